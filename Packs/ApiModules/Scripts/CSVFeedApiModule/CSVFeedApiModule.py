@@ -4,8 +4,8 @@ from CommonServerUserPython import *
 
 ''' IMPORTS '''
 import csv
-import gzip
 import urllib3
+import zlib
 from dateutil.parser import parse
 from typing import Optional, Pattern, Dict, Any, Tuple, Union, List
 
@@ -13,6 +13,8 @@ from typing import Optional, Pattern, Dict, Any, Tuple, Union, List
 urllib3.disable_warnings()
 
 # Globals
+CHUNK_SIZE = 64 * 1024
+BATCH_SIZE = 2000
 
 
 class Client(BaseClient):
@@ -20,7 +22,9 @@ class Client(BaseClient):
                  insecure: bool = False, credentials: dict = None, ignore_regex: str = None, encoding: str = 'latin-1',
                  delimiter: str = ',', doublequote: bool = True, escapechar: str = '',
                  quotechar: str = '"', skipinitialspace: bool = False, polling_timeout: int = 20, proxy: bool = False,
-                 feedTags: Optional[str] = None, tlp_color: Optional[str] = None, value_field: str = 'value', **kwargs):
+                 feedTags: Optional[str] = None, tlp_color: Optional[str] = None, value_field: str = 'value',
+                 max_parallel_downloads: int = 5, skip_unchanged_feeds: bool = False,
+                 submit_delta_only: bool = False, delta_full_refresh_hours: float = 24, **kwargs):
         """
         :param url: URL of the feed.
         :param feed_url_to_config: for each URL, a configuration of the feed that contains
@@ -62,6 +66,15 @@ class Client(BaseClient):
         :param polling_timeout: timeout of the polling request in seconds. Default: 20
         :param proxy: Sets whether use proxy when sending requests
         :param tlp_color: Traffic Light Protocol color.
+        :param max_parallel_downloads: The maximum number of feed URLs to request at the same time. Default: 5
+        :param skip_unchanged_feeds: if *true* fetch-indicators sends conditional requests with the ETag and
+            Last-Modified of the previous fetch, and skips a feed URL which was not modified or has the same content
+            digest. Not applied with the suddenDeath expiration policy. Default: *false*
+        :param submit_delta_only: if *true* fetch-indicators submits only the indicators which are new or changed
+            since the previous fetch, and keeps the values removed from the feed as an expiration list, read with
+            the get-expired-indicators command. Default: *false*
+        :param delta_full_refresh_hours: when skip_unchanged_feeds or submit_delta_only is *true*, how often to read
+            and submit all the indicators, so the unchanged ones do not expire. Default: 24
         """
         self.tags: List[str] = argToList(feedTags)
         self.tlp_color = tlp_color
@@ -89,6 +102,18 @@ class Client(BaseClient):
             self.polling_timeout = int(polling_timeout)
         except (ValueError, TypeError):
             return_error('Please provide an integer value for "Request Timeout"')
+        try:
+            self.max_parallel_downloads = max(int(max_parallel_downloads), 1)
+        except (ValueError, TypeError):
+            return_error('Please provide an integer value for "max_parallel_downloads"')
+        self.skip_unchanged_feeds = argToBoolean(skip_unchanged_feeds)
+        self.feed_validators: Optional[FeedValidators] = None
+        self.skipped_urls: List[str] = []
+        self.submit_delta_only = argToBoolean(submit_delta_only)
+        try:
+            self.delta_full_refresh_hours = float(delta_full_refresh_hours)
+        except (ValueError, TypeError):
+            return_error('Please provide a number for "delta_full_refresh_hours"')
         self.encoding = encoding
         self.ignore_regex: Optional[Pattern] = None
         if ignore_regex is not None:
@@ -103,52 +128,22 @@ class Client(BaseClient):
             'skipinitialspace': skipinitialspace
         }
 
-    def _build_request(self, url):
-        r = requests.Request(
-            'GET',
-            url,
-            auth=self._auth
-        )
-
-        return r.prepare()
-
-    def build_iterator(self, **kwargs):
+    def build_iterator(self, skip_unchanged=False, **kwargs):
         results = []
         urls = self._base_url
         if not isinstance(urls, list):
             urls = [urls]
-        for url in urls:
-            _session = requests.Session()
-
-            prepreq = self._build_request(url)
-
-            # this is to honour the proxy environment variables
-            kwargs.update(_session.merge_environment_settings(
-                prepreq.url,
-                {}, None, None, None  # defaults
-            ))
-            kwargs['stream'] = True
-            kwargs['verify'] = self._verify
-            kwargs['timeout'] = self.polling_timeout
-
-            if self.headers:
-                if 'headers' in kwargs:
-                    kwargs['headers'].update(self.headers)
-                else:
-                    kwargs['headers'] = self.headers
-
-            try:
-                r = _session.send(prepreq, **kwargs)
-            except requests.ConnectionError:
-                raise requests.ConnectionError('Failed to establish a new connection.'
-                                               ' Please make sure your URL is valid.')
-            try:
-                r.raise_for_status()
-            except Exception:
-                return_error('Exception in request: {} {}'.format(r.status_code, r.content))
-                raise
-
-            response = self.get_feed_content_divided_to_lines(url, r)
+        if skip_unchanged and self.feed_validators is None:
+            self.feed_validators = FeedValidators(self.delta_full_refresh_hours)
+        for url, r in self.fetch_urls(urls, skip_unchanged=skip_unchanged, **kwargs):
+            if skip_unchanged and self.feed_validators:
+                content = self.feed_validators.spool_changed_content(url, r)
+                if content is None:
+                    self.skipped_urls.append(url)
+                    continue
+                response = self.divide_chunks_to_lines(url, iter_content_chunks(content))
+            else:
+                response = self.get_feed_content_divided_to_lines(url, r)
             if self.feed_url_to_config:
                 fieldnames = self.feed_url_to_config.get(url, {}).get('fieldnames', [])
             else:
@@ -169,22 +164,95 @@ class Client(BaseClient):
 
         return results
 
+    def fetch_urls(self, urls, skip_unchanged=False, **kwargs):
+        """Requests the URLs concurrently on the client session, up to max_parallel_downloads at a time.
+        A URL which fails is logged and skipped, see fetch_feed_urls.
+
+        Args:
+            urls: The feed URLs.
+            skip_unchanged: Whether to send the conditional headers of the URLs which did not change.
+            kwargs: Arguments to send with each request.
+
+        Returns:
+            List. A (url, response) tuple for each URL which succeeded, in the order of the URLs.
+        """
+        headers = dict(kwargs.pop('headers', None) or {}, **self.headers)
+        requests_kwargs = []
+        for url in urls:
+            request_headers = headers
+            if skip_unchanged and self.feed_validators:
+                request_headers = dict(headers, **self.feed_validators.get_conditional_headers(url))
+            requests_kwargs.append({'full_url': url, 'headers': request_headers})
+        kwargs['stream'] = True
+        kwargs['timeout'] = self.polling_timeout
+        responses, failed_urls = fetch_feed_urls(self, requests_kwargs, self.max_parallel_downloads, method='GET',
+                                                 resp_type='response', error_handler=raise_request_error, **kwargs)
+        self.skipped_urls.extend(failed_urls)
+        return responses
+
     def get_feed_content_divided_to_lines(self, url, raw_response):
-        """Fetch feed data and divides its content to lines
+        """Fetch feed data and divides its content to lines, while it is downloaded,
+        so only a chunk of it is held in memory at a time.
 
         Args:
             url: Current feed's url.
             raw_response: The raw response from the feed's url.
 
         Returns:
-            List. List of lines from the feed content.
+            Iterator. The lines of the feed content, as split by '\\n'.
         """
-        if self.feed_url_to_config and self.feed_url_to_config.get(url).get('is_zipped_file'):  # type: ignore
-            response_content = gzip.decompress(raw_response.content)
-        else:
-            response_content = raw_response.content
+        return self.divide_chunks_to_lines(url, raw_response.iter_content(chunk_size=CHUNK_SIZE))
+
+    def divide_chunks_to_lines(self, url, chunks):
+        if self.feed_url_to_config and self.feed_url_to_config.get(url, {}).get('is_zipped_file'):
+            chunks = gunzip_chunks(chunks)
+        return split_lines(decode_chunks(chunks, self.encoding))
 
-        return response_content.decode(self.encoding).split('\n')
+
+def raise_request_error(response):
+    """Raises the error of a failed feed request."""
+    raise DemistoException('Exception in request: {} {}'.format(response.status_code, response.content))
+
+
+def gunzip_chunks(chunks):
+    """Decompresses gzip content chunk by chunk like gzip.decompress, including files of several gzip members
+    and files padded with zero bytes after a member.
+
+    Args:
+        chunks: Iterator of the compressed bytes.
+
+    Returns:
+        Iterator. The decompressed bytes.
+    """
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        while chunk:
+            if decompressor is None:
+                # a member ended, the zero bytes after it are padding, and anything else is the next member
+                chunk = chunk.lstrip(b'\x00')
+                if not chunk:
+                    break
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            yield decompressor.decompress(chunk)
+            if not decompressor.eof:
+                break
+            chunk = decompressor.unused_data
+            decompressor = None
+    if decompressor is not None:
+        yield decompressor.flush()
+
+
+def split_lines(chunks):
+    """Splits text chunks to lines, the same as str.split('\\n') would split their concatenation."""
+    remainder = ''
+    for chunk in chunks:
+        if '\n' not in chunk:
+            remainder += chunk
+            continue
+        lines = (remainder + chunk).split('\n')
+        remainder = lines.pop()
+        yield from lines
+    yield remainder
 
 
 def determine_indicator_type(indicator_type, default_indicator_type, auto_detect, value):
@@ -206,6 +274,10 @@ def determine_indicator_type(indicator_type, default_indicator_type, auto_detect
 
 
 def module_test_command(client: Client, args):
+    if client.submit_delta_only and not IndicatorsDelta.is_supported():
+        raise ValueError(IndicatorsDelta.UNSUPPORTED_MESSAGE)
+    if client.skip_unchanged_feeds and not FeedValidators.is_supported():
+        raise ValueError(FeedValidators.UNSUPPORTED_MESSAGE)
     client.build_iterator()
     return 'ok', {}, {}
 
@@ -254,8 +326,13 @@ def create_fields_mapping(raw_json: Dict[str, Any], mapping: Dict[str, Union[Tup
 
 
 def fetch_indicators_command(client: Client, default_indicator_type: str, auto_detect: bool, limit: int = 0, **kwargs):
+    return list(iter_indicators(client, default_indicator_type, auto_detect, limit, **kwargs))
+
+
+def iter_indicators(client: Client, default_indicator_type: str, auto_detect: bool, limit: int = 0, **kwargs):
+    """Yields the indicators of the feed one by one, while the feed is read, so it never has to be held in memory."""
     iterator = client.build_iterator(**kwargs)
-    indicators = []
+    count = 0
     config = client.feed_url_to_config or {}
     for url_to_reader in iterator:
         for url, reader in url_to_reader.items():
@@ -282,12 +359,11 @@ def fetch_indicators_command(client: Client, default_indicator_type: str, auto_d
                     if client.tlp_color:
                         indicator['fields']['trafficlightprotocol'] = client.tlp_color
 
-                    indicators.append(indicator)
+                    yield indicator
+                    count += 1
                     # exit the loop if we have more indicators than the limit
-                    if limit and len(indicators) >= limit:
-                        return indicators
-
-    return indicators
+                    if limit and count >= limit:
+                        return
 
 
 def get_indicators_command(client, args: dict, tags: Optional[List[str]] = None):
@@ -305,6 +381,14 @@ def get_indicators_command(client, args: dict, tags: Optional[List[str]] = None)
     return hr, {}, indicators_list
 
 
+def get_expired_indicators_command(client, args: dict):
+    """ The values which fetch-indicators found removed from the feed, with submit_delta_only """
+    limit = int(args.get('limit', 50))
+    expired = IndicatorsDelta.get_expired()[-limit:]
+    hr = tableToMarkdown('Expired Indicators', [{'value': value} for value in expired], headers=['value'])
+    return hr, {}, expired
+
+
 def feed_main(feed_name, params=None, prefix=''):
     if not params:
         params = {k: v for k, v in demisto.params().items() if v is not None}
@@ -318,19 +402,36 @@ def feed_main(feed_name, params=None, prefix=''):
     # Switch case
     commands: dict = {
         'test-module': module_test_command,
-        f'{prefix}get-indicators': get_indicators_command
+        f'{prefix}get-indicators': get_indicators_command,
+        f'{prefix}get-expired-indicators': get_expired_indicators_command,
     }
     try:
         if command == 'fetch-indicators':
-            indicators = fetch_indicators_command(
+            skip_unchanged = client.skip_unchanged_feeds and FeedValidators.is_supported()
+            if client.skip_unchanged_feeds and not skip_unchanged:
+                demisto.debug(f'{FeedValidators.UNSUPPORTED_MESSAGE} Reading all the feeds.')
+            indicators = iter_indicators(
                 client,
                 params.get('indicator_type'),
                 params.get('auto_detect_type'),
                 params.get('limit'),
+                skip_unchanged=skip_unchanged,
             )
-            # we submit the indicators in batches
-            for b in batch(indicators, batch_size=2000):
-                demisto.createIndicators(b)  # type: ignore
+            delta = None
+            if client.submit_delta_only and IndicatorsDelta.is_supported():
+                delta = IndicatorsDelta(client.delta_full_refresh_hours)
+            elif client.submit_delta_only:
+                demisto.debug(f'{IndicatorsDelta.UNSUPPORTED_MESSAGE} Submitting all the indicators.')
+            if delta:
+                indicators = delta.filter(indicators)
+            # we submit the indicators in batches, while the feed is still being read
+            create_indicators_in_batches(indicators, BATCH_SIZE)
+            if client.feed_validators:
+                # a full refresh is complete only if no URL was skipped
+                client.feed_validators.save(refreshed=not client.skipped_urls)
+            if delta:
+                # the indicators of a skipped URL, or after the limit, were not seen but were not removed from the feed
+                delta.save(keep_unseen=bool(client.skipped_urls or params.get('limit')))
         else:
             args = demisto.args()
             args['feed_name'] = feed_name
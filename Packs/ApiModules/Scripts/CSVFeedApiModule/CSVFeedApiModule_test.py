@@ -1,3 +1,4 @@
+import pytest
 import requests_mock
 from CSVFeedApiModule import *
 
@@ -146,7 +147,47 @@ def test_get_feed_content():
             m.get(url, content=feed_url_to_config.get(url).get('content'))
             raw_response = requests.get(url)
 
-            assert client.get_feed_content_divided_to_lines(url, raw_response) == expected_output
+            assert list(client.get_feed_content_divided_to_lines(url, raw_response)) == expected_output
+
+
+@pytest.mark.parametrize('content', [
+    'a,b\nc,d\n',
+    'a,b\r\nc,d',
+    '\n\nשלום,עולם\n\n',
+    '',
+])
+def test_get_feed_content_in_chunks(mocker, content):
+    """
+    Given
+    - Feed content, in one and in several gzip members, which may be padded with zero bytes.
+
+    When
+    - Reading the content in chunks of one byte, so multi-byte characters are split between chunks.
+
+    Then
+    - Ensure the lines are the same as splitting the whole decoded content.
+    """
+    import gzip
+    mocker.patch('CSVFeedApiModule.CHUNK_SIZE', 1)
+    raw = content.encode('utf-8')
+    half = len(raw) // 2
+    feed_url_to_config = {
+        'https://example.com/plain': {'content': raw},
+        'https://example.com/gzip': {'content': gzip.compress(raw), 'is_zipped_file': True},
+        'https://example.com/members': {'content': gzip.compress(raw[:half]) + gzip.compress(raw[half:]),
+                                        'is_zipped_file': True},
+        'https://example.com/padded': {'content': gzip.compress(raw[:half]) + b'\x00' * 4 + gzip.compress(raw[half:])
+                                       + b'\x00' * 8, 'is_zipped_file': True},
+    }
+    with requests_mock.Mocker() as m:
+        for url, config in feed_url_to_config.items():
+            client = Client(url=url, feed_url_to_config=feed_url_to_config, encoding='utf-8')
+            m.get(url, content=config['content'])
+            raw_response = requests.get(url, stream=True)
+
+            if config.get('is_zipped_file'):
+                assert gzip.decompress(config['content']) == raw
+            assert list(client.get_feed_content_divided_to_lines(url, raw_response)) == content.split('\n')
 
 
 def test_date_format_parsing():
@@ -230,3 +271,197 @@ class TestTagsParam:
             )
             _, _, indicators = get_indicators_command(client, args)
             assert [] == indicators[0]['fields']['tags']
+
+
+def test_build_iterator_multiple_urls(mocker):
+    """
+    Given
+    - Three feed URLs, the second of which fails.
+
+    When
+    - Building the iterator.
+
+    Then
+    - Ensure the URLs are requested concurrently.
+    - Ensure the failed URL is logged and skipped, and the rest keep the order of the URLs.
+    """
+    import threading
+    import time
+    import demistomock as demisto
+    mocker.patch.object(demisto, 'error')
+    lock = threading.Lock()
+    active = [0, 0]
+
+    http_request = Client._http_request
+
+    def slow_http_request(self, *args, **kwargs):
+        with lock:
+            active[0] += 1
+            active[1] = max(active)
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return http_request(self, *args, **kwargs)
+
+    mocker.patch.object(Client, '_http_request', slow_http_request)
+
+    urls = ['https://example.com/1', 'https://example.com/2', 'https://example.com/3']
+    with requests_mock.Mocker() as m:
+        m.get(urls[0], content=b'1.1.1.1')
+        m.get(urls[1], status_code=500, content=b'error')
+        m.get(urls[2], content=b'3.3.3.3')
+        client = Client(url=urls, fieldnames='value', max_parallel_downloads=3)
+        results = client.build_iterator()
+
+    assert [list(result) for result in results] == [[urls[0]], [urls[2]]]
+    assert [row['value'] for row in results[0][urls[0]]] == ['1.1.1.1']
+    assert [row['value'] for row in results[1][urls[2]]] == ['3.3.3.3']
+    assert active[1] > 1
+    assert urls[1] in demisto.error.call_args[0][0]
+
+
+def test_build_iterator_all_urls_fail():
+    """
+    Given
+    - Two feed URLs which fail.
+
+    When
+    - Building the iterator.
+
+    Then
+    - Ensure the error is raised.
+    """
+    urls = ['https://example.com/1', 'https://example.com/2']
+    with requests_mock.Mocker() as m:
+        m.get(urls[0], status_code=404)
+        m.get(urls[1], status_code=500)
+        client = Client(url=urls, fieldnames='value')
+        with pytest.raises(DemistoException, match='404'):
+            client.build_iterator()
+
+
+def test_build_iterator_url_fails_sudden_death(mocker):
+    """
+    Given
+    - Two feed URLs, the second of which fails, with the suddenDeath indicator expiration method.
+
+    When
+    - Building the iterator.
+
+    Then
+    - Ensure the error is raised, as the indicators of the failed URL would expire.
+    """
+    import demistomock as demisto
+    mocker.patch.object(demisto, 'params', return_value={'feedExpirationPolicy': 'suddenDeath'})
+    urls = ['https://example.com/1', 'https://example.com/2']
+    with requests_mock.Mocker() as m:
+        m.get(urls[0], content=b'1.1.1.1')
+        m.get(urls[1], status_code=500)
+        client = Client(url=urls, fieldnames='value')
+        with pytest.raises(DemistoException, match='500'):
+            client.build_iterator()
+
+
+def test_feed_main_fetch_indicators_in_batches(mocker):
+    """
+    Given
+    - A gzipped CSV feed of 4,500 IPs.
+
+    When
+    - Fetching indicators.
+
+    Then
+    - Ensure the indicators are created in batches of 2,000, in the order of the feed.
+    """
+    import gzip
+    import demistomock as demisto
+    feed_url = 'https://example.com/ips.csv.gz'
+    mocker.patch.object(demisto, 'params', return_value={
+        'url': feed_url, 'indicator_type': 'IP', 'encoding': 'utf-8',
+        'feed_url_to_config': {feed_url: {'fieldnames': ['value', 'name'], 'is_zipped_file': True}}})
+    mocker.patch.object(demisto, 'command', return_value='fetch-indicators')
+    mocker.patch.object(demisto, 'createIndicators')
+    ips = ['10.0.{}.{}'.format(i // 256, i % 256) for i in range(4500)]
+    with requests_mock.Mocker() as m:
+        m.get(feed_url, content=gzip.compress('\n'.join(ip + ',scanner' for ip in ips).encode('utf-8')))
+        feed_main('great_feed_name')
+
+    batches = [call[0][0] for call in demisto.createIndicators.call_args_list]
+    assert [len(indicators) for indicators in batches] == [2000, 2000, 500]
+    assert [indicator['value'] for indicators in batches for indicator in indicators] == ips
+    assert batches[0][0]['rawJSON']['name'] == 'scanner'
+
+
+def test_feed_main_skip_unchanged_feeds(mocker):
+    """
+    Given
+    - A feed configured to skip unchanged feeds.
+
+    When
+    - Fetching indicators 4 times: the server answers the feed, then 304, then the same content without
+      validators, then a new content.
+
+    Then
+    - Ensure the validators of the first fetch are sent with the second request.
+    - Ensure indicators are created only for the first and the last fetches.
+    """
+    import copy
+    import demistomock as demisto
+    import CommonServerPython
+    feed_url = 'https://example.com/ips.csv'
+    context = {}
+    mocker.patch.object(CommonServerPython, 'get_integration_context', side_effect=lambda: copy.deepcopy(context))
+    mocker.patch.object(CommonServerPython, 'set_integration_context', side_effect=context.update)
+    mocker.patch.object(demisto, 'params', return_value={'url': feed_url, 'indicator_type': 'IP', 'fieldnames': 'value',
+                                                         'skip_unchanged_feeds': True})
+    mocker.patch.object(demisto, 'command', return_value='fetch-indicators')
+    mocker.patch.object(demisto, 'createIndicators')
+    with requests_mock.Mocker() as m:
+        m.get(feed_url, [
+            {'text': '1.1.1.1\n2.2.2.2', 'headers': {'ETag': '"v1"'}},
+            {'status_code': 304},
+            {'text': '1.1.1.1\n2.2.2.2'},
+            {'text': '1.1.1.1\n3.3.3.3'},
+        ])
+        for _ in range(4):
+            feed_main('great_feed_name')
+
+        assert m.request_history[1].headers['If-None-Match'] == '"v1"'
+    created = [[indicator['value'] for indicator in call[0][0]] for call in demisto.createIndicators.call_args_list]
+    assert created == [['1.1.1.1', '2.2.2.2'], ['1.1.1.1', '3.3.3.3']]
+
+
+def test_feed_main_submit_delta_only(mocker, requests_mock):
+    """
+    Given
+    - A feed configured to submit only the delta.
+
+    When
+    - Fetching indicators twice, where one indicator was replaced with another between the fetches.
+
+    Then
+    - Ensure all the indicators are created in the first fetch, and only the new one in the second.
+    - Ensure the removed indicator is listed by the get-expired-indicators command.
+    """
+    import copy
+    import CommonServerPython
+    feed_url = 'https://example.com/ips.csv'
+    context = {}
+    mocker.patch.object(CommonServerPython, 'get_integration_context', side_effect=lambda: copy.deepcopy(context))
+    mocker.patch.object(CommonServerPython, 'set_integration_context', side_effect=context.update)
+    mocker.patch.object(demisto, 'command', return_value='fetch-indicators')
+    mocker.patch.object(demisto, 'createIndicators')
+    requests_mock.get(feed_url, [{'text': '1.1.1.1\n2.2.2.2\n3.3.3.3'}, {'text': '1.1.1.1\n2.2.2.2\n4.4.4.4'}])
+
+    for _ in range(2):
+        feed_main('great_feed_name', params={'url': feed_url, 'indicator_type': 'IP', 'fieldnames': 'value',
+                                             'submit_delta_only': 'true'})
+
+    created = [[indicator['value'] for indicator in call[0][0]] for call in demisto.createIndicators.call_args_list]
+    assert created == [['1.1.1.1', '2.2.2.2', '3.3.3.3'], ['4.4.4.4']]
+    mocker.patch.object(demisto, 'command', return_value='get-expired-indicators')
+    mocker.patch.object(demisto, 'args', return_value={})
+    mocker.patch.object(demisto, 'results')
+    feed_main('great_feed_name', params={'url': feed_url, 'indicator_type': 'IP', 'fieldnames': 'value',
+                                         'submit_delta_only': 'true'})
+    assert demisto.results.call_args[0][0]['Contents'] == ['3.3.3.3']
@@ -6,8 +6,9 @@ from CommonServerUserPython import *
 import urllib3
 import requests
 import traceback
+from itertools import islice
 from dateutil.parser import parse
-from typing import Optional, Pattern, List
+from typing import IO, Any, Dict, Optional, Pattern, List
 
 # disable insecure warnings
 urllib3.disable_warnings()
@@ -15,13 +16,91 @@ urllib3.disable_warnings()
 ''' GLOBALS '''
 TAGS = 'feedTags'
 TLP_COLOR = 'trafficlightprotocol'
+BATCH_SIZE = 2000
+CHUNK_SIZE = 64 * 1024
+GROUP_TRANSFORM_REGEX = re.compile(r'^(?:\\(\d+)|\\g<(\d+)>)$')
+
+
+def compile_transform(transform: str):
+    """
+    Compiles the transform template of an extraction dictionary to a function of the regex match.
+    A template of a single group, like the common \\1, is a group lookup instead of a template expansion.
+    """
+    group_match = GROUP_TRANSFORM_REGEX.match(transform)
+    if group_match:
+        group = int(group_match.group(1) or group_match.group(2))
+        return lambda m: m.group(group) or ''
+    return lambda m: m.expand(transform)
+
+
+class ExtractionPlan:
+    def __init__(self, feed_config: dict, indicator_type: str = '', custom_fields_mapping: dict = None):
+        """
+        The extraction of the indicators of one feed URL, compiled from its configuration once,
+        so processing a line is only matching its regexes.
+        The feed configuration is not modified.
+        :param feed_config: The configuration of the URL, see feed_url_to_config in Client.
+        :param indicator_type: The indicator type to use when the configuration has none.
+        :param custom_fields_mapping: The custom fields mapping of the Client.
+        """
+        self.config_indicator_type = feed_config.get('indicator_type')
+        self.indicator_type = feed_config.get('indicator_type', indicator_type)
+        self.indicator_regex: Optional[Pattern] = None
+        self.indicator_transform = None
+        indicator = feed_config.get('indicator')
+        if indicator:
+            if 'regex' in indicator:
+                self.indicator_regex = re.compile(indicator['regex'])
+            self.indicator_transform = compile_transform(indicator.get('transform', r'\g<0>'))
+
+        self.fields: List[tuple] = []
+        for field in feed_config.get('fields', []):
+            for f, fattrs in field.items():
+                if 'regex' not in fattrs:
+                    raise ValueError(f'{f} field does not have a regex')
+                self.fields.append((f, re.compile(fattrs['regex']), compile_transform(fattrs.get('transform', r'\g<0>'))))
+
+        custom_fields_mapping = custom_fields_mapping or {}
+        self.has_custom_fields_mapping = len(custom_fields_mapping) > 0
+        self.custom_fields_mapping = dict(custom_fields_mapping, **{TAGS: TAGS, TLP_COLOR: TLP_COLOR})
+
+    def extract_value(self, line: str) -> Optional[str]:
+        """
+        Extracts the indicator value from a stripped, non empty line. None if the line has no indicator.
+        """
+        if self.indicator_regex is None:
+            return line.split()[0]
+        m = self.indicator_regex.search(line)
+        if m is None:
+            return None
+        return self.indicator_transform(m)  # type: ignore[misc]
+
+    def extract_fields(self, line: str) -> dict:
+        attributes = {}
+        for f, regex, transform in self.fields:
+            m = regex.search(line)
+            if m is None:
+                continue
+            value = transform(m)
+            try:
+                value = int(value)
+            except Exception:
+                pass
+            attributes[f] = value
+        return attributes
+
+    def create_custom_fields(self, attributes: dict) -> dict:
+        return {self.custom_fields_mapping[attribute]: value for attribute, value in attributes.items()
+                if attribute in self.custom_fields_mapping}
 
 
 class Client(BaseClient):
     def __init__(self, url: str, feed_name: str = 'http', insecure: bool = False, credentials: dict = None,
                  ignore_regex: str = None, encoding: str = None, indicator_type: str = '',
                  indicator: str = '', fields: str = '{}', feed_url_to_config: dict = None, polling_timeout: int = 20,
-                 headers: dict = None, proxy: bool = False, custom_fields_mapping: dict = None, **kwargs):
+                 headers: dict = None, proxy: bool = False, custom_fields_mapping: dict = None,
+                 max_parallel_downloads: int = 5, skip_unchanged_feeds: bool = False,
+                 submit_delta_only: bool = False, delta_full_refresh_hours: float = 24, **kwargs):
         """Implements class for miners of plain text feeds over HTTP.
         **Config parameters**
         :param: url: URL of the feed.
@@ -61,6 +140,15 @@ class Client(BaseClient):
             }]
         }
         :param: proxy: Use proxy in requests.
+        :param: max_parallel_downloads: The maximum number of feed URLs to request at the same time. Default: 5
+        :param: skip_unchanged_feeds: boolean, if *true* fetch-indicators sends conditional requests with the ETag and
+            Last-Modified of the previous fetch, and skips a feed URL which was not modified or has the same content
+            digest. Not applied with the suddenDeath expiration policy. Default: *false*
+        :param: submit_delta_only: boolean, if *true* fetch-indicators submits only the indicators which are new or
+            changed since the previous fetch, and keeps the values removed from the feed as an expiration list, read
+            with the get-expired-indicators command. Default: *false*
+        :param: delta_full_refresh_hours: when skip_unchanged_feeds or submit_delta_only is *true*, how often to read
+            and submit all the indicators, so the unchanged ones do not expire. Default: 24
         **Extraction dictionary**
             Extraction dictionaries contain the following keys:
             :regex: Python regular expression for searching the text.
@@ -102,6 +190,21 @@ class Client(BaseClient):
         except (ValueError, TypeError):
             raise ValueError('Please provide an integer value for "Request Timeout"')
 
+        try:
+            self.max_parallel_downloads = max(int(max_parallel_downloads), 1)
+        except (ValueError, TypeError):
+            raise ValueError('Please provide an integer value for "max_parallel_downloads"')
+
+        self.skip_unchanged_feeds = argToBoolean(skip_unchanged_feeds)
+        self.feed_validators: Optional[FeedValidators] = None
+        self.skipped_urls: List[str] = []
+
+        self.submit_delta_only = argToBoolean(submit_delta_only)
+        try:
+            self.delta_full_refresh_hours = float(delta_full_refresh_hours)
+        except (ValueError, TypeError):
+            raise ValueError('Please provide a number for "delta_full_refresh_hours"')
+
         self.headers = headers
         self.encoding = encoding
         self.feed_name = feed_name
@@ -137,6 +240,19 @@ class Client(BaseClient):
         if custom_fields_mapping is None:
             custom_fields_mapping = {}
         self.custom_fields_mapping = custom_fields_mapping
+        self.extraction_plans: Dict[str, ExtractionPlan] = {}
+
+    def get_extraction_plan(self, url: str) -> ExtractionPlan:
+        """
+        Get the extraction plan of the URL, compiled the first time it is needed.
+        :param url: The feed URL.
+        :return: The extraction plan.
+        """
+        plan = self.extraction_plans.get(url)
+        if plan is None:
+            plan = ExtractionPlan(self.feed_url_to_config.get(url, {}), self.indicator_type, self.custom_fields_mapping)
+            self.extraction_plans[url] = plan
+        return plan
 
     def get_feed_config(self, fields_json: str = '', indicator_json: str = ''):
         """
@@ -189,14 +305,14 @@ class Client(BaseClient):
 
         return config
 
-    def build_iterator(self, **kwargs):
+    def build_iterator(self, skip_unchanged: bool = False, **kwargs):
         """
         For each URL (service), send an HTTP request to get indicators and return them after filtering by Regex
+        :param skip_unchanged: Whether to skip the URLs which did not change since their validators were saved.
         :param kwargs: Arguments to send to the HTTP API endpoint
         :return: List of indicators
         """
         kwargs['stream'] = True
-        kwargs['verify'] = self._verify
         kwargs['timeout'] = self.polling_timeout
 
         if self.headers is not None:
@@ -204,30 +320,24 @@ class Client(BaseClient):
 
         if self.username is not None and self.password is not None:
             kwargs['auth'] = (self.username, self.password)
-        try:
-            urls = self._base_url
-            url_to_response_list: List[dict] = []
-            if not isinstance(urls, list):
-                urls = [urls]
-            for url in urls:
-                r = requests.get(
-                    url,
-                    **kwargs
-                )
-                try:
-                    r.raise_for_status()
-                except Exception:
-                    LOG(f'{self.feed_name!r} - exception in request:'
-                        f' {r.status_code!r} {r.content!r}')
-                    raise
-                url_to_response_list.append({url: r})
-        except requests.ConnectionError:
-            raise requests.ConnectionError('Failed to establish a new connection. Please make sure your URL is valid.')
+        urls = self._base_url
+        if not isinstance(urls, list):
+            urls = [urls]
+        if skip_unchanged and self.feed_validators is None:
+            self.feed_validators = FeedValidators(self.delta_full_refresh_hours)
+        url_to_response_list = self.fetch_urls(urls, skip_unchanged=skip_unchanged, **kwargs)
 
         results = []
         for url_to_response in url_to_response_list:
             for url, lines in url_to_response.items():
-                result = lines.iter_lines()
+                if skip_unchanged and self.feed_validators:
+                    content = self.feed_validators.spool_changed_content(url, lines)
+                    if content is None:
+                        self.skipped_urls.append(url)
+                        continue
+                    result = iter_content_lines(content)
+                else:
+                    result = lines.iter_lines()
                 if self.encoding is not None:
                     result = map(
                         lambda x: x.decode(self.encoding).encode('utf_8'),
@@ -246,6 +356,28 @@ class Client(BaseClient):
                 results.append({url: result})
         return results
 
+    def fetch_urls(self, urls: List[str], skip_unchanged: bool = False, **kwargs) -> List[dict]:
+        """
+        Requests the URLs concurrently on the client session, up to max_parallel_downloads at a time.
+        A URL which fails is logged and skipped, see fetch_feed_urls.
+        :param urls: The feed URLs.
+        :param skip_unchanged: Whether to send the conditional headers of the URLs which did not change.
+        :param kwargs: Arguments to send to the HTTP API endpoint
+        :return: A {url: response} dict for each URL which succeeded, in the order of the URLs.
+        """
+        requests_kwargs: List[Dict[str, Any]] = []
+        for url in urls:
+            request_kwargs: Dict[str, Any] = {'full_url': url}
+            if skip_unchanged and self.feed_validators:
+                request_kwargs['headers'] = dict(kwargs.get('headers') or {},
+                                                 **self.feed_validators.get_conditional_headers(url))
+            requests_kwargs.append(request_kwargs)
+        responses, failed_urls = fetch_feed_urls(self, requests_kwargs, self.max_parallel_downloads, method='GET',
+                                                 resp_type='response', error_handler=requests.Response.raise_for_status,
+                                                 **kwargs)
+        self.skipped_urls.extend(failed_urls)
+        return [{url: r} for url, r in responses]
+
     def custom_fields_creator(self, attributes: dict):
         created_custom_fields = {}
         for attribute in attributes.keys():
@@ -258,6 +390,25 @@ class Client(BaseClient):
         return created_custom_fields
 
 
+def iter_content_lines(content: IO[bytes]):
+    """
+    Yields the lines of the content, the same as requests.Response.iter_lines yields them, and closes it.
+    """
+    with content:
+        pending = None
+        for chunk in iter(lambda: content.read(CHUNK_SIZE), b''):
+            if pending is not None:
+                chunk = pending + chunk
+            lines = chunk.splitlines()
+            if lines and lines[-1] and chunk and lines[-1][-1] == chunk[-1]:
+                pending = lines.pop()
+            else:
+                pending = None
+            yield from lines
+        if pending is not None:
+            yield pending
+
+
 def datestring_to_millisecond_timestamp(datestring):
     date = parse(str(datestring))
     return int(date.timestamp() * 1000)
@@ -275,57 +426,16 @@ def get_indicator_fields(line, url, feed_tags: list, tlp_color: Optional[str], c
     """
     attributes = None
     value: str = ''
-    indicator = None
-    fields_to_extract = []
-    feed_config = client.feed_url_to_config.get(url, {})
-    if feed_config:
-        if 'indicator' in feed_config:
-            indicator = feed_config['indicator']
-            if 'regex' in indicator:
-                indicator['regex'] = re.compile(indicator['regex'])
-            if 'transform' not in indicator:
-                indicator['transform'] = r'\g<0>'
-
-    if 'fields' in feed_config:
-        fields = feed_config['fields']
-        for field in fields:
-            for f, fattrs in field.items():
-                field = {f: {}}
-                if 'regex' in fattrs:
-                    field[f]['regex'] = re.compile(fattrs['regex'])
-                if 'transform' not in fattrs:
-                    field[f]['transform'] = r'\g<0>'
-                else:
-                    field[f]['transform'] = fattrs['transform']
-                fields_to_extract.append(field)
+    plan = client.get_extraction_plan(url)
 
     line = line.strip()
     if line:
-        extracted_indicator = line.split()[0]
-        if indicator:
-            extracted_indicator = indicator['regex'].search(line)
-            if extracted_indicator is None:
-                return attributes, value
-            if 'transform' in indicator:
-                extracted_indicator = extracted_indicator.expand(indicator['transform'])
-        attributes = {}
-        for field in fields_to_extract:
-            for f, fattrs in field.items():
-                m = fattrs['regex'].search(line)
-
-                if m is None:
-                    continue
-
-                attributes[f] = m.expand(fattrs['transform'])
-
-                try:
-                    i = int(attributes[f])
-                except Exception:
-                    pass
-                else:
-                    attributes[f] = i
+        extracted_indicator = plan.extract_value(line)
+        if extracted_indicator is None:
+            return attributes, value
+        attributes = plan.extract_fields(line)
         attributes['value'] = value = extracted_indicator
-        attributes['type'] = feed_config.get('indicator_type', client.indicator_type)
+        attributes['type'] = plan.indicator_type
         attributes['tags'] = feed_tags
 
         if tlp_color:
@@ -335,10 +445,17 @@ def get_indicator_fields(line, url, feed_tags: list, tlp_color: Optional[str], c
 
 
 def fetch_indicators_command(client, feed_tags, tlp_color, itype, auto_detect, **kwargs):
+    return list(iter_indicators(client, feed_tags, tlp_color, itype, auto_detect, **kwargs))
+
+
+def iter_indicators(client, feed_tags, tlp_color, itype, auto_detect, **kwargs):
+    """
+    Yields the indicators of the feed one by one, while the feed is read, so it never has to be held in memory.
+    """
     iterators = client.build_iterator(**kwargs)
-    indicators = []
     for iterator in iterators:
         for url, lines in iterator.items():
+            plan = client.get_extraction_plan(url)
             for line in lines:
                 attributes, value = get_indicator_fields(line, url, feed_tags, tlp_color, client)
                 if value:
@@ -350,19 +467,17 @@ def fetch_indicators_command(client, feed_tags, tlp_color, itype, auto_detect, *
                         attributes['firstseenbysource'] = datestring_to_millisecond_timestamp(
                             attributes['firstseenbysource'])
                     indicator_type = determine_indicator_type(
-                        client.feed_url_to_config.get(url, {}).get('indicator_type'), itype, auto_detect, value)
+                        plan.config_indicator_type, itype, auto_detect, value)
                     indicator_data = {
                         "value": value,
                         "type": indicator_type,
                         "rawJSON": attributes,
                     }
 
-                    if len(client.custom_fields_mapping.keys()) > 0 or TAGS in attributes.keys():
-                        custom_fields = client.custom_fields_creator(attributes)
-                        indicator_data["fields"] = custom_fields
+                    if plan.has_custom_fields_mapping or TAGS in attributes:
+                        indicator_data["fields"] = plan.create_custom_fields(attributes)
 
-                    indicators.append(indicator_data)
-    return indicators
+                    yield indicator_data
 
 
 def determine_indicator_type(indicator_type, default_indicator_type, auto_detect, value):
@@ -389,13 +504,25 @@ def get_indicators_command(client: Client, args):
     feed_tags = args.get('feedTags')
     tlp_color = args.get('tlp_color')
     auto_detect = demisto.params().get('auto_detect_type')
-    indicators_list = fetch_indicators_command(client, feed_tags, tlp_color, itype, auto_detect)[:limit]
+    indicators_list = list(islice(iter_indicators(client, feed_tags, tlp_color, itype, auto_detect), limit))
     entry_result = camelize(indicators_list)
     hr = tableToMarkdown('Indicators', entry_result, headers=['Value', 'Type', 'Rawjson'])
     return hr, {}, indicators_list
 
 
+def get_expired_indicators_command(client: Client, args):
+    """ The values which fetch-indicators found removed from the feed, with submit_delta_only """
+    limit = int(args.get('limit', 50))
+    expired = IndicatorsDelta.get_expired()[-limit:]
+    hr = tableToMarkdown('Expired Indicators', [{'value': value} for value in expired], headers=['value'])
+    return hr, {}, expired
+
+
 def test_module(client: Client, args):
+    if client.submit_delta_only and not IndicatorsDelta.is_supported():
+        raise ValueError(IndicatorsDelta.UNSUPPORTED_MESSAGE)
+    if client.skip_unchanged_feeds and not FeedValidators.is_supported():
+        raise ValueError(FeedValidators.UNSUPPORTED_MESSAGE)
     if not client.feed_url_to_config:
         indicator_type = args.get('indicator_type', demisto.params().get('indicator_type'))
         if not FeedIndicatorType.is_valid_type(indicator_type):
@@ -426,15 +553,31 @@ def feed_main(feed_name, params=None, prefix=''):
     # Switch case
     commands: dict = {
         'test-module': test_module,
-        f'{prefix}get-indicators': get_indicators_command
+        f'{prefix}get-indicators': get_indicators_command,
+        f'{prefix}get-expired-indicators': get_expired_indicators_command,
     }
     try:
         if command == 'fetch-indicators':
-            indicators = fetch_indicators_command(client, feed_tags, tlp_color, params.get('indicator_type'),
-                                                  params.get('auto_detect_type'))
-            # we submit the indicators in batches
-            for b in batch(indicators, batch_size=2000):
-                demisto.createIndicators(b)
+            skip_unchanged = client.skip_unchanged_feeds and FeedValidators.is_supported()
+            if client.skip_unchanged_feeds and not skip_unchanged:
+                demisto.debug(f'{FeedValidators.UNSUPPORTED_MESSAGE} Reading all the feeds.')
+            indicators = iter_indicators(client, feed_tags, tlp_color, params.get('indicator_type'),
+                                         params.get('auto_detect_type'), skip_unchanged=skip_unchanged)
+            delta = None
+            if client.submit_delta_only and IndicatorsDelta.is_supported():
+                delta = IndicatorsDelta(client.delta_full_refresh_hours)
+            elif client.submit_delta_only:
+                demisto.debug(f'{IndicatorsDelta.UNSUPPORTED_MESSAGE} Submitting all the indicators.')
+            if delta:
+                indicators = delta.filter(indicators)
+            # we submit the indicators in batches, while the feed is still being read
+            create_indicators_in_batches(indicators, BATCH_SIZE)
+            if client.feed_validators:
+                # a full refresh is complete only if no URL was skipped
+                client.feed_validators.save(refreshed=not client.skipped_urls)
+            if delta:
+                # the indicators of a skipped URL were not seen, but they were not removed from the feed
+                delta.save(keep_unseen=bool(client.skipped_urls))
         else:
             args = demisto.args()
             args['feed_name'] = feed_name
@@ -1,4 +1,8 @@
-from HTTPFeedApiModule import get_indicators_command, Client, datestring_to_millisecond_timestamp, feed_main
+from HTTPFeedApiModule import get_indicators_command, Client, datestring_to_millisecond_timestamp, feed_main, \
+    get_indicator_fields
+import copy
+import time
+import pytest
 import requests_mock
 import demistomock as demisto
 
@@ -292,3 +296,342 @@ def test_feed_main_test_module(mocker, requests_mock):
     assert demisto.results.call_count == 1
     results = demisto.results.call_args[0][0]
     assert results['HumanReadable'] == 'ok'
+
+
+def test_feed_main_fetch_indicators_in_batches(mocker, requests_mock):
+    """
+    Given
+    - A feed of 4,500 IPs.
+
+    When
+    - Fetching indicators.
+
+    Then
+    - Ensure the indicators are created in batches of 2,000, in the order of the feed.
+    - Ensure the first batch is created before the rest of the feed is processed.
+    """
+    import HTTPFeedApiModule
+    feed_url = 'https://example.com/ips.txt'
+    mocker.patch.object(demisto, 'params', return_value={'url': feed_url, 'indicator_type': 'IP'})
+    mocker.patch.object(demisto, 'command', return_value='fetch-indicators')
+    created = []
+    processed_lines = []
+    get_indicator_fields = HTTPFeedApiModule.get_indicator_fields
+
+    def get_indicator_fields_spy(line, *args):
+        processed_lines.append(line)
+        return get_indicator_fields(line, *args)
+
+    mocker.patch.object(HTTPFeedApiModule, 'get_indicator_fields', side_effect=get_indicator_fields_spy)
+    mocker.patch.object(demisto, 'createIndicators',
+                        side_effect=lambda indicators: created.append((len(processed_lines), indicators)))
+    ips = ['10.0.{}.{}'.format(i // 256, i % 256) for i in range(4500)]
+    requests_mock.get(feed_url, text='\n'.join(ips))
+
+    feed_main('great_feed_name')
+
+    assert [len(indicators) for _, indicators in created] == [2000, 2000, 500]
+    assert [indicator['value'] for _, indicators in created for indicator in indicators] == ips
+    assert created[0][0] <= 2001
+
+
+def test_get_indicator_fields_extraction_plan():
+    """
+    Given
+    - A DShield like feed configuration, with transforms of a single group and of a template.
+
+    When
+    - Extracting the indicators of two lines.
+
+    Then
+    - Ensure the indicator and its fields are extracted, and numeric fields are converted to int.
+    - Ensure the feed configuration is not modified, and the plan is compiled once for the URL.
+    """
+    url = 'https://www.dshield.org/block.txt'
+    feed_url_to_config = {
+        url: {
+            'indicator_type': 'CIDR',
+            'indicator': {
+                'regex': r'^(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})\t[\d.]*\t(\d{1,2})',
+                'transform': '\\1/\\2'
+            },
+            'fields': [
+                {'numberofattacks': {'regex': r'^.*\t.*\t[0-9]+\t([0-9]+)', 'transform': '\\1'}},
+                {'geocountry': {'regex': r'^.*\t.*\t[0-9]+\t[0-9]+\t[^\t]+\t([A-Z]+)', 'transform': r'\g<1>'}},
+                {'line': {'regex': r'^\S+'}}
+            ]
+        }
+    }
+    original_config = copy.deepcopy(feed_url_to_config)
+    client = Client(url=url, feed_url_to_config=feed_url_to_config, custom_fields_mapping={'geocountry': 'country'})
+
+    attributes, value = get_indicator_fields('1.2.3.0\t1.2.3.255\t24\t1501\tEXAMPLE-NET\tUS\tabuse@example.com',
+                                             url, ['tag'], 'RED', client)
+    assert value == '1.2.3.0/24'
+    assert attributes == {'numberofattacks': 1501, 'geocountry': 'US', 'line': '1.2.3.0', 'value': '1.2.3.0/24',
+                          'type': 'CIDR', 'tags': ['tag'], 'trafficlightprotocol': 'RED'}
+    custom_fields = client.get_extraction_plan(url).create_custom_fields(attributes)
+    assert custom_fields == {'country': 'US', 'trafficlightprotocol': 'RED'}
+    assert get_indicator_fields('Start\tEnd\tNetblock', url, [], None, client) == (None, '')
+    assert feed_url_to_config == original_config
+    assert list(client.extraction_plans) == [url]
+
+
+def test_build_iterator_multiple_urls(mocker, requests_mock):
+    """
+    Given
+    - Three feed URLs, the second of which fails.
+
+    When
+    - Building the iterator.
+
+    Then
+    - Ensure the URLs are requested concurrently.
+    - Ensure the failed URL is logged and skipped, and the rest keep the order of the URLs.
+    """
+    import threading
+    mocker.patch.object(demisto, 'error')
+    lock = threading.Lock()
+    active = [0, 0]
+
+    http_request = Client._http_request
+
+    def slow_http_request(self, *args, **kwargs):
+        with lock:
+            active[0] += 1
+            active[1] = max(active)
+        time.sleep(0.05)
+        with lock:
+            active[0] -= 1
+        return http_request(self, *args, **kwargs)
+
+    mocker.patch.object(Client, '_http_request', slow_http_request)
+
+    urls = ['https://example.com/1', 'https://example.com/2', 'https://example.com/3']
+    requests_mock.get(urls[0], content=b'1.1.1.1')
+    requests_mock.get(urls[1], status_code=500, content=b'error')
+    requests_mock.get(urls[2], content=b'3.3.3.3')
+    client = Client(url=urls, feed_url_to_config={url: {} for url in urls}, max_parallel_downloads=3)
+    results = client.build_iterator()
+
+    assert [list(result) for result in results] == [[urls[0]], [urls[2]]]
+    assert list(results[0][urls[0]]) == ['1.1.1.1']
+    assert list(results[1][urls[2]]) == ['3.3.3.3']
+    assert active[1] > 1
+    assert urls[1] in demisto.error.call_args[0][0]
+
+
+def test_build_iterator_all_urls_fail(requests_mock):
+    """
+    Given
+    - Two feed URLs which fail.
+
+    When
+    - Building the iterator.
+
+    Then
+    - Ensure the error is raised.
+    """
+    from requests import HTTPError
+    urls = ['https://example.com/1', 'https://example.com/2']
+    requests_mock.get(urls[0], status_code=404)
+    requests_mock.get(urls[1], status_code=500)
+    client = Client(url=urls, feed_url_to_config={url: {} for url in urls})
+    with pytest.raises(HTTPError, match='404'):
+        client.build_iterator()
+
+
+def test_build_iterator_url_fails_sudden_death(mocker, requests_mock):
+    """
+    Given
+    - Two feed URLs, the second of which fails, with the suddenDeath indicator expiration method.
+
+    When
+    - Building the iterator.
+
+    Then
+    - Ensure the error is raised, as the indicators of the failed URL would expire.
+    """
+    from requests import HTTPError
+    mocker.patch.object(demisto, 'params', return_value={'feedExpirationPolicy': 'suddenDeath'})
+    urls = ['https://example.com/1', 'https://example.com/2']
+    requests_mock.get(urls[0], content=b'1.1.1.1')
+    requests_mock.get(urls[1], status_code=500)
+    client = Client(url=urls, feed_url_to_config={url: {} for url in urls})
+    with pytest.raises(HTTPError, match='500'):
+        client.build_iterator()
+
+
+def test_feed_main_skip_unchanged_feeds(mocker, requests_mock):
+    """
+    Given
+    - A feed configured to skip unchanged feeds.
+
+    When
+    - Fetching indicators 4 times: the server answers the feed, then 304, then the same content without
+      validators, then a new content.
+
+    Then
+    - Ensure the validators of the first fetch are sent with the second request.
+    - Ensure indicators are created only for the first and the last fetches.
+    """
+    import CommonServerPython
+    feed_url = 'https://example.com/ips.txt'
+    context = {}
+    mocker.patch.object(CommonServerPython, 'get_integration_context', side_effect=lambda: copy.deepcopy(context))
+    mocker.patch.object(CommonServerPython, 'set_integration_context', side_effect=context.update)
+    mocker.patch.object(demisto, 'params', return_value={'url': feed_url, 'indicator_type': 'IP',
+                                                         'skip_unchanged_feeds': 'true'})
+    mocker.patch.object(demisto, 'command', return_value='fetch-indicators')
+    mocker.patch.object(demisto, 'createIndicators')
+    requests_mock.get(feed_url, [
+        {'text': '1.1.1.1\n2.2.2.2', 'headers': {'ETag': '"v1"', 'Last-Modified': 'Tue, 01 Sep 2020 10:00:00 GMT'}},
+        {'status_code': 304},
+        {'text': '1.1.1.1\n2.2.2.2'},
+        {'text': '1.1.1.1\n3.3.3.3'},
+    ])
+
+    for _ in range(4):
+        feed_main('great_feed_name')
+
+    assert requests_mock.request_history[1].headers['If-None-Match'] == '"v1"'
+    assert requests_mock.request_history[1].headers['If-Modified-Since'] == 'Tue, 01 Sep 2020 10:00:00 GMT'
+    created = [[indicator['value'] for indicator in call[0][0]] for call in demisto.createIndicators.call_args_list]
+    assert created == [['1.1.1.1', '2.2.2.2'], ['1.1.1.1', '3.3.3.3']]
+    assert context['feed_validators']['urls'][feed_url]['etag'] is None
+
+
+def test_feed_main_skip_unchanged_feeds_full_refresh(mocker, requests_mock):
+    """
+    Given
+    - A feed configured to skip unchanged feeds, whose content did not change.
+
+    When
+    - Fetching indicators twice, and again after the full refresh interval passed.
+
+    Then
+    - Ensure the unchanged feed is skipped by the second fetch, and downloaded without validators and submitted again
+      by the third, so its indicators do not expire.
+    """
+    import CommonServerPython
+    feed_url = 'https://example.com/ips.txt'
+    params = {'url': feed_url, 'indicator_type': 'IP', 'skip_unchanged_feeds': 'true', 'delta_full_refresh_hours': '1'}
+    context = {}
+    mocker.patch.object(CommonServerPython, 'get_integration_context', side_effect=lambda: copy.deepcopy(context))
+    mocker.patch.object(CommonServerPython, 'set_integration_context', side_effect=context.update)
+    mocker.patch.object(demisto, 'command', return_value='fetch-indicators')
+    mocker.patch.object(demisto, 'createIndicators')
+    requests_mock.get(feed_url, text='1.1.1.1\n2.2.2.2', headers={'ETag': '"v1"'})
+
+    feed_main('great_feed_name', params=params)
+    feed_main('great_feed_name', params=params)
+    mocker.patch('CommonServerPython.time.time', return_value=time.time() + 3600)
+    feed_main('great_feed_name', params=params)
+
+    assert [request.headers.get('If-None-Match') for request in requests_mock.request_history] == [None, '"v1"', None]
+    created = [[indicator['value'] for indicator in call[0][0]] for call in demisto.createIndicators.call_args_list]
+    assert created == [['1.1.1.1', '2.2.2.2']] * 2
+
+
+def test_feed_main_full_refresh_url_fails(mocker, requests_mock):
+    """
+    Given
+    - A feed of two URLs configured to skip unchanged feeds and to submit only the delta, whose content does not change.
+
+    When
+    - Fetching indicators, then after the full refresh interval passed while the second URL fails, and again.
+
+    Then
+    - Ensure the failed full refresh is completed by the next fetch, which submits the indicators of both URLs,
+      so the indicators of the URL which failed do not expire.
+    """
+    import CommonServerPython
+    urls = ['https://example.com/1', 'https://example.com/2']
+    params = {'url': urls, 'feed_url_to_config': {url: {} for url in urls}, 'indicator_type': 'IP',
+              'skip_unchanged_feeds': 'true', 'submit_delta_only': 'true', 'delta_full_refresh_hours': '1'}
+    context = {}
+    mocker.patch.object(CommonServerPython, 'get_integration_context', side_effect=lambda: copy.deepcopy(context))
+    mocker.patch.object(CommonServerPython, 'set_integration_context', side_effect=context.update)
+    mocker.patch.object(demisto, 'command', return_value='fetch-indicators')
+    mocker.patch.object(demisto, 'createIndicators')
+    requests_mock.get(urls[0], text='1.1.1.1')
+    requests_mock.get(urls[1], [{'text': '2.2.2.2'}, {'status_code': 500}, {'text': '2.2.2.2'}])
+
+    feed_main('great_feed_name', params=params)
+    mocker.patch('CommonServerPython.time.time', return_value=time.time() + 3600)
+    feed_main('great_feed_name', params=params)
+    feed_main('great_feed_name', params=params)
+
+    created = [[indicator['value'] for indicator in call[0][0]] for call in demisto.createIndicators.call_args_list]
+    assert created == [['1.1.1.1', '2.2.2.2'], ['1.1.1.1'], ['1.1.1.1', '2.2.2.2']]
+
+
+def test_feed_main_submit_delta_only(mocker, requests_mock):
+    """
+    Given
+    - A feed configured to submit only the delta.
+
+    When
+    - Fetching indicators twice, where one indicator was replaced with another between the fetches.
+
+    Then
+    - Ensure all the indicators are created in the first fetch, and only the new one in the second.
+    - Ensure the removed indicator is listed by the get-expired-indicators command.
+    """
+    import CommonServerPython
+    feed_url = 'https://example.com/ips.txt'
+    context = {}
+    mocker.patch.object(CommonServerPython, 'get_integration_context', side_effect=lambda: copy.deepcopy(context))
+    mocker.patch.object(CommonServerPython, 'set_integration_context', side_effect=context.update)
+    mocker.patch.object(demisto, 'command', return_value='fetch-indicators')
+    mocker.patch.object(demisto, 'createIndicators')
+    requests_mock.get(feed_url, [{'text': '1.1.1.1\n2.2.2.2\n3.3.3.3'}, {'text': '1.1.1.1\n2.2.2.2\n4.4.4.4'}])
+
+    for _ in range(2):
+        feed_main('great_feed_name', params={'url': feed_url, 'indicator_type': 'IP', 'submit_delta_only': 'true'})
+
+    created = [[indicator['value'] for indicator in call[0][0]] for call in demisto.createIndicators.call_args_list]
+    assert created == [['1.1.1.1', '2.2.2.2', '3.3.3.3'], ['4.4.4.4']]
+    mocker.patch.object(demisto, 'command', return_value='get-expired-indicators')
+    mocker.patch.object(demisto, 'args', return_value={})
+    mocker.patch.object(demisto, 'results')
+    feed_main('great_feed_name', params={'url': feed_url, 'indicator_type': 'IP', 'submit_delta_only': 'true'})
+    assert demisto.results.call_args[0][0]['Contents'] == ['3.3.3.3']
+
+
+@pytest.mark.parametrize('param, context_key', [('submit_delta_only', 'indicators_delta'),
+                                                ('skip_unchanged_feeds', 'feed_validators')])
+def test_feed_main_sudden_death(mocker, requests_mock, param, context_key):
+    """
+    Given
+    - A feed configured to submit only the delta or to skip unchanged feeds, with the suddenDeath indicator
+      expiration method.
+
+    When
+    - Fetching indicators twice, and running test-module.
+
+    Then
+    - Ensure all the indicators are created in both fetches, so the unchanged ones do not expire.
+    - Ensure test-module fails with the reason.
+    """
+    import CommonServerPython
+    feed_url = 'https://example.com/ips.txt'
+    params = {'url': feed_url, 'indicator_type': 'IP', param: 'true'}
+    context = {}
+    mocker.patch.object(CommonServerPython, 'get_integration_context', side_effect=lambda: copy.deepcopy(context))
+    mocker.patch.object(CommonServerPython, 'set_integration_context', side_effect=context.update)
+    mocker.patch.object(demisto, 'params', return_value=dict(params, feedExpirationPolicy='suddenDeath'))
+    mocker.patch.object(demisto, 'command', return_value='fetch-indicators')
+    mocker.patch.object(demisto, 'createIndicators')
+    requests_mock.get(feed_url, text='1.1.1.1\n2.2.2.2')
+
+    for _ in range(2):
+        feed_main('great_feed_name', params=params)
+
+    created = [[indicator['value'] for indicator in call[0][0]] for call in demisto.createIndicators.call_args_list]
+    assert created == [['1.1.1.1', '2.2.2.2']] * 2
+    assert context_key not in context
+
+    import HTTPFeedApiModule
+    with pytest.raises(ValueError, match='suddenDeath'):
+        HTTPFeedApiModule.test_module(Client(**params), {})
@@ -0,0 +1,259 @@
+import demistomock as demisto
+from CommonServerPython import *
+from CommonServerUserPython import *
+
+import gzip
+import hashlib
+import shutil
+import tempfile
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import gevent
+from gevent.event import AsyncResult
+from flask import Response, request
+from werkzeug.wsgi import wrap_file
+
+# CONSTANTS
+SNAPSHOT_CHECK_INTERVAL = 10  # the maximal number of seconds between checks for stale snapshots
+MAX_SNAPSHOTS = 20
+GZIP_COMPRESS_LEVEL = 6
+SNAPSHOT_BUFFER_SIZE = 1024 * 1024  # the size of the blocks the snapshots are sent in
+SNAPSHOT_MEMORY_MAX_SIZE = 8 * 1024 * 1024  # the size up to which the bodies of the snapshots are also kept in memory
+
+
+class Snapshot:
+    def __init__(self, path: str, mimetype: str, request_args: Any, created: float, digest: str,
+                 gzip_path: Optional[str] = None, data: Optional[bytes] = None, gzip_data: Optional[bytes] = None):
+        """
+        A rendered body of an exported list, written once to its own file and served from it, or from memory if the
+        body is small enough to be kept there as well
+        :param path: the path of the file the body was written to
+        :param mimetype: the mimetype to serve the body with
+        :param request_args: the request arguments the body was rendered for, used to regenerate it
+        :param created: the time the rendering of the body started, in seconds since the epoch
+        :param digest: the SHA-1 digest of the body
+        :param gzip_path: the path of the file the gzip compressed body was written to, if it was compressed
+        :param data: the body, if it is kept in memory
+        :param gzip_data: the gzip compressed body, if it is kept in memory
+        """
+        self.path = path
+        self.mimetype = mimetype
+        self.request_args = request_args
+        self.created = created
+        self.modified = created  # the time the body was first rendered with its current content
+        self.last_requested = created  # the time the snapshot was last requested
+        self.digest = digest
+        self.gzip_path = gzip_path
+        self.data = data
+        self.gzip_data = gzip_data
+        self.size = os.path.getsize(path)
+
+    def remove(self):
+        """
+        Removes the files of the snapshot, responses which already opened them are still served to their end
+        """
+        for path in (self.path, self.gzip_path):
+            try:
+                if path:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+class SnapshotStore:
+    def __init__(self, render: Callable[[Any], Tuple[str, str]], refresh_rate: Optional[str] = None,
+                 directory: Optional[str] = None, max_snapshots: int = MAX_SNAPSHOTS, compress: bool = True,
+                 memory_max_size: int = SNAPSHOT_MEMORY_MAX_SIZE):
+        """
+        Keeps a pre-rendered snapshot of the exported list on disk per request arguments (query, format and options).
+        Requests are served from the snapshots, and the snapshots older than the refresh rate are regenerated in the
+        background, so only the first request of new request arguments waits for the indicators to be polled.
+        Snapshots which were not requested during the last refresh period are removed rather than regenerated, so
+        only the lists clients still request are polled.
+
+        The regeneration runs in a greenlet of the gevent server and not in a thread, as the server calls of the
+        integration are not thread safe. The render function should call gevent.sleep(0) between its server calls,
+        so requests are served while a snapshot is regenerated.
+        :param render: gets the request arguments and returns the body and its mimetype
+        :param refresh_rate: how often to regenerate the snapshots, e.g. "5 minutes". If not set, they are kept as is
+        :param directory: the directory to write the snapshots to, a new temporary directory if not set
+        :param max_snapshots: the number of snapshots to keep, the least recently requested ones are removed
+        :param compress: whether to also keep a gzip compressed body, for the clients which accept it
+        :param memory_max_size: the size up to which the bodies are also kept in memory, and served from there. The
+         gevent server has no sendfile, so a file is copied through the server process in blocks, which costs more
+         than sending a small body from memory
+        """
+        self.render = render
+        self.refresh_rate_seconds: Optional[float] = None
+        if refresh_rate:
+            refresh_start, refresh_end = parse_date_range(refresh_rate, utc=False)
+            self.refresh_rate_seconds = (refresh_end - refresh_start).total_seconds()
+        self.directory = directory or tempfile.mkdtemp(prefix='indicators-snapshots-')
+        self.max_snapshots = max_snapshots
+        self.compress = compress
+        self.memory_max_size = memory_max_size
+        self.snapshots: OrderedDict = OrderedDict()
+        self.rendering: Dict[str, AsyncResult] = {}  # the results of the snapshots rendered for requests, by key
+        self.refresher: Any = None
+
+    @staticmethod
+    def get_key(request_args: Any) -> str:
+        """
+        Returns the key of the snapshot of the request arguments
+        :param request_args: the request arguments, an object whose attributes are JSON serializable
+        """
+        return hashlib.sha1(json.dumps(vars(request_args), sort_keys=True).encode('utf-8')).hexdigest()
+
+    def get(self, request_args: Any) -> Snapshot:
+        """
+        Returns the snapshot of the request arguments, rendering it if there is no snapshot of them yet
+        :param request_args: the request arguments
+        """
+        key = self.get_key(request_args)
+        snapshot = self.snapshots.get(key)
+        if snapshot is None:
+            snapshot = self.generate_once(key, request_args)
+        else:
+            self.snapshots.move_to_end(key)
+        snapshot.last_requested = time.time()
+        return snapshot
+
+    def generate_once(self, key: str, request_args: Any) -> Snapshot:
+        """
+        Renders the snapshot of the request arguments for a request. Concurrent requests of the same request arguments
+        wait for the rendering of the first one, rather than polling the indicators again
+        :param key: the key of the snapshot
+        :param request_args: the request arguments
+        """
+        result = self.rendering.get(key)
+        if result is not None:
+            return result.get()
+
+        result = self.rendering[key] = AsyncResult()
+        try:
+            snapshot = self.generate(key, request_args)
+        except Exception as e:
+            result.set_exception(e)
+            raise
+        else:
+            result.set(snapshot)
+            return snapshot
+        finally:
+            del self.rendering[key]
+
+    def generate(self, key: str, request_args: Any) -> Snapshot:
+        """
+        Renders the snapshot of the request arguments, replacing their previous snapshot if its content changed
+        :param key: the key of the snapshot
+        :param request_args: the request arguments
+        """
+        created = time.time()
+        body, mimetype = self.render(request_args)
+        data = body.encode('utf-8')
+        digest = hashlib.sha1(data).hexdigest()
+
+        previous = self.snapshots.get(key)
+        if previous is not None and previous.digest == digest and previous.mimetype == mimetype:
+            # keep the files, ETag and Last-Modified of an unchanged list, so clients are answered not modified
+            previous.created = created
+            return previous
+
+        fd, path = tempfile.mkstemp(prefix=key, dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        gzip_path = gzip_data = None
+        if self.compress:
+            gzip_data = gzip.compress(data, compresslevel=GZIP_COMPRESS_LEVEL, mtime=0)
+            fd, gzip_path = tempfile.mkstemp(prefix=key, suffix='.gz', dir=self.directory)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(gzip_data)
+        if len(data) > self.memory_max_size:
+            data = gzip_data = None
+        snapshot = Snapshot(path, mimetype, request_args, created, digest, gzip_path, data, gzip_data)
+
+        # a regenerated snapshot keeps the place of the previous one in the order of the last requests
+        self.snapshots[key] = snapshot
+        if previous is not None:
+            snapshot.last_requested = previous.last_requested
+            previous.remove()
+        while len(self.snapshots) > self.max_snapshots:
+            _, evicted = self.snapshots.popitem(last=False)
+            evicted.remove()
+        return snapshot
+
+    def regenerate_stale(self):
+        """
+        Regenerates the snapshots which are older than the refresh rate and were requested during the last refresh
+        period, and removes the ones which were not requested since
+        """
+        if self.refresh_rate_seconds is None:
+            return
+
+        for key, snapshot in list(self.snapshots.items()):
+            # the snapshot could have been evicted, or regenerated for a request, while others were regenerated
+            if self.snapshots.get(key) is not snapshot or time.time() - snapshot.created < self.refresh_rate_seconds:
+                continue
+            if time.time() - snapshot.last_requested >= self.refresh_rate_seconds:
+                # no client requested the list lately, its next request renders it again
+                del self.snapshots[key]
+                snapshot.remove()
+                continue
+            try:
+                self.generate(key, snapshot.request_args)
+            except Exception as e:
+                demisto.error(f'Failed to regenerate a snapshot of the list, serving the previous one. Error: {e}')
+
+    def start(self):
+        """
+        Starts regenerating the stale snapshots in the background
+        """
+        if self.refresh_rate_seconds is None or self.refresher is not None:
+            return
+
+        interval = min(self.refresh_rate_seconds, SNAPSHOT_CHECK_INTERVAL)
+
+        def regenerate_forever():
+            while True:
+                gevent.sleep(interval)
+                self.regenerate_stale()
+
+        self.refresher = gevent.spawn(regenerate_forever)
+
+    def stop(self):
+        """
+        Stops regenerating the snapshots and removes them from the disk
+        """
+        if self.refresher is not None:
+            self.refresher.kill()
+            self.refresher = None
+        self.snapshots.clear()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def serve_snapshot(snapshot: Snapshot) -> Response:
+    """
+    Serves a snapshot from memory or from its file for the current flask request, with its digest as the ETag and
+    the time its content was rendered as the Last-Modified, answering If-None-Match, If-Modified-Since and Range
+    requests. The gzip compressed body is served to the clients which accept it.
+    :param snapshot: the snapshot to serve
+    """
+    path, data, etag = snapshot.path, snapshot.data, snapshot.digest
+    use_gzip = snapshot.gzip_path is not None and 'gzip' in request.accept_encodings
+    if use_gzip:
+        path, data, etag = snapshot.gzip_path, snapshot.gzip_data, f'{snapshot.digest}-gzip'
+
+    if data is not None:
+        response = Response(data, mimetype=snapshot.mimetype)
+    else:
+        body = wrap_file(request.environ, open(path, 'rb'), SNAPSHOT_BUFFER_SIZE)
+        response = Response(body, mimetype=snapshot.mimetype, direct_passthrough=True)
+        response.content_length = os.path.getsize(path)
+    if use_gzip:
+        response.content_encoding = 'gzip'
+    if snapshot.gzip_path is not None:
+        response.vary.add('Accept-Encoding')
+    response.set_etag(etag)
+    response.last_modified = datetime.utcfromtimestamp(int(snapshot.modified))
+    response.cache_control.no_cache = True
+    return response.make_conditional(request, accept_ranges=True, complete_length=response.content_length)
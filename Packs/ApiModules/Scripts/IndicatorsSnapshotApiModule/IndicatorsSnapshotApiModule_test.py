@@ -0,0 +1,261 @@
+import gzip
+import os
+
+import demistomock as demisto
+import gevent
+import pytest
+from flask import Flask
+from IndicatorsSnapshotApiModule import SnapshotStore, serve_snapshot
+
+
+class RequestArguments:
+    def __init__(self, query, out_format='text'):
+        self.query = query
+        self.out_format = out_format
+
+
+class MockRender:
+    def __init__(self):
+        self.calls = []
+        self.fail = False
+        self.changed = True
+        self.delay = 0
+        self.attempts = 0
+
+    def __call__(self, request_args):
+        self.attempts += 1
+        if self.delay:
+            gevent.sleep(self.delay)
+        if self.fail:
+            raise ValueError('search failed')
+        if self.changed:
+            self.calls.append(request_args.query)
+        return '\n'.join(f'{request_args.query}-{i}' for i in range(len(self.calls))), 'text/plain'
+
+
+def read(path):
+    with open(path, 'rb') as f:
+        return f.read().decode('utf-8')
+
+
+def test_get_renders_once_per_request_args(tmp_path):
+    """
+    Given:
+        - a snapshot store
+    When:
+        - getting the snapshots of 2 request arguments, twice each
+    Then:
+        - each snapshot is rendered only on its first request, and written to its files
+        - the bodies are also kept in memory, up to the memory size of the store
+    """
+    render = MockRender()
+    store = SnapshotStore(render, '5 minutes', directory=str(tmp_path), memory_max_size=len('type:IP-0'))
+
+    first = store.get(RequestArguments('type:IP'))
+    assert store.get(RequestArguments('type:IP')) is first
+    second = store.get(RequestArguments('type:URL', out_format='json'))
+
+    assert render.calls == ['type:IP', 'type:URL']
+    assert store.refresh_rate_seconds == 300
+    assert read(first.path) == 'type:IP-0'
+    assert read(second.path) == 'type:URL-0\ntype:URL-1'
+    with gzip.open(second.gzip_path, 'rb') as f:
+        assert f.read() == b'type:URL-0\ntype:URL-1'
+    assert first.mimetype == 'text/plain'
+    assert len(os.listdir(str(tmp_path))) == 4
+    assert first.data == b'type:IP-0'
+    assert gzip.decompress(first.gzip_data) == b'type:IP-0'
+    assert second.data is None
+    assert second.gzip_data is None
+
+
+def test_regenerate_stale(tmp_path, mocker):
+    """
+    Given:
+        - a snapshot store with a snapshot which is older than the refresh rate, and one which is not
+    When:
+        - regenerating the stale snapshots
+    Then:
+        - only the stale snapshot is regenerated and its previous files are removed
+        - a response of the previous snapshot which already opened its file is served to its end
+        - a regeneration with the same content keeps the snapshot
+        - a failed regeneration keeps the previous snapshot
+    """
+    render = MockRender()
+    store = SnapshotStore(render, '1 minute', directory=str(tmp_path))
+    stale = store.get(RequestArguments('type:IP'))
+    fresh = store.get(RequestArguments('type:URL'))
+    stale.created -= 120
+    response = open(stale.path, 'rb')
+
+    store.regenerate_stale()
+
+    regenerated = store.get(RequestArguments('type:IP'))
+    assert regenerated is not stale
+    assert regenerated.digest != stale.digest
+    assert store.get(RequestArguments('type:URL')) is fresh
+    assert read(regenerated.path) == 'type:IP-0\ntype:IP-1\ntype:IP-2'
+    assert not os.path.exists(stale.path)
+    assert not os.path.exists(stale.gzip_path)
+    with response:
+        assert response.read() == b'type:IP-0'
+
+    render.changed = False
+    regenerated.created -= 120
+    store.regenerate_stale()
+    assert store.get(RequestArguments('type:IP')) is regenerated
+    assert regenerated.modified < regenerated.created
+    assert os.path.exists(regenerated.path)
+
+    mocker.patch.object(demisto, 'error')
+    render.fail = True
+    regenerated.created -= 120
+    store.regenerate_stale()
+    assert store.get(RequestArguments('type:IP')) is regenerated
+    assert demisto.error.call_count == 1
+
+
+def test_regenerate_stale_idle(tmp_path):
+    """
+    Given:
+        - a snapshot store with 2 stale snapshots, one of which was not requested during the last refresh period
+    When:
+        - regenerating the stale snapshots
+    Then:
+        - only the requested snapshot is regenerated, the idle one is removed with its files
+        - the next request of the idle snapshot renders it again
+    """
+    render = MockRender()
+    store = SnapshotStore(render, '1 minute', directory=str(tmp_path))
+    requested = store.get(RequestArguments('type:IP'))
+    idle = store.get(RequestArguments('type:URL'))
+    requested.created -= 120
+    idle.created -= 120
+    idle.last_requested -= 120
+
+    store.regenerate_stale()
+
+    assert render.calls == ['type:IP', 'type:URL', 'type:IP']
+    assert SnapshotStore.get_key(RequestArguments('type:URL')) not in store.snapshots
+    assert not os.path.exists(idle.path)
+    assert store.get(RequestArguments('type:IP')) is not requested
+    assert store.get(RequestArguments('type:URL')) is not idle
+    assert render.calls == ['type:IP', 'type:URL', 'type:IP', 'type:URL']
+
+
+def test_get_concurrent_requests(tmp_path):
+    """
+    Given:
+        - a snapshot store whose rendering yields to other greenlets
+    When:
+        - getting the snapshot of the same new request arguments from 3 concurrent greenlets, twice: with a
+          rendering which succeeds and with one which fails
+    Then:
+        - the snapshot is rendered once, and all the requests get it or its error
+    """
+    render = MockRender()
+    render.delay = 0.01
+    store = SnapshotStore(render, directory=str(tmp_path))
+
+    greenlets = [gevent.spawn(store.get, RequestArguments('type:IP')) for _ in range(3)]
+    gevent.joinall(greenlets)
+    assert render.calls == ['type:IP']
+    assert len({id(greenlet.value) for greenlet in greenlets}) == 1
+
+    render.fail = True
+    greenlets = [gevent.spawn(store.get, RequestArguments('type:URL')) for _ in range(3)]
+    gevent.joinall(greenlets)
+    assert all(isinstance(greenlet.exception, ValueError) for greenlet in greenlets)
+    assert render.attempts == 2
+    assert store.rendering == {}
+
+
+def test_max_snapshots(tmp_path):
+    """
+    Given:
+        - a snapshot store which keeps 2 snapshots
+    When:
+        - getting the snapshots of 3 request arguments, the first one requested again before the third
+    Then:
+        - the least recently requested snapshot is removed
+    """
+    store = SnapshotStore(MockRender(), directory=str(tmp_path), max_snapshots=2)
+    first = store.get(RequestArguments('a'))
+    second = store.get(RequestArguments('b'))
+    store.get(RequestArguments('a'))
+    store.get(RequestArguments('c'))
+
+    assert store.get(RequestArguments('a')) is first
+    assert SnapshotStore.get_key(RequestArguments('b')) not in store.snapshots
+    assert not os.path.exists(second.path)
+    store.stop()
+    assert not os.path.exists(str(tmp_path))
+
+
+@pytest.fixture(params=[True, False], ids=['memory', 'file'])
+def snapshot_client(request, tmp_path):
+    body = '\n'.join(f'10.0.{i // 256}.{i % 256}' for i in range(1000))
+    store = SnapshotStore(lambda request_args: (body, 'text/plain'), directory=str(tmp_path),
+                          memory_max_size=len(body) if request.param else len(body) - 1)
+    assert (store.get(RequestArguments('type:IP')).data is not None) == request.param
+    app = Flask('test')
+
+    @app.route('/')
+    def route():
+        return serve_snapshot(store.get(RequestArguments('type:IP')))
+
+    with app.test_client() as client:
+        yield client, body.encode('utf-8')
+
+
+def test_serve_snapshot(snapshot_client):
+    """
+    Given:
+        - a snapshot of 1000 IPs
+    When:
+        - requesting it, and then requesting it again with its ETag and with its Last-Modified
+    Then:
+        - the body is served with an ETag of its digest and its Last-Modified
+        - the conditional requests are answered not modified, without a body
+    """
+    client, body = snapshot_client
+    response = client.get('/')
+    assert response.status_code == 200
+    assert response.data == body
+    assert response.content_length == len(body)
+    assert response.mimetype == 'text/plain'
+    assert 'Content-Encoding' not in response.headers
+    assert response.headers['Vary'] == 'Accept-Encoding'
+    etag, _ = response.get_etag()
+    assert len(etag) == 40
+
+    not_modified = client.get('/', headers={'If-None-Match': response.headers['ETag']})
+    assert not_modified.status_code == 304
+    assert not_modified.data == b''
+
+    not_modified = client.get('/', headers={'If-Modified-Since': response.headers['Last-Modified']})
+    assert not_modified.status_code == 304
+
+
+def test_serve_snapshot_gzip_and_range(snapshot_client):
+    """
+    Given:
+        - a snapshot of 1000 IPs
+    When:
+        - requesting it with Accept-Encoding gzip, and requesting a range of it
+    Then:
+        - the pre-compressed body is served with its own ETag
+        - the range of the body is served as partial content
+    """
+    client, body = snapshot_client
+    response = client.get('/', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(response.data) == body
+    assert response.content_length < len(body)
+    assert response.get_etag()[0].endswith('-gzip')
+
+    partial = client.get('/', headers={'Range': 'bytes=10-19'})
+    assert partial.status_code == 206
+    assert partial.data == body[10:20]
+    assert partial.headers['Content-Range'] == f'bytes 10-19/{len(body)}'
@@ -3,18 +3,30 @@ from CommonServerPython import *
 ''' IMPORTS '''
 import urllib3
 import jmespath
-from typing import List, Dict, Union, Optional
+from jmespath.visitor import TreeInterpreter
+from itertools import islice
+from typing import Any, Iterator, List, Dict, Union, Optional, Tuple
 
 # disable insecure warnings
 urllib3.disable_warnings()
 
+BATCH_SIZE = 2000
+CHUNK_SIZE = 64 * 1024
+JSON_WHITESPACE = ' \t\n\r'
+JSON_DELIMITERS = JSON_WHITESPACE + ',:]}'
+JSON_DECODER = json.JSONDecoder()
+JSON_STRUCTURE = re.compile(r'["\[\]{}]')
+# the characters of a string until its closing quote, or until a backslash the next chunk continues
+JSON_STRING_CHARS = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*', re.DOTALL)
+
 
 class Client:
     def __init__(self, url: str = '', credentials: dict = None,
                  feed_name_to_config: Dict[str, dict] = None, source_name: str = 'JSON',
                  extractor: str = '', indicator: str = 'indicator',
                  insecure: bool = False, cert_file: str = None, key_file: str = None, headers: dict = None,
-                 tlp_color: Optional[str] = None, **_):
+                 tlp_color: Optional[str] = None, skip_unchanged_feeds: bool = False,
+                 submit_delta_only: bool = False, delta_full_refresh_hours: float = 24, **_):
         """
         Implements class for miners of JSON feeds over http/https.
         :param url: URL of the feed.
@@ -32,6 +44,14 @@ class Client:
         Example: headers = {'user-agent': 'my-app/0.0.1'} or Authorization: Bearer
         (curl -H "Authorization: Bearer " "https://api-url.com/api/v1/iocs?first_seen_since=2016-1-1")
         :param tlp_color: Traffic Light Protocol color.
+        :param skip_unchanged_feeds: if *True* fetch-indicators sends conditional requests with the ETag and
+        Last-Modified of the previous fetch, and skips a feed which was not modified or has the same content digest.
+        Not applied with the suddenDeath expiration policy.
+        :param submit_delta_only: if *True* fetch-indicators submits only the indicators which are new or changed since
+        the previous fetch, and keeps the values removed from the feed as an expiration list, read with the
+        get-expired-indicators command.
+        :param delta_full_refresh_hours: when skip_unchanged_feeds or submit_delta_only is *True*, how often to read
+        and submit all the indicators, so the unchanged ones do not expire. Default: 24
 
          Example:
             Example feed config:
@@ -74,23 +94,64 @@ class Client:
 
         self.cert = (cert_file, key_file) if cert_file and key_file else None
         self.tlp_color = tlp_color
-
-    def build_iterator(self, **kwargs) -> List:
+        self.skip_unchanged_feeds = argToBoolean(skip_unchanged_feeds)
+        self.feed_validators: Optional[FeedValidators] = None
+        self.skipped_urls: List[str] = []
+        self.submit_delta_only = argToBoolean(submit_delta_only)
+        try:
+            self.delta_full_refresh_hours = float(delta_full_refresh_hours)
+        except (ValueError, TypeError):
+            raise ValueError('Please provide a number for "delta_full_refresh_hours"')
+        self.extractors: Dict[str, Any] = {}
+
+    def build_iterator(self, skip_unchanged: bool = False, **kwargs) -> List:
+        """
+        Requests the feeds and extracts their items.
+        When the extractor picks the items of an array one by one, the feed is parsed while it is downloaded,
+        so only the current item is held in memory.
+        When unchanged feeds are skipped, the feed is first spooled while its digest is computed, and parsed from there.
+        :param skip_unchanged: Whether to skip the feeds which did not change since their validators were saved.
+        :return: A {feed_name: items} dict for each feed.
+        """
         results = []
+        if skip_unchanged and self.feed_validators is None:
+            self.feed_validators = FeedValidators(self.delta_full_refresh_hours)
         for feed_name, feed in self.feed_name_to_config.items():
+            url = feed.get('url', self.url)
+            headers = self.headers
+            if skip_unchanged and self.feed_validators:
+                headers = dict(self.headers or {}, **self.feed_validators.get_conditional_headers(url))
+            extractor = self.get_extractor(feed_name)
+            streamed, array_key = get_streamed_array(extractor)
             r = requests.get(
-                url=feed.get('url', self.url),
+                url=url,
                 verify=self.verify,
                 auth=self.auth,
                 cert=self.cert,
-                headers=self.headers,
+                headers=headers,
+                stream=streamed or skip_unchanged,
                 **kwargs
             )
 
             try:
                 r.raise_for_status()
-                data = r.json()
-                result = jmespath.search(expression=feed.get('extractor'), data=data)
+                content = None
+                if skip_unchanged and self.feed_validators:
+                    content = self.feed_validators.spool_changed_content(url, r)
+                    if content is None:
+                        self.skipped_urls.append(url)
+                        continue
+                if streamed:
+                    chunks = r.iter_content(chunk_size=CHUNK_SIZE) if content is None else iter_content_chunks(content)
+                    text_chunks = decode_chunks(chunks, r.encoding or 'utf-8-sig')
+                    result = iter_and_close(iter_extracted_items(text_chunks, extractor, array_key), r)
+                else:
+                    if content is None:
+                        data = r.json()
+                    else:
+                        with content:
+                            data = json.load(content)
+                    result = extractor.search(data)
                 results.append({feed_name: result})
 
             except ValueError as VE:
@@ -98,9 +159,251 @@ class Client:
 
         return results
 
+    def get_extractor(self, feed_name: str):
+        """
+        Compiles the JMESPath extractor of the feed once, instead of parsing the expression on every search.
+        :param feed_name: The name of the feed in feed_name_to_config.
+        :return: The compiled extractor.
+        """
+        if feed_name not in self.extractors:
+            self.extractors[feed_name] = jmespath.compile(self.feed_name_to_config[feed_name].get('extractor'))
+        return self.extractors[feed_name]
+
+
+def get_streamed_array(extractor) -> Tuple[bool, Optional[str]]:
+    """
+    Checks whether the extractor picks the items of the top-level array, or of an array under a top-level key,
+    one by one - as in "@", "prefixes", "prefixes[?service=='AMAZON']" or "addresses[].{ip:@}".
+    Such an extractor gives the same items when it is applied to each item of the array on its own.
+    :param extractor: The compiled extractor.
+    :return: Whether the feed can be parsed while it is downloaded, and the key of the array (None for the top-level).
+    """
+    node = extractor.parsed
+    if node['type'] in ('projection', 'filter_projection'):
+        node = node['children'][0]
+        if node['type'] == 'flatten':
+            node = node['children'][0]
+    if node['type'] in ('current', 'identity'):
+        return True, None
+    if node['type'] == 'field':
+        return True, node['value']
+    return False, None
+
+
+def get_item_extractor(extractor):
+    """
+    Builds a function which applies a streamed extractor (see get_streamed_array) to a single item of the array,
+    using one interpreter instead of creating one for every search.
+    :param extractor: The compiled extractor.
+    :return: A function of an item, returning the list of items the extractor gives for it.
+    """
+    node = extractor.parsed
+    if node['type'] in ('current', 'identity', 'field'):
+        return lambda item: [item]
+    left: Dict[str, Any] = {'type': 'identity', 'children': []}
+    if node['children'][0]['type'] == 'flatten':
+        left = {'type': 'flatten', 'children': [left]}
+    item_node = dict(node, children=[left] + node['children'][1:])
+    interpreter = TreeInterpreter()
+    return lambda item: interpreter.visit(item_node, [item])
+
+
+def iter_and_close(items: Iterator[Any], response: requests.Response) -> Iterator[Any]:
+    """
+    Yields the items parsed from a streamed response, and closes the response once they were read or dropped.
+    """
+    try:
+        yield from items
+    finally:
+        response.close()
+
+
+class JSONStream:
+    def __init__(self, text_chunks):
+        """
+        Reads JSON values from text which is downloaded in chunks, holding only the chunks which were not read yet.
+        :param text_chunks: The text chunks.
+        """
+        self.chunks = iter(text_chunks)
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def read_more(self, size: int = 1) -> bool:
+        """
+        Appends the next chunks to the content which was not read yet, joining them once.
+        :param size: The number of characters to read at least, if the content has them.
+        :return: Whether any content was read.
+        """
+        chunks = [self.buffer[self.pos:]]
+        read = 0
+        for chunk in self.chunks:
+            chunks.append(chunk)
+            read += len(chunk)
+            if read >= size:
+                break
+        else:
+            self.eof = True
+        self.buffer = ''.join(chunks)
+        self.pos = 0
+        return read > 0
+
+    def peek(self) -> str:
+        """
+        :return: The next character which is not whitespace, without reading it, or '' at the end of the content.
+        """
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in JSON_WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.read_more():
+                return ''
+
+    def next_char(self) -> str:
+        char = self.peek()
+        self.pos += 1
+        return char
+
+    def decode(self) -> Any:
+        """
+        :return: The next JSON value.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = JSON_DECODER.raw_decode(self.buffer, self.pos)
+                # a number at the end of the chunk, as 4.5 of 4.5e3, may continue in the next one
+                if self.eof or (end < len(self.buffer) and self.buffer[end] in JSON_DELIMITERS):
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            # read as much again as the value has so far, so a large value is decoded a logarithmic number of times
+            self.read_more(len(self.buffer) - self.pos)
+
+    def skip(self) -> None:
+        """
+        Reads the next JSON value without decoding it, scanning only for its strings and brackets.
+        """
+        if self.peek() not in ('[', '{', '"'):
+            self.decode()
+            return
+        depth = 0
+        while True:
+            match = JSON_STRUCTURE.search(self.buffer, self.pos)
+            if match is None:
+                self.pos = len(self.buffer)
+                if not self.read_more():
+                    raise ValueError('Unterminated value')
+                continue
+            self.pos = match.end()
+            char = match.group()
+            if char == '"':
+                self.skip_string()
+            elif char in '[{':
+                depth += 1
+            else:
+                depth -= 1
+            if depth == 0:
+                return
+
+    def skip_string(self) -> None:
+        """
+        Reads the rest of a string whose opening quote was read.
+        """
+        while True:
+            self.pos = JSON_STRING_CHARS.match(self.buffer, self.pos).end()  # type: ignore
+            if self.buffer.startswith('"', self.pos):
+                self.pos += 1
+                return
+            if not self.read_more():
+                raise ValueError('Unterminated string')
+
+    def rest(self) -> str:
+        """
+        :return: All the content which was not read yet.
+        """
+        return self.buffer[self.pos:] + ''.join(self.chunks)
+
+    def find_key(self, key: str) -> bool:
+        """
+        Reads the top-level object until the value of the key.
+        :param key: The key to find.
+        :return: Whether the key was found.
+        """
+        if self.next_char() != '{':
+            raise ValueError('Expecting an object')
+        while self.peek() not in ('}', ''):
+            name = self.decode()
+            if self.next_char() != ':':
+                raise ValueError('Expecting ":" delimiter')
+            if name == key:
+                return True
+            self.skip()
+            if self.peek() == ',':
+                self.next_char()
+        return False
+
+    def iter_array(self) -> Iterator[Any]:
+        """
+        Yields the values of the array one by one.
+        """
+        if self.next_char() != '[':
+            raise ValueError('Expecting an array')
+        if self.peek() == ']':
+            self.next_char()
+            return
+        while True:
+            yield self.decode()
+            char = self.next_char()
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError('Expecting "," delimiter')
+
+
+def iter_extracted_items(text_chunks, extractor, array_key: Optional[str]) -> Iterator[Any]:
+    """
+    Parses the items of the array one by one while the feed is downloaded, and applies the extractor to each of them.
+    A feed of another structure than the extractor expects is parsed as a whole.
+    :param text_chunks: The text chunks of the feed.
+    :param extractor: The compiled extractor, see get_streamed_array.
+    :param array_key: The key of the array in the top-level object, or None for a top-level array.
+    :return: The extracted items.
+    """
+    stream = JSONStream(text_chunks)
+    try:
+        if stream.peek() != ('[' if array_key is None else '{'):
+            yield from extractor.search(json.loads(stream.rest())) or []
+            return
+        if array_key is not None:
+            if not stream.find_key(array_key):
+                return
+            if stream.peek() != '[':
+                yield from extractor.search({array_key: stream.decode()}) or []
+                return
+        extract_item = get_item_extractor(extractor)
+        for item in stream.iter_array():
+            yield from extract_item(item) or []
+    except ValueError as VE:
+        raise ValueError(f'Could not parse returned data to Json. \n\nError massage: {VE}')
+
 
 def test_module(client, params) -> str:
-    client.build_iterator()
+    if client.submit_delta_only and not IndicatorsDelta.is_supported():
+        raise ValueError(IndicatorsDelta.UNSUPPORTED_MESSAGE)
+    if client.skip_unchanged_feeds and not FeedValidators.is_supported():
+        raise ValueError(FeedValidators.UNSUPPORTED_MESSAGE)
+    for result in client.build_iterator():
+        for items in result.values():
+            # a streamed feed is parsed only while its items are read
+            try:
+                next(iter(items), None)
+            finally:
+                if hasattr(items, 'close'):
+                    items.close()
     return 'ok'
 
 
@@ -112,7 +415,17 @@ def fetch_indicators_command(client: Client, indicator_type: str, feedTags: list
     :param indicator_type: the default indicator type
     :param feedTags: the indicator tags
     """
-    indicators = []
+    return list(iter_indicators(client, indicator_type, feedTags, auto_detect, **kwargs))
+
+
+def iter_indicators(client: Client, indicator_type: str, feedTags: list, auto_detect: bool, **kwargs) \
+        -> Iterator[Dict]:
+    """
+    Yields the indicators of the feeds one by one, while the feeds are read.
+    :param client: Client of a JSON Feed
+    :param indicator_type: the default indicator type
+    :param feedTags: the indicator tags
+    """
     for result in client.build_iterator(**kwargs):
         for service_name, items in result.items():
             feed_config = client.feed_name_to_config.get(service_name, {})
@@ -140,21 +453,20 @@ def fetch_indicators_command(client: Client, indicator_type: str, feedTags: list
                 if client.tlp_color:
                     indicator['fields']['trafficlightprotocol'] = client.tlp_color
 
-                attributes = {'source_name': service_name, 'value': indicator_value,
-                              'type': current_indicator_type}
+                if mapping:
+                    attributes = {'source_name': service_name, 'value': indicator_value,
+                                  'type': current_indicator_type}
 
-                attributes.update(extract_all_fields_from_indicator(item, indicator_field))
+                    # only the keys of the mapping are flattened
+                    attributes.update(extract_all_fields_from_indicator(item, indicator_field, mapping))
 
-                if mapping:
                     for map_key in mapping:
                         if map_key in attributes:
                             indicator['fields'][mapping[map_key]] = attributes.get(map_key)  # type: ignore
 
                 indicator['rawJSON'] = item
 
-                indicators.append(indicator)
-
-    return indicators
+                yield indicator
 
 
 def determine_indicator_type(indicator_type, auto_detect, value):
@@ -172,12 +484,13 @@ def determine_indicator_type(indicator_type, auto_detect, value):
     return indicator_type
 
 
-def extract_all_fields_from_indicator(indicator, indicator_key):
+def extract_all_fields_from_indicator(indicator, indicator_key, fields_to_extract=None):
     """Flattens the JSON object to create one dictionary of values
 
     Args:
         indicator(dict): JSON object that holds indicator full data.
         indicator_key(str): The key that holds the indicator value.
+        fields_to_extract(Container): The keys to extract, for example the keys of the mapping. Default is all keys.
 
     Returns:
         dict. A dictionary of the fields in the JSON object.
@@ -185,6 +498,8 @@ def extract_all_fields_from_indicator(indicator, indicator_key):
     fields = {}  # type: dict
 
     def insert_value_to_fields(key, value):
+        if fields_to_extract is not None and key not in fields_to_extract:
+            return
         if key in fields:
             if not isinstance(fields[key], list):
                 fields[key] = [fields[key]]
@@ -224,19 +539,42 @@ def feed_main(params, feed_name, prefix):
             return_outputs(test_module(client, params))
 
         elif command == 'fetch-indicators':
-            indicators = fetch_indicators_command(client, params.get('indicator_type'), feedTags,
-                                                  params.get('auto_detect_type'))
-            for b in batch(indicators, batch_size=2000):
-                demisto.createIndicators(b)
+            skip_unchanged = client.skip_unchanged_feeds and FeedValidators.is_supported()
+            if client.skip_unchanged_feeds and not skip_unchanged:
+                demisto.debug(f'{FeedValidators.UNSUPPORTED_MESSAGE} Reading all the feeds.')
+            indicators = iter_indicators(client, params.get('indicator_type'), feedTags,
+                                         params.get('auto_detect_type'), skip_unchanged=skip_unchanged)
+            delta = None
+            if client.submit_delta_only and IndicatorsDelta.is_supported():
+                delta = IndicatorsDelta(client.delta_full_refresh_hours)
+            elif client.submit_delta_only:
+                demisto.debug(f'{IndicatorsDelta.UNSUPPORTED_MESSAGE} Submitting all the indicators.')
+            if delta:
+                indicators = delta.filter(indicators)
+            # we submit the indicators in batches, while the feed is still being read
+            create_indicators_in_batches(indicators, BATCH_SIZE)
+            if client.feed_validators:
+                # a full refresh is complete only if no URL was skipped
+                client.feed_validators.save(refreshed=not client.skipped_urls)
+            if delta:
+                # the indicators of a skipped URL were not seen, but they were not removed from the feed
+                delta.save(keep_unseen=bool(client.skipped_urls))
 
         elif command == f'{prefix}get-indicators':
             # dummy command for testing
             limit = int(demisto.args().get('limit', 10))
             auto_detect = params.get('auto_detect_type')
-            indicators = fetch_indicators_command(client, indicator_type, feedTags, auto_detect)[:limit]
+            indicators = list(islice(iter_indicators(client, indicator_type, feedTags, auto_detect), limit))
             hr = tableToMarkdown('Indicators', indicators, headers=['value', 'type', 'rawJSON'])
             return_outputs(hr, {}, indicators)
 
+        elif command == f'{prefix}get-expired-indicators':
+            # the values which fetch-indicators found removed from the feed, with submit_delta_only
+            limit = int(demisto.args().get('limit', 50))
+            expired = IndicatorsDelta.get_expired()[-limit:]
+            hr = tableToMarkdown('Expired Indicators', [{'value': value} for value in expired], headers=['value'])
+            return_outputs(hr, {}, expired)
+
     except Exception as err:
         err_msg = f'Error in {feed_name} integration [{err}]'
         return_error(err_msg)
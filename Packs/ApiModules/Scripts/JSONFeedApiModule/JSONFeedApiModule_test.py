@@ -1,6 +1,8 @@
 from JSONFeedApiModule import Client, fetch_indicators_command, jmespath
 from CommonServerPython import *
+import requests
 import requests_mock
+import pytest
 
 
 def test_json_feed_no_config():
@@ -121,3 +123,245 @@ def test_list_of_indicators_with_no_json_object():
         assert indicators[0].get('value') == '1.1.1.1'
         assert indicators[0].get('type') == 'IP'
         assert indicators[1].get('rawJSON') == {'indicator': '2.2.2.2'}
+
+
+@pytest.mark.parametrize('text, valid', [('[{"indicator": "1.1.1.1"}]', True), ('<html>Not found</html>', False)])
+def test_test_module(mocker, requests_mock, text, valid):
+    """
+    Given
+    - A feed whose extractor is parsed while the feed is downloaded, which answers JSON or not.
+
+    When
+    - Running test-module.
+
+    Then
+    - Ensure it succeeds only for the JSON feed, and the response is closed.
+    """
+    from JSONFeedApiModule import test_module
+    close = mocker.spy(requests.Response, 'close')
+    requests_mock.get('https://example.com/feed.json', text=text)
+    client = Client(url='https://example.com/feed.json')
+
+    if valid:
+        assert test_module(client, {}) == 'ok'
+    else:
+        with pytest.raises(ValueError, match='Could not parse returned data to Json'):
+            test_module(client, {})
+    assert close.call_count == 1
+
+
+@pytest.mark.parametrize('extractor', ['@', 'sort(@)'])
+def test_feed_main_skip_unchanged_feeds(mocker, extractor):
+    """
+    Given
+    - A feed configured to skip unchanged feeds, with an extractor which is or is not applied while downloading.
+
+    When
+    - Fetching indicators 4 times: the server answers the feed, then 304, then the same content without
+      validators, then a new content.
+
+    Then
+    - Ensure the validators of the first fetch are sent with the second request.
+    - Ensure indicators are created only for the first and the last fetches.
+    - Ensure the content is streamed to compute its digest, and not loaded whole.
+    """
+    import copy
+    import demistomock as demisto
+    import CommonServerPython
+    import JSONFeedApiModule
+    mocker.patch.object(requests.Response, 'content', new_callable=mocker.PropertyMock,
+                        side_effect=AssertionError('the content should be streamed'))
+    feed_url = 'https://example.com/ips.json'
+    context = {}
+    mocker.patch.object(CommonServerPython, 'get_integration_context', side_effect=lambda: copy.deepcopy(context))
+    mocker.patch.object(CommonServerPython, 'set_integration_context', side_effect=context.update)
+    mocker.patch.object(demisto, 'command', return_value='fetch-indicators')
+    mocker.patch.object(demisto, 'createIndicators')
+    params = {'url': feed_url, 'indicator_type': 'IP', 'skip_unchanged_feeds': True, 'extractor': extractor}
+    with requests_mock.Mocker() as m:
+        m.get(feed_url, [
+            {'json': ['1.1.1.1', '2.2.2.2'], 'headers': {'Last-Modified': 'Tue, 01 Sep 2020 10:00:00 GMT'}},
+            {'status_code': 304},
+            {'json': ['1.1.1.1', '2.2.2.2']},
+            {'json': ['1.1.1.1', '3.3.3.3']},
+        ])
+        for _ in range(4):
+            JSONFeedApiModule.feed_main(params, 'great_feed_name', '')
+
+        assert m.request_history[1].headers['If-Modified-Since'] == 'Tue, 01 Sep 2020 10:00:00 GMT'
+    created = [[indicator['value'] for indicator in call[0][0]] for call in demisto.createIndicators.call_args_list]
+    assert created == [['1.1.1.1', '2.2.2.2'], ['1.1.1.1', '3.3.3.3']]
+
+
+def test_feed_main_submit_delta_only(mocker, requests_mock):
+    """
+    Given
+    - A feed configured to submit only the delta.
+
+    When
+    - Fetching indicators twice, where one indicator was replaced with another between the fetches.
+
+    Then
+    - Ensure all the indicators are created in the first fetch, and only the new one in the second.
+    - Ensure the removed indicator is listed by the get-expired-indicators command.
+    """
+    import copy
+    import CommonServerPython
+    from JSONFeedApiModule import feed_main
+    feed_url = 'https://example.com/ips.json'
+    context = {}
+    mocker.patch.object(CommonServerPython, 'get_integration_context', side_effect=lambda: copy.deepcopy(context))
+    mocker.patch.object(CommonServerPython, 'set_integration_context', side_effect=context.update)
+    mocker.patch.object(demisto, 'command', return_value='fetch-indicators')
+    mocker.patch.object(demisto, 'createIndicators')
+    requests_mock.get(feed_url, [{'json': [{'ip': '1.1.1.1'}, {'ip': '2.2.2.2'}, {'ip': '3.3.3.3'}]},
+                                 {'json': [{'ip': '1.1.1.1'}, {'ip': '2.2.2.2'}, {'ip': '4.4.4.4'}]}])
+
+    for _ in range(2):
+        feed_main({'url': feed_url, 'indicator': 'ip', 'indicator_type': 'IP', 'submit_delta_only': 'true'},
+                  'great_feed_name', '')
+
+    created = [[indicator['value'] for indicator in call[0][0]] for call in demisto.createIndicators.call_args_list]
+    assert created == [['1.1.1.1', '2.2.2.2', '3.3.3.3'], ['4.4.4.4']]
+    mocker.patch.object(demisto, 'command', return_value='get-expired-indicators')
+    mocker.patch.object(demisto, 'args', return_value={})
+    mocker.patch.object(demisto, 'results')
+    feed_main({'url': feed_url, 'indicator': 'ip', 'indicator_type': 'IP', 'submit_delta_only': 'true'},
+              'great_feed_name', '')
+    assert demisto.results.call_args[0][0]['Contents'] == ['3.3.3.3']
+
+
+STREAMED_DOCUMENTS = [
+    ('@', '[{"ip": "1.1.1.1"}, {"ip": "2.2.2.2", "n": 12345}, "3.3.3.3", 4.5e3, null, true]'),
+    ('[?ip]', '[{"ip": "1.1.1.1"}, {"no": "ip"}, {"ip": "2.2.2.2\\u00e9\\" ]}"}]'),
+    ('[].ip', '[[{"ip": "1.1.1.1"}], {"ip": "2.2.2.2"}]'),
+    ("prefixes[?service=='AMAZON']", '{"syncToken": "1", "prefixes": [{"ip_prefix": "1.1.1.0/24", "service": "AMAZON"}, '
+                                     '{"ip_prefix": "2.2.2.0/24", "service": "S3"}], "ipv6_prefixes": []}'),
+    ('addresses[].{ip:@}', '{"addresses": ["1.1.1.1", "2.2.2.2"], "ipv6_addresses": ["::1"]}'),
+    ('hooks', '{"meta": {"hooks": ["x"]}, "hooks": ["1.1.1.1", "2.2.2.2"]}'),
+    ('hooks', '{"a": "]\\\\", "b": [{"c": "\\"}{["}, -1.5e3, null], "d": 12, "hooks": ["1.1.1.1"]}'),
+    ('hooks', '{"hooks": {"1.1.1.1": 1}}'),
+    ('hooks', '{"other": []}'),
+    ('hooks', '{"hooks": []}'),
+    ('@', '{"ip": "1.1.1.1"}'),
+]
+
+
+@pytest.mark.parametrize('extractor, document', STREAMED_DOCUMENTS)
+@pytest.mark.parametrize('chunk_size', [1, 3, 1024])
+def test_iter_extracted_items(extractor, document, chunk_size):
+    """
+    Given
+    - A JSON document and an extractor which picks the items of an array.
+
+    When
+    - Parsing the document while it is downloaded in chunks.
+
+    Then
+    - Ensure the items are the same as the extractor gives for the whole document.
+    """
+    from JSONFeedApiModule import get_streamed_array, iter_extracted_items
+    compiled = jmespath.compile(extractor)
+    streamed, array_key = get_streamed_array(compiled)
+    chunks = [document[i:i + chunk_size] for i in range(0, len(document), chunk_size)]
+
+    assert streamed
+    expected = jmespath.search(extractor, json.loads(document)) or []
+    assert list(iter_extracted_items(chunks, compiled, array_key)) == list(expected)
+
+
+@pytest.mark.parametrize('extractor', ['a.b', 'prefixes[0]', 'length(@)', '[0]'])
+def test_get_streamed_array_not_streamed(extractor):
+    """
+    Given
+    - An extractor whose result depends on the whole document.
+
+    When
+    - Checking whether the feed can be parsed while it is downloaded.
+
+    Then
+    - Ensure it is parsed as a whole.
+    """
+    from JSONFeedApiModule import get_streamed_array
+    assert get_streamed_array(jmespath.compile(extractor)) == (False, None)
+
+
+def test_iter_extracted_items_invalid_json():
+    """
+    Given
+    - A truncated JSON document.
+
+    When
+    - Parsing it while it is downloaded.
+
+    Then
+    - Ensure a parsing error is raised.
+    """
+    from JSONFeedApiModule import iter_extracted_items
+    with pytest.raises(ValueError, match='Could not parse returned data to Json'):
+        list(iter_extracted_items(['{"hooks": ["1.1.1.1", "2.2'], jmespath.compile('hooks'), 'hooks'))
+
+
+@pytest.mark.parametrize('document', ['{{"a": [{}], "b": [1]}}', '{{"a": 1, "b": {{"c": [{}]}}}}'])
+def test_iter_extracted_items_large_value(mocker, document):
+    """
+    Given
+    - A feed with a large value, downloaded in many chunks.
+
+    When
+    - Parsing it while it is downloaded, where the large value is skipped before the extracted key,
+      or is the value of the key and is not an array.
+
+    Then
+    - Ensure the items are the same as the extractor gives for the whole document, and the large value is decoded
+      only a few times, not once for every chunk.
+    """
+    import JSONFeedApiModule
+    document = document.format(', '.join(str(i) for i in range(20000)))
+    chunks = [document[i:i + 100] for i in range(0, len(document), 100)]
+    raw_decode = mocker.spy(JSONFeedApiModule.JSON_DECODER, 'raw_decode')
+
+    extracted = list(JSONFeedApiModule.iter_extracted_items(chunks, jmespath.compile('b'), 'b'))
+    assert extracted == list(jmespath.search('b', json.loads(document)))
+    assert len(chunks) > 1000
+    assert raw_decode.call_count < 30
+
+
+def test_extract_mapped_fields_only():
+    """
+    Given
+    - An indicator with nested fields.
+
+    When
+    - Extracting only the fields of the mapping.
+
+    Then
+    - Ensure only the mapped fields are extracted, as they are when all the fields are extracted.
+    """
+    from JSONFeedApiModule import extract_all_fields_from_indicator
+    item = {'ip': '1.1.1.1', 'region': 'us', 'meta': {'region': 'eu', 'owner': 'x'}, 'tags': ['a']}
+    all_fields = extract_all_fields_from_indicator(item, 'ip')
+
+    assert extract_all_fields_from_indicator(item, 'ip', {'region': 'Region'}) == {'region': all_fields['region']}
+    assert all_fields['region'] == ['us', 'eu']
+
+
+def test_extractor_compiled_once(mocker):
+    """
+    Given
+    - A JSON feed.
+
+    When
+    - Fetching it twice.
+
+    Then
+    - Ensure the extractor is compiled only once.
+    """
+    compile_spy = mocker.spy(jmespath, 'compile')
+    with requests_mock.Mocker() as m:
+        m.get('https://api.github.com/meta', json=json.loads(FLAT_LIST_OF_INDICATORS))
+        client = Client(url='https://api.github.com/meta', extractor='hooks', indicator=None)
+
+        for _ in range(2):
+            assert len(fetch_indicators_command(client=client, indicator_type='IP', feedTags=[], auto_detect=False)) == 3
+    assert compile_spy.call_count == 1
@@ -2,10 +2,9 @@ import demistomock as demisto
 from CommonServerPython import *
 from CommonServerUserPython import *
 
-from typing import Union, Optional, List, Dict, Tuple
+from typing import Union, Optional, List, Dict, Tuple, Iterator
 from requests.sessions import merge_setting, CaseInsensitiveDict
 import re
-import copy
 import types
 import urllib3
 from taxii2client import v20, v21
@@ -19,6 +18,7 @@ TAXII_VER_2_0 = "2.0"
 TAXII_VER_2_1 = "2.1"
 
 DFLT_LIMIT_PER_REQUEST = 100
+BATCH_SIZE = 2000
 API_USERNAME = "_api_token_key"
 HEADER_USERNAME = "_header:"
 
@@ -38,6 +38,9 @@ CIDR_ISUPPERSET_VAL_PATTERN = INDICATOR_OPERATOR_VAL_FORMAT_PATTERN.format(
 HASHES_EQUALS_VAL_PATTERN = INDICATOR_OPERATOR_VAL_FORMAT_PATTERN.format(
     value=r"hashes\..*?", operator="="
 )
+# all of the above in a single pass - (`type`, `operator`, `indicator`), where the operator of hashes is empty.
+# the type can not contain quotes, so a comparison is never matched together with the one before it
+STIX_COMPARISON_REGEX = re.compile(r"(\w[^']*?(?:value(=|ISSUBSET|ISUPPERSET)|hashes\..*?=))'(.*?)'")
 
 TAXII_TIME_FORMAT = "%Y-%m-%dT%H:%M:%S.%fZ"
 TAXII_TIME_FORMAT_NO_MS = "%Y-%m-%dT%H:%M:%SZ"
@@ -94,6 +97,7 @@ class Taxii2FeedClient:
         self.api_root = None
         self.collections = None
         self.last_fetched_indicator__modified = None
+        self.last_fetched_indicator__modified_datetime: Optional[datetime] = None
 
         self.collection_to_fetch = collection_to_fetch
         self.skip_complex_mode = skip_complex_mode
@@ -124,14 +128,6 @@ class Taxii2FeedClient:
         self.field_map = field_map if field_map else {}
         self.tags = tags if tags else []
         self.tlp_color = tlp_color
-        self.indicator_regexes = [
-            re.compile(INDICATOR_EQUALS_VAL_PATTERN),
-            re.compile(HASHES_EQUALS_VAL_PATTERN),
-        ]
-        self.cidr_regexes = [
-            re.compile(CIDR_ISSUBSET_VAL_PATTERN),
-            re.compile(CIDR_ISUPPERSET_VAL_PATTERN),
-        ]
 
     def init_server(self, version=TAXII_VER_2_0):
         """
@@ -221,6 +217,15 @@ class Taxii2FeedClient:
         :param limit: max amount of indicators to fetch
         :return: Cortex indicators list
         """
+        return list(self.iter_indicators(limit, **kwargs))
+
+    def iter_indicators(self, limit: int = -1, **kwargs) -> Iterator[Dict[str, str]]:
+        """
+        Polls the taxii server and yields cortex indicators objects page by page,
+        requesting the next page only once the indicators of the current one were consumed
+        :param limit: max amount of indicators to fetch
+        :return: Cortex indicators iterator
+        """
         if not isinstance(self.collection_to_fetch, (v20.Collection, v21.Collection)):
             raise DemistoException(
                 "Could not find a collection to fetch from. "
@@ -231,10 +236,9 @@ class Taxii2FeedClient:
 
         page_size = self.get_page_size(limit, limit)
         if page_size <= 0:
-            return []
+            return
         envelope = self.poll_collection(page_size, **kwargs)
-        indicators = self.extract_indicators_from_envelope_and_parse(envelope, limit)
-        return indicators
+        yield from self.iter_indicators_from_envelope(envelope, limit)
 
     def extract_indicators_from_envelope_and_parse(
             self, envelope: Union[types.GeneratorType, Dict[str, str]], limit: int = -1
@@ -246,59 +250,59 @@ class Taxii2FeedClient:
         :param limit: max amount of indicators to fetch
         :return: Cortex indicators list
         """
-        indicators = []
-        obj_cnt = 0
-        # TAXII 2.0
-        if isinstance(envelope, types.GeneratorType):
-            for sub_envelope in envelope:
-                stix_objects = sub_envelope.get("objects")
-                if not stix_objects:
-                    # no fetched objects
-                    break
-                obj_cnt += len(stix_objects)
-                indicators.extend(
-                    self.parse_indicators_list(
-                        self.extract_indicators_from_stix_objects(stix_objects)
-                    )
-                )
-                if 0 < limit <= len(indicators):
-                    break
-        # TAXII 2.1
-        elif isinstance(envelope, Dict):
-            cur_limit = limit
-            stix_objects = envelope.get("objects")
-            obj_cnt += len(stix_objects)
-            indicators_list = self.extract_indicators_from_stix_objects(stix_objects)
-            indicators = self.parse_indicators_list(indicators_list)
-            while envelope.get("more", False):
-                page_size = self.get_page_size(limit, cur_limit)
-                envelope = self.collection_to_fetch.get_objects(
-                    limit=page_size, next=envelope.get("next", "")
-                )
-                if isinstance(envelope, Dict):
-                    stix_objects = envelope.get("objects")
-                    obj_cnt += len(stix_objects)
-                    extracted_iocs = self.extract_indicators_from_stix_objects(
-                        stix_objects
-                    )
-                    parsed_iocs = self.parse_indicators_list(extracted_iocs)
-                    indicators.extend(parsed_iocs)
+        return list(self.iter_indicators_from_envelope(envelope, limit))
 
-                    if limit > -1:
-                        cur_limit -= len(envelope)  # type: ignore
-                        if cur_limit < 0:
-                            break
+    def iter_indicators_from_envelope(
+            self, envelope: Union[types.GeneratorType, Dict[str, str]], limit: int = -1
+    ) -> Iterator[Dict[str, str]]:
+        """
+        Yields the indicators of an 2.0 envelope generator, or 2.1 envelope (which then polls the next pages)
+        parsed as cortex indicators. Stops polling once `limit` indicators were yielded.
+        :param envelope: envelope containing stix objects
+        :param limit: max amount of indicators to fetch
+        :return: Cortex indicators iterator
+        """
+        indicators_cnt = 0
+        obj_cnt = 0
+        if limit == 0:
+            return
+        try:
+            while True:
+                # TAXII 2.0
+                if isinstance(envelope, types.GeneratorType):
+                    sub_envelope = next(envelope, None)
+                    stix_objects = sub_envelope.get("objects") if sub_envelope else None
+                    if not stix_objects:
+                        # no fetched objects
+                        return
+                # TAXII 2.1
+                elif isinstance(envelope, Dict):
+                    stix_objects = envelope.get("objects") or []
                 else:
                     raise DemistoException(
                         "Error: TAXII 2 client received the following response while requesting "
                         f"indicators: {str(envelope)}\n\nExpected output is json"
                     )
-        demisto.debug(
-            f"TAXII 2 Feed has extracted {len(indicators)} indicators / {obj_cnt} stix objects"
-        )
-        if limit > -1:
-            return indicators[:limit]
-        return indicators
+                obj_cnt += len(stix_objects)
+                for indicator_obj in self.extract_indicators_from_stix_objects(stix_objects):
+                    indicators = self.parse_single_indicator(indicator_obj)
+                    self.update_last_modified(indicator_obj.get("modified"))
+                    for indicator in indicators:
+                        yield indicator
+                        indicators_cnt += 1
+                        if -1 < limit <= indicators_cnt:
+                            return
+                if isinstance(envelope, Dict):
+                    if not envelope.get("more", False):
+                        return
+                    page_size = self.get_page_size(limit, limit - indicators_cnt)
+                    envelope = self.collection_to_fetch.get_objects(
+                        limit=page_size, next=envelope.get("next", "")
+                    )
+        finally:
+            demisto.debug(
+                f"TAXII 2 Feed has extracted {indicators_cnt} indicators / {obj_cnt} stix objects"
+            )
 
     def poll_collection(
             self, page_size: int, **kwargs
@@ -346,7 +350,7 @@ class Taxii2FeedClient:
             self, indicators_objs: List[Dict[str, str]]
     ) -> List[Dict[str, str]]:
         """
-        Parses a list of indicator objects, and updates the client.latest_fetched_indicator_created
+        Parses a list of indicator objects, and updates the client.last_fetched_indicator__modified
         :param indicators_objs: indicator objects
         :return: Parsed list of indicators
         """
@@ -354,20 +358,24 @@ class Taxii2FeedClient:
         if indicators_objs:
             for indicator_obj in indicators_objs:
                 indicators.extend(self.parse_single_indicator(indicator_obj))
-                indicator_modified_str = indicator_obj.get("modified")
-                if self.last_fetched_indicator__modified is None:
-                    self.last_fetched_indicator__modified = indicator_modified_str  # type: ignore[assignment]
-                else:
-                    last_datetime = self.stix_time_to_datetime(
-                        self.last_fetched_indicator__modified
-                    )
-                    indicator_created_datetime = self.stix_time_to_datetime(
-                        indicator_modified_str
-                    )
-                    if indicator_created_datetime > last_datetime:
-                        self.last_fetched_indicator__modified = indicator_modified_str
+                self.update_last_modified(indicator_obj.get("modified"))
         return indicators
 
+    def update_last_modified(self, indicator_modified_str: Optional[str]):
+        """
+        Keeps the latest modified time of the fetched indicators, parsing each time only once
+        :param indicator_modified_str: modified time of an indicator
+        """
+        if not indicator_modified_str or indicator_modified_str == self.last_fetched_indicator__modified:
+            return
+        indicator_modified_datetime = self.stix_time_to_datetime(indicator_modified_str)
+        if (
+                self.last_fetched_indicator__modified_datetime is None
+                or indicator_modified_datetime > self.last_fetched_indicator__modified_datetime
+        ):
+            self.last_fetched_indicator__modified = indicator_modified_str  # type: ignore[assignment]
+            self.last_fetched_indicator__modified_datetime = indicator_modified_datetime
+
     def parse_single_indicator(
             self, indicator_obj: Dict[str, str]
     ) -> List[Dict[str, str]]:
@@ -384,9 +392,7 @@ class Taxii2FeedClient:
             # supported indicators have no spaces, so this action shouldn't affect extracted values
             trimmed_pattern = pattern.replace(" ", "")
 
-            indicator_groups = self.extract_indicator_groups_from_pattern(
-                trimmed_pattern, self.indicator_regexes
-            )
+            indicator_groups, cidr_groups = self.extract_comparison_groups_from_pattern(trimmed_pattern)
             indicators.extend(
                 self.get_indicators_from_indicator_groups(
                     indicator_groups,
@@ -396,9 +402,6 @@ class Taxii2FeedClient:
                 )
             )
 
-            cidr_groups = self.extract_indicator_groups_from_pattern(
-                trimmed_pattern, self.cidr_regexes
-            )
             indicators.extend(
                 self.get_indicators_from_indicator_groups(
                     cidr_groups,
@@ -452,9 +455,8 @@ class Taxii2FeedClient:
         :param field_map: field map used for mapping fields ({field_name: field_value})
         :return: Cortex indicator
         """
-        ioc_obj_copy = copy.deepcopy(indicator_obj)
-        ioc_obj_copy["value"] = value
-        ioc_obj_copy["type"] = type_
+        # the stix object is shared by all the indicators of its pattern, so only its top level is copied
+        ioc_obj_copy = dict(indicator_obj, value=value, type=type_)
         indicator = {
             "value": value,
             "type": type_,
@@ -508,6 +510,21 @@ class Taxii2FeedClient:
                 groups.extend(find_result)
         return groups
 
+    @staticmethod
+    def extract_comparison_groups_from_pattern(
+            pattern: str
+    ) -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+        """
+        Extracts indicator [`type`, `indicator`] groups from pattern in a single pass,
+        in the order of INDICATOR_EQUALS_VAL_PATTERN, HASHES_EQUALS_VAL_PATTERN, and of the CIDR patterns
+        :param pattern: stix pattern
+        :return: extracted indicators list and extracted CIDR indicators list from pattern
+        """
+        groups: Dict[str, List[Tuple[str, str]]] = {"=": [], "": [], "ISSUBSET": [], "ISUPPERSET": []}
+        for term, operator, value in STIX_COMPARISON_REGEX.findall(pattern):
+            groups[operator].append((term, value))
+        return groups["="] + groups[""], groups["ISSUBSET"] + groups["ISUPPERSET"]
+
     @staticmethod
     def stix_time_to_datetime(s_time):
         """
@@ -3,6 +3,7 @@ from TAXII2ApiModule import Taxii2FeedClient, TAXII_VER_2_1, HEADER_USERNAME
 from taxii2client import v20, v21
 import pytest
 import json
+from itertools import islice
 
 with open('test_data/stix_envelope_no_indicators.json', 'r') as f:
     STIX_ENVELOPE_NO_IOCS = json.load(f)
@@ -168,6 +169,61 @@ class TestBuildIterator:
         iocs = mock_client.build_iterator(limit=0)
         assert iocs == []
 
+    def test_limit_v21_stops_polling(self, mocker):
+        """
+        Scenario: Call build iterator with a limit on a v21.Collection of several pages
+
+        Given:
+        - Pages of 17 indicators each, out of 19 objects
+        - Limit is 20
+
+        When
+        - Polling the collection
+
+        Then:
+        - Ensure 20 iocs are returned
+        - Ensure the second page asks only for the missing iocs, and no other page is requested
+        """
+        mock_client = Taxii2FeedClient(url='', collection_to_fetch=None, proxies=[], verify=False, limit_per_request=19,
+                                       tlp_color='GREEN')
+        collection = mocker.patch.object(mock_client, "collection_to_fetch", spec=v21.Collection)
+        page = dict(STIX_ENVELOPE_17_IOCS_19_OBJS, more=True, next='next')
+        collection.get_objects.return_value = page
+
+        iocs = mock_client.build_iterator(limit=20)
+
+        assert iocs == CORTEX_17_IOCS_19_OBJS + CORTEX_17_IOCS_19_OBJS[:3]
+        assert [call.kwargs['limit'] for call in collection.get_objects.call_args_list] == [19, 3]
+
+    def test_iter_indicators_v20_pages_on_demand(self, mocker):
+        """
+        Scenario: Iterate the indicators of a v20.Collection of several pages
+
+        Given:
+        - Pages of 17 indicators each
+
+        When
+        - Consuming only the first 10 iocs
+
+        Then:
+        - Ensure only the first page was requested
+        """
+        requested_pages = []
+
+        def as_pages(*args, **kwargs):
+            for i in range(5):
+                requested_pages.append(i)
+                yield STIX_ENVELOPE_17_IOCS_19_OBJS
+
+        mock_client = Taxii2FeedClient(url='', collection_to_fetch=None, proxies=[], verify=False, tlp_color='GREEN')
+        mocker.patch.object(mock_client, "collection_to_fetch", spec=v20.Collection)
+        mocker.patch.object(v20, 'as_pages', side_effect=as_pages)
+
+        iocs = list(islice(mock_client.iter_indicators(), 10))
+
+        assert iocs == CORTEX_17_IOCS_19_OBJS[:10]
+        assert requested_pages == [0]
+
 
 class TestInitServer:
     """
@@ -320,3 +376,84 @@ class TestExtractIndicatorsAndParse:
 
         assert len(actual) == 14
         assert actual == expected
+
+
+class TestParseIndicators:
+    """
+    Scenario: Parse STIX indicator objects
+    """
+
+    @pytest.mark.parametrize('pattern, expected_indicator_groups, expected_cidr_groups', [
+        ("[ipv4-addr:value='1.1.1.1']", [('ipv4-addr:value=', '1.1.1.1')], []),
+        ("[ipv4-addr:value='1.1.1.1'ANDdomain-name:value='example.com']",
+         [('ipv4-addr:value=', '1.1.1.1'), ('ANDdomain-name:value=', 'example.com')], []),
+        ("[file:hashes.'SHA-256'='aec070645fe53ee3b3763059376134f058cc337247c978add178b6ccdfb0019f']",
+         [("file:hashes.'SHA-256'=", 'aec070645fe53ee3b3763059376134f058cc337247c978add178b6ccdfb0019f')], []),
+        ("[url:value='https://example.com/a'ORfile:hashes.MD5='d41d8cd98f00b204e9800998ecf8427e']",
+         [('url:value=', 'https://example.com/a'), ('ORfile:hashes.MD5=', 'd41d8cd98f00b204e9800998ecf8427e')], []),
+        ("[ipv4-addr:valueISSUBSET'1.1.1.0/24']OR[ipv6-addr:valueISUPPERSET'2001:db8::/32']",
+         [], [('ipv4-addr:valueISSUBSET', '1.1.1.0/24'), ('OR[ipv6-addr:valueISUPPERSET', '2001:db8::/32')]),
+        ("[url:value='https://example.com/a']AND[ipv4-addr:valueISSUBSET'1.1.1.0/24']",
+         [('url:value=', 'https://example.com/a')], [('AND[ipv4-addr:valueISSUBSET', '1.1.1.0/24')]),
+        ("[process:name='cmd.exe']", [], []),
+    ])
+    def test_extract_comparison_groups_from_pattern(self, pattern, expected_indicator_groups, expected_cidr_groups):
+        """
+        Given:
+        - A STIX pattern of one or more comparisons.
+
+        When:
+        - Extracting the indicator and CIDR groups in a single pass.
+
+        Then:
+        - Ensure each group holds the type and the value of a single comparison.
+        """
+        assert Taxii2FeedClient.extract_comparison_groups_from_pattern(pattern) == (
+            expected_indicator_groups, expected_cidr_groups)
+
+    def test_create_indicator_does_not_change_stix_object(self):
+        """
+        Given:
+        - A STIX indicator object with a complex pattern.
+
+        When:
+        - Parsing it.
+
+        Then:
+        - Ensure each indicator has its own value and type in its rawJSON, and the object itself did not change.
+        """
+        indicator_obj = {
+            'type': 'indicator', 'id': 'indicator--1', 'modified': '2020-06-10T01:14:33.126Z', 'labels': ['malicious'],
+            'pattern': "[ipv4-addr:value = '1.1.1.1' AND domain-name:value = 'example.com']",
+            'external_references': [{'source_name': 'example'}],
+        }
+        original = json.loads(json.dumps(indicator_obj))
+        mock_client = Taxii2FeedClient(url='', collection_to_fetch='', proxies=[], verify=False)
+
+        first, second = mock_client.parse_single_indicator(indicator_obj)
+
+        assert (first['rawJSON']['value'], first['rawJSON']['type']) == ('1.1.1.1', 'IP')
+        assert (second['rawJSON']['value'], second['rawJSON']['type']) == ('example.com', 'Domain')
+        assert first['fields']['tags'] == ['malicious']
+        assert indicator_obj == original
+
+    def test_last_fetched_indicator_modified(self):
+        """
+        Given:
+        - Indicator objects with modified times with and without milliseconds, not in order, and without one.
+
+        When:
+        - Parsing them.
+
+        Then:
+        - Ensure the latest modified time is kept.
+        """
+        mock_client = Taxii2FeedClient(url='', collection_to_fetch='', proxies=[], verify=False)
+        mock_client.parse_indicators_list([
+            {'type': 'indicator', 'pattern': "[ipv4-addr:value='1.1.1.1']", 'modified': '2020-06-10T01:14:33.126Z'},
+            {'type': 'indicator', 'pattern': "[ipv4-addr:value='2.2.2.2']", 'modified': '2020-06-10T01:15:00Z'},
+            {'type': 'indicator', 'pattern': "[ipv4-addr:value='3.3.3.3']"},
+            {'type': 'indicator', 'pattern': "[ipv4-addr:value='4.4.4.4']", 'modified': '2020-06-10T01:14:59.999Z'},
+        ])
+
+        assert mock_client.last_fetched_indicator__modified == '2020-06-10T01:15:00Z'
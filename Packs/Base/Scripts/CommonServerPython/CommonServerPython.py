@@ -6,17 +6,23 @@ Note that adding code to CommonServerUserPython can override functions in Common
 from __future__ import print_function
 
 import base64
+import codecs
+import hashlib
 import json
 import logging
 import os
 import re
 import socket
 import sys
+import tempfile
+import threading
 import time
 import traceback
+import zlib
 from random import randint
 import xml.etree.cElementTree as ET
-from collections import OrderedDict
+from collections import OrderedDict, deque
+from itertools import islice
 from datetime import datetime, timedelta
 from abc import abstractmethod
 
@@ -277,58 +283,83 @@ class FeedIndicatorType(object):
             return None
 
 
-def auto_detect_indicator_type(indicator_value):
+TLD_EXTRACTOR = None
+
+
+def get_tld_extractor():
     """
-      Infer the type of the indicator.
+      Returns the tldextract extractor of the bundled public suffix list, which is parsed only on the first call.
 
-      :type indicator_value: ``str``
-      :param indicator_value: The indicator whose type we want to check. (required)
+      :return: The extractor.
+      :rtype: ``tldextract.TLDExtract``
+    """
+    global TLD_EXTRACTOR
+    if TLD_EXTRACTOR is None:
+        try:
+            import tldextract
+        except Exception:
+            raise Exception("Missing tldextract module, In order to use the auto detect function please use a docker"
+                            " image with it installed such as: demisto/jmespath")
+        try:
+            TLD_EXTRACTOR = tldextract.TLDExtract(cache_file=False, suffix_list_urls=None)
+        except TypeError:
+            # cache_file was replaced by cache_dir in tldextract 3.0.0
+            TLD_EXTRACTOR = tldextract.TLDExtract(cache_dir=None, suffix_list_urls=())
+    return TLD_EXTRACTOR
 
-      :return: The type of the indicator.
-      :rtype: ``str``
+
+HEX_CHARS = frozenset('0123456789abcdefABCDEF')
+DIGIT_CHARS = frozenset('0123456789')
+URL_FIRST_CHARS = frozenset('hfw')
+
+
+def detect_indicator_type(indicator_value, extract_tld):
     """
-    try:
-        import tldextract
-    except Exception:
-        raise Exception("Missing tldextract module, In order to use the auto detect function please use a docker"
-                        " image with it installed such as: demisto/jmespath")
+      Infers the type of the indicator with the given extractor, trying the same patterns in the same order as
+      auto_detect_indicator_type. Every pattern is tried only if the value has the characters and the length that
+      it requires, so most values are matched against one or two patterns.
+    """
+    first_char = indicator_value[:1]
+    length = len(indicator_value)
+    is_digit = first_char in DIGIT_CHARS
+    is_hex = first_char in HEX_CHARS
+    has_colon = is_hex and ':' in indicator_value
 
-    if re.match(ipv4cidrRegex, indicator_value):
+    if is_digit and '/' in indicator_value and ipv4cidrPattern.match(indicator_value):
         return FeedIndicatorType.CIDR
 
-    if re.match(ipv6cidrRegex, indicator_value):
+    if has_colon and '/' in indicator_value and ipv6cidrPattern.match(indicator_value):
         return FeedIndicatorType.IPv6CIDR
 
-    if re.match(ipv4Regex, indicator_value):
+    if is_digit and '.' in indicator_value and ipv4Pattern.match(indicator_value):
         return FeedIndicatorType.IP
 
-    if re.match(ipv6Regex, indicator_value):
+    if has_colon and ipv6Pattern.match(indicator_value):
         return FeedIndicatorType.IPv6
 
-    if re.match(sha256Regex, indicator_value):
+    if is_hex and length >= 64 and sha256Regex.match(indicator_value):
         return FeedIndicatorType.File
 
-    if re.match(urlRegex, indicator_value):
+    if first_char in URL_FIRST_CHARS and urlPattern.match(indicator_value):
         return FeedIndicatorType.URL
 
-    if re.match(md5Regex, indicator_value):
+    if is_hex and length >= 32 and md5Regex.match(indicator_value):
         return FeedIndicatorType.File
 
-    if re.match(sha1Regex, indicator_value):
+    if is_hex and length >= 40 and sha1Regex.match(indicator_value):
         return FeedIndicatorType.File
 
-    if re.match(emailRegex, indicator_value):
+    if '@' in indicator_value and emailPattern.match(indicator_value):
         return FeedIndicatorType.Email
 
-    if re.match(cveRegex, indicator_value):
+    if length >= 13 and '-' in indicator_value and cvePattern.match(indicator_value):
         return FeedIndicatorType.CVE
 
-    if re.match(sha512Regex, indicator_value):
+    if is_hex and length >= 128 and sha512Regex.match(indicator_value):
         return FeedIndicatorType.File
 
     try:
-        no_cache_extract = tldextract.TLDExtract(cache_file=False, suffix_list_urls=None)
-        if no_cache_extract(indicator_value).suffix:
+        if extract_tld(indicator_value).suffix:
             if '*' in indicator_value:
                 return FeedIndicatorType.DomainGlob
             return FeedIndicatorType.Domain
@@ -339,6 +370,33 @@ def auto_detect_indicator_type(indicator_value):
     return None
 
 
+def auto_detect_indicator_type(indicator_value):
+    """
+      Infer the type of the indicator.
+
+      :type indicator_value: ``str``
+      :param indicator_value: The indicator whose type we want to check. (required)
+
+      :return: The type of the indicator.
+      :rtype: ``str``
+    """
+    return detect_indicator_type(indicator_value, get_tld_extractor())
+
+
+def auto_detect_indicator_types(indicator_values):
+    """
+      Infer the types of many indicators, as auto_detect_indicator_type does for each of them.
+
+      :type indicator_values: ``iterable``
+      :param indicator_values: The indicators whose types we want to check. (required)
+
+      :return: The types of the indicators, in the order of the indicators.
+      :rtype: ``list``
+    """
+    extract_tld = get_tld_extractor()
+    return [detect_indicator_type(indicator_value, extract_tld) for indicator_value in indicator_values]
+
+
 def handle_proxy(proxy_param_name='proxy', checkbox_default_value=False, handle_insecure=True,
                  insecure_param_name=None):
     """
@@ -992,10 +1050,20 @@ class IntegrationLogger(object):
       :rtype: ``None``
     """
 
+    MAX_MESSAGES_SIZE = 10 * 1024 * 1024  # the maximal number of characters of the buffered messages
+    REPLACED_STR = '<XX_REPLACED>'
+    REPLACE_PATTERN_MIN_STRS = 256
+
     def __init__(self):
-        self.messages = []  # type: list
+        self.messages = deque()  # type: deque
+        self.messages_size = 0
+        self.dropped_messages = 0
         self.write_buf = []  # type: list
+        self.replace_strs_version = 0
+        self.replace_strs_key = None  # type: Optional[tuple]
         self.replace_strs = []  # type: list
+        self.unique_replace_strs = []  # type: list
+        self.replace_pattern = None
         self.buffering = True
         # if for some reason you don't want to auto add credentials.password to replace strings
         # set the os env COMMON_SERVER_NO_AUTO_REPLACE_STRS. Either in CommonServerUserPython, or docker env
@@ -1005,6 +1073,15 @@ class IntegrationLogger(object):
             if demisto.params():
                 self._iter_sensistive_dict_obj(demisto.params(), sensitive_params)
 
+    @property
+    def replace_strs(self):
+        return self._replace_strs
+
+    @replace_strs.setter
+    def replace_strs(self, strs):
+        self._replace_strs = strs
+        self.replace_strs_version += 1
+
     def _iter_sensistive_dict_obj(self, dict_obj, sensitive_params):
         for (k, v) in dict_obj.items():
             if isinstance(v, dict):  # credentials object case. recurse into the object
@@ -1015,7 +1092,8 @@ class IntegrationLogger(object):
                     if p in k_lower:
                         self.add_replace_strs(v, b64_encode(v))
 
-    def encode(self, message):
+    @staticmethod
+    def _to_str(message):
         try:
             res = str(message)
         except UnicodeEncodeError as exception:
@@ -1028,14 +1106,96 @@ class IntegrationLogger(object):
                 res = message.encode('utf-8', 'replace')  # type: ignore
             else:
                 res = "Failed encoding message with error: {}".format(exception)
-        for s in self.replace_strs:
-            res = res.replace(s, '<XX_REPLACED>')
         return res
 
+    def encode(self, message):
+        res = self._to_str(message)
+        self.update_replacer()
+        if self.replace_pattern is not None:
+            res = self.replace_pattern.sub(self.REPLACED_STR, res)
+        else:
+            for s in self.unique_replace_strs:
+                res = res.replace(s, self.REPLACED_STR)
+        return res
+
+    @staticmethod
+    def build_replace_pattern(strs):
+        """
+        Builds a single pattern matching all the strings, the longest one where several match at the same place.
+        The strings are merged into a trie, so every place in a message is tested against the strings which start
+        with its character, and not against all of them.
+
+        :type strs: ``list``
+        :param strs: The strings to match.
+
+        :return: The compiled pattern.
+        :rtype: ``re.Pattern``
+        """
+        trie = {}  # type: dict
+        for s in strs:
+            node = trie
+            for char in s:
+                node = node.setdefault(char, {})
+            node[''] = {}
+
+        def to_regex(node):
+            # follow the chains of a single character without recursion, secrets such as SSH keys are long
+            chain = []
+            while len(node) == 1 and '' not in node:
+                char, node = next(iter(node.items()))
+                chain.append(re.escape(char))
+            alternatives = [re.escape(char) + to_regex(child) for char, child in sorted(node.items()) if char]
+            regex = ''
+            if len(alternatives) == 1:
+                regex = alternatives[0]
+            elif alternatives:
+                regex = '(?:{})'.format('|'.join(alternatives))
+            if '' in node and alternatives:
+                # a string ends here, longer strings are preferred
+                regex = '(?:{})?'.format(regex)
+            return ''.join(chain) + regex
+
+        try:
+            return re.compile(to_regex(trie))
+        except Exception:
+            # too deeply nested for the regex compiler, the longest strings first give the same matches
+            return re.compile('|'.join(re.escape(s) for s in sorted(strs, key=len, reverse=True)))
+
+    def update_replacer(self):
+        """
+        Prepares the replace strings for encode, again only when the strings changed: without duplicates and the
+        longest first, or as a single pattern when there are more than REPLACE_PATTERN_MIN_STRS of them.
+        Up to that number, replacing each string with str.replace in turn is faster than the pattern.
+        A change is detected by replace_strs_version, which add_replace_strs and setting replace_strs bump, and by
+        the length of replace_strs, for strings appended to or removed from the list directly.
+
+        :return: No data returned
+        :rtype: ``None``
+        """
+        key = (self.replace_strs_version, len(self.replace_strs))
+        if key == self.replace_strs_key:
+            return
+        self.unique_replace_strs = sorted(set(s for s in self.replace_strs if s), key=lambda s: (-len(s), s))
+        self.replace_pattern = None
+        if len(self.unique_replace_strs) > self.REPLACE_PATTERN_MIN_STRS:
+            self.replace_pattern = self.build_replace_pattern(self.unique_replace_strs)
+        self.replace_strs_key = key
+
+    def buffer_message(self, text):
+        """
+        Buffers a message until print_log, dropping the earliest messages when the buffered messages are larger
+        than MAX_MESSAGES_SIZE, so a long running integration which logs a lot does not run out of memory.
+        """
+        self.messages.append(text)
+        self.messages_size += len(text)
+        while self.messages_size > self.MAX_MESSAGES_SIZE and len(self.messages) > 1:
+            self.messages_size -= len(self.messages.popleft())
+            self.dropped_messages += 1
+
     def __call__(self, message):
         text = self.encode(message)
         if self.buffering:
-            self.messages.append(text)
+            self.buffer_message(text)
         else:
             demisto.info(text)
 
@@ -1047,10 +1207,11 @@ class IntegrationLogger(object):
         to_add = []
         for a in args:
             if a:
-                a = self.encode(a)
+                a = self._to_str(a)
                 to_add.append(stringEscape(a))
                 to_add.append(stringUnEscape(a))
         self.replace_strs.extend(to_add)
+        self.replace_strs_version += 1
 
     def set_buffering(self, state):
         """
@@ -1063,13 +1224,18 @@ class IntegrationLogger(object):
 
     def print_log(self, verbose=False):
         if self.write_buf:
-            self.messages.append("".join(self.write_buf))
+            self.buffer_message("".join(self.write_buf))
         if self.messages:
-            text = 'Full Integration Log:\n' + '\n'.join(self.messages)
+            title = 'Full Integration Log:\n'
+            if self.dropped_messages:
+                title = 'Full Integration Log ({} earlier messages were dropped):\n'.format(self.dropped_messages)
+            text = title + '\n'.join(self.messages)
             if verbose:
                 demisto.log(text)
             demisto.info(text)
-            self.messages = []
+            self.messages = deque()
+            self.messages_size = 0
+            self.dropped_messages = 0
 
     def write(self, msg):
         # same as __call__ but allows IntegrationLogger to act as a File like object.
@@ -1084,7 +1250,7 @@ class IntegrationLogger(object):
         if has_newline:
             text = "".join(self.write_buf)
             if self.buffering:
-                self.messages.append(text)
+                self.buffer_message(text)
             else:
                 demisto.info(text)
             self.write_buf = []
@@ -1312,7 +1478,8 @@ def appendContext(key, data, dedup=False):
         demisto.setContext(key, data)
 
 
-def tableToMarkdown(name, t, headers=None, headerTransform=None, removeNull=False, metadata=None):
+def tableToMarkdown(name, t, headers=None, headerTransform=None, removeNull=False, metadata=None, max_rows=None,
+                    max_cell_length=None):
     """
        Converts a demisto table in JSON form to a Markdown table
 
@@ -1335,20 +1502,28 @@ def tableToMarkdown(name, t, headers=None, headerTransform=None, removeNull=Fals
        :type metadata: ``str``
        :param metadata: Metadata about the table contents
 
+       :type max_rows: ``int``
+       :param max_rows: The maximal number of rows to present. When the table has more rows, only the first max_rows
+            are presented, followed by a line with the number of presented rows. Default is all the rows.
+
+       :type max_cell_length: ``int``
+       :param max_cell_length: The maximal length of a cell content, longer contents are cut and end with '...'.
+            Default is the full content.
+
        :return: A string representation of the markdown table
        :rtype: ``str``
     """
 
-    mdResult = ''
+    md_parts = []
     if name:
-        mdResult = '### ' + name + '\n'
+        md_parts.append('### ' + name + '\n')
 
     if metadata:
-        mdResult += metadata + '\n'
+        md_parts.append(metadata + '\n')
 
     if not t or len(t) == 0:
-        mdResult += '**No entries.**\n'
-        return mdResult
+        md_parts.append('**No entries.**\n')
+        return ''.join(md_parts)
 
     if not isinstance(t, list):
         t = [t]
@@ -1361,7 +1536,7 @@ def tableToMarkdown(name, t, headers=None, headerTransform=None, removeNull=Fals
         # should be only one header
         if headers and len(headers) > 0:
             header = headers[0]
-            t = map(lambda item: dict((h, item) for h in [header]), t)
+            t = [{header: item} for item in t]
         else:
             raise Exception("Missing headers param for tableToMarkdown. Example: headers=['Some Header']")
 
@@ -1371,41 +1546,60 @@ def tableToMarkdown(name, t, headers=None, headerTransform=None, removeNull=Fals
         headers.sort()
 
     if removeNull:
-        headers_aux = headers[:]
-        for header in headers_aux:
-            if all(obj.get(header) in ('', None, [], {}) for obj in t):
-                headers.remove(header)
+        # a single pass over all the rows, also those over max_rows, which checks only the headers that were empty
+        # in all the previous rows
+        empty_headers = list(headers)
+        for entry in t:
+            empty_headers = [header for header in empty_headers if entry.get(header) in ('', None, [], {})]
+            if not empty_headers:
+                break
+        headers = [header for header in headers if header not in empty_headers]
+
+    total_rows = len(t)
+    if max_rows is not None and total_rows > max_rows:
+        t = t[:max_rows]
 
     if t and len(headers) > 0:
-        newHeaders = []
         if headerTransform is None:  # noqa
             def headerTransform(s): return stringEscapeMD(s, True, True)  # noqa
-        for header in headers:
-            newHeaders.append(headerTransform(header))
-        mdResult += '|'
-        if len(newHeaders) == 1:
-            mdResult += newHeaders[0]
-        else:
-            mdResult += '|'.join(newHeaders)
-        mdResult += '|\n'
-        sep = '---'
-        mdResult += '|' + '|'.join([sep] * len(headers)) + '|\n'
+        md_parts.append('|' + '|'.join([headerTransform(header) for header in headers]) + '|\n')
+        md_parts.append('|' + '|'.join(['---'] * len(headers)) + '|\n')
         for entry in t:
-            vals = [stringEscapeMD((formatCell(entry.get(h, ''), False) if entry.get(h) is not None else ''),
-                                   True, True) for h in headers]
+            vals = []
+            for header in headers:
+                value = entry.get(header)
+                if value is None:
+                    vals.append('')
+                    continue
+                # strings are kept as is by formatCell, and ints are formatted by it as by str
+                if type(value) is int:
+                    value = str(value)
+                elif not isinstance(value, STRING_TYPES):
+                    value = formatCell(value, False)
+                if max_cell_length is not None and len(value) > max_cell_length:
+                    value = value[:max_cell_length] + '...'
+                # escaping a cell without pipes or line breaks keeps it as is
+                if '|' in value or '\n' in value or '\r' in value:
+                    value = stringEscapeMD(value, True, True)
+                vals.append(value)
             # this pipe is optional
-            mdResult += '| '
             try:
-                mdResult += ' | '.join(vals)
+                md_parts.append('| ' + ' | '.join(vals) + ' |\n')
             except UnicodeDecodeError:
                 vals = [str(v) for v in vals]
-                mdResult += ' | '.join(vals)
-            mdResult += ' |\n'
+                md_parts.append('| ' + ' | '.join(vals) + ' |\n')
 
     else:
-        mdResult += '**No entries.**\n'
+        md_parts.append('**No entries.**\n')
 
-    return mdResult
+    if len(t) < total_rows:
+        md_parts.append('\n**Showing {} of {} rows.**\n'.format(len(t), total_rows))
+
+    try:
+        return ''.join(md_parts)
+    except UnicodeDecodeError:
+        # python 2: unicode cells with a non-ASCII str name or metadata, join them as str like the rows are
+        return ''.join(encode_string_results(part) for part in md_parts)
 
 
 tblToMd = tableToMarkdown
@@ -1697,19 +1891,29 @@ def elem_to_internal(elem, strip_ns=1, strip=1):
         if strip_ns:
             tag = strip_tag(subelem.tag)
 
-        value = v[tag]
-        try:
+        add_xml_value(d, tag, v[tag])
+
+    return {elem_tag: finish_xml_value(d, elem.text, elem.tail, strip)}
+
+
+def add_xml_value(d, tag, value):
+    """Adds the value of a sub element to the dictionary of its parent, the values of repeated tags are a list"""
+    if tag in d:
+        existing = d[tag]
+        if type(existing) is list:
             # add to existing list for this tag
-            d[tag].append(value)
-        except AttributeError:
+            existing.append(value)
+        else:
             # turn existing entry into a list
-            d[tag] = [d[tag], value]
-        except KeyError:
-            # add a new non-list entry
-            d[tag] = value
+            d[tag] = [existing, value]
+    else:
+        # add a new non-list entry
+        d[tag] = value
 
-    text = elem.text
-    tail = elem.tail
+
+def finish_xml_value(d, text, tail, strip=1):
+    """Adds the text and tail of an element to the dictionary of its attributes and sub elements,
+    and returns the value of the element"""
     if strip:
         # ignore leading and trailing whitespace
         if text:
@@ -1724,10 +1928,9 @@ def elem_to_internal(elem, strip_ns=1, strip=1):
         # use #text element if other attributes exist
         if text:
             d["#text"] = text
-    else:
-        # text is the value if no attributes
-        d = text or None  # type: ignore
-    return {elem_tag: d}
+        return d
+    # text is the value if no attributes
+    return text or None
 
 
 def internal_to_elem(pfsh, factory=ET.Element):
@@ -1801,8 +2004,112 @@ def xml2json(xmlstring, options={}, strip_ns=1, strip=1):
        :return: The converted JSON
        :rtype: ``dict`` or ``list``
     """
-    elem = ET.fromstring(xmlstring)
-    return elem2json(elem, options, strip_ns=strip_ns, strip=strip)
+    internal = xml2dict(xmlstring, strip_ns=strip_ns, strip=strip, dict_type=OrderedDict)
+    if 'pretty' in options:
+        return json.dumps(internal, indent=4, separators=(',', ': '))
+    else:
+        return json.dumps(internal)
+
+
+class XMLDictBuilder(object):
+    """
+       A parser target which builds the dictionary of an XML document from the parser events, without building
+       its elements. The dictionary is the one elem_to_internal returns for the root element.
+       It can be the target of any parser with the target interface of ElementTree's XMLParser, such as lxml's.
+
+       :type strip_ns: ``int``
+       :param strip_ns: Whether to remove the namespaces from the tags
+
+       :type strip: ``int``
+       :param strip: Whether to remove leading and trailing whitespace from the text
+
+       :type dict_type: ``type``
+       :param dict_type: The type of the dictionaries of the elements
+    """
+
+    def __init__(self, strip_ns=1, strip=1, dict_type=dict):
+        self._strip_ns = strip_ns
+        self._strip = strip
+        self._dict_type = dict_type
+        # [tag, dictionary, text] of the open elements
+        self._stack = []  # type: list
+        # [tag, dictionary, text] of the element which ended last, until its tail is known
+        self._ended = None  # type: Optional[list]
+        self._data = []  # type: list
+        self._root = None  # type: Optional[list]
+
+    def _flush_data(self):
+        """Returns the data since the last start or end of an element, which is the text of the open element or the
+        tail of the element which ended last"""
+        if not self._data:
+            return None
+        data = ''.join(self._data)
+        self._data = []
+        if self._ended is not None:
+            self._add_ended(data)
+            return None
+        return data
+
+    def _add_ended(self, tail):
+        tag, d, text = self._ended
+        self._ended = None
+        add_xml_value(self._stack[-1][1], tag, finish_xml_value(d, text, tail, self._strip))
+
+    def start(self, tag, attrib):
+        data = self._flush_data()
+        if self._ended is not None:
+            self._add_ended(None)
+        elif data is not None:
+            self._stack[-1][2] = data
+        if self._strip_ns and '}' in tag:
+            tag = strip_tag(tag)
+        d = self._dict_type()
+        for key, value in attrib.items():
+            d['@' + key] = value
+        self._stack.append([tag, d, None])
+
+    def end(self, tag):
+        data = self._flush_data()
+        if self._ended is not None:
+            self._add_ended(None)
+        elif data is not None:
+            self._stack[-1][2] = data
+        self._ended = self._stack.pop()
+        if not self._stack:
+            self._root = self._ended
+            self._ended = None
+
+    def data(self, data):
+        self._data.append(data)
+
+    def close(self):
+        tag, d, text = self._root  # type: ignore
+        return {tag: finish_xml_value(d, text, None, self._strip)}
+
+
+def xml2dict(xmlstring, strip_ns=1, strip=1, dict_type=dict):
+    """
+       Convert an XML string into a dictionary. The dictionary is equal to json.loads(xml2json(xmlstring)), and is
+       built directly from the parser events, without the element tree and the JSON string.
+
+       :type xmlstring: ``str``
+       :param xmlstring: The string to be converted (required)
+
+       :type strip_ns: ``int``
+       :param strip_ns: Whether to remove the namespaces from the tags
+
+       :type strip: ``int``
+       :param strip: Whether to remove leading and trailing whitespace from the text
+
+       :type dict_type: ``type``
+       :param dict_type: The type of the dictionaries of the elements
+
+       :return: The converted dictionary
+       :rtype: ``dict``
+    """
+    parser = ET.XMLParser(target=XMLDictBuilder(strip_ns=strip_ns, strip=strip, dict_type=dict_type))
+    parser.feed(xmlstring)
+    return parser.close()
 
 
 def json2xml(json_data, factory=ET.Element):
@@ -3135,6 +3442,15 @@ sha1Regex = re.compile(r'\b[0-9a-fA-F]{40}\b', regexFlags)
 sha256Regex = re.compile(r'\b[0-9a-fA-F]{64}\b', regexFlags)
 sha512Regex = re.compile(r'\b[0-9a-fA-F]{128}\b', regexFlags)
 
+# the patterns of auto_detect_indicator_type, compiled once
+ipv4Pattern = re.compile(ipv4Regex)
+ipv4cidrPattern = re.compile(ipv4cidrRegex)
+ipv6Pattern = re.compile(ipv6Regex)
+ipv6cidrPattern = re.compile(ipv6cidrRegex)
+emailPattern = re.compile(emailRegex)
+urlPattern = re.compile(urlRegex)
+cvePattern = re.compile(cveRegex)
+
 pascalRegex = re.compile('([A-Z]?[a-z]+)')
 
 
@@ -3543,20 +3859,29 @@ class DebugLogger(object):
         self.root_logger.addHandler(self.handler)
 
     def __del__(self):
+        self.close()
+
+    def close(self):
+        """
+        Restores the logging and the http client as they were before debug-mode started. Can be called more than once
+        """
         if self.handler:
             self.root_logger.setLevel(self.prev_log_level)
             self.root_logger.removeHandler(self.handler)
             self.handler.flush()
             self.handler.close()
+            self.handler = None
         if self.org_handlers:
             for h in self.org_handlers:
                 self.root_logger.addHandler(h)
+            self.org_handlers = None
         if self.http_client:
             self.http_client.HTTPConnection.debuglevel = 0
             if self.http_client_print:
                 setattr(self.http_client, 'print', self.http_client_print)
             else:
                 delattr(self.http_client, 'print')
+            self.http_client = None
 
     def log_start_debug(self):
         """
@@ -3575,14 +3900,41 @@ class DebugLogger(object):
 
 
 _requests_logger = None
-try:
-    if is_debug_mode():
-        _requests_logger = DebugLogger()
-        _requests_logger.log_start_debug()
-except Exception as ex:
-    # Should fail silently so that if there is a problem with the logger it will
-    # not affect the execution of commands and playbooks
-    demisto.info('Failed initializing DebugLogger: {}'.format(ex))
+
+
+def _start_requests_logger():
+    """
+    Starts logging at logging.DEBUG level when the command runs in debug-mode.
+
+    :return: No data returned
+    :rtype: ``None``
+    """
+    _stop_requests_logger()
+    global _requests_logger
+    try:
+        if is_debug_mode():
+            _requests_logger = DebugLogger()
+            _requests_logger.log_start_debug()
+    except Exception as ex:
+        # Should fail silently so that if there is a problem with the logger it will
+        # not affect the execution of commands and playbooks
+        demisto.info('Failed initializing DebugLogger: {}'.format(ex))
+
+
+def _stop_requests_logger():
+    """
+    Stops the debug-mode logging of a previous command, if it was started.
+
+    :return: No data returned
+    :rtype: ``None``
+    """
+    global _requests_logger
+    if _requests_logger is not None:
+        _requests_logger.close()
+        _requests_logger = None
+
+
+_start_requests_logger()
 
 
 def parse_date_string(date_string, date_format='%Y-%m-%dT%H:%M:%S'):
@@ -3772,6 +4124,115 @@ H || val.SSDeep && val.SSDeep == obj.SSDeep)': {'Malicious': {'Vendor': 'Vendor'
                                .format(indicator_type, INDICATOR_TYPE_TO_CONTEXT_KEY.keys()))
 
 
+class RateLimiter(object):
+    """Token bucket limiting the rate of requests sent to an API, which also honors the wait times the API asks for.
+
+    :type rate: ``float``
+    :param rate:
+        The number of requests allowed per period, for example 4 for a budget of 4 requests per minute.
+        If None, requests are only delayed when the API asks to wait.
+
+    :type period: ``float``
+    :param period: The length of the period in seconds.
+
+    :type max_wait: ``float``
+    :param max_wait:
+        The longest time in seconds to wait when the API asks to, a longer wait is not worth holding
+        the command for.
+
+    :return: No data returned
+    :rtype: ``None``
+    """
+    RESET_HEADERS = ('X-RateLimit-Reset', 'RateLimit-Reset', 'X-Rate-Limit-Reset')
+    REMAINING_HEADERS = ('X-RateLimit-Remaining', 'RateLimit-Remaining', 'X-Rate-Limit-Remaining')
+
+    def __init__(self, rate=None, period=1, max_wait=60):
+        self.rate = rate
+        self.period = float(period)
+        self.max_wait = max_wait
+        self.tokens = float(rate) if rate else 0.0
+        self.updated = time.time()
+        self.blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def to_dict(self):
+        return {'tokens': self.tokens, 'updated': self.updated, 'blocked_until': self.blocked_until}
+
+    def load(self, state):
+        """ Continues from the state another run saved with to_dict() """
+        if not state:
+            return
+        with self._lock:
+            self.tokens = min(float(state.get('tokens', self.tokens)), float(self.rate or 0))
+            self.updated = float(state.get('updated', self.updated))
+            self.blocked_until = max(self.blocked_until, float(state.get('blocked_until', 0)))
+
+    def _refill(self, now):
+        if self.rate:
+            self.tokens = min(float(self.rate), self.tokens + (now - self.updated) * self.rate / self.period)
+        self.updated = now
+
+    def acquire(self):
+        """ Waits until a request may be sent, and takes its token """
+        while True:
+            with self._lock:
+                now = time.time()
+                self._refill(now)
+                if self.blocked_until > now:
+                    wait = self.blocked_until - now
+                elif not self.rate or self.tokens >= 1:
+                    self.tokens -= 1 if self.rate else 0
+                    return
+                else:
+                    wait = (1 - self.tokens) * self.period / self.rate
+            time.sleep(wait)
+
+    def block_for(self, seconds):
+        """ Stops all requests for the given number of seconds. Returns whether the wait is not too long """
+        if seconds > self.max_wait:
+            return False
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.time() + seconds)
+        return True
+
+    @staticmethod
+    def _parse_delay(value, now):
+        """ Parses a Retry-After or rate limit reset header: seconds, an epoch timestamp or an HTTP date """
+        try:
+            delay = float(value)
+            # a reset time may be an epoch timestamp rather than a number of seconds
+            return delay - now if delay > 1e9 else delay
+        except (TypeError, ValueError):
+            pass
+        try:
+            from email.utils import mktime_tz, parsedate_tz
+            return mktime_tz(parsedate_tz(value)) - now
+        except Exception:
+            return None
+
+    def get_retry_delay(self, response):
+        """
+        Returns the number of seconds the API asked to wait with a throttled response, from its Retry-After or
+        rate limit reset headers. None if the response says nothing about it.
+        """
+        now = time.time()
+        headers = response.headers
+        for header in ('Retry-After',) + self.RESET_HEADERS:
+            if headers.get(header):
+                delay = self._parse_delay(headers[header], now)
+                if delay is not None:
+                    return max(delay, 0)
+        return None
+
+    def update_from_response(self, response):
+        """ Stops sending requests until the reset time, once the API says the remaining budget is used up """
+        remaining = next((response.headers[h] for h in self.REMAINING_HEADERS if response.headers.get(h)), None)
+        if remaining is not None and remaining.strip() == '0':
+            delay = self.get_retry_delay(response)
+            if delay:
+                self.block_for(delay)
+
+
 # Will add only if 'requests' module imported
 if 'requests' in sys.modules:
     class BaseClient(object):
@@ -3800,11 +4261,39 @@ if 'requests' in sys.modules:
             The request authorization, for example: (username, password).
             Can be None.
 
+        :type pool_connections: ``int``
+        :param pool_connections: The number of hosts to keep connection pools for.
+
+        :type pool_maxsize: ``int``
+        :param pool_maxsize:
+            The maximum number of connections to keep open per host.
+            Raise it when sending concurrent requests to the same host.
+
+        :type rate_limit: ``float``
+        :param rate_limit: The number of requests allowed per rate_limit_period seconds. None for no limit.
+
+        :type rate_limit_period: ``float``
+        :param rate_limit_period: The length in seconds of the period the rate_limit applies to.
+
+        :type rate_limit_retries: ``int``
+        :param rate_limit_retries:
+            How many times to retry a request throttled by the API (status code 429), after waiting the time
+            the API asked for in the Retry-After or rate limit reset headers, or an exponential backoff otherwise.
+
+        :type rate_limit_context_key: ``str``
+        :param rate_limit_context_key:
+            If set, the state of the rate limit is kept in the integration context under this key,
+            so the next commands of the instance continue from it.
+
         :return: No data returned
         :rtype: ``None``
         """
 
-        def __init__(self, base_url, verify=True, proxy=False, ok_codes=tuple(), headers=None, auth=None):
+        RATE_LIMIT_SAVE_INTERVAL = 10
+
+        def __init__(self, base_url, verify=True, proxy=False, ok_codes=tuple(), headers=None, auth=None,
+                     pool_connections=10, pool_maxsize=10, rate_limit=None, rate_limit_period=1,
+                     rate_limit_retries=0, rate_limit_context_key=None):
             self._base_url = base_url
             self._verify = verify
             self._ok_codes = ok_codes
@@ -3813,6 +4302,63 @@ if 'requests' in sys.modules:
             self._session = requests.Session()
             if not proxy:
                 self._session.trust_env = False
+            self._pool_connections = pool_connections
+            self._pool_maxsize = pool_maxsize
+            # adapters by their retry configuration, each one keeps its own connection pools
+            self._adapters = {}
+            self._mounted_adapter_key = None
+            self._rate_limiter = None
+            if rate_limit or rate_limit_retries:
+                self._rate_limiter = RateLimiter(rate_limit, rate_limit_period)
+            self._rate_limit_retries = rate_limit_retries
+            self._rate_limit_context_key = rate_limit_context_key
+            self._rate_limit_loaded = False
+            self._rate_limit_saved = 0.0
+            # whether a request was throttled since the rate limit state was last saved
+            self._rate_limit_throttled = False
+            # set while _http_requests sends from its worker threads, which must not access the integration context
+            self._rate_limit_in_workers = False
+
+        def _load_rate_limit(self):
+            """ Loads the rate limit state of the previous runs, once. Called only from the calling thread """
+            if self._rate_limit_loaded:
+                return
+            self._rate_limit_loaded = True
+            if self._rate_limit_context_key:
+                state = get_integration_context().get(self._rate_limit_context_key)
+                self._rate_limiter.load(json.loads(state) if isinstance(state, STRING_TYPES) else state)
+
+        def _save_rate_limit(self, force=False):
+            """ Saves the rate limit state for the next runs. Called only from the calling thread """
+            if not self._rate_limit_context_key:
+                return
+            now = time.time()
+            if force or self._rate_limit_throttled or now - self._rate_limit_saved >= self.RATE_LIMIT_SAVE_INTERVAL:
+                self._rate_limit_saved = now
+                self._rate_limit_throttled = False
+                set_to_integration_context_with_retries({self._rate_limit_context_key: self._rate_limiter.to_dict()},
+                                                        sync=False)
+
+        def _send_rate_limited(self, send, backoff_factor):
+            """
+            Sends the request when the rate limit allows it, and retries it when the API throttles it.
+            The state is only updated in memory, the caller saves it.
+            """
+            attempt = 0
+            while True:
+                self._rate_limiter.acquire()
+                res = send()
+                self._rate_limiter.update_from_response(res)
+                if res.status_code == 429:
+                    self._rate_limit_throttled = True
+                    if attempt < self._rate_limit_retries:
+                        delay = self._rate_limiter.get_retry_delay(res)
+                        if delay is None:
+                            delay = backoff_factor * (2 ** attempt)
+                        if self._rate_limiter.block_for(delay):
+                            attempt += 1
+                            continue
+                return res
 
         def _implement_retry(self, retries=0,
                              status_list_to_retry=None,
@@ -3856,21 +4402,31 @@ if 'requests' in sys.modules:
                 if status falls in ``status_forcelist`` range and retries have
                 been exhausted.
             """
+            adapter_key = (retries, tuple(status_list_to_retry or ()), backoff_factor, raise_on_redirect,
+                           raise_on_status)
+            if adapter_key == self._mounted_adapter_key:
+                # keep using the mounted adapter and the connections it holds open
+                return
             try:
-                retry = Retry(
-                    total=retries,
-                    read=retries,
-                    connect=retries,
-                    backoff_factor=backoff_factor,
-                    status=retries,
-                    status_forcelist=status_list_to_retry,
-                    method_whitelist=frozenset(['GET', 'POST', 'PUT']),
-                    raise_on_status=raise_on_status,
-                    raise_on_redirect=raise_on_redirect
-                )
-                adapter = HTTPAdapter(max_retries=retry)
+                adapter = self._adapters.get(adapter_key)
+                if adapter is None:
+                    retry = Retry(
+                        total=retries,
+                        read=retries,
+                        connect=retries,
+                        backoff_factor=backoff_factor,
+                        status=retries,
+                        status_forcelist=status_list_to_retry,
+                        method_whitelist=frozenset(['GET', 'POST', 'PUT']),
+                        raise_on_status=raise_on_status,
+                        raise_on_redirect=raise_on_redirect
+                    )
+                    adapter = HTTPAdapter(max_retries=retry, pool_connections=self._pool_connections,
+                                          pool_maxsize=self._pool_maxsize)
+                    self._adapters[adapter_key] = adapter
                 self._session.mount('http://', adapter)
                 self._session.mount('https://', adapter)
+                self._mounted_adapter_key = adapter_key
             except NameError:
                 pass
 
@@ -3976,20 +4532,33 @@ if 'requests' in sys.modules:
                 headers = headers if headers else self._headers
                 auth = auth if auth else self._auth
                 self._implement_retry(retries, status_list_to_retry, backoff_factor, raise_on_redirect, raise_on_status)
+
+                def send():
+                    return self._session.request(
+                        method,
+                        address,
+                        verify=self._verify,
+                        params=params,
+                        data=data,
+                        json=json_data,
+                        files=files,
+                        headers=headers,
+                        auth=auth,
+                        timeout=timeout,
+                        **kwargs
+                    )
+
                 # Execute
-                res = self._session.request(
-                    method,
-                    address,
-                    verify=self._verify,
-                    params=params,
-                    data=data,
-                    json=json_data,
-                    files=files,
-                    headers=headers,
-                    auth=auth,
-                    timeout=timeout,
-                    **kwargs
-                )
+                if self._rate_limiter and self._rate_limit_in_workers:
+                    res = self._send_rate_limited(send, backoff_factor)
+                elif self._rate_limiter:
+                    self._load_rate_limit()
+                    try:
+                        res = self._send_rate_limited(send, backoff_factor)
+                    finally:
+                        self._save_rate_limit()
+                else:
+                    res = send()
                 # Handle error responses gracefully
                 if not self._is_status_code_valid(res, ok_codes):
                     if error_handler:
@@ -4053,6 +4622,100 @@ if 'requests' in sys.modules:
                 err_msg = 'Max Retries Error- Request attempts with {} retries failed. \n{}'.format(retries, reason)
                 raise DemistoException(err_msg, exception)
 
+        def _http_requests(self, requests_kwargs, max_workers=10, max_workers_per_host=None,
+                           raise_on_error=False, **kwargs):
+            """Sends many requests concurrently, on a bounded pool of threads sharing the session connection pools.
+
+            :type requests_kwargs: ``list``
+            :param requests_kwargs:
+                The arguments of the _http_request call of each request, for example:
+                [{'method': 'GET', 'url_suffix': 'file/{}'.format(file_hash)} for file_hash in hashes]
+
+            :type max_workers: ``int``
+            :param max_workers: The maximum number of requests to send at the same time.
+
+            :type max_workers_per_host: ``int``
+            :param max_workers_per_host:
+                The maximum number of requests to send to the same host at the same time.
+                If None, will use the pool_maxsize of the client, so each request has a connection to reuse.
+
+            :type raise_on_error: ``bool``
+            :param raise_on_error:
+                Whether to raise a DemistoException listing all the failed requests once all requests are done.
+                If False, the exception raised by a failed request is returned in its place in the results.
+
+            :type kwargs: ``dict``
+            :param kwargs:
+                _http_request arguments common to all the requests, for example: resp_type='text'.
+                The retry arguments (retries, status_list_to_retry, backoff_factor, raise_on_redirect and
+                raise_on_status) can only be given here, as they mount an adapter on the session the requests share.
+
+            :return: The result of each request, in the order of requests_kwargs
+            :rtype: ``list``
+            """
+            requests_kwargs = list(requests_kwargs)
+            retry_args = ('retries', 'status_list_to_retry', 'backoff_factor', 'raise_on_redirect', 'raise_on_status')
+            for request_kwargs in requests_kwargs:
+                overrides = [arg for arg in retry_args if arg in request_kwargs]
+                if overrides:
+                    raise ValueError('The retry arguments {} apply to all the requests, pass them to _http_requests '
+                                     'and not with a request'.format(', '.join(overrides)))
+            # the adapter is mounted once here, so the workers find it mounted and do not mount it concurrently
+            self._implement_retry(**{arg: kwargs[arg] for arg in retry_args if arg in kwargs})
+            results = [None] * len(requests_kwargs)  # type: List[Any]
+            if is_debug_mode():
+                # the debug logger writes to the server from the thread making the request, keep it to one thread
+                max_workers = 1
+            max_workers_per_host = max_workers_per_host or self._pool_maxsize
+            host_semaphores = {}  # type: dict
+            lock = threading.Lock()
+            pending = iter(range(len(requests_kwargs)))
+
+            def get_host_semaphore(request_kwargs):
+                address = request_kwargs.get('full_url') or urljoin(self._base_url, request_kwargs.get('url_suffix', ''))
+                host = address.split('://', 1)[-1].split('/', 1)[0]
+                with lock:
+                    if host not in host_semaphores:
+                        host_semaphores[host] = threading.Semaphore(max_workers_per_host)
+                    return host_semaphores[host]
+
+            def worker():
+                while True:
+                    with lock:
+                        index = next(pending, None)
+                    if index is None:
+                        return
+                    request_kwargs = dict(kwargs, **requests_kwargs[index])
+                    with get_host_semaphore(request_kwargs):
+                        try:
+                            results[index] = self._http_request(**request_kwargs)
+                        except Exception as exception:
+                            results[index] = exception
+
+            if self._rate_limiter:
+                # the integration context is accessed only from this thread, before and after the workers send
+                self._load_rate_limit()
+                self._rate_limit_in_workers = True
+            threads = [threading.Thread(target=worker) for _ in range(min(max_workers, len(requests_kwargs)))]
+            try:
+                for thread in threads:
+                    thread.daemon = True
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+            finally:
+                if self._rate_limiter:
+                    self._rate_limit_in_workers = False
+                    self._save_rate_limit(force=True)
+
+            if raise_on_error:
+                errors = ['request {}: {}'.format(i, result) for i, result in enumerate(results)
+                          if isinstance(result, Exception)]
+                if errors:
+                    raise DemistoException('{} of {} requests failed:\n{}'.format(
+                        len(errors), len(results), '\n'.join(errors)))
+            return results
+
         def _is_status_code_valid(self, response, ok_codes=None):
             """If the status code is OK, return 'True'.
 
@@ -4076,6 +4739,8 @@ if 'requests' in sys.modules:
 
 def batch(iterable, batch_size=1):
     """Gets an iterable and yields slices of it.
+    Lists, tuples and strings are sliced, any other iterable, such as a generator, is consumed a batch at a time
+    and its batches are lists.
 
     :type iterable: ``list``
     :param iterable: list or other iterable object.
@@ -4086,12 +4751,578 @@ def batch(iterable, batch_size=1):
     :rtype: ``list``
     :return:: Iterable slices of given
     """
-    current_batch = iterable[:batch_size]
-    not_batched = iterable[batch_size:]
+    if isinstance(iterable, (list, tuple) + STRING_TYPES):
+        for start in range(0, len(iterable), batch_size):
+            yield iterable[start:start + batch_size]
+        return
+
+    iterator = iter(iterable)
+    current_batch = list(islice(iterator, batch_size))
     while current_batch:
         yield current_batch
-        current_batch = not_batched[:batch_size]
-        not_batched = not_batched[batch_size:]
+        current_batch = list(islice(iterator, batch_size))
+
+
+def create_indicators_in_batches(indicators, batch_size=2000, parallel=False):
+    """Creates the indicators with demisto.createIndicators, a batch at a time, while they are still generated,
+    and logs the throughput once all of them were created.
+
+    :type indicators: ``iterable``
+    :param indicators: The indicators to create, e.g. a generator which parses them from the feed.
+
+    :type batch_size: ``int``
+    :param batch_size: The maximal number of indicators to create in a single call to the server.
+
+    :type parallel: ``bool``
+    :param parallel:
+        Whether to generate the next batch in a background thread, while the server creates the current one.
+        The calls to the server can not be made from two threads at once, so use it only when generating the
+        indicators does not call the server, e.g. with demisto.debug or demisto.getIntegrationContext.
+
+    :return: The number of the indicators which were created.
+    :rtype: ``int``
+    """
+    start = time.time()
+    created = batches = 0
+    batches_iterator = batch(indicators, batch_size)
+    if parallel:
+        batches_iterator = iter_in_background(batches_iterator)
+    for indicators_batch in batches_iterator:
+        demisto.createIndicators(indicators_batch)
+        created += len(indicators_batch)
+        batches += 1
+
+    duration = time.time() - start
+    demisto.debug('Created {} indicators in {} batches in {:.1f} seconds, {:.0f} indicators per second'.format(
+        created, batches, duration, created / duration if duration else created))
+    return created
+
+
+def iter_in_background(iterable, buffer_size=1):
+    """Consumes an iterable in a background thread, up to buffer_size items ahead of the caller.
+
+    :type iterable: ``iterable``
+    :param iterable: The iterable to consume. It must not call the server, see create_indicators_in_batches.
+
+    :type buffer_size: ``int``
+    :param buffer_size: The maximal number of items which were consumed and were not yielded yet.
+
+    :return: The items of the iterable, an exception it raised is raised by the caller.
+    :rtype: ``iterator``
+    """
+    try:
+        import queue
+    except ImportError:
+        import Queue as queue  # type: ignore
+
+    items = queue.Queue(maxsize=buffer_size)  # type: ignore
+    done = object()
+    stopped = threading.Event()
+
+    def put(entry):
+        while not stopped.is_set():
+            try:
+                items.put(entry, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def consume():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((done, None))
+        except Exception as e:
+            put((done, e))
+
+    consumer = threading.Thread(target=consume)
+    consumer.daemon = True
+    consumer.start()
+    try:
+        while True:
+            item, error = items.get()
+            if error is not None:
+                raise error
+            if item is done:
+                return
+            yield item
+    finally:
+        # the caller stopped early, or failed, let the thread end
+        stopped.set()
+
+
+class IndicatorsDelta(object):
+    """Keeps a fingerprint of each indicator a feed submitted, so the next fetches submit only the indicators
+    which are new or changed. The values which are no longer in the feed are kept as an expiration list,
+    read with get_expired.
+
+    All the indicators are submitted again every full_refresh_hours, so the indicators which did not change
+    are seen again by the server and do not expire by the interval expiration of the feed.
+    Use it only when the feed is read in full on every fetch, and not with the suddenDeath expiration policy,
+    which expires every indicator a fetch does not submit (see is_supported).
+
+    The fingerprints are kept in the integration context, which is written on every fetch, so an indicator takes
+    16 bytes - a digest of its value and a digest of everything which is submitted for it - and up to
+    MAX_FINGERPRINTS of them are kept. The indicators over the limit are submitted on every fetch.
+    The values themselves, needed for the expiration list, are kept compressed, up to MAX_FINGERPRINTS of them,
+    and up to MAX_EXPIRED values are kept in the expiration list.
+
+    :type full_refresh_hours: ``float``
+    :param full_refresh_hours: How often to submit all the indicators, in hours.
+
+    :type context_key: ``str``
+    :param context_key: The integration context key under which the fingerprints are kept.
+
+    :return: No data returned
+    :rtype: ``None``
+    """
+    CONTEXT_KEY = 'indicators_delta'
+    DIGEST_SIZE = 8
+    MAX_FINGERPRINTS = 100000
+    MAX_EXPIRED = 10000
+    UNSUPPORTED_MESSAGE = 'Submitting only new and changed indicators is not supported with the "suddenDeath" ' \
+                          'indicator expiration method, which expires the unchanged indicators.'
+
+    def __init__(self, full_refresh_hours=24, context_key=CONTEXT_KEY):
+        self.context_key = context_key
+        state = get_integration_context().get(context_key) or {}
+        self.previous = self.decode(state.get('digests'))  # type: dict
+        self.last_full_refresh = state.get('last_full_refresh', 0)
+        self.full_refresh = time.time() - self.last_full_refresh >= float(full_refresh_hours) * 3600
+        self.current = {}  # type: dict
+        self.values = []  # type: list
+        self.submitted = 0
+
+    @staticmethod
+    def is_supported(params=None):
+        """Whether the feed may submit only new and changed indicators. With the suddenDeath expiration policy,
+        every indicator a fetch does not submit is expired, so the feed must submit all of them on every fetch.
+
+        :type params: ``dict``
+        :param params: The integration parameters, demisto.params() if not set.
+
+        :rtype: ``bool``
+        """
+        if params is None:
+            params = demisto.params()
+        return params.get('feedExpirationPolicy') != 'suddenDeath'
+
+    @staticmethod
+    def get_expired(context_key=CONTEXT_KEY):
+        """
+        :type context_key: ``str``
+        :param context_key: The integration context key under which the fingerprints are kept.
+
+        :return: The values which were removed from the feed and did not come back, the latest last,
+            up to MAX_EXPIRED of them
+        :rtype: ``list``
+        """
+        state = get_integration_context().get(context_key) or {}
+        return IndicatorsDelta.decode_values(state.get('expired'))
+
+    @staticmethod
+    def digest(data):
+        """ A short digest of the data, json encoded """
+        data = json.dumps(data, sort_keys=True, default=str).encode('utf-8')
+        return hashlib.md5(data).digest()[:IndicatorsDelta.DIGEST_SIZE]
+
+    @staticmethod
+    def add(fingerprints, key, fingerprint):
+        """ Adds a fingerprint of the value digest key. A value which appears several times in the feed,
+        e.g. in several URLs, keeps a list of its fingerprints """
+        seen = fingerprints.get(key)
+        if seen is None:
+            fingerprints[key] = fingerprint
+        elif isinstance(seen, list):
+            if fingerprint not in seen:
+                seen.append(fingerprint)
+        elif seen != fingerprint:
+            fingerprints[key] = [seen, fingerprint]
+
+    @staticmethod
+    def encode(fingerprints):
+        records = sorted(key + fingerprint for key, seen in fingerprints.items()
+                         for fingerprint in (seen if isinstance(seen, list) else [seen]))
+        return base64.b64encode(b''.join(records[:IndicatorsDelta.MAX_FINGERPRINTS])).decode('ascii')
+
+    @staticmethod
+    def decode(encoded):
+        fingerprints = {}  # type: dict
+        data = base64.b64decode(encoded) if encoded else b''
+        size = IndicatorsDelta.DIGEST_SIZE
+        for i in range(0, len(data), 2 * size):
+            IndicatorsDelta.add(fingerprints, data[i:i + size], data[i + size:i + 2 * size])
+        return fingerprints
+
+    @staticmethod
+    def encode_values(values):
+        return base64.b64encode(zlib.compress(json.dumps(values).encode('utf-8'))).decode('ascii')
+
+    @staticmethod
+    def decode_values(encoded):
+        if not encoded:
+            return []
+        return json.loads(zlib.decompress(base64.b64decode(encoded)).decode('utf-8'))
+
+    def filter(self, indicators):
+        """Yields only the indicators which are new or changed since the last fetch, or all of them in a full refresh.
+
+        :type indicators: ``iterable``
+        :param indicators: The indicators of the feed, as passed to demisto.createIndicators.
+
+        :return: The indicators to submit
+        :rtype: ``iterator``
+        """
+        for indicator in indicators:
+            value = indicator.get('value')
+            key = self.digest(value)
+            fingerprint = self.digest(indicator)
+            if key not in self.current and len(self.values) < self.MAX_FINGERPRINTS:
+                self.values.append(value)
+            self.add(self.current, key, fingerprint)
+            previous = self.previous.get(key)
+            unchanged = previous == fingerprint or (isinstance(previous, list) and fingerprint in previous)
+            if self.full_refresh or not unchanged:
+                self.submitted += 1
+                yield indicator
+
+    def save(self, keep_unseen=False):
+        """Saves the fingerprints of this fetch to the integration context, once its indicators were created.
+
+        :type keep_unseen: ``bool``
+        :param keep_unseen:
+            Whether to keep the fingerprints of the indicators this fetch did not see,
+            for when parts of the feed were not read, for example because they did not change or failed.
+            Such a fetch does not complete a full refresh, as the indicators which were not read were not submitted.
+
+        :return: No data returned
+        :rtype: ``None``
+        """
+        state = get_integration_context().get(self.context_key) or {}
+        fingerprints = self.current
+        values = self.values
+        unseen = [value for value in self.decode_values(state.get('values')) if self.digest(value) not in self.current]
+        removed = []  # type: list
+        if keep_unseen:
+            fingerprints = dict(self.previous)
+            fingerprints.update(self.current)
+            values = (values + unseen)[:self.MAX_FINGERPRINTS]
+        else:
+            removed = unseen
+        expired = [value for value in self.decode_values(state.get('expired'))
+                   if self.digest(value) not in self.current] + removed
+        demisto.debug('Submitted {} of {} indicators, {} were removed from the feed'.format(
+            self.submitted, len(self.current), len(removed)))
+        context = get_integration_context()
+        context[self.context_key] = {
+            'digests': self.encode(fingerprints),
+            'values': self.encode_values(values),
+            'expired': self.encode_values(expired[-self.MAX_EXPIRED:]),
+            'last_full_refresh': time.time() if self.full_refresh and not keep_unseen else self.last_full_refresh,
+        }
+        set_integration_context(context)
+
+
+class FeedValidators(object):
+    """Keeps the ETag, Last-Modified and content digest of each URL of a feed, so the next fetches skip the URLs
+    which did not change: the server answers a conditional request with 304 Not Modified, or the content has the
+    same digest.
+
+    A skipped URL submits no indicators, so all the URLs are read and submitted again every full_refresh_hours,
+    and the indicators which did not change do not expire by the interval expiration of the feed.
+    Not supported with the suddenDeath expiration policy, which expires every indicator a fetch does not submit
+    (see is_supported).
+
+    :type full_refresh_hours: ``float``
+    :param full_refresh_hours: How often to read all the URLs of the feed, in hours.
+
+    :type context_key: ``str``
+    :param context_key: The integration context key under which the validators are kept.
+
+    :return: No data returned
+    :rtype: ``None``
+    """
+    CONTEXT_KEY = 'feed_validators'
+    CHUNK_SIZE = 64 * 1024
+    # feeds bigger than this are spooled to disk while their digest is computed
+    SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+    UNSUPPORTED_MESSAGE = 'Skipping unchanged feeds is not supported with the "suddenDeath" indicator expiration ' \
+                          'method, which expires the indicators of a skipped feed.'
+
+    def __init__(self, full_refresh_hours=24, context_key=CONTEXT_KEY):
+        self.context_key = context_key
+        state = get_integration_context().get(context_key) or {}
+        self.previous = state.get('urls') or {}  # type: dict
+        self.last_full_refresh = state.get('last_full_refresh', 0)
+        self.full_refresh = time.time() - self.last_full_refresh >= float(full_refresh_hours) * 3600
+        self.current = {}  # type: dict
+
+    @staticmethod
+    def is_supported(params=None):
+        """Whether the feed may skip the URLs which did not change, see IndicatorsDelta.is_supported.
+
+        :type params: ``dict``
+        :param params: The integration parameters, demisto.params() if not set.
+
+        :rtype: ``bool``
+        """
+        return IndicatorsDelta.is_supported(params)
+
+    def get_conditional_headers(self, url):
+        """Get the headers which ask the server to answer 304 if the URL was not modified since the last fetch.
+        None are sent in a full refresh, so the server answers with the content.
+
+        :type url: ``str``
+        :param url: The feed URL.
+
+        :return: The If-None-Match and If-Modified-Since headers
+        :rtype: ``dict``
+        """
+        validators = {} if self.full_refresh else self.previous.get(url, {})
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+        return headers
+
+    def spool_changed_content(self, url, response):
+        """Reads the content of the response to a temporary file while computing its digest,
+        unless the server answered it was not modified. The new validators of the URL are kept until save is called.
+
+        :type url: ``str``
+        :param url: The feed URL.
+
+        :type response: ``requests.Response``
+        :param response: The streamed response.
+
+        :return: The content, or None if it did not change since the last fetch and this is not a full refresh
+        :rtype: ``file``
+        """
+        if response.status_code == 304:
+            demisto.debug('{} was not modified since the last fetch, skipping it'.format(url))
+            return None
+        content = tempfile.SpooledTemporaryFile(max_size=self.SPOOL_MAX_MEMORY)
+        digest = hashlib.sha256()
+        for chunk in response.iter_content(chunk_size=self.CHUNK_SIZE):
+            digest.update(chunk)
+            content.write(chunk)
+        content.seek(0)
+        self.current[url] = {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'digest': digest.hexdigest(),
+        }
+        if not self.full_refresh and self.previous.get(url, {}).get('digest') == self.current[url]['digest']:
+            demisto.debug('The content of {} did not change since the last fetch, skipping it'.format(url))
+            content.close()
+            return None
+        return content
+
+    def save(self, refreshed=True):
+        """Saves the validators of the read URLs to the integration context, once their indicators were created.
+
+        :type refreshed: ``bool``
+        :param refreshed: Whether all the URLs of the feed were read, which completes a full refresh.
+
+        :return: No data returned
+        :rtype: ``None``
+        """
+        context = get_integration_context()
+        context[self.context_key] = {
+            'urls': dict(self.previous, **self.current),
+            'last_full_refresh': time.time() if self.full_refresh and refreshed else self.last_full_refresh,
+        }
+        set_integration_context(context)
+
+
+def fetch_feed_urls(client, requests_kwargs, max_workers=5, **kwargs):
+    """Requests the URLs of a feed concurrently with the _http_requests of its client.
+    A URL which fails is logged and skipped, unless all the URLs fail, or the feed uses the suddenDeath expiration
+    policy, which would expire the indicators of the skipped URL.
+    The proxy environment variables are honoured for every URL, as feeds always did, also when the session of the
+    client does not trust the environment because its proxy argument is not set.
+
+    :type client: ``BaseClient``
+    :param client: The client of the feed.
+
+    :type requests_kwargs: ``list``
+    :param requests_kwargs: The _http_request arguments of each URL, with the URL as full_url.
+
+    :type max_workers: ``int``
+    :param max_workers: The maximum number of URLs to request at the same time.
+
+    :type kwargs: ``dict``
+    :param kwargs: _http_request arguments common to all the URLs, see BaseClient._http_requests.
+
+    :return: A (url, result) tuple for each URL which succeeded, in the order of requests_kwargs,
+        and the URLs which failed.
+    :rtype: ``tuple``
+    """
+    urls = [request_kwargs['full_url'] for request_kwargs in requests_kwargs]
+    requests_kwargs = [dict({'proxies': requests.utils.get_environ_proxies(request_kwargs['full_url'])},
+                            **request_kwargs) for request_kwargs in requests_kwargs]
+    results = client._http_requests(requests_kwargs, max_workers=max_workers, **kwargs)
+    errors = [(url, result) for url, result in zip(urls, results) if isinstance(result, Exception)]
+    if errors and (len(errors) == len(urls) or demisto.params().get('feedExpirationPolicy') == 'suddenDeath'):
+        raise errors[0][1]
+    for url, error in errors:
+        demisto.error('Failed to fetch {}, skipping it: {}'.format(url, error))
+    succeeded = [(url, result) for url, result in zip(urls, results) if not isinstance(result, Exception)]
+    return succeeded, [url for url, _ in errors]
+
+
+def iter_content_chunks(content, chunk_size=FeedValidators.CHUNK_SIZE):
+    """Yields the content of a file a chunk at a time, and closes it.
+    For the content FeedValidators.spool_changed_content returns.
+
+    :type content: ``file``
+    :param content: The content, opened in binary mode.
+
+    :type chunk_size: ``int``
+    :param chunk_size: The number of bytes to read at a time.
+
+    :return: The bytes chunks
+    :rtype: ``iterator``
+    """
+    with content:
+        for chunk in iter(lambda: content.read(chunk_size), b''):
+            yield chunk
+
+
+def decode_chunks(chunks, encoding):
+    """Decodes bytes chunk by chunk, so a feed is parsed while it is downloaded. A character split between two
+    chunks is kept whole, and bytes which are not valid in the encoding are replaced, as requests does when it
+    decodes a response.
+
+    :type chunks: ``iterable``
+    :param chunks: The bytes chunks, for example of response.iter_content or iter_content_chunks.
+
+    :type encoding: ``str``
+    :param encoding: The encoding of the content.
+
+    :return: The text chunks, without empty ones
+    :rtype: ``iterator``
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    text = decoder.decode(b'', final=True)
+    if text:
+        yield text
+
+
+class IndicatorsSearcher(object):
+    """Iterates over the indicators of a query, fetching them page after page with demisto.searchIndicators,
+    so only one page of indicators is held in memory at a time.
+
+    When the server returns a searchAfter cursor, the next pages are fetched with it, which is cheaper for the
+    server than paging by number deep into the results. Otherwise the next pages are fetched by their number.
+
+    :type query: ``str``
+    :param query: The indicators query, in the Cortex XSOAR indicator query syntax.
+
+    :type page_size: ``int``
+    :param page_size: The number of indicators to fetch in each call to the server.
+
+    :type limit: ``int``
+    :param limit: The maximal number of indicators to return, all the indicators of the query if not set.
+
+    :type offset: ``int``
+    :param offset: The number of indicators of the query to skip.
+
+    :type from_date: ``str``
+    :param from_date: Search the indicators from this date.
+
+    :type to_date: ``str``
+    :param to_date: Search the indicators until this date.
+
+    :return: No data returned
+    :rtype: ``None``
+    """
+    DEFAULT_PAGE_SIZE = 1000
+    SEARCH_AFTER_TITLE = 'searchAfter'
+
+    def __init__(self, query='', page_size=DEFAULT_PAGE_SIZE, limit=None, offset=0, from_date='', to_date=''):
+        self.query = query
+        self.page_size = int(page_size)
+        self.limit = int(limit) if limit is not None else None
+        self.offset = int(offset or 0)
+        self.from_date = from_date
+        self.to_date = to_date
+        self.total = None
+        self.fetched = 0
+
+    def search(self, size, page=0, search_after=None):
+        """ Fetches a page of indicators, by the cursor of the previous page if it is given, else by its number """
+        kwargs = {'query': self.query, 'size': size}
+        if self.from_date:
+            kwargs['fromDate'] = self.from_date
+        if self.to_date:
+            kwargs['toDate'] = self.to_date
+        if search_after is not None:
+            kwargs['searchAfter'] = search_after
+        else:
+            kwargs['page'] = page
+        return demisto.searchIndicators(**kwargs) or {}
+
+    def iter_pages(self):
+        """Yields the indicators of the query a page at a time, after the offset and up to the limit.
+
+        :return: The pages of indicators
+        :rtype: ``iterator``
+        """
+        if self.limit is not None and self.limit <= 0:
+            return
+
+        # the first page is fetched by its number, as a cursor can not skip the offset. A limit smaller than a page
+        # sizes the first page down to it, when the page of that size still starts at or before the offset
+        size = self.page_size
+        if self.limit is not None and self.limit < self.page_size:
+            if self.offset % self.limit == 0:
+                size = self.limit
+            elif self.offset + self.limit <= self.page_size:
+                size = self.offset + self.limit
+        page = self.offset // size
+        skip = self.offset % size
+        search_after = None
+        while True:
+            res = self.search(size, page=page, search_after=search_after)
+            iocs = res.get('iocs') or []
+            if self.total is None:
+                self.total = res.get('total')
+            last_page = len(iocs) < size
+
+            iocs = iocs[skip:]
+            skip = 0
+            if self.limit is not None:
+                iocs = iocs[:self.limit - self.fetched]
+            if iocs:
+                self.fetched += len(iocs)
+                yield iocs
+            if last_page or (self.limit is not None and self.fetched >= self.limit):
+                return
+
+            search_after = res.get(self.SEARCH_AFTER_TITLE)
+            if search_after is not None:
+                # the cursor does not depend on the page size, so only the remaining indicators are fetched
+                if self.limit is not None:
+                    size = min(self.page_size, self.limit - self.fetched)
+            else:
+                # without a cursor, continue by number from the position of the next indicator of the query
+                position = self.offset + self.fetched
+                page = position // self.page_size
+                skip = position % self.page_size
+                size = self.page_size
+
+    def __iter__(self):
+        for iocs in self.iter_pages():
+            for ioc in iocs:
+                yield ioc
 
 
 def dict_safe_get(dict_object, keys, default_return_value=None, return_type=None, raise_return_type=True):
@@ -4946,3 +6177,37 @@ class IAMUserProfile:
         if not isinstance(app_data, dict):
             app_data = safe_load_json(app_data)
         self._user_profile = demisto.mapObject(app_data, mapper_name, mapping_type)
+
+
+def reset_module_state():
+    """
+    Re-creates the module level objects which depend on the running script: the ``LOG`` integration logger,
+    which holds the params to redact, and the debug-mode logger.
+    The docker python loop executes this module once per container and calls this function before each script.
+
+    :return: No data returned
+    :rtype: ``None``
+    """
+    global LOG
+    LOG = IntegrationLogger()
+    _start_requests_logger()
+
+
+def clear_module_state():
+    """
+    Releases the module level objects which depend on the running script, so they are not kept after it: stops the
+    debug-mode logger and drops the ``LOG`` integration logger, which holds the params of the script to redact.
+    ``LOG`` is not created again here, as that would read the params of the script which just ran;
+    reset_module_state creates it for the next script.
+    The docker python loop calls this function after each script, and before it keeps the module for the next ones.
+
+    :return: No data returned
+    :rtype: ``None``
+    """
+    global LOG
+    LOG = None
+    _stop_requests_logger()
+
+
+# The docker python loop executes everything above this line once per container. Do not add code below it.
+# ###END_OF_COMMON_SERVER_PYTHON###
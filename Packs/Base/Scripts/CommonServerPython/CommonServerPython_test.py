@@ -1,10 +1,13 @@
 # -*- coding: utf-8 -*-
 import demistomock as demisto
+import base64
 import copy
 import json
 import re
 import os
 import sys
+import tempfile
+import time
 import requests
 from pytest import raises, mark
 import pytest
@@ -65,6 +68,38 @@ def test_xml():
     assert xmlActual == xml, "expected:\n{}\nto equal:\n{}".format(xml, xmlActual)
 
 
+XML2DICT_PARAMS = [
+    ('<a/>', {}, {'a': None}),
+    ('<a x="1">t</a>', {}, {'a': {'@x': '1', '#text': 't'}}),
+    ('<a><b>1</b><b>2</b><b>3</b><c/></a>', {}, {'a': {'b': ['1', '2', '3'], 'c': None}}),
+    ('<a> pre <b>1</b> mid <b x="y">2</b> post </a>', {},
+     {'a': {'b': [{'#tail': 'mid', '#text': '1'}, {'@x': 'y', '#tail': 'post', '#text': '2'}], '#text': 'pre'}}),
+    ('<a>\n  <b>1</b>\n</a>', {'strip': 0}, {'a': {'b': {'#tail': '\n', '#text': '1'}, '#text': '\n  '}}),
+    ('<a>x<!-- comment -->y<![CDATA[<z>]]> &amp;</a>', {}, {'a': 'xy<z> &'}),
+    ('<r xmlns="urn:r" xmlns:p="urn:p"><p:b p:at="1">v</p:b></r>', {}, {'r': {'b': {'@{urn:p}at': '1', '#text': 'v'}}}),
+    ('<r xmlns="urn:r"><b>v</b></r>', {'strip_ns': 0}, {'{urn:r}r': {'{urn:r}b': 'v'}}),
+]
+
+
+@pytest.mark.parametrize('xml, kwargs, expected', XML2DICT_PARAMS)
+def test_xml2dict(xml, kwargs, expected):
+    """
+    Given:
+        - An XML string
+    When:
+        - Converting it with xml2dict and xml2json
+    Then:
+        - Ensure the dictionary is the expected one, and equals the JSON of xml2json and of elem_to_internal
+    """
+    import json
+    import xml.etree.cElementTree as ET
+    from CommonServerPython import elem_to_internal, xml2dict
+
+    assert xml2dict(xml, **kwargs) == expected
+    assert json.loads(xml2json(xml, **kwargs)) == expected
+    assert xml2json(xml, **kwargs) == json.dumps(elem_to_internal(ET.fromstring(xml), **kwargs))
+
+
 def toEntry(table):
     return {
 
@@ -368,6 +403,63 @@ def test_tbl_to_md_header_with_special_character():
     assert table_with_character == expected_string_with_special_character
 
 
+def test_tbl_to_md_max_rows():
+    table = tableToMarkdown('tableToMarkdown test with max rows', DATA, max_rows=2)
+    expected_table = '''### tableToMarkdown test with max rows
+|header_1|header_2|header_3|
+|---|---|---|
+| a1 | b1 | c1 |
+| a2 | b2 | c2 |
+
+**Showing 2 of 3 rows.**
+'''
+    assert table == expected_table
+    assert tableToMarkdown('tableToMarkdown test', DATA, max_rows=3) == tableToMarkdown('tableToMarkdown test', DATA)
+
+
+def test_tbl_to_md_max_rows_remove_null():
+    """
+    Given:
+        - A table whose column is empty only in the presented rows
+    When:
+        - Converting it with max_rows and removeNull
+    Then:
+        - Ensure the column is kept, as removeNull removes only the columns which are empty in all the rows
+    """
+    data = [{'header_1': 'a1', 'header_2': None}, {'header_1': 'a2', 'header_2': 'b2'}]
+    table = tableToMarkdown('tableToMarkdown test', data, removeNull=True, max_rows=1)
+    assert table == '''### tableToMarkdown test
+|header_1|header_2|
+|---|---|
+| a1 |  |
+
+**Showing 1 of 2 rows.**
+'''
+
+
+def test_tbl_to_md_max_cell_length():
+    data = [{'header_1': 'a' * 10, 'header_2': ['b|1', 'b|2']}, {'header_1': 'short', 'header_2': 3}]
+    table = tableToMarkdown('tableToMarkdown test with max cell length', data, max_cell_length=5)
+    expected_table = '''### tableToMarkdown test with max cell length
+|header_1|header_2|
+|---|---|
+| aaaaa... | b\\|1,<br>... |
+| short | 3 |
+'''
+    assert table == expected_table
+
+
+def test_tbl_to_md_string_array_remove_null():
+    table = tableToMarkdown('tableToMarkdown test', ['foo', '', 'bar'], ['header_1'], removeNull=True)
+    assert table == '''### tableToMarkdown test
+|header_1|
+|---|
+| foo |
+|  |
+| bar |
+'''
+
+
 def test_flatten_cell():
     # sanity
     utf8_to_flatten = b'abcdefghijklmnopqrstuvwxyz1234567890!'.decode('utf8')
@@ -727,6 +819,140 @@ def test_debug_logger_replace_strs(mocker):
         assert s not in msg
 
 
+@pytest.mark.parametrize('pattern_min_strs', [IntegrationLogger.REPLACE_PATTERN_MIN_STRS, 0])
+def test_logger_replace_strs_overlapping(mocker, pattern_min_strs):
+    """
+    Given:
+        - replace strings which are prefixes of each other, and a string added after a message was logged
+        - few replace strings, which are replaced in turn, or more than the minimum for a single pattern
+    When:
+        - logging messages containing them
+    Then:
+        - the longest string is replaced where several match at the same place
+        - the strings added after a message was logged are replaced in the next messages
+    """
+    mocker.patch.object(demisto, 'params', return_value={})
+    mocker.patch.object(IntegrationLogger, 'REPLACE_PATTERN_MIN_STRS', pattern_min_strs)
+    ilog = IntegrationLogger()
+    ilog.add_replace_strs('pass', 'password1', 'password12')
+    ilog('password123 password1 passport')
+    ilog.add_replace_strs('port')
+    ilog('password123 password1 passport')
+    ilog.replace_strs.append('word')
+    ilog('word')
+    assert list(ilog.messages) == ['<XX_REPLACED>3 <XX_REPLACED> <XX_REPLACED>port',
+                                   '<XX_REPLACED>3 <XX_REPLACED> <XX_REPLACED><XX_REPLACED>',
+                                   '<XX_REPLACED>']
+    assert (ilog.replace_pattern is not None) == (pattern_min_strs == 0)
+
+
+@pytest.mark.parametrize('pattern_min_strs', [IntegrationLogger.REPLACE_PATTERN_MIN_STRS, 0])
+def test_logger_replace_strs_changed(mocker, pattern_min_strs):
+    """
+    Given:
+        - replace strings which were already used to log a message
+    When:
+        - removing one of them from the list and adding another directly, sorting the list, and setting another
+          list of the same length
+    Then:
+        - the new strings are replaced in the next messages, and the previous ones are not
+        - the strings are prepared again only when they changed
+    """
+    mocker.patch.object(demisto, 'params', return_value={})
+    mocker.patch.object(IntegrationLogger, 'REPLACE_PATTERN_MIN_STRS', pattern_min_strs)
+    ilog = IntegrationLogger()
+    ilog.replace_strs.extend(['first', 'second'])
+    ilog('first second')
+    ilog.replace_strs.remove('second')
+    ilog('first second')
+    ilog.replace_strs.append('third')
+    ilog.replace_strs.sort(key=len, reverse=True)
+    ilog('second third')
+    ilog.replace_strs = ['fourth', 'fifth']
+    ilog('first fourth fifth')
+    assert list(ilog.messages) == ['<XX_REPLACED> <XX_REPLACED>',
+                                   '<XX_REPLACED> second',
+                                   'second <XX_REPLACED>',
+                                   'first <XX_REPLACED> <XX_REPLACED>']
+    unique_replace_strs = ilog.unique_replace_strs
+    ilog('fifth')
+    assert ilog.unique_replace_strs is unique_replace_strs
+
+
+def test_logger_build_replace_pattern():
+    """
+    Given:
+        - 1000 replace strings, the longest of 5000 characters
+    When:
+        - building their pattern
+    Then:
+        - the pattern matches each of them
+    """
+    strs = ['secret{}'.format(i) for i in range(999)] + ['k' * 5000]
+    pattern = IntegrationLogger.build_replace_pattern(strs)
+    for s in strs:
+        assert pattern.sub('', 'a {} b'.format(s)) == 'a  b'
+
+
+def test_logger_max_messages_size(mocker):
+    """
+    Given:
+        - a logger which buffers messages of up to 25 characters
+    When:
+        - logging 5 messages of 10 characters
+    Then:
+        - only the 2 latest messages are printed, with the number of the messages which were dropped
+    """
+    mocker.patch.object(demisto, 'params', return_value={})
+    mocker.patch.object(demisto, 'info')
+    mocker.patch.object(IntegrationLogger, 'MAX_MESSAGES_SIZE', 25)
+    ilog = IntegrationLogger()
+    for i in range(5):
+        ilog('message {}.'.format(i))
+    ilog.print_log()
+    assert demisto.info.call_args[0][0] == 'Full Integration Log (3 earlier messages were dropped):\n' \
+                                           'message 3.\nmessage 4.'
+    assert not ilog.messages
+    assert ilog.messages_size == ilog.dropped_messages == 0
+
+
+def test_reset_module_state(mocker):
+    import CommonServerPython
+    mocker.patch.object(demisto, 'params', return_value={'apikey': 'first_key'})
+    CommonServerPython.reset_module_state()
+    first_logger = CommonServerPython.LOG
+    mocker.patch.object(demisto, 'params', return_value={'apikey': 'second_key'})
+    CommonServerPython.reset_module_state()
+    assert CommonServerPython.LOG is not first_logger
+    assert 'second_key' in CommonServerPython.LOG.replace_strs
+    assert 'first_key' not in CommonServerPython.LOG.replace_strs
+    assert CommonServerPython._requests_logger is None
+
+
+def test_clear_module_state(mocker):
+    """
+    Given:
+        - The module state of a script, with its params.
+    When:
+        - Clearing the module state after the script, and resetting it for the next one.
+    Then:
+        - The logger of the script is dropped without reading the params again, and the next script gets a logger
+          with its own params.
+    """
+    import CommonServerPython
+    mocker.patch.object(demisto, 'params', return_value={'apikey': 'first_key'})
+    CommonServerPython.reset_module_state()
+    demisto.params.reset_mock()
+    try:
+        CommonServerPython.clear_module_state()
+        assert CommonServerPython.LOG is None
+        assert not demisto.params.called
+    finally:
+        mocker.patch.object(demisto, 'params', return_value={'apikey': 'second_key'})
+        CommonServerPython.reset_module_state()
+    assert 'second_key' in CommonServerPython.LOG.replace_strs
+
+
 def test_is_mac_address():
     from CommonServerPython import is_mac_address
 
@@ -1754,6 +1980,325 @@ class TestBaseClient:
             assert e.res.status_code == 400
             assert resp_json.get('error') == 'additional text'
 
+    def test_http_request_reuses_adapter(self, requests_mock):
+        """
+            Given
+            - A base client with custom connection pool sizes
+
+            When
+            - Making several http requests, with different retry configurations
+
+            Then
+            - Ensure requests with the same retry configuration share the same adapter and its connection pools
+        """
+        from CommonServerPython import BaseClient
+        client = BaseClient('http://example.com/api/v2/', pool_connections=3, pool_maxsize=20)
+        requests_mock.get('http://example.com/api/v2/event', text=json.dumps(self.text))
+        client._http_request('get', 'event')
+        adapter = client._session.adapters['http://']
+        assert adapter._pool_connections == 3
+        assert adapter._pool_maxsize == 20
+
+        client._http_request('get', 'event')
+        assert client._session.adapters['http://'] is adapter
+
+        client._http_request('get', 'event', retries=2, status_list_to_retry=[429])
+        retry_adapter = client._session.adapters['http://']
+        assert retry_adapter is not adapter
+        assert retry_adapter.max_retries.total == 2
+
+        client._http_request('get', 'event')
+        assert client._session.adapters['http://'] is adapter
+        assert client._session.adapters['https://'] is adapter
+
+    def test_http_requests_keeps_order(self, requests_mock):
+        """
+            Given
+            - A base client
+
+            When
+            - Sending many requests concurrently, which complete in a different order than they were sent
+
+            Then
+            - Ensure the results are returned in the order of the requests
+        """
+        import time
+
+        def callback(request, context):
+            item = int(request.path.split('/')[-1])
+            time.sleep((item % 3) * 0.01)
+            return {'item': item}
+
+        requests_mock.get(re.compile('http://example.com/api/v2/item/.*'), json=callback)
+        results = self.client._http_requests([{'method': 'GET', 'url_suffix': 'item/{}'.format(i)} for i in range(30)],
+                                             max_workers=5)
+        assert results == [{'item': i} for i in range(30)]
+
+    def test_http_requests_errors(self, requests_mock):
+        """
+            Given
+            - A base client
+
+            When
+            - Sending requests concurrently, some of which fail
+
+            Then
+            - Ensure the failed requests return their error in place, or all errors are raised together
+        """
+        from CommonServerPython import DemistoException
+        requests_mock.get('http://example.com/api/v2/ok', json={'ok': True})
+        requests_mock.get('http://example.com/api/v2/fail', status_code=500)
+        requests_kwargs = [{'method': 'GET', 'url_suffix': suffix} for suffix in ('ok', 'fail', 'ok', 'fail')]
+
+        results = self.client._http_requests(requests_kwargs)
+        assert results[0] == results[2] == {'ok': True}
+        assert isinstance(results[1], DemistoException)
+        assert isinstance(results[3], DemistoException)
+
+        with raises(DemistoException, match='2 of 4 requests failed'):
+            self.client._http_requests(requests_kwargs, raise_on_error=True)
+
+    def test_http_requests_retries(self, requests_mock, mocker):
+        """
+            Given
+            - A base client
+
+            When
+            - Sending requests concurrently with retries for all of them, or with retries for one of them
+
+            Then
+            - Ensure the retry adapter is mounted once, before the requests are sent
+            - Ensure retries for one of the requests are rejected
+        """
+        from CommonServerPython import BaseClient
+        requests_mock.get(re.compile('http://example.com/api/v2/item/.*'), json={})
+        client = BaseClient('http://example.com/api/v2/', ok_codes=(200, 201))
+        mount = mocker.spy(client._session, 'mount')
+        requests_kwargs = [{'method': 'GET', 'url_suffix': 'item/{}'.format(i)} for i in range(10)]
+
+        assert client._http_requests(requests_kwargs, retries=3, status_list_to_retry=[503]) == [{}] * 10
+        assert mount.call_count == 2
+        assert client._session.adapters['http://'].max_retries.total == 3
+
+        with raises(ValueError, match='retries'):
+            client._http_requests(requests_kwargs + [{'method': 'GET', 'url_suffix': 'item/10', 'retries': 1}])
+        assert requests_mock.call_count == 10
+
+    def test_http_requests_max_workers_per_host(self, requests_mock):
+        """
+            Given
+            - A base client
+
+            When
+            - Sending requests concurrently to two hosts, with a limit of concurrent requests per host
+
+            Then
+            - Ensure no more requests than the limit are sent at the same time to each host
+            - Ensure the common arguments apply to all requests
+        """
+        import threading
+        import time
+        lock = threading.Lock()
+        active = {}
+        max_active = {}
+
+        def callback(request, context):
+            with lock:
+                active[request.netloc] = active.get(request.netloc, 0) + 1
+                max_active[request.netloc] = max(max_active.get(request.netloc, 0), active[request.netloc])
+            time.sleep(0.01)
+            with lock:
+                active[request.netloc] -= 1
+            return 'done'
+
+        requests_mock.get(re.compile('http://host[12].com/.*'), text=callback)
+        requests_kwargs = [{'method': 'GET', 'full_url': 'http://host{}.com/{}'.format(i % 2 + 1, i)} for i in range(20)]
+        results = self.client._http_requests(requests_kwargs, max_workers=10, max_workers_per_host=2, resp_type='text')
+        assert results == ['done'] * 20
+        assert set(max_active) == {'host1.com', 'host2.com'}
+        assert all(count <= 2 for count in max_active.values())
+
+    @pytest.fixture
+    def clock(self, mocker):
+        """ A fake clock for the rate limit, which moves forward when sleeping """
+        class Clock(object):
+            def __init__(self):
+                self.now = 1600000000.0
+                self.sleeps = []
+
+            def time(self):
+                return self.now
+
+            def sleep(self, seconds):
+                self.sleeps.append(seconds)
+                self.now += seconds
+
+        clock = Clock()
+        mocker.patch('CommonServerPython.time.time', side_effect=clock.time)
+        mocker.patch('CommonServerPython.time.sleep', side_effect=clock.sleep)
+        return clock
+
+    def test_http_request_rate_limit_retry_after(self, requests_mock, clock):
+        """
+            Given
+            - A base client which retries throttled requests
+
+            When
+            - The API throttles the first request with a Retry-After header
+
+            Then
+            - Ensure the client waits the time the API asked for and retries the request
+        """
+        from CommonServerPython import BaseClient
+        requests_mock.get('http://example.com/api/v2/event', [
+            {'status_code': 429, 'headers': {'Retry-After': '7'}},
+            {'json': {'ok': True}},
+        ])
+        client = BaseClient('http://example.com/api/v2/', rate_limit_retries=2)
+        assert client._http_request('get', 'event') == {'ok': True}
+        assert requests_mock.call_count == 2
+        assert clock.sleeps == [7]
+
+    def test_http_request_rate_limit_retries_exhausted(self, requests_mock, clock):
+        """
+            Given
+            - A base client which retries throttled requests once
+
+            When
+            - The API keeps throttling the request
+
+            Then
+            - Ensure the error is raised after the retry
+        """
+        from CommonServerPython import BaseClient, DemistoException
+        requests_mock.get('http://example.com/api/v2/event', status_code=429, headers={'Retry-After': '1'})
+        client = BaseClient('http://example.com/api/v2/', rate_limit_retries=1)
+        with raises(DemistoException, match='Error in API call \\[429\\]'):
+            client._http_request('get', 'event')
+        assert requests_mock.call_count == 2
+
+    def test_http_request_rate_limit_too_long_wait(self, requests_mock, clock):
+        """
+            Given
+            - A base client which retries throttled requests
+
+            When
+            - The API asks to wait longer than the limiter's maximum wait
+
+            Then
+            - Ensure the request is not retried
+        """
+        from CommonServerPython import BaseClient, DemistoException
+        requests_mock.get('http://example.com/api/v2/event', status_code=429, headers={'Retry-After': '3600'})
+        client = BaseClient('http://example.com/api/v2/', rate_limit_retries=3)
+        with raises(DemistoException):
+            client._http_request('get', 'event')
+        assert requests_mock.call_count == 1
+        assert clock.sleeps == []
+
+    def test_http_request_rate_limit_token_bucket(self, requests_mock, clock):
+        """
+            Given
+            - A base client limited to 2 requests per minute
+
+            When
+            - Sending 3 requests
+
+            Then
+            - Ensure the third request waits for a token
+        """
+        from CommonServerPython import BaseClient
+        requests_mock.get('http://example.com/api/v2/event', json={})
+        client = BaseClient('http://example.com/api/v2/', rate_limit=2, rate_limit_period=60)
+        client._http_request('get', 'event')
+        client._http_request('get', 'event')
+        assert clock.sleeps == []
+        clock.now += 1
+        client._http_request('get', 'event')
+        assert clock.sleeps == [29]
+
+    def test_http_request_rate_limit_reset_headers(self, requests_mock, clock):
+        """
+            Given
+            - A base client with a rate limit
+
+            When
+            - The API answers the budget is used up until an epoch reset time
+
+            Then
+            - Ensure the next request waits until the reset time
+        """
+        from CommonServerPython import BaseClient
+        requests_mock.get('http://example.com/api/v2/event', json={},
+                          headers={'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(int(clock.now) + 20)})
+        client = BaseClient('http://example.com/api/v2/', rate_limit=100)
+        client._http_request('get', 'event')
+        assert clock.sleeps == []
+        clock.now += 15
+        client._http_request('get', 'event')
+        assert clock.sleeps == [5]
+
+    def test_http_request_rate_limit_context(self, requests_mock, mocker, clock):
+        """
+            Given
+            - A base client keeping its rate limit in the integration context
+
+            When
+            - A previous run was throttled until a time in the future
+
+            Then
+            - Ensure the new run waits until that time before sending
+            - Ensure the state is saved back to the integration context
+        """
+        from CommonServerPython import BaseClient
+        blocked_until = clock.now + 10
+        mocker.patch('CommonServerPython.get_integration_context', return_value={
+            'rate_limit': json.dumps({'tokens': 1, 'updated': clock.now, 'blocked_until': blocked_until})})
+        set_context = mocker.patch('CommonServerPython.set_to_integration_context_with_retries')
+        requests_mock.get('http://example.com/api/v2/event', json={})
+        client = BaseClient('http://example.com/api/v2/', rate_limit=5, rate_limit_context_key='rate_limit')
+        client._http_request('get', 'event')
+        assert clock.sleeps == [10]
+        saved = set_context.call_args[0][0]['rate_limit']
+        assert saved['blocked_until'] == blocked_until
+        assert saved['tokens'] == 4
+
+    def test_http_requests_rate_limit_context(self, requests_mock, mocker):
+        """
+            Given
+            - A base client keeping its rate limit in the integration context
+
+            When
+            - Sending many requests concurrently, some of which are throttled
+
+            Then
+            - Ensure the integration context is loaded and saved once, from the calling thread only
+            - Ensure the saved state has the tokens taken by all the requests
+        """
+        import threading
+        from CommonServerPython import BaseClient
+        context_threads = []
+
+        def get_context():
+            context_threads.append(threading.current_thread())
+            return {}
+
+        def set_context(context, sync=True):
+            context_threads.append(threading.current_thread())
+
+        mocker.patch('CommonServerPython.get_integration_context', side_effect=get_context)
+        set_context_mock = mocker.patch('CommonServerPython.set_to_integration_context_with_retries',
+                                        side_effect=set_context)
+        requests_mock.get(re.compile('http://example.com/api/v2/item/.*'),
+                          [{'status_code': 429, 'headers': {'Retry-After': '0'}}] + [{'json': {}}] * 30)
+        client = BaseClient('http://example.com/api/v2/', rate_limit=1000, rate_limit_period=3600,
+                            rate_limit_retries=1, rate_limit_context_key='rate_limit')
+        client._http_requests([{'method': 'GET', 'url_suffix': 'item/{}'.format(i)} for i in range(20)],
+                              max_workers=5, raise_on_error=True)
+        assert context_threads == [threading.current_thread()] * 2
+        assert set_context_mock.call_count == 1
+        assert 978 <= set_context_mock.call_args[0][0]['rate_limit']['tokens'] < 980
+
     def test_is_valid_ok_codes_empty(self):
         from requests import Response
         from CommonServerPython import BaseClient
@@ -2062,14 +2607,587 @@ batch_params = [
     ([1, 2, 3], 5, [[1, 2, 3]]),
     # out of index in end with batches
     ([1, 2, 3, 4, 5], 2, [[1, 2], [3, 4], [5]]),
-    ([1] * 100, 2, [[1, 1]] * 50)
+    ([1] * 100, 2, [[1, 1]] * 50),
+    # sequences are sliced
+    ((1, 2, 3), 2, [(1, 2), (3,)]),
+    ('abcde', 2, ['ab', 'cd', 'e']),
+    # any other iterable is consumed to lists
+    ((i for i in range(5)), 2, [[0, 1], [2, 3], [4]]),
+    (iter([]), 2, []),
 ]
 
 
 @pytest.mark.parametrize('iterable, sz, expected', batch_params)
 def test_batch(iterable, sz, expected):
-    for i, item in enumerate(batch(iterable, sz)):
-        assert expected[i] == item
+    assert list(batch(iterable, sz)) == expected
+
+
+def test_batch_generator_is_consumed_lazily():
+    """
+    Given:
+        - A generator of indicators.
+    When:
+        - Taking the first batch of it.
+    Then:
+        - Only the indicators of the first batch were generated.
+    """
+    generated = []
+
+    def indicators():
+        for i in range(10):
+            generated.append(i)
+            yield i
+
+    assert next(batch(indicators(), 3)) == [0, 1, 2]
+    assert generated == [0, 1, 2]
+
+
+@pytest.mark.parametrize('parallel', [False, True])
+def test_create_indicators_in_batches(mocker, parallel):
+    """
+    Given:
+        - A generator of 4500 indicators.
+    When:
+        - Creating them in batches of 2000, generating the next batch in the same or in a background thread.
+    Then:
+        - The indicators are created in 3 batches, in order, and the throughput is logged.
+    """
+    from CommonServerPython import create_indicators_in_batches
+    mocker.patch.object(demisto, 'createIndicators')
+    mocker.patch.object(demisto, 'debug')
+    indicators = ({'value': str(i), 'type': 'IP'} for i in range(4500))
+
+    assert create_indicators_in_batches(indicators, 2000, parallel=parallel) == 4500
+
+    batches = [call[0][0] for call in demisto.createIndicators.call_args_list]
+    assert [len(b) for b in batches] == [2000, 2000, 500]
+    assert [indicator['value'] for b in batches for indicator in b] == [str(i) for i in range(4500)]
+    assert demisto.debug.call_args[0][0].startswith('Created 4500 indicators in 3 batches in ')
+
+
+@pytest.mark.parametrize('parallel', [False, True])
+def test_create_indicators_in_batches_error(mocker, parallel):
+    """
+    Given:
+        - A generator of indicators which fails after 3 indicators.
+    When:
+        - Creating them in batches of 2, generating the next batch in the same or in a background thread.
+    Then:
+        - The first batch is created, and the error of the generator is raised.
+    """
+    from CommonServerPython import create_indicators_in_batches
+    mocker.patch.object(demisto, 'createIndicators')
+
+    def indicators():
+        for i in range(3):
+            yield {'value': str(i), 'type': 'IP'}
+        raise ValueError('feed failed')
+
+    with pytest.raises(ValueError, match='feed failed'):
+        create_indicators_in_batches(indicators(), 2, parallel=parallel)
+    assert demisto.createIndicators.call_count == 1
+
+
+def test_indicators_delta(mocker):
+    """
+    Given:
+        - A feed fetched three times, where one indicator changed, one was removed and one was added after the first
+          fetch, and the full refresh interval passed before the third fetch.
+    When:
+        - Filtering the indicators with IndicatorsDelta.
+    Then:
+        - The first fetch submits all the indicators.
+        - The second fetch submits only the changed and the new indicators, and keeps the removed one as expired,
+          so it is submitted as new when it comes back.
+        - The third fetch submits all the indicators again.
+    """
+    from CommonServerPython import IndicatorsDelta
+    context = {}
+    mocker.patch('CommonServerPython.get_integration_context', side_effect=lambda: dict(context))
+    mocker.patch('CommonServerPython.set_integration_context', side_effect=context.update)
+    first = [{'value': '1.1.1.1', 'type': 'IP', 'fields': {'tags': ['a']}},
+             {'value': '2.2.2.2', 'type': 'IP', 'fields': {}},
+             {'value': '3.3.3.3', 'type': 'IP', 'fields': {}}]
+    second = [{'value': '1.1.1.1', 'type': 'IP', 'fields': {'tags': ['b']}},
+              {'value': '2.2.2.2', 'type': 'IP', 'fields': {}},
+              {'value': '4.4.4.4', 'type': 'IP', 'fields': {}}]
+
+    delta = IndicatorsDelta()
+    assert list(delta.filter(first)) == first
+    delta.save()
+
+    delta = IndicatorsDelta()
+    assert [i['value'] for i in delta.filter(second)] == ['1.1.1.1', '4.4.4.4']
+    delta.save()
+    assert IndicatorsDelta.get_expired() == ['3.3.3.3']
+    assert [i['value'] for i in IndicatorsDelta().filter(first)] == ['1.1.1.1', '3.3.3.3']
+
+    mocker.patch('CommonServerPython.time.time', return_value=time.time() + 24 * 3600)
+    delta = IndicatorsDelta()
+    assert list(delta.filter(second)) == second
+
+
+def test_indicators_delta_keep_unseen(mocker):
+    """
+    Given:
+        - A fetch which did not read part of the feed.
+    When:
+        - Saving the IndicatorsDelta with keep_unseen.
+    Then:
+        - The indicators which were not seen are not expired and are still known to the next fetch.
+    """
+    from CommonServerPython import IndicatorsDelta
+    context = {}
+    mocker.patch('CommonServerPython.get_integration_context', side_effect=lambda: dict(context))
+    mocker.patch('CommonServerPython.set_integration_context', side_effect=context.update)
+    indicators = [{'value': '1.1.1.1', 'type': 'IP'}, {'value': '2.2.2.2', 'type': 'IP'}]
+
+    delta = IndicatorsDelta()
+    list(delta.filter(indicators))
+    delta.save()
+    delta = IndicatorsDelta()
+    assert list(delta.filter(indicators[:1])) == []
+    delta.save(keep_unseen=True)
+    assert IndicatorsDelta.get_expired() == []
+
+    delta = IndicatorsDelta()
+    assert list(delta.filter(indicators)) == []
+
+
+def test_indicators_delta_keep_unseen_full_refresh(mocker):
+    """
+    Given:
+        - A full refresh in which a feed URL failed, so its indicators were not read.
+    When:
+        - Saving the IndicatorsDelta with keep_unseen, and fetching again.
+    Then:
+        - The full refresh is not complete, so the next fetch submits all the indicators, with those of the URL.
+    """
+    from CommonServerPython import IndicatorsDelta
+    context = {}
+    mocker.patch('CommonServerPython.get_integration_context', side_effect=lambda: dict(context))
+    mocker.patch('CommonServerPython.set_integration_context', side_effect=context.update)
+    indicators = [{'value': '1.1.1.1', 'type': 'IP'}, {'value': '2.2.2.2', 'type': 'IP'}]
+
+    delta = IndicatorsDelta()
+    list(delta.filter(indicators))
+    delta.save()
+    mocker.patch('CommonServerPython.time.time', return_value=time.time() + 24 * 3600)
+    delta = IndicatorsDelta()
+    assert list(delta.filter(indicators[:1])) == indicators[:1]
+    delta.save(keep_unseen=True)
+
+    delta = IndicatorsDelta()
+    assert list(delta.filter(indicators)) == indicators
+    delta.save()
+    assert list(IndicatorsDelta().filter(indicators)) == []
+
+
+def test_indicators_delta_expired(mocker):
+    """
+    Given:
+        - A feed from which values are removed and come back, with a fetch which did not read the whole feed.
+    When:
+        - Saving the IndicatorsDelta after each fetch.
+    Then:
+        - The removed values are added to the expiration list, the latest last, also after the partial fetch.
+        - The value which came back is no longer expired.
+    """
+    from CommonServerPython import IndicatorsDelta
+    context = {}
+    mocker.patch('CommonServerPython.get_integration_context', side_effect=lambda: dict(context))
+    mocker.patch('CommonServerPython.set_integration_context', side_effect=context.update)
+    indicators = [{'value': str(i), 'type': 'IP'} for i in range(4)]
+
+    def fetch(fetched, keep_unseen=False):
+        delta = IndicatorsDelta()
+        list(delta.filter(fetched))
+        delta.save(keep_unseen=keep_unseen)
+        return IndicatorsDelta.get_expired()
+
+    assert fetch(indicators) == []
+    assert fetch(indicators[:3]) == ['3']
+    assert fetch(indicators[1:2], keep_unseen=True) == ['3']
+    assert fetch(indicators[1:]) == ['0']
+    assert fetch(indicators[2:]) == ['0', '1']
+
+
+def test_indicators_delta_expired_limit(mocker):
+    """
+    Given:
+        - A feed from which more values were removed than the limit of the expiration list.
+    When:
+        - Saving the IndicatorsDelta.
+    Then:
+        - The expiration list is compressed, and keeps only the latest values up to the limit.
+    """
+    from CommonServerPython import IndicatorsDelta, STRING_TYPES
+    context = {}
+    mocker.patch('CommonServerPython.get_integration_context', side_effect=lambda: dict(context))
+    mocker.patch('CommonServerPython.set_integration_context', side_effect=context.update)
+    mocker.patch.object(IndicatorsDelta, 'MAX_EXPIRED', 3)
+
+    delta = IndicatorsDelta()
+    list(delta.filter({'value': str(i), 'type': 'IP'} for i in range(10)))
+    delta.save()
+    delta = IndicatorsDelta()
+    list(delta.filter([]))
+    delta.save()
+    assert IndicatorsDelta.get_expired() == ['7', '8', '9']
+    assert isinstance(context[IndicatorsDelta.CONTEXT_KEY]['expired'], STRING_TYPES)
+
+
+def test_indicators_delta_repeated_values(mocker):
+    """
+    Given:
+        - A feed where a value appears twice with different fields, e.g. in two of its URLs.
+    When:
+        - Filtering the same indicators in a second fetch, and then with one of the occurrences changed.
+    Then:
+        - The unchanged occurrences are not submitted again, and only the changed one is.
+    """
+    from CommonServerPython import IndicatorsDelta
+    context = {}
+    mocker.patch('CommonServerPython.get_integration_context', side_effect=lambda: dict(context))
+    mocker.patch('CommonServerPython.set_integration_context', side_effect=context.update)
+    indicators = [{'value': '1.1.1.1', 'type': 'IP', 'fields': {'tags': ['a']}},
+                  {'value': '1.1.1.1', 'type': 'IP', 'fields': {'tags': ['b']}}]
+    changed = [indicators[0], {'value': '1.1.1.1', 'type': 'IP', 'fields': {'tags': ['c']}}]
+
+    delta = IndicatorsDelta()
+    assert list(delta.filter(indicators)) == indicators
+    delta.save()
+    delta = IndicatorsDelta()
+    assert list(delta.filter(indicators)) == []
+    delta.save()
+    delta = IndicatorsDelta()
+    assert list(delta.filter(changed)) == changed[1:]
+
+
+def test_indicators_delta_limit(mocker):
+    """
+    Given:
+        - A feed with more indicators than the limit of the fingerprints.
+    When:
+        - Filtering the same indicators in a second fetch.
+    Then:
+        - Only up to the limit of the fingerprints are kept, 16 bytes each, and the rest are submitted again.
+    """
+    from CommonServerPython import IndicatorsDelta
+    context = {}
+    mocker.patch('CommonServerPython.get_integration_context', side_effect=lambda: dict(context))
+    mocker.patch('CommonServerPython.set_integration_context', side_effect=context.update)
+    mocker.patch.object(IndicatorsDelta, 'MAX_FINGERPRINTS', 3)
+    indicators = [{'value': str(i), 'type': 'IP'} for i in range(10)]
+
+    delta = IndicatorsDelta()
+    list(delta.filter(indicators))
+    delta.save()
+    assert len(base64.b64decode(context[IndicatorsDelta.CONTEXT_KEY]['digests'])) == 3 * 16
+    delta = IndicatorsDelta()
+    assert len(list(delta.filter(indicators))) == 7
+
+
+@pytest.mark.parametrize('params, supported', [({}, True), ({'feedExpirationPolicy': 'interval'}, True),
+                                               ({'feedExpirationPolicy': 'suddenDeath'}, False)])
+def test_indicators_delta_is_supported(mocker, params, supported):
+    from CommonServerPython import IndicatorsDelta
+    mocker.patch.object(demisto, 'params', return_value=params)
+    assert IndicatorsDelta.is_supported() is supported
+
+
+def test_feed_validators(mocker, requests_mock):
+    """
+    Given:
+        - A feed URL whose content does not change, and whose server answers a conditional request with 304.
+    When:
+        - Reading it with FeedValidators three times, the last one after the full refresh interval passed.
+    Then:
+        - The first read returns the content and saves its validators.
+        - The second read sends the validators and skips the URL.
+        - The third read sends no validators and returns the content again.
+        - The full refresh time is kept when a full refresh did not read all the URLs.
+    """
+    from CommonServerPython import FeedValidators
+    url = 'https://example.com/feed.txt'
+    context = {}
+    mocker.patch('CommonServerPython.get_integration_context', side_effect=lambda: copy.deepcopy(context))
+    mocker.patch('CommonServerPython.set_integration_context', side_effect=context.update)
+    requests_mock.get(url, [{'text': 'feed', 'headers': {'ETag': '"v1"'}}, {'status_code': 304}, {'text': 'feed'}])
+
+    def read(validators):
+        response = requests.get(url, headers=validators.get_conditional_headers(url), stream=True)
+        content = validators.spool_changed_content(url, response)
+        return content.read() if content else None
+
+    validators = FeedValidators()
+    assert read(validators) == b'feed'
+    validators.save()
+    last_full_refresh = context[FeedValidators.CONTEXT_KEY]['last_full_refresh']
+
+    validators = FeedValidators()
+    assert read(validators) is None
+    assert requests_mock.request_history[1].headers['If-None-Match'] == '"v1"'
+    validators.save()
+
+    mocker.patch('CommonServerPython.time.time', return_value=time.time() + 24 * 3600)
+    validators = FeedValidators()
+    assert read(validators) == b'feed'
+    assert 'If-None-Match' not in requests_mock.request_history[2].headers
+    validators.save(refreshed=False)
+    assert context[FeedValidators.CONTEXT_KEY]['last_full_refresh'] == last_full_refresh
+    assert FeedValidators().full_refresh
+
+
+@pytest.mark.parametrize('params', [{}, {'feedExpirationPolicy': 'suddenDeath'}])
+def test_fetch_feed_urls(mocker, requests_mock, params):
+    """
+    Given:
+        - Three feed URLs, the second of which fails, with or without the suddenDeath expiration policy.
+    When:
+        - Requesting them with fetch_feed_urls in debug mode.
+    Then:
+        - The URLs are requested one at a time, as the debug logger is not thread safe.
+        - The failed URL is logged and skipped, and the rest keep the order of the URLs,
+          or the fetch fails with suddenDeath, which would expire the indicators of the failed URL.
+    """
+    from CommonServerPython import BaseClient, DemistoException, fetch_feed_urls
+    import threading
+    mocker.patch('CommonServerPython.is_debug_mode', return_value=True)
+    mocker.patch.object(demisto, 'params', return_value=params)
+    mocker.patch.object(demisto, 'error')
+    lock = threading.Lock()
+    active = [0, 0]
+
+    def callback(request, context):
+        with lock:
+            active[0] += 1
+            active[1] = max(active)
+        time.sleep(0.01)
+        with lock:
+            active[0] -= 1
+        context.status_code = 500 if request.path == '/2' else 200
+        return request.path
+
+    urls = ['https://example.com/1', 'https://example.com/2', 'https://example.com/3']
+    for url in urls:
+        requests_mock.get(url, text=callback)
+    requests_kwargs = [{'full_url': url} for url in urls]
+    client = BaseClient('https://example.com')
+
+    if params:
+        with raises(DemistoException, match='500'):
+            fetch_feed_urls(client, requests_kwargs, max_workers=3, method='GET', resp_type='text')
+    else:
+        results, failed_urls = fetch_feed_urls(client, requests_kwargs, max_workers=3, method='GET', resp_type='text')
+        assert results == [(urls[0], '/1'), (urls[2], '/3')]
+        assert failed_urls == [urls[1]]
+        assert urls[1] in demisto.error.call_args[0][0]
+    assert active[1] == 1
+
+
+def test_fetch_feed_urls_environment_proxy(mocker, monkeypatch):
+    """
+    Given:
+        - A proxy in the environment, which a host is excluded from, and a client without the proxy argument.
+    When:
+        - Requesting feed URLs with fetch_feed_urls.
+    Then:
+        - The proxy of the environment is sent with the URL, and not with the excluded one.
+    """
+    from CommonServerPython import BaseClient, fetch_feed_urls
+    monkeypatch.setenv('HTTPS_PROXY', 'http://proxy.example.com:3128')
+    monkeypatch.setenv('NO_PROXY', 'internal.example.com')
+    client = BaseClient('https://example.com', proxy=False)
+    mocker.patch.object(client, '_http_requests', side_effect=lambda requests_kwargs, **kwargs: ['a', 'b'])
+    urls = ['https://example.com/feed', 'https://internal.example.com/feed']
+
+    results, _ = fetch_feed_urls(client, [{'full_url': url} for url in urls])
+
+    assert results == [(urls[0], 'a'), (urls[1], 'b')]
+    requests_kwargs = client._http_requests.call_args[0][0]
+    assert requests_kwargs[0]['proxies'].get('https') == 'http://proxy.example.com:3128'
+    assert 'https' not in requests_kwargs[1]['proxies']
+
+
+def test_iter_content_chunks():
+    """
+    Given:
+        - The content of a feed in a file.
+    When:
+        - Reading it with iter_content_chunks.
+    Then:
+        - The content is read in chunks of the given size, and the file is closed.
+    """
+    from CommonServerPython import iter_content_chunks
+    content = tempfile.TemporaryFile()
+    content.write(b'0123456789')
+    content.seek(0)
+
+    assert list(iter_content_chunks(content, chunk_size=4)) == [b'0123', b'4567', b'89']
+    assert content.closed
+
+
+def test_decode_chunks():
+    """
+    Given:
+        - UTF-8 chunks where a character is split between two chunks, an empty chunk and an invalid byte.
+    When:
+        - Decoding them with decode_chunks.
+    Then:
+        - The split character is kept whole, the invalid byte is replaced, and no empty text chunk is yielded.
+    """
+    from CommonServerPython import decode_chunks
+    data = u'ab\u00e9cd'.encode('utf-8')
+    chunks = [data[:3], b'', data[3:], b'\xff']
+
+    assert list(decode_chunks(chunks, 'utf-8')) == [u'ab', u'\u00e9cd', u'\ufffd']
+
+
+class MockIndicatorsServer(object):
+    """ A demisto.searchIndicators of a server with total indicators, which returns searchAfter cursors if set,
+    or only in its first search_after responses if it is a number """
+    def __init__(self, total, search_after=True):
+        self.total = total
+        self.search_after = search_after
+        self.calls = []
+
+    def __call__(self, query='', size=100, page=0, searchAfter=None, **kwargs):
+        self.calls.append({'size': size, 'page': page, 'searchAfter': searchAfter})
+        start = searchAfter[0] + 1 if searchAfter is not None else page * size
+        iocs = [{'value': str(i), 'indicator_type': 'IP'} for i in range(start, min(start + size, self.total))]
+        res = {'iocs': iocs, 'total': self.total}
+        if iocs and (self.search_after is True or self.search_after >= len(self.calls)):
+            res['searchAfter'] = [int(iocs[-1]['value'])]
+        return res
+
+
+@pytest.mark.parametrize('search_after', [True, False])
+def test_indicators_searcher_all_indicators(mocker, search_after):
+    """
+    Given:
+        - A server with 1M indicators, which does or does not return searchAfter cursors.
+    When:
+        - Iterating over all the indicators with IndicatorsSearcher.
+    Then:
+        - All the indicators are returned in order, a page of at most the page size at a time.
+        - The pages after the first are fetched by the cursor if the server returns one, else by their number.
+    """
+    from CommonServerPython import IndicatorsSearcher
+    server = MockIndicatorsServer(1000000, search_after=search_after)
+    mocker.patch.object(demisto, 'searchIndicators', side_effect=server)
+
+    searcher = IndicatorsSearcher(query='type:IP', page_size=5000)
+    count = 0
+    for iocs in searcher.iter_pages():
+        assert len(iocs) <= 5000
+        assert iocs[0]['value'] == str(count)
+        count += len(iocs)
+
+    assert count == searcher.fetched == searcher.total == 1000000
+    # the last page is full, so one more page is fetched to find it is the last
+    assert len(server.calls) == 201
+    assert server.calls[1] == ({'size': 5000, 'page': 0, 'searchAfter': [4999]} if search_after
+                               else {'size': 5000, 'page': 1, 'searchAfter': None})
+
+
+@pytest.mark.parametrize('search_after, expected_calls', [
+    (True, [{'size': 1000, 'page': 1, 'searchAfter': None}, {'size': 1000, 'page': 0, 'searchAfter': [1999]},
+            {'size': 500, 'page': 0, 'searchAfter': [2999]}]),
+    (False, [{'size': 1000, 'page': 1, 'searchAfter': None}, {'size': 1000, 'page': 2, 'searchAfter': None},
+             {'size': 1000, 'page': 3, 'searchAfter': None}]),
+])
+def test_indicators_searcher_limit_and_offset(mocker, search_after, expected_calls):
+    """
+    Given:
+        - A server with 1M indicators, which does or does not return searchAfter cursors.
+    When:
+        - Iterating over 2000 indicators with IndicatorsSearcher, after an offset of 1500.
+    Then:
+        - Only the indicators from the offset up to the limit are returned.
+        - The search stops at the limit, and fetches only the remaining indicators when it has a cursor.
+    """
+    from CommonServerPython import IndicatorsSearcher
+    server = MockIndicatorsServer(1000000, search_after=search_after)
+    mocker.patch.object(demisto, 'searchIndicators', side_effect=server)
+
+    values = [ioc['value'] for ioc in IndicatorsSearcher(page_size=1000, limit=2000, offset=1500)]
+
+    assert values == [str(i) for i in range(1500, 3500)]
+    assert server.calls == expected_calls
+
+
+@pytest.mark.parametrize('offset, limit, expected_call', [
+    (0, 50, {'size': 50, 'page': 0, 'searchAfter': None}),
+    (30, 50, {'size': 80, 'page': 0, 'searchAfter': None}),
+    (100, 50, {'size': 50, 'page': 2, 'searchAfter': None}),
+    (1030, 50, {'size': 1000, 'page': 1, 'searchAfter': None}),
+])
+def test_indicators_searcher_limit_smaller_than_page(mocker, offset, limit, expected_call):
+    """
+    Given:
+        - A server with 1M indicators.
+    When:
+        - Iterating over fewer indicators than the page size with IndicatorsSearcher, after an offset.
+    Then:
+        - The indicators are fetched in a single search, sized down to the limit where the page of that size
+          starts at or before the offset.
+    """
+    from CommonServerPython import IndicatorsSearcher
+    server = MockIndicatorsServer(1000000)
+    mocker.patch.object(demisto, 'searchIndicators', side_effect=server)
+
+    values = [ioc['value'] for ioc in IndicatorsSearcher(page_size=1000, limit=limit, offset=offset)]
+
+    assert values == [str(i) for i in range(offset, offset + limit)]
+    assert server.calls == [expected_call]
+
+
+@pytest.mark.parametrize('offset, limit, expected_calls', [
+    (0, None, [{'size': 1000, 'page': 0, 'searchAfter': None}, {'size': 1000, 'page': 0, 'searchAfter': [999]},
+               {'size': 1000, 'page': 2, 'searchAfter': None}, {'size': 1000, 'page': 3, 'searchAfter': None}]),
+    (1500, 2000, [{'size': 1000, 'page': 1, 'searchAfter': None}, {'size': 1000, 'page': 0, 'searchAfter': [1999]},
+                  {'size': 1000, 'page': 3, 'searchAfter': None}]),
+    (1500, 1700, [{'size': 1000, 'page': 1, 'searchAfter': None}, {'size': 1000, 'page': 0, 'searchAfter': [1999]},
+                  {'size': 1000, 'page': 3, 'searchAfter': None}]),
+])
+def test_indicators_searcher_cursor_disappears(mocker, offset, limit, expected_calls):
+    """
+    Given:
+        - A server with 3500 indicators, which returns a searchAfter cursor only in its first response.
+    When:
+        - Iterating over the indicators with IndicatorsSearcher, with and without an offset and a limit.
+    Then:
+        - Every indicator from the offset up to the limit is returned once, in order.
+        - Once the cursor disappears, the pages are fetched by number from the position of the next indicator,
+          in the full page size.
+    """
+    from CommonServerPython import IndicatorsSearcher
+    server = MockIndicatorsServer(3500, search_after=1)
+    mocker.patch.object(demisto, 'searchIndicators', side_effect=server)
+
+    values = [ioc['value'] for ioc in IndicatorsSearcher(page_size=1000, limit=limit, offset=offset)]
+
+    assert values == [str(i) for i in range(offset, 3500 if limit is None else offset + limit)]
+    assert server.calls == expected_calls
+
+
+@pytest.mark.parametrize('limit, res, expected_calls', [(0, {'iocs': [{'value': '1'}]}, 0),
+                                                        (None, {}, 1),
+                                                        (None, {'iocs': None}, 1)])
+def test_indicators_searcher_no_indicators(mocker, limit, res, expected_calls):
+    """
+    Given:
+        - A limit of 0, or a server which returns no indicators.
+    When:
+        - Iterating over the indicators with IndicatorsSearcher.
+    Then:
+        - No indicators are returned.
+    """
+    from CommonServerPython import IndicatorsSearcher
+    mocker.patch.object(demisto, 'searchIndicators', return_value=res)
+    assert list(IndicatorsSearcher(limit=limit)) == []
+    assert demisto.searchIndicators.call_count == expected_calls
 
 
 regexes_test = [
@@ -2301,6 +3419,32 @@ def test_auto_detect_indicator_type(indicator_value, indicatory_type):
                              " use a docker image with it installed such as: demisto/jmespath"
 
 
+def test_auto_detect_indicator_types(mocker):
+    """
+        Given
+            - Indicator values of all the types
+            - A Domain which is not a valid value of any other type
+
+        When
+        - Detecting the types of the indicators, in a batch and one by one.
+
+        Then
+        -  Validate the types are as expected, and that the public suffix list is parsed only once.
+    """
+    tldextract = pytest.importorskip('tldextract')
+    import CommonServerPython
+    from CommonServerPython import auto_detect_indicator_types
+    mocker.patch.object(CommonServerPython, 'TLD_EXTRACTOR', None)
+    extractor_class = mocker.patch.object(tldextract, 'TLDExtract', wraps=tldextract.TLDExtract)
+    values_and_types = INDICATOR_VALUE_AND_TYPE + [('sub.example.co.uk', 'Domain'), ('', None)]
+    values = [value for value, _ in values_and_types]
+
+    assert auto_detect_indicator_types(values) == [indicator_type for _, indicator_type in values_and_types]
+    created = extractor_class.call_count
+    assert [auto_detect_indicator_type(value) for value in values] == auto_detect_indicator_types(values)
+    assert extractor_class.call_count == created
+
+
 def test_handle_proxy(mocker):
     os.environ['REQUESTS_CA_BUNDLE'] = '/test1.pem'
     mocker.patch.object(demisto, 'params', return_value={'insecure': True})
@@ -3,13 +3,15 @@ from CommonServerPython import *
 from CommonServerUserPython import *
 
 import re
+import gevent
 from base64 import b64decode
 from multiprocessing import Process
 from gevent.pywsgi import WSGIServer
 from tempfile import NamedTemporaryFile
 from flask import Flask, Response, request
 from netaddr import IPAddress, iprange_to_cidrs
-from typing import Callable, List, Any, Dict, cast, Tuple
+from itertools import islice
+from typing import Callable, Iterator, List, Any, Dict, cast, Tuple
 from ssl import SSLContext, SSLError, PROTOCOL_TLSv1_2
 
 
@@ -21,10 +23,11 @@ class Handler:
 
 ''' GLOBAL VARIABLES '''
 INTEGRATION_NAME: str = 'EDL'
-PAGE_SIZE: int = 200
+PAGE_SIZE: int = IndicatorsSearcher.DEFAULT_PAGE_SIZE
 DEMISTO_LOGGER: Handler = Handler()
 APP: Flask = Flask('demisto-edl')
 EDL_VALUES_KEY: str = 'dmst_edl_values'
+SNAPSHOT_STORE = None  # the SnapshotStore the EDL is served from, when not updated on demand
 EDL_LIMIT_ERR_MSG: str = 'Please provide a valid integer for EDL Size'
 EDL_OFFSET_ERR_MSG: str = 'Please provide a valid integer for Starting Index'
 EDL_COLLAPSE_ERR_MSG: str = 'The Collapse parameter can only get the following: 0 - Dont Collapse, ' \
@@ -123,20 +126,48 @@ def refresh_edl_context(request_args: RequestArguments) -> str:
     Returns: List(IoCs in output format)
     """
     now = datetime.now()
+    out_dict, iocs = get_edl_values(request_args)
+    out_dict["last_run"] = date_to_timestamp(now)
+    out_dict["current_iocs"] = iocs
+    demisto.setIntegrationContext(out_dict)
+    return out_dict[EDL_VALUES_KEY]
+
+
+def render_snapshot(request_args: RequestArguments) -> Tuple[str, str]:
+    """
+    Renders the EDL for a snapshot, without saving it to the integration context
+
+    Parameters:
+        request_args: Request arguments
+
+    Returns: The IoCs in output format and their mimetype
+    """
+    out_dict, _ = get_edl_values(request_args)
+    return out_dict[EDL_VALUES_KEY], 'text/plain'
+
+
+def get_edl_values(request_args: RequestArguments) -> Tuple[dict, list]:
+    """
+    Polls the indicators of the indicator_query and formats them.
+    Formatting drops and collapses indicators, so more indicators are pulled from the same search until the formatted
+    values reach the limit, or the search ends.
+
+    Parameters:
+        request_args: Request arguments
+
+    Returns: The output values dict and the polled IoCs
+    """
     # poll indicators into edl from demisto
-    iocs = find_indicators_to_limit(request_args.query, request_args.limit, request_args.offset)
+    indicators = iter_indicators(request_args.query, request_args.offset, min(PAGE_SIZE, request_args.limit))
+    iocs: List[dict] = list(islice(indicators, request_args.limit))
     out_dict, actual_indicator_amount = create_values_for_returned_dict(iocs, request_args)
 
     while actual_indicator_amount < request_args.limit:
-        # from where to start the new poll and how many results should be fetched
-        new_offset = len(iocs) + request_args.offset + actual_indicator_amount - 1
-        new_limit = request_args.limit - actual_indicator_amount
-
-        # poll additional indicators into list from demisto
-        new_iocs = find_indicators_to_limit(request_args.query, new_limit, new_offset)
+        # poll the missing amount of indicators, from where the search stopped
+        new_iocs = list(islice(indicators, request_args.limit - actual_indicator_amount))
 
         # in case no additional indicators exist - exit
-        if len(new_iocs) == 0:
+        if not new_iocs:
             break
 
         # add the new results to the existing results
@@ -145,10 +176,7 @@ def refresh_edl_context(request_args: RequestArguments) -> str:
         # reformat the output
         out_dict, actual_indicator_amount = create_values_for_returned_dict(iocs, request_args)
 
-    out_dict["last_run"] = date_to_timestamp(now)
-    out_dict["current_iocs"] = iocs
-    demisto.setIntegrationContext(out_dict)
-    return out_dict[EDL_VALUES_KEY]
+    return out_dict, iocs
 
 
 def find_indicators_to_limit(indicator_query: str, limit: int, offset: int = 0) -> list:
@@ -164,96 +192,44 @@ def find_indicators_to_limit(indicator_query: str, limit: int, offset: int = 0)
     Returns:
         list: The IoCs list up until the amount set by 'limit'
     """
-    if offset:
-        next_page = int(offset / PAGE_SIZE)
-
-        # set the offset from the starting page
-        offset_in_page = offset - (PAGE_SIZE * next_page)
-
-    else:
-        next_page = 0
-        offset_in_page = 0
-
-    # the second returned variable is the next page - it is implemented for a future use of repolling
-    iocs, _ = find_indicators_to_limit_loop(indicator_query, limit, next_page=next_page)
-
-    # if offset in page is bigger than the amount of results returned return empty list
-    if len(iocs) <= offset_in_page:
-        return []
+    return list(islice(iter_indicators(indicator_query, offset, min(PAGE_SIZE, limit)), limit))
 
-    return iocs[offset_in_page:limit + offset_in_page]
 
-
-def find_indicators_to_limit_loop(indicator_query: str, limit: int, total_fetched: int = 0,
-                                  next_page: int = 0, last_found_len: int = PAGE_SIZE):
+def iter_indicators(indicator_query: str, offset: int = 0, page_size: int = 0) -> Iterator[dict]:
     """
-    Finds indicators using while loop with demisto.searchIndicators, and returns result and last page
+    Yields the indicators of the query using demisto.searchIndicators, a page is fetched when the previous one was
+    consumed
 
     Parameters:
         indicator_query (str): Query that determines which indicators to include in
             the EDL (Cortex XSOAR indicator query syntax)
-        limit (int): The maximum number of indicators to include in the EDL
-        total_fetched (int): The amount of indicators already fetched
-        next_page (int): The page we are up to in the loop
-        last_found_len (int): The amount of indicators found in the last fetch
+        offset (int): The starting index from which to fetch incidents
+        page_size (int): The number of indicators to fetch at a time, PAGE_SIZE if not set
 
     Returns:
-        (tuple): The iocs and the last page
-    """
-    iocs: List[dict] = []
-    if not last_found_len:
-        last_found_len = total_fetched
-    while last_found_len == PAGE_SIZE and limit and total_fetched < limit:
-        fetched_iocs = demisto.searchIndicators(query=indicator_query, page=next_page, size=PAGE_SIZE).get('iocs')
-        # In case the result from searchIndicators includes the key `iocs` but it's value is None
-        fetched_iocs = fetched_iocs or []
-        iocs.extend(fetched_iocs)
-        last_found_len = len(fetched_iocs)
-        total_fetched += last_found_len
-        next_page += 1
-    return iocs, next_page
+        iterator: The IoCs
+    """
+    searcher = IndicatorsSearcher(query=indicator_query, page_size=page_size or PAGE_SIZE, offset=offset)
+    for fetched_iocs in searcher.iter_pages():
+        yield from fetched_iocs
+        # let the server handle requests between the pages, when a snapshot is regenerated in the background
+        gevent.sleep(0)
 
 
 def ip_groups_to_cidrs(ip_range_groups: list):
     """Collapse ip groups list to CIDRs
 
     Args:
-        ip_range_groups (list): a list of lists containing connected IPs
+        ip_range_groups (list): a list of (first IP, last IP) tuples of connected IPs
 
     Returns:
         list. a list of CIDRs.
     """
     ip_ranges = []  # type:List
-    for group in ip_range_groups:
-        # handle single ips
-        if len(group) == 1:
-            ip_ranges.append(str(group[0]))
-            continue
-
-        min_ip = group[0]
-        max_ip = group[-1]
-        moved_ip = False
-        # CIDR must begin with an even LSB
-        # if the first ip does not - separate it from the rest of the range
-        if (int(str(min_ip).split('.')[-1]) % 2) != 0:
-            ip_ranges.append(str(min_ip))
-            min_ip = group[1]
-            moved_ip = True
-
-        # CIDR must end with uneven LSB
-        # if the last ip does not - separate it from the rest of the range
-        if (int(str(max_ip).split('.')[-1]) % 2) == 0:
-            ip_ranges.append(str(max_ip))
-            max_ip = group[-2]
-            moved_ip = True
-
-        # if both min and max ips were shifted and there are only 2 ips in the range
-        # we added both ips by the shift and now we move to the next  range
-        if moved_ip and len(group) == 2:
-            continue
-
-        else:
-            ip_ranges.append(str(iprange_to_cidrs(min_ip, max_ip)[0].cidr))
+    for min_ip, max_ip in ip_range_groups:
+        # the smallest list of CIDRs covering exactly the range, single ips are listed without a prefix length
+        for cidr in iprange_to_cidrs(min_ip, max_ip):
+            ip_ranges.append(str(cidr.ip) if cidr.first == cidr.last else str(cidr.cidr))
 
     return ip_ranges
 
@@ -262,20 +238,18 @@ def ip_groups_to_ranges(ip_range_groups: list):
     """Collapse ip groups list to ranges.
 
     Args:
-        ip_range_groups (list): a list of lists containing connected IPs
+        ip_range_groups (list): a list of (first IP, last IP) tuples of connected IPs
 
     Returns:
         list. a list of Ranges.
     """
     ip_ranges = []  # type:List
-    for group in ip_range_groups:
+    for min_ip, max_ip in ip_range_groups:
         # handle single ips
-        if len(group) == 1:
-            ip_ranges.append(str(group[0]))
+        if min_ip == max_ip:
+            ip_ranges.append(str(min_ip))
             continue
 
-        min_ip = group[0]
-        max_ip = group[-1]
         ip_ranges.append(str(min_ip) + "-" + str(max_ip))
 
     return ip_ranges
@@ -285,30 +259,27 @@ def ips_to_ranges(ips: list, collapse_ips):
     """Collapse IPs to Ranges or CIDRs.
 
     Args:
-        ips (list): a list of IP strings.
+        ips (list): a list of IPAddress objects of the same IP version.
         collapse_ips (str): Whether to collapse to Ranges or CIDRs.
 
     Returns:
         list. a list to Ranges or CIDRs.
     """
     ips_range_groups = []  # type:List
-    ips = sorted(ips)
-
-    if len(ips) > 0:
-        ips_range_groups.append([ips[0]])
-
-    if len(ips) > 1:
-        for ip in ips[1:]:
-            appended = False
+    if ips:
+        version = ips[0].version
+        # a single sweep over the sorted addresses, a group ends where the next address is not the one after it
+        min_ip = max_ip = None
+        for ip in sorted(set(int(ip) for ip in ips)):
+            if max_ip is not None and ip == max_ip + 1:
+                max_ip = ip
+                continue
 
-            for group in ips_range_groups:
-                if IPAddress(int(ip) + 1) in group or IPAddress(int(ip) - 1) in group:
-                    group.append(ip)
-                    sorted(group)
-                    appended = True
+            if max_ip is not None:
+                ips_range_groups.append((IPAddress(min_ip, version), IPAddress(max_ip, version)))
+            min_ip = max_ip = ip
 
-            if not appended:
-                ips_range_groups.append([ip])
+        ips_range_groups.append((IPAddress(min_ip, version), IPAddress(max_ip, version)))
 
     if collapse_ips == COLLAPSE_TO_RANGES:
         return ip_groups_to_ranges(ips_range_groups)
@@ -497,6 +468,10 @@ def route_edl_values() -> Response:
 
     request_args = get_request_args(request.args, params)
 
+    if SNAPSHOT_STORE is not None and not params.get('on_demand'):
+        snapshot = SNAPSHOT_STORE.get(request_args)
+        return serve_snapshot(snapshot)
+
     values = get_edl_ioc_values(
         on_demand=params.get('on_demand'),
         request_args=request_args,
@@ -586,6 +561,7 @@ def run_long_running(params, is_test=False):
     :param is_test: Indicates whether it's test-module run or regular run
     :return: None
     """
+    global SNAPSHOT_STORE
     certificate: str = params.get('certificate', '')
     private_key: str = params.get('key', '')
 
@@ -623,6 +599,10 @@ def run_long_running(params, is_test=False):
             time.sleep(5)
             server_process.terminate()
         else:
+            if not params.get('on_demand'):
+                # serve the EDL from snapshots, which are regenerated in the background every cache_refresh_rate
+                SNAPSHOT_STORE = SnapshotStore(render_snapshot, params.get('cache_refresh_rate'))
+                SNAPSHOT_STORE.start()
             server.serve_forever()
     except SSLError as e:
         ssl_err_message = f'Failed to validate certificate and/or private key: {str(e)}'
@@ -632,6 +612,9 @@ def run_long_running(params, is_test=False):
         demisto.error(f'An error occurred in long running loop: {str(e)}')
         raise ValueError(str(e))
     finally:
+        if SNAPSHOT_STORE is not None:
+            SNAPSHOT_STORE.stop()
+            SNAPSHOT_STORE = None
         if certificate_path:
             os.unlink(certificate_path)
         if private_key_path:
@@ -692,5 +675,7 @@ def main():
         return_error(err_msg)
 
 
+from IndicatorsSnapshotApiModule import *  # noqa: E402
+
 if __name__ in ['__main__', '__builtin__', 'builtins']:
     main()
@@ -126,7 +126,7 @@ class TestHelperFunctions:
         import EDL as edl
         with open('EDL_test/TestHelperFunctions/demisto_iocs.json', 'r') as iocs_json_f:
             iocs_json = json.loads(iocs_json_f.read())
-            mocker.patch.object(edl, 'find_indicators_to_limit', return_value=iocs_json)
+            mocker.patch.object(edl, 'iter_indicators', return_value=iter(iocs_json))
             request_args = edl.RequestArguments(query='', limit=38, url_port_stripping=True)
             edl_vals = edl.refresh_edl_context(request_args)
             for ioc in iocs_json:
@@ -142,9 +142,10 @@ class TestHelperFunctions:
         """Test find indicators limit"""
         import EDL as edl
         with open('EDL_test/TestHelperFunctions/demisto_iocs.json', 'r') as iocs_json_f:
-            iocs_json = json.loads(iocs_json_f.read())
+            iocs_dict = {'iocs': json.loads(iocs_json_f.read())}
             limit = 30
-            mocker.patch.object(edl, 'find_indicators_to_limit_loop', return_value=(iocs_json, 1))
+            mocker.patch.object(edl, 'PAGE_SIZE', 200)
+            mocker.patch.object(demisto, 'searchIndicators', return_value=iocs_dict)
             edl_vals = edl.find_indicators_to_limit(indicator_query='', limit=limit)
             assert len(edl_vals) == limit
 
@@ -153,38 +154,72 @@ class TestHelperFunctions:
         """Test find indicators limit and offset"""
         import EDL as edl
         with open('EDL_test/TestHelperFunctions/demisto_iocs.json', 'r') as iocs_json_f:
-            iocs_json = json.loads(iocs_json_f.read())
+            iocs_dict = {'iocs': json.loads(iocs_json_f.read())}
             limit = 30
             offset = 1
-            mocker.patch.object(edl, 'find_indicators_to_limit_loop', return_value=(iocs_json, 1))
+            mocker.patch.object(edl, 'PAGE_SIZE', 200)
+            mocker.patch.object(demisto, 'searchIndicators', return_value=iocs_dict)
             edl_vals = edl.find_indicators_to_limit(indicator_query='', limit=limit, offset=offset)
             assert len(edl_vals) == limit
             # check that the first value is the second on the list
             assert edl_vals[0].get('value') == '212.115.110.19'
 
-    @pytest.mark.find_indicators_to_limit_loop
-    def test_find_indicators_to_limit_loop_1(self, mocker):
+    @pytest.mark.find_indicators_to_limit
+    def test_find_indicators_to_limit_last_page(self, mocker):
         """Test find indicators stops when reached last page"""
         import EDL as edl
         with open('EDL_test/TestHelperFunctions/demisto_iocs.json', 'r') as iocs_json_f:
             iocs_dict = {'iocs': json.loads(iocs_json_f.read())}
             limit = 50
+            mocker.patch.object(edl, 'PAGE_SIZE', 200)
             mocker.patch.object(demisto, 'searchIndicators', return_value=iocs_dict)
-            edl_vals, nxt_pg = edl.find_indicators_to_limit_loop(indicator_query='', limit=limit)
-            assert nxt_pg == 1  # assert entered into loop
+            edl_vals = edl.find_indicators_to_limit(indicator_query='', limit=limit)
+            assert len(edl_vals) == len(iocs_dict['iocs'])
+            assert demisto.searchIndicators.call_count == 1
 
-    @pytest.mark.find_indicators_to_limit_loop
-    def test_find_indicators_to_limit_loop_2(self, mocker):
+    @pytest.mark.find_indicators_to_limit
+    def test_find_indicators_to_limit_reached_limit(self, mocker):
         """Test find indicators stops when reached limit"""
         import EDL as edl
         with open('EDL_test/TestHelperFunctions/demisto_iocs.json', 'r') as iocs_json_f:
             iocs_dict = {'iocs': json.loads(iocs_json_f.read())}
-            limit = 30
+            limit = 50
+            mocker.patch.object(edl, 'PAGE_SIZE', len(iocs_dict['iocs']))
             mocker.patch.object(demisto, 'searchIndicators', return_value=iocs_dict)
-            edl.PAGE_SIZE = IOC_RES_LEN
-            edl_vals, nxt_pg = edl.find_indicators_to_limit_loop(indicator_query='', limit=limit,
-                                                                 last_found_len=IOC_RES_LEN)
-            assert nxt_pg == 1  # assert entered into loop
+            edl_vals = edl.find_indicators_to_limit(indicator_query='', limit=limit)
+            assert len(edl_vals) == limit
+            assert demisto.searchIndicators.call_count == 2
+
+    @pytest.mark.parametrize('search_after', [True, False])
+    @pytest.mark.parametrize('offset', [0, 2])
+    def test_get_edl_values_dropped_indicators(self, mocker, search_after, offset):
+        """
+        Given:
+            - 30 indicators, every third of which has a port and is dropped by the formatting
+        When:
+            - getting the EDL values up to a limit of 10, from an offset
+        Then:
+            - the missing values are pulled from where the search stopped, so no indicator is skipped or repeated
+        """
+        import EDL as edl
+
+        def search_indicators(query='', size=0, page=0, searchAfter=None, **_):
+            start = searchAfter[0] + 1 if searchAfter else page * size
+            iocs = [{'value': f'{i}.example.com:8080' if i % 3 == 0 else f'{i}.example.com',
+                     'indicator_type': 'Domain'} for i in range(start, min(start + size, 30))]
+            res = {'iocs': iocs}
+            if search_after and iocs:
+                res['searchAfter'] = [start + len(iocs) - 1]
+            return res
+
+        mocker.patch.object(demisto, 'searchIndicators', side_effect=search_indicators)
+        request_args = edl.RequestArguments(query='', limit=10, offset=offset)
+
+        out_dict, iocs = edl.get_edl_values(request_args)
+
+        kept = [i for i in range(offset, 30) if i % 3][:10]
+        assert out_dict[edl.EDL_VALUES_KEY].split('\n') == [f'{i}.example.com' for i in kept]
+        assert [int(ioc['value'].split('.')[0]) for ioc in iocs] == list(range(offset, kept[-1] + 1))
 
     @pytest.mark.validate_basic_authentication
     def test_create_values_for_returned_dict(self):
@@ -272,3 +307,91 @@ class TestHelperFunctions:
         assert "1.1.1.3" not in ip_range_list
         assert "2.2.2.2" in ip_range_list
         assert "25.24.23.22" in ip_range_list
+
+    @pytest.mark.ips_to_cidrs
+    def test_ips_to_ranges_cidr_cover(self):
+        """
+        Given:
+            - a range of IPs which is not a single CIDR, with duplicated IPs
+        When:
+            - collapsing the IPs to CIDRs
+        Then:
+            - all the CIDRs covering exactly the range are returned, and not only the first one
+        """
+        from EDL import ips_to_ranges, COLLAPSE_TO_CIDR
+        ip_list = [IPAddress(f"10.0.0.{i}") for i in range(1, 11)] + [IPAddress("10.0.0.5"), IPAddress("10.0.0.12")]
+
+        ip_range_list = ips_to_ranges(ip_list, COLLAPSE_TO_CIDR)
+        assert ip_range_list == ["10.0.0.1", "10.0.0.2/31", "10.0.0.4/30", "10.0.0.8/31", "10.0.0.10", "10.0.0.12"]
+
+    @pytest.mark.ips_to_ranges
+    def test_ips_to_ranges_ipv6(self):
+        """
+        Given:
+            - IPv6 addresses, 3 of them connected
+        When:
+            - collapsing the IPs to ranges and to CIDRs
+        Then:
+            - the connected IPs are collapsed and the separated IP is kept
+        """
+        from EDL import ips_to_ranges, COLLAPSE_TO_CIDR, COLLAPSE_TO_RANGES
+        ip_list = [IPAddress("2001:db8::2"), IPAddress("2001:db8::ff"), IPAddress("2001:db8::1"), IPAddress("2001:db8::3")]
+
+        assert ips_to_ranges(ip_list, COLLAPSE_TO_RANGES) == ["2001:db8::1-2001:db8::3", "2001:db8::ff"]
+        assert ips_to_ranges(ip_list, COLLAPSE_TO_CIDR) == ["2001:db8::1", "2001:db8::2/127", "2001:db8::ff"]
+
+    def test_route_edl_values_from_snapshot(self, mocker, tmp_path):
+        """
+        Given:
+            - the EDL is served from a snapshot store, when not updated on demand
+        When:
+            - requesting the EDL twice, and with IPs collapsed to ranges
+        Then:
+            - the indicators are polled and formatted only on the first request of each options
+            - the integration context is not read or written
+        """
+        import EDL as edl
+        from IndicatorsSnapshotApiModule import SnapshotStore
+        iocs = [{'value': '1.1.1.1', 'indicator_type': 'IP'}, {'value': '1.1.1.2', 'indicator_type': 'IP'}]
+        mocker.patch.object(demisto, 'params', return_value={'indicators_query': 'type:IP', 'edl_size': '2',
+                                                             'cache_refresh_rate': '5 minutes'})
+        mocker.patch.object(demisto, 'searchIndicators', side_effect=lambda page=0, **_: {'iocs': [] if page else iocs})
+        mocker.patch.object(demisto, 'getIntegrationContext')
+        mocker.patch.object(demisto, 'setIntegrationContext')
+        mocker.patch.object(edl, 'PAGE_SIZE', 200)
+        mocker.patch.object(edl, 'SNAPSHOT_STORE', SnapshotStore(edl.render_snapshot, '5 minutes', str(tmp_path)))
+
+        with edl.APP.test_client() as client:
+            responses = [client.get('/'), client.get('/'), client.get('/?tr=1')]
+
+        assert [response.status_code for response in responses] == [200, 200, 200]
+        assert responses[0].data == responses[1].data == b'1.1.1.1\n1.1.1.2'
+        assert responses[2].data == b'1.1.1.1-1.1.1.2'
+        # collapsing the IPs to a single range re-polls for more indicators, as there are less than edl_size
+        assert demisto.searchIndicators.call_count == 3
+        assert not demisto.getIntegrationContext.called
+        assert not demisto.setIntegrationContext.called
+
+    def test_route_edl_values_not_modified(self, mocker, tmp_path):
+        """
+        Given:
+            - the EDL is served from a snapshot store
+        When:
+            - a firewall polls the EDL again with the ETag of the EDL it has
+        Then:
+            - the EDL is answered not modified, without sending it again
+        """
+        import EDL as edl
+        from IndicatorsSnapshotApiModule import SnapshotStore
+        mocker.patch.object(demisto, 'params', return_value={'indicators_query': 'type:IP', 'edl_size': '2'})
+        mocker.patch.object(edl, 'SNAPSHOT_STORE',
+                            SnapshotStore(lambda request_args: ('1.1.1.1\n2.2.2.2', 'text/plain'), directory=str(tmp_path)))
+
+        with edl.APP.test_client() as client:
+            response = client.get('/')
+            not_modified = client.get('/', headers={'If-None-Match': response.headers['ETag']})
+
+        assert response.status_code == 200
+        assert response.data == b'1.1.1.1\n2.2.2.2'
+        assert not_modified.status_code == 304
+        assert not_modified.data == b''
@@ -195,7 +195,7 @@ class TestHelperFunctions:
         import ExportIndicators as ei
         with open('ExportIndicators_test/TestHelperFunctions/demisto_iocs.json', 'r') as iocs_json_f:
             iocs_json = json.loads(iocs_json_f.read())
-            mocker.patch.object(ei, 'find_indicators_with_limit', return_value=iocs_json)
+            mocker.patch.object(ei, 'iter_indicators', return_value=iter(iocs_json))
             request_args = ei.RequestArguments(query='', out_format='text', limit=38)
             ei_vals = ei.refresh_outbound_context(request_args)
             for ioc in iocs_json:
@@ -208,7 +208,7 @@ class TestHelperFunctions:
         import ExportIndicators as ei
         with open('ExportIndicators_test/TestHelperFunctions/demisto_iocs.json', 'r') as iocs_json_f:
             iocs_json = json.loads(iocs_json_f.read())
-            mocker.patch.object(ei, 'find_indicators_with_limit', return_value=iocs_json)
+            mocker.patch.object(ei, 'iter_indicators', return_value=iter(iocs_json))
             request_args = ei.RequestArguments(query='', out_format='XSOAR json', limit=38)
             ei_vals = ei.refresh_outbound_context(request_args)
             assert isinstance(ei_vals, str)
@@ -221,7 +221,7 @@ class TestHelperFunctions:
         import ExportIndicators as ei
         with open('ExportIndicators_test/TestHelperFunctions/demisto_iocs.json', 'r') as iocs_json_f:
             iocs_json = json.loads(iocs_json_f.read())
-            mocker.patch.object(ei, 'find_indicators_with_limit', return_value=iocs_json)
+            mocker.patch.object(ei, 'iter_indicators', return_value=iter(iocs_json))
             request_args = ei.RequestArguments(query='', out_format='XSOAR csv', limit=38)
             ei_vals = ei.refresh_outbound_context(request_args)
             with open('ExportIndicators_test/TestHelperFunctions/iocs_out_csv.txt', 'r') as iocs_out_f:
@@ -235,7 +235,7 @@ class TestHelperFunctions:
         import ExportIndicators as ei
         with open('ExportIndicators_test/TestHelperFunctions/demisto_iocs.json', 'r') as iocs_json_f:
             iocs_json = json.loads(iocs_json_f.read())
-            mocker.patch.object(ei, 'find_indicators_with_limit', return_value=iocs_json)
+            mocker.patch.object(ei, 'iter_indicators', return_value=iter(iocs_json))
             request_args = ei.RequestArguments(query='', out_format='XSOAR json-seq', limit=38)
             ei_vals = ei.refresh_outbound_context(request_args)
             with open('ExportIndicators_test/TestHelperFunctions/iocs_out_json_seq.txt', 'r') as iocs_out_f:
@@ -248,7 +248,7 @@ class TestHelperFunctions:
         import ExportIndicators as ei
         with open('ExportIndicators_test/TestHelperFunctions/demisto_url_iocs.json', 'r') as iocs_json_f:
             iocs_json = json.loads(iocs_json_f.read())
-            mocker.patch.object(ei, 'find_indicators_with_limit', return_value=iocs_json)
+            mocker.patch.object(ei, 'iter_indicators', return_value=iter(iocs_json))
             request_args = ei.RequestArguments(query='', out_format='json', limit=2)
             ei_vals = ei.refresh_outbound_context(request_args)
             ei_vals = json.loads(ei_vals)
@@ -262,7 +262,7 @@ class TestHelperFunctions:
         import ExportIndicators as ei
         with open('ExportIndicators_test/TestHelperFunctions/demisto_iocs.json', 'r') as iocs_json_f:
             iocs_json = json.loads(iocs_json_f.read())
-            mocker.patch.object(ei, 'find_indicators_with_limit', return_value=iocs_json)
+            mocker.patch.object(ei, 'iter_indicators', return_value=iter(iocs_json))
             request_args = ei.RequestArguments(query='', out_format='json-seq', limit=38)
             ei_vals = ei.refresh_outbound_context(request_args)
             with open('ExportIndicators_test/TestHelperFunctions/iocs_out_json_seq_old.txt', 'r') as iocs_out_f:
@@ -276,7 +276,7 @@ class TestHelperFunctions:
         import ExportIndicators as ei
         with open('ExportIndicators_test/TestHelperFunctions/demisto_iocs.json', 'r') as iocs_json_f:
             iocs_json = json.loads(iocs_json_f.read())
-            mocker.patch.object(ei, 'find_indicators_with_limit', return_value=iocs_json)
+            mocker.patch.object(ei, 'iter_indicators', return_value=iter(iocs_json))
             request_args = ei.RequestArguments(query='', out_format='csv', limit=38)
             ei_vals = ei.refresh_outbound_context(request_args)
             with open('ExportIndicators_test/TestHelperFunctions/iocs_out_csv_old.txt', 'r') as iocs_out_f:
@@ -289,9 +289,10 @@ class TestHelperFunctions:
         """Test find indicators limit"""
         import ExportIndicators as ei
         with open('ExportIndicators_test/TestHelperFunctions/demisto_iocs.json', 'r') as iocs_json_f:
-            iocs_json = json.loads(iocs_json_f.read())
+            iocs_dict = {'iocs': json.loads(iocs_json_f.read())}
             limit = 30
-            mocker.patch.object(ei, 'find_indicators_with_limit_loop', return_value=(iocs_json, 1))
+            mocker.patch.object(ei, 'PAGE_SIZE', 200)
+            mocker.patch.object(demisto, 'searchIndicators', return_value=iocs_dict)
             ei_vals = ei.find_indicators_with_limit(indicator_query='', limit=limit, offset=0)
             assert len(ei_vals) == limit
 
@@ -300,38 +301,72 @@ class TestHelperFunctions:
         """Test find indicators limit and offset"""
         import ExportIndicators as ei
         with open('ExportIndicators_test/TestHelperFunctions/demisto_iocs.json', 'r') as iocs_json_f:
-            iocs_json = json.loads(iocs_json_f.read())
+            iocs_dict = {'iocs': json.loads(iocs_json_f.read())}
             limit = 30
             offset = 1
-            mocker.patch.object(ei, 'find_indicators_with_limit_loop', return_value=(iocs_json, 1))
+            mocker.patch.object(ei, 'PAGE_SIZE', 200)
+            mocker.patch.object(demisto, 'searchIndicators', return_value=iocs_dict)
             ei_vals = ei.find_indicators_with_limit(indicator_query='', limit=limit, offset=offset)
             assert len(ei_vals) == limit
             # check that the first value is the second on the list
             assert ei_vals[0].get('value') == '212.115.110.19'
 
-    @pytest.mark.find_indicators_with_limit_loop
-    def test_find_indicators_with_limit_loop_1(self, mocker):
+    @pytest.mark.find_indicators_with_limit
+    def test_find_indicators_with_limit_last_page(self, mocker):
         """Test find indicators stops when reached last page"""
         import ExportIndicators as ei
         with open('ExportIndicators_test/TestHelperFunctions/demisto_iocs.json', 'r') as iocs_json_f:
             iocs_dict = {'iocs': json.loads(iocs_json_f.read())}
             limit = 50
+            mocker.patch.object(ei, 'PAGE_SIZE', 200)
             mocker.patch.object(demisto, 'searchIndicators', return_value=iocs_dict)
-            ei_vals, nxt_pg = ei.find_indicators_with_limit_loop(indicator_query='', limit=limit)
-            assert nxt_pg == 1  # assert entered into loop
+            ei_vals = ei.find_indicators_with_limit(indicator_query='', limit=limit, offset=0)
+            assert len(ei_vals) == len(iocs_dict['iocs'])
+            assert demisto.searchIndicators.call_count == 1
 
-    @pytest.mark.find_indicators_with_limit_loop
-    def test_find_indicators_with_limit_loop_2(self, mocker):
+    @pytest.mark.find_indicators_with_limit
+    def test_find_indicators_with_limit_reached_limit(self, mocker):
         """Test find indicators stops when reached limit"""
         import ExportIndicators as ei
         with open('ExportIndicators_test/TestHelperFunctions/demisto_iocs.json', 'r') as iocs_json_f:
             iocs_dict = {'iocs': json.loads(iocs_json_f.read())}
-            limit = 30
+            limit = 50
+            mocker.patch.object(ei, 'PAGE_SIZE', len(iocs_dict['iocs']))
             mocker.patch.object(demisto, 'searchIndicators', return_value=iocs_dict)
-            ei.PAGE_SIZE = IOC_RES_LEN
-            ei_vals, nxt_pg = ei.find_indicators_with_limit_loop(indicator_query='', limit=limit,
-                                                                 last_found_len=IOC_RES_LEN)
-            assert nxt_pg == 1  # assert entered into loop
+            ei_vals = ei.find_indicators_with_limit(indicator_query='', limit=limit, offset=0)
+            assert len(ei_vals) == limit
+            assert demisto.searchIndicators.call_count == 2
+
+    @pytest.mark.parametrize('search_after', [True, False])
+    @pytest.mark.parametrize('offset', [0, 2])
+    def test_get_outbound_values_dropped_indicators(self, mocker, search_after, offset):
+        """
+        Given:
+            - 30 indicators, every third of which has no value and is dropped by the formatting
+        When:
+            - getting the outbound values up to a limit of 10, from an offset
+        Then:
+            - the missing values are pulled from where the search stopped, so no indicator is skipped or repeated
+        """
+        import ExportIndicators as ei
+
+        def search_indicators(query='', size=0, page=0, searchAfter=None, **_):
+            start = searchAfter[0] + 1 if searchAfter else page * size
+            iocs = [{'value': '' if i % 3 == 0 else f'{i}.example.com', 'id': i, 'indicator_type': 'Domain'}
+                    for i in range(start, min(start + size, 30))]
+            res = {'iocs': iocs}
+            if search_after and iocs:
+                res['searchAfter'] = [start + len(iocs) - 1]
+            return res
+
+        mocker.patch.object(demisto, 'searchIndicators', side_effect=search_indicators)
+        request_args = ei.RequestArguments(query='', limit=10, offset=offset)
+
+        out_dict, iocs = ei.get_outbound_values(request_args)
+
+        kept = [i for i in range(offset, 30) if i % 3][:10]
+        assert out_dict[ei.CTX_VALUES_KEY].split('\n') == [f'{i}.example.com' for i in kept]
+        assert [ioc['id'] for ioc in iocs] == list(range(offset, kept[-1] + 1))
 
     @pytest.mark.create_values_for_returned_dict
     def test_create_values_for_returned_dict_1(self):
@@ -567,8 +602,72 @@ class TestHelperFunctions:
         assert "2.2.2.2" in ip_range_list
         assert "25.24.23.22" in ip_range_list
 
+    @pytest.mark.ips_to_cidrs
+    def test_ips_to_ranges_cidr_cover(self):
+        """
+        Given:
+            - a range of IPs which is not a single CIDR, with duplicated IPs
+        When:
+            - collapsing the IPs to CIDRs
+        Then:
+            - all the CIDRs covering exactly the range are returned, and not only the first one
+        """
+        from ExportIndicators import ips_to_ranges, COLLAPSE_TO_CIDR
+        ip_list = [IPAddress(f"10.0.0.{i}") for i in range(1, 11)] + [IPAddress("10.0.0.5"), IPAddress("10.0.0.12")]
+
+        ip_range_list = ips_to_ranges(ip_list, COLLAPSE_TO_CIDR)
+        assert ip_range_list == ["10.0.0.1", "10.0.0.2/31", "10.0.0.4/30", "10.0.0.8/31", "10.0.0.10", "10.0.0.12"]
+
+    @pytest.mark.ips_to_ranges
+    def test_ips_to_ranges_ipv6(self):
+        """
+        Given:
+            - IPv6 addresses, 3 of them connected
+        When:
+            - collapsing the IPs to ranges and to CIDRs
+        Then:
+            - the connected IPs are collapsed and the separated IP is kept
+        """
+        from ExportIndicators import ips_to_ranges, COLLAPSE_TO_CIDR, COLLAPSE_TO_RANGES
+        ip_list = [IPAddress("2001:db8::2"), IPAddress("2001:db8::ff"), IPAddress("2001:db8::1"), IPAddress("2001:db8::3")]
+
+        assert ips_to_ranges(ip_list, COLLAPSE_TO_RANGES) == ["2001:db8::1-2001:db8::3", "2001:db8::ff"]
+        assert ips_to_ranges(ip_list, COLLAPSE_TO_CIDR) == ["2001:db8::1", "2001:db8::2/127", "2001:db8::ff"]
+
     def test_empty_integartion_context_mimtype(self, mocker):
         from ExportIndicators import get_outbound_mimetype
         mocker.patch.object(demisto, 'getIntegrationContext', return_value={})
         mimtype = get_outbound_mimetype()
         assert mimtype == 'text/plain'
+
+    def test_route_list_values_from_snapshot(self, mocker, tmp_path):
+        """
+        Given:
+            - the list is served from a snapshot store, when not updated on demand
+        When:
+            - requesting the list twice, and with another format
+        Then:
+            - the indicators are polled and formatted only on the first request of each format
+            - the integration context is not read or written
+        """
+        import ExportIndicators as ei
+        from IndicatorsSnapshotApiModule import SnapshotStore
+        iocs = [{'value': '1.1.1.1', 'indicator_type': 'IP'}, {'value': 'demisto.com', 'indicator_type': 'Domain'}]
+        mocker.patch.object(demisto, 'params', return_value={'indicators_query': 'type:IP', 'list_size': '2',
+                                                             'cache_refresh_rate': '5 minutes'})
+        mocker.patch.object(demisto, 'searchIndicators', return_value={'iocs': iocs})
+        mocker.patch.object(demisto, 'getIntegrationContext')
+        mocker.patch.object(demisto, 'setIntegrationContext')
+        mocker.patch.object(ei, 'PAGE_SIZE', 200)
+        mocker.patch.object(ei, 'SNAPSHOT_STORE', SnapshotStore(ei.render_snapshot, '5 minutes', str(tmp_path)))
+
+        with ei.APP.test_client() as client:
+            responses = [client.get('/'), client.get('/'), client.get('/?v=json')]
+
+        assert [response.status_code for response in responses] == [200, 200, 200]
+        assert responses[0].data == responses[1].data == b'1.1.1.1\ndemisto.com'
+        assert responses[0].mimetype == 'text/plain'
+        assert responses[2].mimetype == 'application/json'
+        assert demisto.searchIndicators.call_count == 2
+        assert not demisto.getIntegrationContext.called
+        assert not demisto.setIntegrationContext.called
@@ -14,12 +14,13 @@ import dateutil.parser
 from bs4 import BeautifulSoup
 from netaddr import IPAddress, iprange_to_cidrs, IPNetwork
 from six import string_types
-from typing import Dict, List, Optional
+from typing import Dict, Iterator, List, Optional, Set
 
 # Disable insecure warnings
 requests.packages.urllib3.disable_warnings()
 
 SOURCE_NAME = "Alien Vault OTX TAXII"
+BATCH_SIZE = 2000
 
 # disable insecure warnings
 urllib3.disable_warnings()
@@ -510,6 +511,19 @@ class Client:
         Returns:
             list. A list of XML elements (strings).
         """
+        return list(self.iter_content_blocks(collection, begin_date=begin_date))
+
+    def iter_content_blocks(self, collection, begin_date=None):
+        """Returns an iterator over the XML elements from the given collection, polling the next parts of the
+        collection only when the elements polled so far were consumed.
+
+        Args:
+            collection(str): The collection name to fetch the elements from.
+            begin_date(datetime): what is the first date to fetch indicators from.
+
+        Returns:
+            iterator. An iterator of XML elements (strings).
+        """
         if not begin_date:
             begin_date, _ = parse_date_range(demisto.params().get('initial_interval'))
 
@@ -517,7 +531,7 @@ class Client:
             begin_date = begin_date.replace(tzinfo=pytz.UTC)
 
         # bring all the indicators created from the last date until now.
-        return list(self.taxii_client.poll(collection_name=collection, begin_date=begin_date))
+        return self.taxii_client.poll(collection_name=collection, begin_date=begin_date)
 
     def decode_indicators(self, response):
         """Decode the XML response given using STIXDecode class.
@@ -600,11 +614,11 @@ def parse_indicators(sub_indicator_list, full_indicator_list, tags, tlp_color):
     Args:
         tags(list): The tags to add to the indicator.
         sub_indicator_list(list): A list of STIXDecoded indicators
-        full_indicator_list(list): A list of all the indicators fetched to this point - used to prevent duplications.
+        full_indicator_list(set): A set of all the indicators fetched to this point - used to prevent duplications.
         tlp_color(str): Traffic Light Protocol color.
 
     Returns:
-        list,list. A list of parsed indicators and an updated list of all indicators polled
+        list,set. A list of parsed indicators and an updated set of all indicators polled
     """
     parsed_indicator_list = []  # type: List
     for indicator in sub_indicator_list:
@@ -627,7 +641,7 @@ def parse_indicators(sub_indicator_list, full_indicator_list, tags, tlp_color):
 
         indicator['rawJSON'] = temp_copy
         parsed_indicator_list.append(indicator)
-        full_indicator_list.append(indicator['value'])
+        full_indicator_list.add(indicator['value'])
 
     return parsed_indicator_list, full_indicator_list
 
@@ -650,40 +664,56 @@ def fetch_indicators_command(client: Client, limit=None, begin_date=None):
 
     Args:
         client(Client): The AlienVault OTX client.
-        limit(any): How many XML elements to parse, None if all should be parsed.
+        limit(any): How many indicators to fetch, None if all should be fetched.
+        begin_date(datetime): what is the first date to fetch indicators from.
+
+    Returns:
+        list,datetime. A list of indicators and the time of the latest indicator.
+    """
+    indicator_list = list(iter_indicators(client, limit=limit, begin_date=begin_date))
+    return indicator_list, get_latest_indicator_time(indicator_list)
+
+
+def iter_indicators(client: Client, limit=None, begin_date=None) -> Iterator[Dict]:
+    """Iterates over the indicators of AlienVault OTX, polling the collections while the indicators are consumed.
+
+    Args:
+        client(Client): The AlienVault OTX client.
+        limit(any): How many indicators to fetch, None if all should be fetched.
         begin_date(datetime): what is the first date to fetch indicators from.
 
     Returns:
-        list. A list of indicators.
+        iterator. An iterator of indicators.
     """
-    indicator_list = []  # type:List
+    indicators_count = 0
     for collection in client.collections:
         try:
-            taxii_iter = client.build_iterator(collection, begin_date=begin_date)
-
+            content_blocks = client.iter_content_blocks(collection, begin_date=begin_date)
         except Exception as e:
             if not client.all_collections:
                 raise Exception(e)
-
-            else:
-                continue
-
-        only_indicator_list = []  # type:List
-        for raw_response in taxii_iter:
-            _, res = client.decode_indicators(raw_response.content)
-            # the only_indicator_list is a list containing only the indicators themselves.
-            # it is used to prevent duplicated indicators from being created in the system.
-            # this is because AlienVault OTX can return the same indicator several times from the same collection.
-            parsed_list, only_indicator_list = parse_indicators(res, only_indicator_list, client.tags, client.tlp_color)
-            indicator_list.extend(parsed_list)
-
-            if limit is not None and limit <= len(indicator_list):
-                indicator_list = indicator_list[:limit]
+            continue
+        # the only_indicator_set is a set containing only the indicators themselves.
+        # it is used to prevent duplicated indicators from being created in the system.
+        # this is because AlienVault OTX can return the same indicator several times from the same collection.
+        only_indicator_set: Set = set()
+        while True:
+            try:
+                raw_response = next(content_blocks)
+            except StopIteration:
+                break
+            except Exception as e:
+                if not client.all_collections:
+                    raise Exception(e)
                 break
 
-        latest_indicator_time = get_latest_indicator_time(indicator_list)
-
-    return indicator_list, latest_indicator_time
+            _, res = client.decode_indicators(raw_response.content)
+            parsed_list, only_indicator_set = parse_indicators(res, only_indicator_set, client.tags, client.tlp_color)
+            for indicator in parsed_list:
+                yield indicator
+                indicators_count += 1
+                if limit is not None and limit <= indicators_count:
+                    return
 
 
 def main():
@@ -713,13 +743,16 @@ def main():
             else:
                 begin_date = dateutil.parser.parse(begin_date)
 
-            indicators, latest_indicator_time = fetch_indicators_command(client, begin_date=begin_date)
-            # we submit the indicators in batches
-            if indicators:
-                # if new indicators were found - submit them in batches, set the next begin_date
-                # to the time of the last indicator found
-                for b in batch(indicators, batch_size=2000):
-                    demisto.createIndicators(b)
+            # we submit the indicators in batches while the collections are polled
+            latest_indicator_time = None
+            for b in batch(iter_indicators(client, begin_date=begin_date), BATCH_SIZE):
+                demisto.createIndicators(b)
+                batch_latest_time = get_latest_indicator_time(b)
+                if latest_indicator_time is None or batch_latest_time > latest_indicator_time:
+                    latest_indicator_time = batch_latest_time
+
+            if latest_indicator_time is not None:
+                # if new indicators were found - set the next begin_date to the time of the last indicator found
                 demisto.setIntegrationContext({"begin_date": str(latest_indicator_time)})
 
             else:
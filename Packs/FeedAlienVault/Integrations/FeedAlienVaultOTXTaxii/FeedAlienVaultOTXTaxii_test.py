@@ -1,7 +1,7 @@
 import copy
 from dateutil.parser import parse
 
-from FeedAlienVaultOTXTaxii import parse_indicators, get_latest_indicator_time
+from FeedAlienVaultOTXTaxii import Client, iter_indicators, parse_indicators, get_latest_indicator_time
 
 TEST_DATA = [
     {
@@ -134,16 +134,16 @@ RESULT_PARSED_INDICATORS = [
                             'firstseenbysource': '2020-02-23T12:03:31Z'
                             }}}]
 
-RESULT_ONLY_INDICATORS_LIST = ['http://demsito.demisto.com/',
-                               '39eb39ad9fad2710be03c18de6985c20', 'demisto.com', '1.2.3.4', '1.2.3.4/24']
+RESULT_ONLY_INDICATORS_SET = {'http://demsito.demisto.com/',
+                              '39eb39ad9fad2710be03c18de6985c20', 'demisto.com', '1.2.3.4', '1.2.3.4/24'}
 
 
 def test_parse_indicators():
     # parse_indicators is deleting the indicator key, so deep copying the test data
     test_data = copy.deepcopy(TEST_DATA)
-    parsed_list, only_indicator_list = parse_indicators(test_data, [], tags=['tag1', 'tag2'], tlp_color=None)
+    parsed_list, only_indicator_list = parse_indicators(test_data, set(), tags=['tag1', 'tag2'], tlp_color=None)
     assert parsed_list == RESULT_PARSED_INDICATORS
-    assert only_indicator_list == RESULT_ONLY_INDICATORS_LIST
+    assert only_indicator_list == RESULT_ONLY_INDICATORS_SET
 
 
 def test_parse_indicators_with_tlp():
@@ -153,9 +153,9 @@ def test_parse_indicators_with_tlp():
 
     # parse_indicators is deleting the indicator key, so deep copying the test data
     test_data = copy.deepcopy(TEST_DATA)
-    parsed_list, only_indicator_list = parse_indicators(test_data, [], tags=['tag1', 'tag2'], tlp_color='RED')
+    parsed_list, only_indicator_list = parse_indicators(test_data, set(), tags=['tag1', 'tag2'], tlp_color='RED')
     assert parsed_list == RESULT_PARSED_INDICATORS
-    assert only_indicator_list == RESULT_ONLY_INDICATORS_LIST
+    assert only_indicator_list == RESULT_ONLY_INDICATORS_SET
 
 
 def test_get_latest_indicator_time():
@@ -166,3 +166,91 @@ def test_get_latest_indicator_time():
     ]
 
     assert get_latest_indicator_time(indicators_list) == parse('2020-02-23T13:13:31Z')
+
+
+class MockContentBlock:
+    def __init__(self, content):
+        self.content = content
+
+
+def mock_content_blocks(polled, blocks_count, fail_after=None):
+    def iter_content_blocks(collection, begin_date=None):
+        for i in range(blocks_count):
+            if i == fail_after:
+                raise Exception('connection reset')
+            polled.append((collection, i))
+            # every content block repeats an indicator of the block before it
+            yield MockContentBlock([{'indicator': f'{collection}{j}.com', 'stix_package_short_description': '',
+                                     'added_time': '2020-02-23T12:03:31Z'} for j in range(i, i + 3)])
+    return iter_content_blocks
+
+
+def test_iter_indicators_limit_stops_polling(mocker):
+    """
+    Given:
+        - 2 collections, each with 10 content blocks of 3 indicators, 2 of them already seen in the block before
+    When:
+        - iterating over 5 indicators
+    Then:
+        - the duplicated indicators are skipped
+        - only the content blocks needed for 5 indicators are polled
+    """
+    client = Client('api_key', 'c1,c2', tags=[])
+    polled = []  # type: list
+    mocker.patch.object(client, 'iter_content_blocks', side_effect=mock_content_blocks(polled, 10))
+    mocker.patch.object(client, 'decode_indicators', side_effect=lambda content: (None, content))
+
+    indicators = list(iter_indicators(client, limit=5))
+
+    assert [indicator['value'] for indicator in indicators] == ['c10.com', 'c11.com', 'c12.com', 'c13.com', 'c14.com']
+    assert polled == [('c1', 0), ('c1', 1), ('c1', 2)]
+
+
+def test_iter_indicators_all_collections_skips_failed_collection(mocker):
+    """
+    Given:
+        - all_collections is checked, and polling the first collection fails after its first content block
+    When:
+        - iterating over all the indicators
+    Then:
+        - the indicators of the first content block are kept, and the next collection is polled
+    """
+    client = Client('api_key', 'c1,c2', tags=[])
+    client.all_collections = True
+    polled = []  # type: list
+    mocker.patch.object(client, 'iter_content_blocks', side_effect=mock_content_blocks(polled, 2, fail_after=1))
+    mocker.patch.object(client, 'decode_indicators', side_effect=lambda content: (None, content))
+
+    indicators = list(iter_indicators(client))
+
+    assert [indicator['value'] for indicator in indicators] == ['c10.com', 'c11.com', 'c12.com',
+                                                                'c20.com', 'c21.com', 'c22.com']
+
+
+def test_iter_indicators_all_collections_skips_collection_failing_setup(mocker):
+    """
+    Given:
+        - all_collections is checked, and setting up the polling of the first collection fails,
+          e.g. on a bad initial interval
+    When:
+        - iterating over all the indicators
+    Then:
+        - the first collection is skipped, and the next collection is polled
+    """
+    client = Client('api_key', 'c1,c2', tags=[])
+    client.all_collections = True
+    polled = []  # type: list
+    content_blocks = mock_content_blocks(polled, 1)
+
+    def iter_content_blocks(collection, begin_date=None):
+        if collection == 'c1':
+            raise ValueError('bad date range')
+        return content_blocks(collection, begin_date)
+
+    mocker.patch.object(client, 'iter_content_blocks', side_effect=iter_content_blocks)
+    mocker.patch.object(client, 'decode_indicators', side_effect=lambda content: (None, content))
+
+    indicators = list(iter_indicators(client))
+
+    assert [indicator['value'] for indicator in indicators] == ['c20.com', 'c21.com', 'c22.com']
+    assert polled == [('c2', 0)]
@@ -2,7 +2,7 @@ import demistomock as demisto
 from CommonServerPython import *
 from CommonServerUserPython import *
 
-from typing import Any, Tuple, Optional
+from typing import Any, Tuple, Optional, Iterator
 
 """ CONSTANT VARIABLES """
 
@@ -62,6 +62,31 @@ def fetch_indicators_command(
     :param filter_args: filter args requested by the user
     :return: indicators in cortex TIM format
     """
+    indicators = list(iter_fetched_indicators(
+        client, initial_interval, limit, last_run_ctx, fetch_full_feed, filter_args
+    ))
+    return indicators, last_run_ctx
+
+
+def iter_fetched_indicators(
+    client,
+    initial_interval,
+    limit,
+    last_run_ctx,
+    fetch_full_feed: bool = False,
+    filter_args: Optional[dict] = None,
+) -> Iterator[dict]:
+    """
+    Yields the indicators fetched from TAXII 2 server while the collections are polled,
+    and updates last_run_ctx once each collection was fetched
+    :param client: Taxii2FeedClient
+    :param initial_interval: initial interval in parse_date_range format
+    :param limit: upper limit of indicators to fetch
+    :param last_run_ctx: last run dict with {collection_id: last_run_time string}
+    :param fetch_full_feed: when set to true, will ignore last run, and try to fetch the entire feed
+    :param filter_args: filter args requested by the user
+    :return: indicators in cortex TIM format
+    """
     if initial_interval:
         initial_interval, _ = parse_date_range(
             initial_interval, date_format=TAXII_TIME_FORMAT
@@ -81,28 +106,28 @@ def fetch_indicators_command(
         # fetch all collections
         if client.collections is None:
             raise DemistoException(ERR_NO_COLL)
-        indicators: list = []
         for collection in client.collections:
             client.collection_to_fetch = collection
             filter_args["added_after"] = get_added_after(
                 fetch_full_feed, initial_interval, last_run_ctx.get(collection.id)
             )
-            fetched_iocs = client.build_iterator(limit, **filter_args)
-            indicators.extend(fetched_iocs)
+            fetched_iocs_cnt = 0
+            for indicator in client.iter_indicators(limit, **filter_args):
+                yield indicator
+                fetched_iocs_cnt += 1
             if limit >= 0:
-                limit -= len(fetched_iocs)
+                limit -= fetched_iocs_cnt
                 if limit <= 0:
                     break
             last_run_ctx[collection.id] = client.last_fetched_indicator__modified
     else:
         # fetch from a single collection
-        indicators = client.build_iterator(limit, **filter_args)
+        yield from client.iter_indicators(limit, **filter_args)
         last_run_ctx[client.collection_to_fetch.id] = (
             client.last_fetched_indicator__modified
             if client.last_fetched_indicator__modified
             else filter_args.get("added_after")
         )
-    return indicators, last_run_ctx
 
 
 def get_added_after(
@@ -282,7 +307,7 @@ def main():
             if fetch_full_feed:
                 limit = -1
             integration_ctx = demisto.getIntegrationContext() or {}
-            (indicators, integration_ctx) = fetch_indicators_command(
+            indicators = iter_fetched_indicators(
                 client,
                 initial_interval,
                 limit,
@@ -290,8 +315,9 @@ def main():
                 fetch_full_feed,
                 filter_args,
             )
-            for iter_ in batch(indicators, batch_size=2000):
-                demisto.createIndicators(iter_)
+            # the indicators are submitted in batches while the collections are polled,
+            # integration_ctx is updated once all of them were submitted
+            create_indicators_in_batches(indicators, BATCH_SIZE)
 
             demisto.setIntegrationContext(integration_ctx)
         else:
@@ -2,8 +2,6 @@ import json
 import pytest
 from FeedTAXII2 import *
 
-with open('test_data/results.json', 'r') as f:
-    RESULTS_JSON = json.load(f)
 with open('test_data/cortex_indicators_1.json', 'r') as f:
     CORTEX_IOCS_1 = json.load(f)
 with open('test_data/cortex_indicators_1.json', 'r') as f:
@@ -42,9 +40,9 @@ class TestFetchIndicators:
         mock_client.collections = [MockCollection(default_id, 'default'), MockCollection(nondefault_id, 'not_default')]
 
         mock_client.collection_to_fetch = mock_client.collections[0]
-        mocker.patch.object(mock_client, 'build_iterator', return_value=RESULTS_JSON)
+        mocker.patch.object(mock_client, 'iter_indicators', return_value=iter(CORTEX_IOCS_1))
         indicators, last_run = fetch_indicators_command(mock_client, '1 day', -1, {})
-        assert indicators == RESULTS_JSON
+        assert indicators == CORTEX_IOCS_1
         assert mock_client.collection_to_fetch.id in last_run
 
     def test_single_with_context(self, mocker):
@@ -71,9 +69,9 @@ class TestFetchIndicators:
 
         mock_client.collection_to_fetch = mock_client.collections[0]
         last_run = {mock_client.collections[1]: 'test'}
-        mocker.patch.object(mock_client, 'build_iterator', return_value=RESULTS_JSON)
+        mocker.patch.object(mock_client, 'iter_indicators', return_value=iter(CORTEX_IOCS_1))
         indicators, last_run = fetch_indicators_command(mock_client, '1 day', -1, last_run)
-        assert indicators == RESULTS_JSON
+        assert indicators == CORTEX_IOCS_1
         assert mock_client.collection_to_fetch.id in last_run
         assert last_run.get(mock_client.collections[1]) == 'test'
 
@@ -99,7 +97,7 @@ class TestFetchIndicators:
         nondefault_id = 2
         mock_client.collections = [MockCollection(default_id, 'default'), MockCollection(nondefault_id, 'not_default')]
 
-        mocker.patch.object(mock_client, 'build_iterator', side_effect=[CORTEX_IOCS_1, CORTEX_IOCS_2])
+        mocker.patch.object(mock_client, 'iter_indicators', side_effect=[CORTEX_IOCS_1, CORTEX_IOCS_2])
         indicators, last_run = fetch_indicators_command(mock_client, '1 day', -1, {})
         assert len(indicators) == 14
         assert mock_client.collection_to_fetch.id in last_run
@@ -127,11 +125,48 @@ class TestFetchIndicators:
         mock_client.collections = [MockCollection(id_1, 'a'), MockCollection(id_2, 'b')]
 
         last_run = {mock_client.collections[1]: 'test'}
-        mocker.patch.object(mock_client, 'build_iterator', side_effect=[CORTEX_IOCS_1, CORTEX_IOCS_2])
+        mocker.patch.object(mock_client, 'iter_indicators', side_effect=[CORTEX_IOCS_1, CORTEX_IOCS_2])
         indicators, last_run = fetch_indicators_command(mock_client, '1 day', len(CORTEX_IOCS_1), last_run)
         assert len(indicators) == len(CORTEX_IOCS_1)
         assert last_run.get(mock_client.collections[1]) == 'test'
 
+    def test_main_fetch_in_batches(self, mocker):
+        """
+        Scenario: Test fetch-indicators streams the indicators into batches
+
+        Given:
+        - collection to fetch is set to 'default', with 2500 indicators
+
+        When:
+        - fetch-indicators is called
+
+        Then:
+        - create the indicators in batches of 2000
+        - update last run only after the indicators were created
+        """
+        def iter_indicators(client, limit, **kwargs):
+            for i in range(2500):
+                yield {'value': f'1.1.{i // 256}.{i % 256}', 'type': 'IP'}
+            client.last_fetched_indicator__modified = '2020-06-10T01:14:33.126Z'
+
+        mocker.patch.object(demisto, 'params', return_value={'url': 'https://example.com/taxii/',
+                                                             'collection_to_fetch': 'default'})
+        mocker.patch.object(demisto, 'command', return_value='fetch-indicators')
+        mocker.patch.object(demisto, 'getIntegrationContext', return_value={})
+        mocker.patch.object(demisto, 'setIntegrationContext')
+        mocker.patch.object(demisto, 'createIndicators')
+
+        def initialise(client):
+            client.collection_to_fetch = MockCollection(1, 'default')
+
+        mocker.patch.object(Taxii2FeedClient, 'initialise', initialise)
+        mocker.patch.object(Taxii2FeedClient, 'iter_indicators', iter_indicators)
+
+        main()
+
+        assert [len(call[0][0]) for call in demisto.createIndicators.call_args_list] == [2000, 500]
+        demisto.setIntegrationContext.assert_called_once_with({1: '2020-06-10T01:14:33.126Z'})
+
 
 class TestHelperFunctions:
     def test_try_parse_integer(self):
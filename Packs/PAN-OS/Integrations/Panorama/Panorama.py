@@ -105,7 +105,7 @@ def http_request(uri: str, method: str, headers: dict = {},
     if is_pcap:
         return result
 
-    json_result = json.loads(xml2json(result.text))
+    json_result = xml2dict(result.text)
 
     # handle raw response that doe not contain the response key, e.g xonfiguration export
     if 'response' not in json_result or '@code' not in json_result['response']:
@@ -3079,7 +3079,7 @@ def panorama_list_pcaps_command(args: dict):
         raise Exception('can not provide dlp-pcap without password')
 
     result = http_request(URL, 'GET', params=params, is_pcap=True)
-    json_result = json.loads(xml2json(result.text))['response']
+    json_result = xml2dict(result.text)['response']
     if json_result['@status'] != 'success':
         raise Exception('Request to get list of Pcaps Failed.\nStatus code: ' + str(
             json_result['response']['@code']) + '\nWith message: ' + str(json_result['response']['msg']['line']))
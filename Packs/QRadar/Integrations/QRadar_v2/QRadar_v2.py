@@ -1960,17 +1960,19 @@ def get_indicators_list(indicator_query, limit, page):
 
         Args:
               indicator_query (str): The query demisto.searchIndicators use to find indicators
-              limit (int): The amount of indicators the user want to add to reference set
-              page (int): Page's number the user would like to start from
+              limit (int or str): The amount of indicators the user want to add to reference set
+              page (int or str): Page's number the user would like to start from
         Returns:
              list, list: List of indicators values and a list with all indicators data
     """
+    # the arguments of the command are strings
+    limit = int(limit)
+    page = int(page)
     indicators_values_list = []
     indicators_data_list = []
-    fetched_iocs = demisto.searchIndicators(
-        query=indicator_query, page=page, size=limit
-    ).get("iocs")
-    for indicator in fetched_iocs:
+    # the page is of the size of the limit, fetched in a single search
+    searcher = IndicatorsSearcher(query=indicator_query, page_size=limit, limit=limit, offset=page * limit)
+    for indicator in searcher:
         indicators_values_list.append(indicator["value"])
         indicators_data_list.append(
             {"Value": indicator["value"], "Type": indicator["indicator_type"]}
@@ -474,6 +474,31 @@ def test_get_mapping_fields(mocker):
     assert response['Events: Custom Fields']['events']['bloop'] == 'string'
 
 
+def test_get_indicators_list(mocker):
+    """Check the indicators of the requested page are returned
+
+    Given:
+    - 5 indicators of the query
+
+    When:
+    - Getting the indicators list with a limit of 2 and page 1, given as strings like the command arguments
+
+    Then:
+    - Validate the 3rd and 4th indicators are returned, in a single search of the size of the limit
+    """
+    from QRadar_v2 import get_indicators_list
+    iocs = [{'value': '1.1.1.{}'.format(i), 'indicator_type': 'IP'} for i in range(5)]
+
+    def search_indicators(query='', size=100, page=0, **kwargs):
+        return {'iocs': iocs[page * size:(page + 1) * size], 'total': len(iocs)}
+
+    mocker.patch.object(demisto, 'searchIndicators', side_effect=search_indicators)
+    values, data = get_indicators_list('type:IP', '2', '1')
+    assert values == ['1.1.1.2', '1.1.1.3']
+    assert data == [{'Value': '1.1.1.2', 'Type': 'IP'}, {'Value': '1.1.1.3', 'Type': 'IP'}]
+    assert demisto.searchIndicators.call_args_list == [mocker.call(query='type:IP', size=2, page=1)]
+
+
 class TestGetCustomProperties:
     error = 'Can\'t send the `filter` argument with `field_name` or `like_name`'
     client = QRadarClient("https://example.com", {}, {"identifier": "*", "password": "*"})
@@ -5,7 +5,7 @@ from gevent.pywsgi import WSGIServer
 from urllib.parse import urlparse, ParseResult
 from tempfile import NamedTemporaryFile
 from base64 import b64decode
-from typing import Callable, List, Generator
+from typing import Callable, Iterator, List, Generator
 from ssl import SSLContext, SSLError, PROTOCOL_TLSv1_2
 from multiprocessing import Process
 
@@ -54,7 +54,7 @@ import pytz
 
 ''' GLOBAL VARIABLES '''
 INTEGRATION_NAME: str = 'TAXII Server'
-PAGE_SIZE = 200
+PAGE_SIZE = IndicatorsSearcher.DEFAULT_PAGE_SIZE
 APP: Flask = Flask('demisto-taxii')
 NAMESPACE_URI = 'https://www.paloaltonetworks.com/cortex'
 NAMESPACE = 'cortex'
@@ -719,7 +719,8 @@ def get_collections(params: dict = demisto.params()) -> dict:
     return collections
 
 
-def find_indicators_by_time_frame(indicator_query: str, begin_time: datetime, end_time: datetime) -> list:
+def find_indicators_by_time_frame(indicator_query: str, begin_time: datetime,
+                                  end_time: datetime) -> Iterator[dict]:
     """
     Find indicators according to a query and begin time/end time.
     Args:
@@ -749,26 +750,16 @@ def find_indicators_by_time_frame(indicator_query: str, begin_time: datetime, en
     return find_indicators_loop(indicator_query)
 
 
-def find_indicators_loop(indicator_query: str):
+def find_indicators_loop(indicator_query: str) -> Iterator[dict]:
     """
-    Find indicators in a loop according to a query.
+    Find indicators in a loop according to a query, fetching them a page at a time.
     Args:
         indicator_query: The indicator query.
 
     Returns:
         Indicator query results from Demisto.
     """
-    iocs: List[dict] = []
-    total_fetched = 0
-    next_page = 0
-    last_found_len = PAGE_SIZE
-    while last_found_len == PAGE_SIZE:
-        fetched_iocs = demisto.searchIndicators(query=indicator_query, page=next_page, size=PAGE_SIZE).get('iocs')
-        iocs.extend(fetched_iocs)
-        last_found_len = len(fetched_iocs)
-        total_fetched += last_found_len
-        next_page += 1
-    return iocs
+    return iter(IndicatorsSearcher(query=indicator_query, page_size=PAGE_SIZE))
 
 
 def taxii_make_response(taxii_message: TAXIIMessage):
@@ -412,7 +412,7 @@ def test_find_indicators_loop(mocker):
     mocker.patch.object(demisto, 'searchIndicators', return_value=json.loads(IP_INDICATORS))
 
     # Arrange
-    indicators = find_indicators_loop('q')
+    indicators = list(find_indicators_loop('q'))
 
     # Assert
     assert len(indicators) == 1
@@ -1,13 +1,23 @@
+import __future__
+import copy
 import os
 import threading
 import sys
+import time
 import json
+import hashlib
 import traceback
+import types
+from collections import OrderedDict
 
 if sys.version_info[0] < 3:
     import Queue as queue
+    import __builtin__ as builtins_module
+    CLASS_TYPES = (type, types.ClassType)
 else:
     import queue
+    import builtins as builtins_module
+    CLASS_TYPES = (type,)
 
 __read_thread = None
 __input_queue = None
@@ -46,6 +56,304 @@ def __readWhileAvailable():
         return buff
 
 
+class CodeCache(object):
+    """Bounded LRU cache of compiled code objects, keyed by the sha256 of their source.
+
+    The server sends the whole script (CommonServerPython included) on every execution, so the same source is
+    usually compiled over and over by a long living container. Entries are evicted once either the number of
+    entries or the total size of the cached sources exceeds its limit. The most recent entry is always kept.
+    """
+
+    def __init__(self, max_entries=32, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = 0
+        self._entries = OrderedDict()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def size(self):
+        return self._size
+
+    @staticmethod
+    def _key(source, filename, flags):
+        if not isinstance(source, bytes):
+            source = source.encode('utf-8')
+        return filename, flags, hashlib.sha256(source).hexdigest()
+
+    def compile(self, source, filename='<string>', flags=0):
+        """ Return the code object of the source, compiling it only if it is not cached already """
+        if self.max_entries <= 0:
+            return compile(source, filename, 'exec', flags)
+
+        key = self._key(source, filename, flags)
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            self.misses += 1
+            entry = (compile(source, filename, 'exec', flags), len(source))
+            self._size += entry[1]
+        else:
+            self.hits += 1
+        self._entries[key] = entry
+
+        while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._size > self.max_bytes):
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._size -= evicted_size
+
+        return entry[0]
+
+    def clear(self):
+        self._entries.clear()
+        self._size = 0
+
+
+def _int_env(name, default):
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def _bool_env(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.lower() in ('true', 'yes', '1')
+
+
+# compiled code is cached across executions in the same container.
+# set DEMISTO_LOOP_CODE_CACHE_ENTRIES=0 in the docker env to disable the cache
+code_cache = CodeCache(
+    max_entries=_int_env('DEMISTO_LOOP_CODE_CACHE_ENTRIES', 32),
+    max_bytes=_int_env('DEMISTO_LOOP_CODE_CACHE_MB', 64) * 1024 * 1024
+)
+
+
+class JSONCodec(object):
+    """The JSON encoder and decoder of the wire protocol, using the json module of the standard library.
+
+    Faster codecs may format their output differently, and fall back to the standard library for the values they
+    can detect they handle differently. Those they cannot detect without walking the whole message are documented
+    on the codec, set DEMISTO_LOOP_JSON_CODEC=json in the docker env to avoid them.
+    """
+    name = 'json'
+
+    def dumps(self, obj):
+        return json.dumps(obj)
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class UjsonCodec(JSONCodec):
+    """Encodes and decodes with ujson.
+
+    ujson serializes some objects the standard library rejects with a TypeError: Decimal (as a float), dict keys of
+    any type (as their str(), e.g. a tuple key), and objects with a __json__ or toDict method (as what they return).
+    A script which returns them gets them serialized, where with the standard library it fails.
+
+    ujson 1.x truncates floats to a few decimals by default (double_precision), and to no more than 15 when asked,
+    while the later versions removed the argument and write the shortest repr of a float, like the standard library.
+    A ujson which does not round trip floats is not used.
+    """
+    name = 'ujson'
+    FLOAT_PROBE = 0.1 + 0.2
+
+    def __init__(self):
+        import ujson
+        if ujson.loads(ujson.dumps(self.FLOAT_PROBE)) != self.FLOAT_PROBE:
+            raise ImportError('ujson {} truncates floats'.format(getattr(ujson, '__version__', '')))
+        self.ujson = ujson
+
+    def dumps(self, obj):
+        try:
+            return self.ujson.dumps(obj, ensure_ascii=True, escape_forward_slashes=False)
+        except (TypeError, OverflowError):
+            return json.dumps(obj)
+
+    def loads(self, data):
+        try:
+            return self.ujson.loads(data)
+        except ValueError:
+            # e.g. NaN, which the standard library accepts
+            return json.loads(data)
+
+
+class OrjsonCodec(JSONCodec):
+    """Encodes with orjson, decodes with the standard library.
+
+    orjson parses integers beyond 64 bit as floats, and detecting them in the data costs more than the parsing
+    time orjson saves, so loads() is left to the standard library. The messages the loop decodes are mostly small
+    anyway, while the results it encodes can be large.
+
+    orjson writes NaN and infinite floats as null, where the standard library writes the NaN, Infinity and
+    -Infinity literals, which are not valid JSON.
+
+    orjson serializes some objects the standard library rejects with a TypeError: UUID and Enum values, and date,
+    time, datetime, UUID and Enum dict keys (as their isoformat, str or value). datetime and dataclass values, and
+    subclasses of builtin types, are passed through to the standard library, which rejects or serializes them.
+    """
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self.orjson = orjson
+        # datetime and dataclass values and subclasses of builtin types are passed to _default(), which makes dumps()
+        # fall back to the standard library
+        self.options = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+                        | orjson.OPT_PASSTHROUGH_SUBCLASS)
+
+    @staticmethod
+    def _default(obj):
+        raise TypeError('{!r} is not JSON serializable'.format(obj))
+
+    def dumps(self, obj):
+        try:
+            # the protocol is ascii only, like json.dumps with ensure_ascii, while orjson always writes utf-8
+            return self.orjson.dumps(obj, default=self._default, option=self.options).decode('ascii')
+        except (TypeError, UnicodeDecodeError):
+            # e.g. integers larger than 64 bit or non ascii text
+            return json.dumps(obj)
+
+
+def get_json_codec(name=None):
+    """ Return the codec of the given name, or the fastest one available in the docker image """
+    codecs = (UjsonCodec, OrjsonCodec, JSONCodec)
+    if name:
+        codecs = tuple(c for c in codecs if c.name == name)
+    for codec in codecs:
+        try:
+            return codec()
+        except ImportError:
+            pass
+    return JSONCodec()
+
+
+# set DEMISTO_LOOP_JSON_CODEC=json in the docker env to use the standard library only
+json_codec = get_json_codec(os.environ.get('DEMISTO_LOOP_JSON_CODEC'))
+
+
+class Protocol(object):
+    """Sends the messages of the running script to the server over stdout, and reads the server replies from stdin.
+
+    In batch mode, fire-and-forget messages (entry logs, results and server logs) are coalesced and written in a
+    single write, flushed once max_records or max_bytes are reached, once max_delay seconds passed since the first
+    pending message, before any blocking request, and when the script completes. The server still replies to each
+    server log (`demisto.info/debug/error`), the replies are read when the batch is flushed instead of one round
+    trip per message. max_records bounds the number of unread replies, so the server never blocks writing them.
+
+    max_delay is enforced by a timer thread, so the messages of a script which then computes for a while without
+    sending more are not held back. The writes and reads of the protocol are serialized by a lock, and an error
+    reply read by the timer is raised by the next call of the script.
+    """
+
+    def __init__(self, batch=False, max_records=100, max_bytes=64 * 1024, max_delay=1.0, codec=None):
+        self.batch = batch
+        self.codec = codec or JSONCodec()
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self._pending = []
+        self._pending_bytes = 0
+        self._pending_replies = 0
+        self._first_pending_time = None
+        self._lock = threading.RLock()
+        self._timer = None
+        self._timer_error = None
+
+    def _read_reply(self):
+        data = globals()['__readWhileAvailable']()
+        if data.find('$$##') > -1:
+            raise ValueError(data[4:])
+        return self.codec.loads(data)
+
+    @staticmethod
+    def _write(data):
+        sys.stdout.write(data)
+        sys.stdout.flush()
+
+    def send(self, message, expects_reply=False):
+        """ Send a message without waiting for the server. The reply to it, if there is one, is discarded """
+        line = self.codec.dumps(message) + '\n'
+        with self._lock:
+            if not self.batch:
+                self._write(line)
+                if expects_reply:
+                    self._read_reply()
+                return
+
+            if not self._pending:
+                self._first_pending_time = time.time()
+                self._start_timer()
+            self._pending.append(line)
+            self._pending_bytes += len(line)
+            if expects_reply:
+                self._pending_replies += 1
+            if (len(self._pending) >= self.max_records or self._pending_bytes >= self.max_bytes
+                    or time.time() - self._first_pending_time >= self.max_delay
+                    or self._timer_error is not None):
+                self.flush()
+
+    def request(self, message):
+        """ Send a message to the server and return its reply """
+        with self._lock:
+            self.flush()
+            self._write(self.codec.dumps(message) + '\n')
+            return self._read_reply()
+
+    def flush(self):
+        """ Write the pending messages and read the replies to them """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if self._pending:
+                data = ''.join(self._pending)
+                self._pending = []
+                self._pending_bytes = 0
+                self._write(data)
+
+            error, self._timer_error = self._timer_error, None
+            while self._pending_replies:
+                self._pending_replies -= 1
+                try:
+                    self._read_reply()
+                except ValueError as ex:
+                    # keep reading, so the next request gets its own reply
+                    error = error or ex
+            if error:
+                raise error
+
+    def _start_timer(self):
+        self._timer = threading.Timer(self.max_delay, self._flush_on_timer)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _flush_on_timer(self):
+        with self._lock:
+            if self._timer is not threading.current_thread():
+                # the batch was flushed while the timer waited for the lock
+                return
+            self._timer = None
+            try:
+                self.flush()
+            except ValueError as ex:
+                self._timer_error = ex
+
+
+# set DEMISTO_LOOP_BATCH_MESSAGES=true in the docker env to batch the fire-and-forget messages of scripts
+protocol = Protocol(
+    batch=_bool_env('DEMISTO_LOOP_BATCH_MESSAGES', False),
+    max_records=_int_env('DEMISTO_LOOP_BATCH_MAX_RECORDS', 100),
+    max_delay=_int_env('DEMISTO_LOOP_BATCH_MAX_DELAY_MS', 1000) / 1000.0,
+    codec=json_codec
+)
+
+
 """Demisto instance for scripts only"""
 
 template_code = '''
@@ -65,9 +373,7 @@ class Demisto:
             os.environ['DEMISTO_MACHINE_LEARNING_MAGIC_KEY'] = args['demisto_machine_learning_magic_key']
 
     def log(self, msg):
-        json.dump({'type': 'entryLog', 'args': {'message': msg}}, sys.stdout)
-        sys.stdout.write('\\n')
-        sys.stdout.flush()
+        _protocol.send({'type': 'entryLog', 'args': {'message': msg}})
 
     def investigation(self):
         return self.callingContext[u'context'][u'Inv']
@@ -121,12 +427,12 @@ class Demisto:
     def info(self, *args):
         argsObj = {}
         argsObj["args"] = list(args)
-        self.__do({'type': 'log', 'command': 'info', 'args': argsObj})
+        _protocol.send({'type': 'log', 'command': 'info', 'args': argsObj}, expects_reply=True)
 
     def error(self, *args):
         argsObj = {}
         argsObj["args"] = list(args)
-        self.__do({'type': 'log', 'command': 'error', 'args': argsObj})
+        _protocol.send({'type': 'log', 'command': 'error', 'args': argsObj}, expects_reply=True)
 
     def exception(self, ex):
         return self.__do({'type': 'exception', 'command': 'exception', 'args': ex})
@@ -134,7 +440,7 @@ class Demisto:
     def debug(self, *args):
         argsObj = {}
         argsObj["args"] = list(args)
-        self.__do({'type': 'log', 'command': 'debug', 'args': argsObj})
+        _protocol.send({'type': 'log', 'command': 'debug', 'args': argsObj}, expects_reply=True)
 
     def getAllSupportedCommands(self):
         return self.__do({'type': 'getAllModulesSupportedCmds'})
@@ -150,18 +456,8 @@ class Demisto:
 
     def __do(self, cmd):
         # Watch out there is another defintion like this
-        # prepare command to send to server
-        json.dump(cmd, sys.stdout)
-        sys.stdout.write('\\n')
-
-        # send command to Demisto server
-        sys.stdout.flush()
-
-        # wait to receive response from Demisto server
-        data = globals()['__readWhileAvailable']()
-        if data.find('$$##') > -1:
-            raise ValueError(data[4:])
-        return json.loads(data)
+        # send command to Demisto server and wait to receive its response
+        return _protocol.request(cmd)
 
 
     def convert(self, results):
@@ -189,9 +485,7 @@ class Demisto:
         else:
             res.append(converted)
 
-        json.dump({'type': 'result', 'results': res}, sys.stdout)
-        sys.stdout.write('\\n')
-        sys.stdout.flush()
+        _protocol.send({'type': 'result', 'results': res})
 
 demisto = Demisto(context)
 
@@ -234,9 +528,7 @@ class Demisto:
             os.environ['DEMISTO_MACHINE_LEARNING_MAGIC_KEY'] = args['demisto_machine_learning_magic_key']
 
     def log(self, msg):
-        json.dump({'type': 'entryLog', 'args': {'message': 'Integration log: ' + msg}}, sys.stdout)
-        sys.stdout.write('\\n')
-        sys.stdout.flush()
+        _protocol.send({'type': 'entryLog', 'args': {'message': 'Integration log: ' + msg}})
 
     def investigation(self):
         return self.callingContext[u'context'][u'Inv']
@@ -299,17 +591,17 @@ class Demisto:
     def info(self, *args):
         argsObj = {}
         argsObj["args"] = list(args)
-        self.__do({'type': 'log', 'command': 'info', 'args': argsObj})
+        _protocol.send({'type': 'log', 'command': 'info', 'args': argsObj}, expects_reply=True)
 
     def error(self, *args):
         argsObj = {}
         argsObj["args"] = list(args)
-        self.__do({'type': 'log', 'command': 'error', 'args': argsObj})
+        _protocol.send({'type': 'log', 'command': 'error', 'args': argsObj}, expects_reply=True)
 
     def debug(self, *args):
         argsObj = {}
         argsObj["args"] = list(args)
-        self.__do({'type': 'log', 'command': 'debug', 'args': argsObj})
+        _protocol.send({'type': 'log', 'command': 'debug', 'args': argsObj}, expects_reply=True)
 
     def gets(self, obj, field):
         return str(self.get(obj, field))
@@ -325,13 +617,7 @@ class Demisto:
 
     def __do(self, cmd):
         # Watch out there is another defintion like this
-        json.dump(cmd, sys.stdout)
-        sys.stdout.write('\\n')
-        sys.stdout.flush()
-        data = globals()['__readWhileAvailable']()
-        if data.find('$$##') > -1:
-            raise ValueError(data[4:])
-        return json.loads(data)
+        return _protocol.request(cmd)
 
     def __convert(self, results):
         """ Convert whatever result into entry """
@@ -356,9 +642,7 @@ class Demisto:
             res = converted
         else:
             res.append(converted)
-        json.dump({'type': 'result', 'results': res}, sys.stdout)
-        sys.stdout.write('\\n')
-        sys.stdout.flush()
+        _protocol.send({'type': 'result', 'results': res})
 
     def incidents(self, incidents):
         self.results({'Type': 1, 'Contents': json.dumps(incidents), 'ContentsFormat': 'json'})
@@ -388,22 +672,221 @@ print = demisto_print
 ###CODE_HERE###
 '''
 
+
+# CommonServerPython ends with this line. Everything before it is executed once per container, see CommonServerModule.
+COMMON_SERVER_END_MARKER = '\n# ###END_OF_COMMON_SERVER_PYTHON###'
+
+# the template code starts with `from __future__ import print_function`, code compiled apart from it needs the flag
+FUTURE_FLAGS = __future__.print_function.compiler_flag
+
+
+def is_module_class(value):
+    """ Whether the value is a class defined by CommonServerPython (it is executed without a __name__, so its classes
+    get the module name of the builtins) """
+    return isinstance(value, CLASS_TYPES) and getattr(value, '__module__', None) == builtins_module.__name__ and \
+        getattr(builtins_module, getattr(value, '__name__', ''), None) is not value
+
+
+def snapshot_classes(values):
+    """ The attributes of the classes in values and of their nested classes, as (class, attributes) pairs """
+    class_attributes = []
+    seen = set()
+    pending = [value for value in values if is_module_class(value)]
+    while pending:
+        cls = pending.pop()
+        if id(cls) in seen:
+            continue
+        seen.add(id(cls))
+        attributes = dict(vars(cls))
+        class_attributes.append((cls, attributes))
+        pending.extend(value for value in attributes.values() if is_module_class(value))
+    return class_attributes
+
+
+def restore_classes(class_attributes):
+    """ Set the attributes of the classes back to the snapshot, removing those added since """
+    for cls, attributes in class_attributes:
+        current = vars(cls)
+        for name in [name for name in current if name not in attributes]:
+            try:
+                delattr(cls, name)
+            except Exception:
+                pass
+        for name, value in attributes.items():
+            if name not in current or current[name] is not value:
+                try:
+                    setattr(cls, name, value)
+                except Exception:
+                    pass
+
+
+def snapshot_containers(values):
+    """ Deep copies of the dicts, lists and sets in values, as (container, copy) pairs """
+    containers = []
+    seen = set()
+    for value in values:
+        if not isinstance(value, (dict, list, set)) or id(value) in seen:
+            continue
+        seen.add(id(value))
+        try:
+            containers.append((value, copy.deepcopy(value)))
+        except Exception:
+            # holds an object which cannot be copied (e.g. a lock), it is not restored
+            pass
+    return containers
+
+
+def restore_containers(containers):
+    """ Restore the contents of the containers in place, so every reference to them sees the snapshot """
+    for container, pristine in containers:
+        content = copy.deepcopy(pristine)
+        if isinstance(container, list):
+            container[:] = content
+        else:
+            container.clear()
+            container.update(content)
+
+
+class CommonServerModule(object):
+    """CommonServerPython executed once per container as a real module.
+
+    The module namespace is snapshot right after CommonServerPython was executed in it. Each script then runs
+    directly in the module namespace (so CommonServerUserPython can still override its functions), and
+    rollback() restores the namespace from the snapshot afterwards. Before a script runs, the template code is
+    executed to bind `demisto` to the new context and `reset_module_state()` re-creates the module level objects
+    which depend on the running script. `clear_module_state()` releases them before the snapshot is taken and after
+    each script, so the context, logger and debug-mode logging of one run are not kept for the next ones.
+
+    The snapshot binds the names of the module to the same objects again, so rollback() also restores in place the
+    dicts, lists and sets CommonServerPython defines (module level and class attributes) and the attributes of its
+    classes, nested classes included. Other objects a script mutates (e.g. an instance held by the module) still
+    leak into the next runs; set DEMISTO_LOOP_MODULE_SNAPSHOT=false if the scripts of a container do that.
+    """
+
+    def __init__(self, key, template_prefix, prelude, run_globals):
+        self.key = key
+        self.template_code = code_cache.compile(template_prefix)
+        self.module = types.ModuleType('CommonServerPython')
+        # the module runs scripts, which must not see a __name__ of their own (they check it to call main())
+        self.namespace = self.module.__dict__
+        self.namespace.clear()
+        self.namespace.update(run_globals)
+        exec(self.template_code, self.namespace)  # guardrails-disable-line
+        template_names = set(self.namespace)
+        prelude_code = compile('\n' * template_prefix.count('\n') + prelude, '<string>', 'exec', FUTURE_FLAGS)
+        exec(prelude_code, self.namespace)  # guardrails-disable-line
+        self.clear_module_state()
+        self.snapshot = dict(self.namespace)
+        # bound again to each run by prepare()
+        for name in ('demisto', 'context'):
+            self.snapshot.pop(name, None)
+        prelude_values = [value for name, value in self.snapshot.items() if name not in template_names]
+        self.class_attributes = snapshot_classes(prelude_values)
+        self.containers = snapshot_containers(
+            prelude_values + [value for _, attributes in self.class_attributes for value in attributes.values()])
+        self.reset_module_state()
+        sys.modules['CommonServerPython'] = self.module
+
+    def prepare(self, run_globals):
+        """ Bind the module namespace to the new script execution and return it """
+        self.namespace.update(run_globals)
+        exec(self.template_code, self.namespace)  # guardrails-disable-line
+        self.reset_module_state()
+        return self.namespace
+
+    def reset_module_state(self):
+        reset_module_state = self.namespace.get('reset_module_state')
+        if reset_module_state:
+            reset_module_state()
+
+    def clear_module_state(self):
+        clear_module_state = self.namespace.get('clear_module_state')
+        if clear_module_state:
+            try:
+                clear_module_state()
+            except Exception:
+                # releasing the state of a run must not fail the next ones
+                pass
+
+    def rollback(self):
+        self.clear_module_state()
+        self.namespace.clear()
+        self.namespace.update(self.snapshot)
+        restore_classes(self.class_attributes)
+        restore_containers(self.containers)
+
+
+# one CommonServerPython module per template (scripts and integrations).
+# set DEMISTO_LOOP_MODULE_SNAPSHOT=false in the docker env to execute CommonServerPython from scratch on every run
+use_module_snapshot = _bool_env('DEMISTO_LOOP_MODULE_SNAPSHOT', True)
+common_server_modules = {}
+
+
+def execute_script(code_string, context_json):
+    """ Execute the script sent by the server, CommonServerPython included, with the template of its type """
+    is_integ_script = context_json['integration']
+    template = integ_template_code if is_integ_script else template_code
+    run_globals = {
+        '__readWhileAvailable': __readWhileAvailable,
+        '_protocol': protocol,
+        'context': context_json,
+        'win': win
+    }
+
+    marker_index = code_string.find(COMMON_SERVER_END_MARKER)
+    if not use_module_snapshot or marker_index < 0:
+        complete_code = template.replace('###CODE_HERE###', code_string)
+        code = code_cache.compile(complete_code, '<string>')
+        exec(code, run_globals, run_globals)  # guardrails-disable-line
+        return
+
+    template_prefix, template_suffix = template.split('###CODE_HERE###')
+    prelude = code_string[:marker_index + 1]
+    body = code_string[marker_index + 1:]
+
+    key = hashlib.sha256(prelude.encode('utf-8')).hexdigest()
+    common_server = common_server_modules.get(is_integ_script)
+    if common_server and common_server.key == key:
+        namespace = common_server.prepare(run_globals)
+    else:
+        common_server_modules.pop(is_integ_script, None)
+        common_server = CommonServerModule(key, template_prefix, prelude, run_globals)
+        common_server_modules[is_integ_script] = common_server
+        namespace = common_server.namespace
+
+    # keep the line numbers of the script as if it was executed as part of the complete code
+    body_offset = '\n' * (template_prefix.count('\n') + prelude.count('\n'))
+    code = code_cache.compile(body_offset + body + template_suffix, '<string>', FUTURE_FLAGS)
+    exec(code, namespace, namespace)  # guardrails-disable-line
+
+
 # rollback file system to its previous state
 # delete home dir and tmp dir
 
 
+# writes the messages the script left in the protocol batch
+def flush_protocol():
+    try:
+        protocol.flush()
+    except ValueError:
+        # the script is already done, there is no one to report the failure of a log message to
+        pass
+
+
 # notifies demisto server that the current executed script is completed
 # and the process is ready to execute the next script
 def send_script_completed():
+    flush_protocol()
     json.dump({'type': 'completed'}, sys.stdout)
     sys.stdout.write('\\n')
     sys.stdout.flush()
 
 
 def send_script_exception(exc_type, exc_value, exc_traceback):
+    flush_protocol()
     ex_string = traceback.format_exception(exc_type, exc_value, exc_traceback)
     if ex_string == 'None\n':
-        ex_string = str(ex)
+        ex_string = str(exc_value)
 
     json.dump({'type': 'exception', 'args': {'exception': ex_string}}, sys.stdout)
     sys.stdout.write('\\n')
@@ -436,54 +919,46 @@ def rollback_system():
     os.environ = {}
     for key in backup_env_vars.keys():
         os.environ[key] = backup_env_vars[key]
+    for common_server in common_server_modules.values():
+        common_server.rollback()
 
 
-while True:
-    contextString = do_ping_pong()
-    if contextString == '':
-        # finish executing python
-        break
-
-    contextJSON = json.loads(contextString)
+def main():
+    while True:
+        contextString = do_ping_pong()
+        if contextString == '':
+            # finish executing python
+            break
 
-    code_string = contextJSON['script']
-    contextJSON.pop('script', None)
+        contextJSON = json_codec.loads(contextString)
 
-    is_integ_script = contextJSON['integration']
-    complete_code = ''
-    if is_integ_script:
-        complete_code = integ_template_code.replace('###CODE_HERE###', code_string)
-    else:
-        complete_code = template_code.replace('###CODE_HERE###', code_string)
+        code_string = contextJSON['script']
+        contextJSON.pop('script', None)
 
-    try:
-        code = compile(complete_code, '<string>', 'exec')
+        try:
+            execute_script(code_string, contextJSON)
+            protocol.flush()
 
-        sub_globals = {
-            '__readWhileAvailable': __readWhileAvailable,
-            'context': contextJSON,
-            'win': win
-        }
+        except Exception:
+            exc_type, exc_value, exc_traceback = sys.exc_info()
+            send_script_exception(exc_type, exc_value, exc_traceback)
+        except SystemExit:
+            # print 'Will not stop on sys.exit(0)'
+            pass
 
-        exec(code, sub_globals, sub_globals)  # guardrails-disable-line
+        rollback_system()
 
-    except Exception as ex:
-        exc_type, exc_value, exc_traceback = sys.exc_info()
-        send_script_exception(exc_type, exc_value, exc_traceback)
-    except SystemExit:
-        # print 'Will not stop on sys.exit(0)'
-        pass
-
-    rollback_system()
+        # ping back to Demisto server that script is completed
+        send_script_completed()
 
-    # ping back to Demisto server that script is completed
-    send_script_completed()
+        # if the script running on native python then terminate the process after finished the script
+        is_python_native = contextJSON['native']
+        if is_python_native:
+            break
 
-    # if the script running on native python then terminate the process after finished the script
-    is_python_native = contextJSON['native']
-    if is_python_native:
-        break
+    if __read_thread:
+        __read_thread.join(timeout=1)
 
 
-if __read_thread:
-    __read_thread.join(timeout=1)
+if __name__ == '__main__':
+    main()
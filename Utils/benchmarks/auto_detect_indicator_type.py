@@ -0,0 +1,119 @@
+"""Indicators/sec of detecting the types of 1M mixed indicator values, like a feed with auto_detect_type does:
+    before          - auto_detect_indicator_type as it was: the patterns in sequence, and a new extractor, which
+                      parses the public suffix list, for every value which is not of another type.
+                      It is measured only up to LEGACY_MAX_VALUES values
+    before, cached  - the patterns in sequence as before, with a single extractor
+    single value    - auto_detect_indicator_type, called per value
+    batch           - auto_detect_indicator_types, called once for all the values
+The types of all the modes are compared to the types of the patterns in sequence.
+"""
+import hashlib
+import random
+import re
+
+from Utils.benchmarks.utils import add_to_path, measure, report
+
+add_to_path()
+import tldextract  # noqa: E402
+from CommonServerPython import (FeedIndicatorType, auto_detect_indicator_type,  # noqa: E402
+                                auto_detect_indicator_types, cveRegex, emailRegex, get_tld_extractor,
+                                ipv4cidrRegex, ipv4Regex, ipv6cidrRegex, ipv6Regex, md5Regex, sha1Regex,
+                                sha256Regex, sha512Regex, urlRegex)
+
+LEGACY_MAX_VALUES = 2000
+
+
+def new_extractor():
+    try:
+        return tldextract.TLDExtract(cache_file=False, suffix_list_urls=None)
+    except TypeError:
+        return tldextract.TLDExtract(cache_dir=None, suffix_list_urls=())
+
+
+def legacy_auto_detect_indicator_type(indicator_value, extractor_factory=new_extractor):
+    """auto_detect_indicator_type as it was before, with the extractor created by extractor_factory"""
+    if re.match(ipv4cidrRegex, indicator_value):
+        return FeedIndicatorType.CIDR
+    if re.match(ipv6cidrRegex, indicator_value):
+        return FeedIndicatorType.IPv6CIDR
+    if re.match(ipv4Regex, indicator_value):
+        return FeedIndicatorType.IP
+    if re.match(ipv6Regex, indicator_value):
+        return FeedIndicatorType.IPv6
+    if re.match(sha256Regex, indicator_value):
+        return FeedIndicatorType.File
+    if re.match(urlRegex, indicator_value):
+        return FeedIndicatorType.URL
+    if re.match(md5Regex, indicator_value):
+        return FeedIndicatorType.File
+    if re.match(sha1Regex, indicator_value):
+        return FeedIndicatorType.File
+    if re.match(emailRegex, indicator_value):
+        return FeedIndicatorType.Email
+    if re.match(cveRegex, indicator_value):
+        return FeedIndicatorType.CVE
+    if re.match(sha512Regex, indicator_value):
+        return FeedIndicatorType.File
+    try:
+        if extractor_factory()(indicator_value).suffix:
+            if '*' in indicator_value:
+                return FeedIndicatorType.DomainGlob
+            return FeedIndicatorType.Domain
+    except Exception:
+        pass
+    return None
+
+
+def build_values(count, seed=0):
+    rand = random.Random(seed)
+    words = ['alpha', 'bravo', 'charlie', 'delta', 'echo', 'foxtrot', 'golf', 'hotel', 'india', 'juliet']
+    suffixes = ['com', 'net', 'org', 'co.uk', 'io', 'ru', 'xyz', 'local']
+
+    def domain():
+        return '{}{}.{}'.format(rand.choice(words), rand.randint(0, 9999), rand.choice(suffixes))
+
+    def digest(algorithm):
+        return hashlib.new(algorithm, str(rand.random()).encode('utf-8')).hexdigest()
+
+    makers = [
+        lambda: '{}.{}.{}.{}'.format(*(rand.randint(0, 255) for _ in range(4))),
+        lambda: '{}.{}.{}.0/{}'.format(rand.randint(1, 223), rand.randint(0, 255), rand.randint(0, 255),
+                                       rand.randint(8, 32)),
+        lambda: '2001:db8:{:x}::{:x}'.format(rand.randint(0, 65535), rand.randint(0, 65535)),
+        lambda: '2001:db8:{:x}::/48'.format(rand.randint(0, 65535)),
+        lambda: digest('md5'),
+        lambda: digest('sha1'),
+        lambda: digest('sha256'),
+        lambda: digest('sha512'),
+        lambda: 'https://{}/{}/index.php?id={}'.format(domain(), rand.choice(words), rand.randint(0, 999)),
+        domain,
+        domain,
+        lambda: '*.' + domain(),
+        lambda: '{}@{}'.format(rand.choice(words), domain()),
+        lambda: 'CVE-20{:02d}-{}'.format(rand.randint(0, 21), rand.randint(1000, 99999)),
+        lambda: rand.choice(words),
+    ]
+    return [rand.choice(makers)() for _ in range(count)]
+
+
+def main(count=1000000):
+    values = build_values(count)
+    cached_extractor = get_tld_extractor()
+    expected = [legacy_auto_detect_indicator_type(value, lambda: cached_extractor) for value in values]
+    modes = (
+        ('before', lambda: [legacy_auto_detect_indicator_type(value) for value in values[:LEGACY_MAX_VALUES]]),
+        ('before, cached', lambda: [legacy_auto_detect_indicator_type(value, lambda: cached_extractor)
+                                    for value in values]),
+        ('single value', lambda: [auto_detect_indicator_type(value) for value in values]),
+        ('batch', lambda: auto_detect_indicator_types(values)),
+    )
+    for mode, run in modes:
+        results = []
+        duration = measure(lambda: results.append(run()))
+        measured = len(results[0])
+        assert results[0] == expected[:measured], mode
+        report('{:,} values - {}'.format(measured, mode), duration, measured, 'values')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""Connections opened by BaseClient._http_request per 1,000 requests, with and without adapter reuse"""
+import time
+
+from Utils.benchmarks.utils import StubServer, add_to_path, report
+
+add_to_path()
+from CommonServerPython import BaseClient  # noqa: E402
+
+
+class RemountingClient(BaseClient):
+    """BaseClient as it was before adapters were cached: a new adapter, and connection pool, for every request"""
+
+    def _implement_retry(self, *args, **kwargs):
+        self._adapters = {}
+        self._mounted_adapter_key = None
+        super(RemountingClient, self)._implement_retry(*args, **kwargs)
+
+
+def main(requests_count=1000):
+    for client_class in (RemountingClient, BaseClient):
+        with StubServer() as server:
+            client = client_class(server.url)
+            start = time.time()
+            for _ in range(requests_count):
+                client._http_request('GET', 'api')
+            duration = time.time() - start
+            report('{} - {} connections'.format(client_class.__name__, server.connections), duration,
+                   requests_count, 'requests')
+
+
+if __name__ == '__main__':
+    main()
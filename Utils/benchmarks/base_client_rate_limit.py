@@ -0,0 +1,63 @@
+"""Throughput and rejected requests of BaseClient against an API allowing 50 requests per second"""
+import math
+import time
+
+from Utils.benchmarks.utils import StubHandler, StubServer, add_to_path, report
+
+add_to_path()
+from CommonServerPython import BaseClient  # noqa: E402
+
+RATE = 50
+WINDOW = 1.0
+
+
+class ThrottlingHandler(StubHandler):
+    """Allows RATE requests per fixed window, like most APIs, and throttles the rest with a 429"""
+
+    def respond(self):
+        server = self.server
+        with server.lock:
+            now = time.time()
+            window_end = (math.floor(now / WINDOW) + 1) * WINDOW
+            if window_end != server.window_end:
+                server.window_end = window_end
+                server.remaining = RATE
+            if server.remaining:
+                server.remaining -= 1
+                status = 200
+            else:
+                server.rejected += 1
+                status = 429
+            headers = {'X-RateLimit-Remaining': str(server.remaining), 'X-RateLimit-Reset': str(window_end)}
+        if status == 429:
+            headers['Retry-After'] = str(int(math.ceil(window_end - now)))
+        return status, headers, b'{"ok": true}'
+
+
+class ThrottlingServer(StubServer):
+    def __init__(self):
+        StubServer.__init__(self, ThrottlingHandler)
+        self.window_end = 0
+        self.remaining = RATE
+        self.rejected = 0
+
+
+def main(requests_count=300):
+    clients = (
+        ('urllib3 retry on 429', lambda url: BaseClient(url), {'retries': 10, 'status_list_to_retry': [429]}),
+        ('rate_limit_retries', lambda url: BaseClient(url, rate_limit_retries=10), {}),
+        ('rate_limit + rate_limit_retries',
+         lambda url: BaseClient(url, rate_limit=RATE, rate_limit_period=WINDOW, rate_limit_retries=10), {}),
+    )
+    for name, build_client, kwargs in clients:
+        with ThrottlingServer() as server:
+            client = build_client(server.url)
+            start = time.time()
+            for _ in range(requests_count):
+                client._http_request('GET', 'api', **kwargs)
+            duration = time.time() - start
+            report('{} - {} rejected'.format(name, server.rejected), duration, requests_count, 'requests')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""Indicators/sec of splitting indicators to batches of 2000 and of creating them with create_indicators_in_batches.
+    before      - batch as it was: the rest of the list is copied after every batch, which is quadratic
+    batch       - batch, slicing the list by index
+    generator   - batch over a generator of the indicators, holding a single batch in memory
+demisto.createIndicators is mocked with CREATE_LATENCY seconds per call, while every indicator takes
+GENERATE_LATENCY seconds to parse, and create_indicators_in_batches is measured with and without parallel.
+"""
+import time
+
+from Utils.benchmarks.utils import add_to_path, measure, report
+
+add_to_path()
+import demistomock as demisto  # noqa: E402
+from CommonServerPython import batch, create_indicators_in_batches  # noqa: E402
+
+BATCH_SIZE = 2000
+CREATE_LATENCY = 0.05
+GENERATE_LATENCY = 0.00002
+CREATE_COUNT = 200000
+
+
+def legacy_batch(iterable, batch_size=1):
+    """batch as it was before"""
+    current_batch = iterable[:batch_size]
+    not_batched = iterable[batch_size:]
+    while current_batch:
+        yield current_batch
+        current_batch = not_batched[:batch_size]
+        not_batched = not_batched[batch_size:]
+
+
+def indicators(count, latency=0.0):
+    for i in range(count):
+        if latency and not i % 100:
+            time.sleep(latency * 100)
+        yield {'value': '10.{}.{}.{}'.format(i >> 16 & 255, i >> 8 & 255, i & 255), 'type': 'IP'}
+
+
+def main():
+    for count in (100000, 1000000, 2000000):
+        values = list(indicators(count))
+        modes = (
+            ('before', lambda: legacy_batch(values, BATCH_SIZE)),
+            ('batch', lambda: batch(values, BATCH_SIZE)),
+            ('generator', lambda: batch(indicators(count), BATCH_SIZE)),
+        )
+        for mode, batches in modes:
+            duration = measure(lambda: sum(len(b) for b in batches()))
+            report('{:,} indicators - {}'.format(count, mode), duration, count, 'indicators')
+
+    demisto.createIndicators = lambda indicators_batch: time.sleep(CREATE_LATENCY)
+    for parallel in (False, True):
+        created = []
+        duration = measure(lambda: created.append(create_indicators_in_batches(
+            indicators(CREATE_COUNT, GENERATE_LATENCY), BATCH_SIZE, parallel=parallel)))
+        assert created == [CREATE_COUNT]
+        report('{:,} created - parallel={}'.format(CREATE_COUNT, parallel), duration, CREATE_COUNT, 'indicators')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,27 @@
+"""Per invocation compile latency of the docker python loop with a cold and a warm code cache"""
+from Utils._script_docker_python_loop import CodeCache, integ_template_code, template_code
+from Utils.benchmarks.utils import load_common_server_python, measure, report
+
+SCRIPT = '''
+args = demisto.args()
+demisto.results(tableToMarkdown('Args', args))
+'''
+
+
+def main(repeat=20):
+    common_server = load_common_server_python()
+
+    for name, template in (('script', template_code), ('integration', integ_template_code)):
+        complete_code = template.replace('###CODE_HERE###', common_server + SCRIPT)
+
+        cold = measure(lambda: CodeCache().compile(complete_code), repeat)
+        warm_cache = CodeCache()
+        warm_cache.compile(complete_code)
+        warm = measure(lambda: warm_cache.compile(complete_code), repeat)
+
+        report('{} - cold cache'.format(name), cold)
+        report('{} - warm cache'.format(name), warm)
+
+
+if __name__ == '__main__':
+    main()
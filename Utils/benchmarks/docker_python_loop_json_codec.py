@@ -0,0 +1,38 @@
+"""Encoding and decoding a multi-MB results message with each JSON codec available to the docker python loop"""
+from Utils._script_docker_python_loop import JSONCodec, OrjsonCodec, UjsonCodec
+from Utils.benchmarks.utils import measure, report
+
+
+def results_message(records, description):
+    contents = [{
+        'id': i,
+        'name': u'host-{}.example.com'.format(i),
+        'path': u'C:\\Users\\user\\AppData\\Local\\Temp\\file_{}.exe'.format(i),
+        'description': description.format(i),
+        'score': i / 7.0,
+        'tags': ['tag1', 'tag2', 'tag3'],
+        'enabled': i % 2 == 0,
+        'parent': None,
+    } for i in range(records)]
+    return {'type': 'result', 'results': [{'Type': 1, 'Contents': contents, 'ContentsFormat': 'json'}]}
+
+
+def main(records=20000, repeat=5):
+    for text, description in (('ascii', u'Search result number {}'), ('non ascii', u'Résultat de recherche numéro {}')):
+        message = results_message(records, description)
+        data = JSONCodec().dumps(message)
+        print('{} message, {:.1f} MB'.format(text, len(data) / 1024.0 / 1024))
+
+        for codec_class in (JSONCodec, UjsonCodec, OrjsonCodec):
+            try:
+                codec = codec_class()
+            except ImportError:
+                print('{} is not installed'.format(codec_class.name))
+                continue
+            size = len(data) / 1e6
+            report('{} - dumps'.format(codec.name), measure(lambda: codec.dumps(message), repeat), size, 'MB')
+            report('{} - loads'.format(codec.name), measure(lambda: codec.loads(data), repeat), size, 'MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+"""Per execution startup time of the docker python loop, executing CommonServerPython from scratch or from a snapshot"""
+from Utils import _script_docker_python_loop as loop
+from Utils.benchmarks.utils import load_common_server_python, measure, report
+
+SCRIPT = '''
+args = demisto.args()
+'''
+
+
+def main(repeat=50):
+    code_string = load_common_server_python() + SCRIPT
+    context = {'integration': False, 'native': False, 'args': {}, 'context': {}}
+
+    def run():
+        loop.execute_script(code_string, context)
+        for common_server in loop.common_server_modules.values():
+            common_server.rollback()
+
+    for use_module_snapshot in (False, True):
+        loop.use_module_snapshot = use_module_snapshot
+        run()  # warm up the code cache and the snapshot
+        report('module snapshot {}'.format('on' if use_module_snapshot else 'off'), measure(run, repeat))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,29 @@
+"""Log lines per second a script can write through the docker python loop, with and without batched messages"""
+import time
+
+from Utils.benchmarks.utils import report
+from Utils.tests.script_docker_python_loop_test import StandInServer
+
+SCRIPT = '''
+for i in range({lines}):
+    demisto.{method}('line {{}}'.format(i))
+'''
+
+
+def main(lines=20000):
+    for method in ('log', 'info'):
+        for batch in ('false', 'true'):
+            stand_in = StandInServer(env={'DEMISTO_LOOP_BATCH_MESSAGES': batch})
+            try:
+                stand_in.run_script('pass')  # start up the loop
+                start = time.time()
+                messages = stand_in.run_script(SCRIPT.format(lines=lines, method=method))
+                duration = time.time() - start
+            finally:
+                stand_in.close()
+            assert len(messages) == lines + 1
+            report('demisto.{} - batch {}'.format(method, batch), duration, lines, 'lines')
+
+
+if __name__ == '__main__':
+    main()
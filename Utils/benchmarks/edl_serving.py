@@ -0,0 +1,117 @@
+"""Requests/sec and bytes/sec of the EDL endpoint served by its gevent WSGIServer, for a list of 200k IPs,
+polled by 8 concurrent keep-alive clients. The server runs in its own process, in each of the modes:
+    context     - the list is read from the integration context and sent as a Python string per request, as before
+    snapshot    - the list is sent from the snapshot, which keeps it in memory
+    file        - the list is sent from the file of its snapshot, as a larger list is
+    gzip        - the client accepts gzip, the pre-compressed file of the snapshot is sent
+    etag        - the client sends the ETag of the list it has, and is answered 304 Not Modified
+The integration context is mocked in the context mode, so the server round trip of the context is not measured.
+"""
+import http.client
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+from Utils.benchmarks.utils import add_to_path, report
+
+EDL_DIRS = ('Packs/Base/Scripts/CommonServerUserPython', 'Packs/ApiModules/Scripts/IndicatorsSnapshotApiModule',
+            'Packs/EDL/Integrations/EDL')
+MODES = ('context', 'snapshot', 'file', 'gzip', 'etag')
+CLIENTS = 8
+
+
+def build_body(ips_count):
+    return '\n'.join('{}.{}.{}.{}'.format(i >> 24 & 255 or 11, i >> 16 & 255, i >> 8 & 255, i & 255)
+                     for i in range(ips_count))
+
+
+def serve(mode, port, ips_count):
+    add_to_path(*EDL_DIRS)
+    import demistomock as demisto
+    import EDL as edl
+    from gevent.pywsgi import WSGIServer
+    from IndicatorsSnapshotApiModule import SnapshotStore
+
+    body = build_body(int(ips_count))
+    demisto.params = lambda: {'indicators_query': 'type:IP', 'edl_size': ips_count, 'on_demand': mode == 'context'}
+    demisto.getIntegrationContext = lambda: {'last_output': {edl.EDL_VALUES_KEY: body}}
+    if mode != 'context':
+        edl.SNAPSHOT_STORE = SnapshotStore(lambda request_args: (body, 'text/plain'),
+                                           memory_max_size=0 if mode == 'file' else len(body))
+    WSGIServer(('127.0.0.1', int(port)), edl.APP, log=None).serve_forever()
+
+
+def poll(port, headers, deadline, totals, lock):
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    requests_count = bytes_count = 0
+    while time.time() < deadline:
+        connection.request('GET', '/', headers=headers)
+        response = connection.getresponse()
+        bytes_count += len(response.read())
+        requests_count += 1
+    connection.close()
+    with lock:
+        totals[0] += requests_count
+        totals[1] += bytes_count
+
+
+def free_port():
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def wait_for_server(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('The server did not start')
+
+
+def main(ips_count=200000, seconds=5):
+    for mode in MODES:
+        port = free_port()
+        server = subprocess.Popen([sys.executable, '-m', 'Utils.benchmarks.edl_serving', 'serve', mode, str(port),
+                                   str(ips_count)])
+        try:
+            wait_for_server(port)
+            headers = {'Accept-Encoding': 'gzip'} if mode == 'gzip' else {}
+            if mode == 'etag':
+                connection = http.client.HTTPConnection('127.0.0.1', port)
+                connection.request('GET', '/')
+                response = connection.getresponse()
+                response.read()
+                headers['If-None-Match'] = response.getheader('ETag')
+                connection.close()
+
+            totals = [0, 0]
+            lock = threading.Lock()
+            deadline = time.time() + seconds
+            clients = [threading.Thread(target=poll, args=(port, headers, deadline, totals, lock))
+                       for _ in range(CLIENTS)]
+            start = time.time()
+            for client in clients:
+                client.start()
+            for client in clients:
+                client.join()
+            duration = time.time() - start
+            report('{} - {:,.1f} MB/sec'.format(mode, totals[1] / duration / 1024 / 1024), duration, totals[0],
+                   'requests')
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 5 and sys.argv[1] == 'serve':
+        serve(*sys.argv[2:])
+    else:
+        main(*map(int, sys.argv[1:]))
@@ -0,0 +1,55 @@
+"""Indicators submitted and fetch time of a feed fetched twice with 1% churn between the fetches,
+submitting the whole feed every fetch as before, and with IndicatorsDelta submitting only the delta"""
+import time
+
+from Utils.benchmarks.utils import add_to_path, report
+
+add_to_path()
+import CommonServerPython  # noqa: E402
+from CommonServerPython import IndicatorsDelta, batch  # noqa: E402
+
+
+def build_feed(indicators_count, generation=0, churn=0.01):
+    """The indicators of the feed, where every 1/churn indicator is replaced in each generation"""
+    step = int(1 / churn)
+    indicators = []
+    for i in range(indicators_count):
+        suffix = generation if i % step == 0 else 0
+        indicators.append({
+            'value': 'host{}-{}.example.com'.format(i, suffix),
+            'type': 'Domain',
+            'rawJSON': {'value': 'host{}-{}.example.com'.format(i, suffix), 'type': 'Domain', 'line': i},
+            'fields': {'tags': ['benchmark'], 'trafficlightprotocol': 'WHITE'},
+        })
+    return indicators
+
+
+def main(indicators_count=100000):
+    context = {}
+    CommonServerPython.get_integration_context = lambda *args, **kwargs: dict(context)
+    CommonServerPython.set_integration_context = lambda value, *args, **kwargs: context.update(value)
+    feeds = [build_feed(indicators_count, generation) for generation in range(2)]
+
+    for mode in ('full', 'delta'):
+        context.clear()
+        for generation, feed in enumerate(feeds):
+            submitted = [0]
+
+            def create_indicators(indicators):
+                submitted[0] += len(indicators)
+
+            start = time.time()
+            delta = IndicatorsDelta() if mode == 'delta' else None
+            indicators = list(delta.filter(feed)) if delta else feed
+            for b in batch(indicators, batch_size=2000):
+                create_indicators(b)
+            if delta:
+                delta.save()
+            duration = time.time() - start
+            state = context.get(IndicatorsDelta.CONTEXT_KEY, {}).get('fingerprints', '')
+            report('{} fetch {} - {:,} submitted, {:,.0f} KB state'.format(
+                mode, generation + 1, submitted[0], len(state) / 1024.0), duration, len(feed), 'indicators')
+
+
+if __name__ == '__main__':
+    main()
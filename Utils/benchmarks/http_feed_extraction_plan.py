@@ -0,0 +1,108 @@
+"""Lines/sec of HTTPFeedApiModule.get_indicator_fields with the Spamhaus and DShield feed configurations,
+compiling the configuration on every line as before, and with the extraction plan compiled once per URL"""
+import re
+
+from Utils.benchmarks.utils import add_to_path, measure, report
+
+add_to_path('Packs/Base/Scripts/CommonServerUserPython', 'Packs/ApiModules/Scripts/HTTPFeedApiModule')
+from HTTPFeedApiModule import Client, get_indicator_fields  # noqa: E402
+
+SPAMHAUS_URL = 'https://www.spamhaus.org/drop/asndrop.txt'
+SPAMHAUS_CONFIG = {
+    'indicator_type': 'ASN',
+    'indicator': {'regex': r'^AS[0-9]+'},
+    'fields': [
+        {'asndrop_country': {'regex': r'^.*;\W([a-zA-Z]+)\W+', 'transform': r'\1'}},
+        {'asndrop_org': {'regex': r'^.*\|\W+(.*)', 'transform': r'\1'}},
+    ]
+}
+SPAMHAUS_LINE = 'AS397539 ; US | LAKSH CYBERSECURITY AND DEFENSE LLC'
+
+DSHIELD_URL = 'https://www.dshield.org/block.txt'
+DSHIELD_CONFIG = {
+    'indicator_type': 'CIDR',
+    'indicator': {'regex': r'^(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})\t[\d.]*\t(\d{1,2})', 'transform': '\\1/\\2'},
+    'fields': [
+        {'numberofattacks': {'regex': '^.*\\t.*\\t[0-9]+\\t([0-9]+)', 'transform': '\\1'}},
+        {'networkname': {'regex': '^.*\\t.*\\t[0-9]+\\t[0-9]+\\t([^\\t]+)', 'transform': '\\1'}},
+        {'geocountry': {'regex': '^.*\\t.*\\t[0-9]+\\t[0-9]+\\t[^\\t]+\\t([A-Z]+)', 'transform': '\\1'}},
+        {'registrarabuseemail': {'regex': '^.*\\t.*\\t[0-9]+\\t[0-9]+\\t[^\\t]+\\t[A-Z]+\\t(\\S+)',
+                                 'transform': '\\1'}},
+    ]
+}
+DSHIELD_LINE = '45.143.220.0\t45.143.220.255\t24\t3024\tEXAMPLE-AS\tNL\tabuse@example.com'
+
+
+def legacy_get_indicator_fields(line, url, feed_tags, tlp_color, client):
+    """get_indicator_fields as it was before the extraction plan"""
+    attributes = None
+    value = ''
+    indicator = None
+    fields_to_extract = []
+    feed_config = client.feed_url_to_config.get(url, {})
+    if feed_config:
+        if 'indicator' in feed_config:
+            indicator = feed_config['indicator']
+            if 'regex' in indicator:
+                indicator['regex'] = re.compile(indicator['regex'])
+            if 'transform' not in indicator:
+                indicator['transform'] = r'\g<0>'
+
+    if 'fields' in feed_config:
+        fields = feed_config['fields']
+        for field in fields:
+            for f, fattrs in field.items():
+                field = {f: {}}
+                if 'regex' in fattrs:
+                    field[f]['regex'] = re.compile(fattrs['regex'])
+                if 'transform' not in fattrs:
+                    field[f]['transform'] = r'\g<0>'
+                else:
+                    field[f]['transform'] = fattrs['transform']
+                fields_to_extract.append(field)
+
+    line = line.strip()
+    if line:
+        extracted_indicator = line.split()[0]
+        if indicator:
+            extracted_indicator = indicator['regex'].search(line)
+            if extracted_indicator is None:
+                return attributes, value
+            if 'transform' in indicator:
+                extracted_indicator = extracted_indicator.expand(indicator['transform'])
+        attributes = {}
+        for field in fields_to_extract:
+            for f, fattrs in field.items():
+                m = fattrs['regex'].search(line)
+                if m is None:
+                    continue
+                attributes[f] = m.expand(fattrs['transform'])
+                try:
+                    i = int(attributes[f])
+                except Exception:
+                    pass
+                else:
+                    attributes[f] = i
+        attributes['value'] = value = extracted_indicator
+        attributes['type'] = feed_config.get('indicator_type', client.indicator_type)
+        attributes['tags'] = feed_tags
+        if tlp_color:
+            attributes['trafficlightprotocol'] = tlp_color
+    return attributes, value
+
+
+def main(lines_count=100000):
+    for name, url, config, line in (('Spamhaus ASN', SPAMHAUS_URL, SPAMHAUS_CONFIG, SPAMHAUS_LINE),
+                                    ('DShield', DSHIELD_URL, DSHIELD_CONFIG, DSHIELD_LINE)):
+        client = Client(url=url, feed_url_to_config={url: config})
+        assert legacy_get_indicator_fields(line, url, [], None, client) == get_indicator_fields(
+            line, url, [], None, client)
+        for label, extract in (('per line', legacy_get_indicator_fields), ('plan', get_indicator_fields)):
+            def run():
+                for _ in range(lines_count):
+                    extract(line, url, [], None, client)
+            report('{} - {}'.format(name, label), measure(run), lines_count, 'lines')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Peak memory and indicators/sec of HTTPFeedApiModule fetch-indicators on a large plain text feed.
+
+Each mode runs in its own process, so its peak RSS is not mixed with the feed server or the other mode:
+    list    - all the indicators are collected with fetch_indicators_command before submitting them, as before
+    stream  - feed_main, which submits batches while the feed is read
+"""
+import resource
+import subprocess
+import sys
+import time
+
+from Utils.benchmarks.utils import StubHandler, StubServer, add_to_path, report
+
+HTTP_FEED_DIRS = ('Packs/Base/Scripts/CommonServerUserPython', 'Packs/ApiModules/Scripts/HTTPFeedApiModule')
+
+
+def peak_rss_mb():
+    # ru_maxrss survives exec on linux, so it would include the parent building the feed. VmHWM does not
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024.0
+    except IOError:
+        pass
+    # in KB on linux, in bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+class FeedHandler(StubHandler):
+    body = b''
+
+    def respond(self):
+        return 200, {'Content-Type': 'text/plain'}, self.body
+
+
+def run_fetch(mode, url):
+    add_to_path(*HTTP_FEED_DIRS)
+    import demistomock as demisto
+    import HTTPFeedApiModule
+
+    created = [0]
+
+    def create_indicators(indicators):
+        created[0] += len(indicators)
+
+    demisto.params = lambda: {'url': url, 'indicator_type': 'IP', 'ignore_regex': '^#'}
+    demisto.command = lambda: 'fetch-indicators'
+    demisto.createIndicators = create_indicators
+
+    start = time.time()
+    if mode == 'list':
+        client = HTTPFeedApiModule.Client(**demisto.params())
+        indicators = HTTPFeedApiModule.fetch_indicators_command(client, [], None, 'IP', False)
+        for b in HTTPFeedApiModule.iter_indicator_batches(indicators):
+            demisto.createIndicators(b)
+    else:
+        HTTPFeedApiModule.feed_main('benchmark')
+    duration = time.time() - start
+    report('{} - peak RSS {:,.0f} MB'.format(mode, peak_rss_mb()), duration, created[0], 'indicators')
+
+
+def main(lines_count=5000000):
+    FeedHandler.body = b'# synthetic feed\n' + b''.join(
+        '{}.{}.{}.{}\tscanner\n'.format(i >> 24 & 255, i >> 16 & 255, i >> 8 & 255, i & 255).encode('ascii')
+        for i in range(lines_count))
+    with StubServer(FeedHandler) as server:
+        for mode in ('list', 'stream'):
+            subprocess.check_call([sys.executable, '-m', 'Utils.benchmarks.http_feed_streaming', mode, server.url])
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3:
+        run_fetch(*sys.argv[1:])
+    else:
+        main(*map(int, sys.argv[1:]))
@@ -0,0 +1,70 @@
+"""Indicators/sec, server calls and peak memory of reading the 1M indicators of a query, with the page loop the
+exporting integrations had before (pages of 200 by number, all the indicators kept in a list) and with
+IndicatorsSearcher (pages of 1000 by the searchAfter cursor, iterated a page at a time).
+
+demisto.searchIndicators is mocked by a server of fake indicators. Paging by number makes the server skip all the
+indicators before the page on every call, so the number of indicators it reads for the search is reported too:
+the sum of page * size + size over the calls by number, the returned indicators for the calls by a cursor.
+"""
+import tracemalloc
+
+from Utils.benchmarks.utils import add_to_path, measure, report
+
+add_to_path()
+import demistomock as demisto  # noqa: E402
+from CommonServerPython import IndicatorsSearcher  # noqa: E402
+
+LEGACY_PAGE_SIZE = 200
+
+
+class FakeIndicatorsServer(object):
+    def __init__(self, total):
+        self.total = total
+        self.calls = 0
+        self.read = 0
+
+    def __call__(self, query='', size=100, page=0, searchAfter=None, **kwargs):
+        self.calls += 1
+        start = searchAfter[0] + 1 if searchAfter is not None else page * size
+        iocs = [{'value': '10.{}.{}.{}'.format(i >> 16 & 255, i >> 8 & 255, i & 255), 'indicator_type': 'IP',
+                 'id': str(i)} for i in range(start, min(start + size, self.total))]
+        self.read += len(iocs) if searchAfter is not None else start + len(iocs)
+        res = {'iocs': iocs, 'total': self.total}
+        if iocs:
+            res['searchAfter'] = [start + len(iocs) - 1]
+        return res
+
+
+def legacy_find_indicators_loop(indicator_query):
+    """find_indicators_loop of TAXIIServer as it was before IndicatorsSearcher"""
+    iocs = []
+    next_page = 0
+    last_found_len = LEGACY_PAGE_SIZE
+    while last_found_len == LEGACY_PAGE_SIZE:
+        fetched_iocs = demisto.searchIndicators(query=indicator_query, page=next_page,
+                                                size=LEGACY_PAGE_SIZE).get('iocs')
+        iocs.extend(fetched_iocs)
+        last_found_len = len(fetched_iocs)
+        next_page += 1
+    return iocs
+
+
+def main(total=1000000):
+    modes = (
+        ('page loop', lambda: sum(1 for _ in legacy_find_indicators_loop('type:IP'))),
+        ('searcher', lambda: sum(1 for _ in IndicatorsSearcher(query='type:IP'))),
+    )
+    for mode, run in modes:
+        server = FakeIndicatorsServer(total)
+        demisto.searchIndicators = server
+        tracemalloc.start()
+        duration = measure(run)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        report('{:,} indicators - {}'.format(total, mode), duration, total, 'indicators')
+        print('    {:,} server calls, {:,} indicators read by the server, {:,.1f} MB peak memory'.format(
+            server.calls, server.read, peak / 1024 / 1024))
+
+
+if __name__ == '__main__':
+    main()
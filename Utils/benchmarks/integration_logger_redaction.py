@@ -0,0 +1,55 @@
+"""Messages/sec of IntegrationLogger redacting its replace strings from log messages of 200 characters, as the
+number of secrets grows. Each secret is added with add_replace_strs with its base64 form, like the sensitive params.
+    before  - every replace string is replaced with str.replace in turn, as before
+    encode  - IntegrationLogger.encode: the replace strings without duplicates are replaced in turn, or with a
+              single pattern when there are more than REPLACE_PATTERN_MIN_STRS of them
+"""
+import base64
+import random
+import string
+
+from Utils.benchmarks.utils import add_to_path, measure, report
+
+add_to_path()
+import demistomock as demisto  # noqa: E402
+from CommonServerPython import IntegrationLogger  # noqa: E402
+
+MESSAGES = 50000
+
+
+def legacy_redact(replace_strs, message):
+    for s in replace_strs:
+        message = message.replace(s, '<XX_REPLACED>')
+    return message
+
+
+def main():
+    rand = random.Random(0)
+    demisto.params = lambda: {}
+
+    def random_str(length):
+        return ''.join(rand.choice(string.ascii_letters + string.digits) for _ in range(length))
+
+    for secrets_count in (1, 10, 100, 500):
+        logger = IntegrationLogger()
+        secrets = [random_str(rand.randint(8, 40)) for _ in range(secrets_count)]
+        for secret in secrets:
+            logger.add_replace_strs(secret, base64.b64encode(secret.encode('utf-8')).decode('utf-8'))
+        messages = ['GET /api/v1/items?page={} returned 200: {}'.format(i, random_str(160)) for i in range(MESSAGES)]
+        # every 10th message leaks a secret
+        messages[::10] = [message + rand.choice(secrets) for message in messages[::10]]
+
+        results = {}
+        modes = (('before', lambda message: legacy_redact(logger.replace_strs, message)),
+                 ('encode', logger.encode))
+        for mode, redact in modes:
+            def run():
+                results[mode] = [redact(message) for message in messages]
+
+            duration = measure(run)
+            report('{} secrets - {}'.format(secrets_count, mode), duration, MESSAGES, 'messages')
+        assert all('<XX_REPLACED>' in message for message in results['encode'][::10])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""IPs/sec of EDL ips_to_ranges collapsing 10k, 100k and 1M IPv4 addresses to ranges and to CIDRs, with the
+grouping as it was before (every IP is looked up in every group found so far), and with the sorted sweep.
+The grouping before is quadratic, so it is measured only up to LEGACY_MAX_IPS"""
+import random
+
+from netaddr import IPAddress, iprange_to_cidrs
+
+from Utils.benchmarks.utils import add_to_path, measure, report
+
+add_to_path('Packs/Base/Scripts/CommonServerUserPython', 'Packs/EDL/Integrations/EDL')
+from EDL import COLLAPSE_TO_CIDR, COLLAPSE_TO_RANGES, ips_to_ranges  # noqa: E402
+
+LEGACY_MAX_IPS = 10000
+
+
+def legacy_ips_to_ranges(ips, collapse_ips):
+    """ips_to_ranges as it was before the sorted sweep"""
+    ips_range_groups = []
+    ips = sorted(ips)
+    if len(ips) > 0:
+        ips_range_groups.append([ips[0]])
+    if len(ips) > 1:
+        for ip in ips[1:]:
+            appended = False
+            for group in ips_range_groups:
+                if IPAddress(int(ip) + 1) in group or IPAddress(int(ip) - 1) in group:
+                    group.append(ip)
+                    appended = True
+            if not appended:
+                ips_range_groups.append([ip])
+
+    ip_ranges = []
+    for group in ips_range_groups:
+        if len(group) == 1:
+            ip_ranges.append(str(group[0]))
+        elif collapse_ips == COLLAPSE_TO_RANGES:
+            ip_ranges.append(str(group[0]) + "-" + str(group[-1]))
+        else:
+            min_ip, max_ip = group[0], group[-1]
+            moved_ip = False
+            if (int(str(min_ip).split('.')[-1]) % 2) != 0:
+                ip_ranges.append(str(min_ip))
+                min_ip = group[1]
+                moved_ip = True
+            if (int(str(max_ip).split('.')[-1]) % 2) == 0:
+                ip_ranges.append(str(max_ip))
+                max_ip = group[-2]
+                moved_ip = True
+            if not (moved_ip and len(group) == 2):
+                ip_ranges.append(str(iprange_to_cidrs(min_ip, max_ip)[0].cidr))
+    return ip_ranges
+
+
+def build_ips(ips_count, seed=0):
+    """Runs of 1 to 64 consecutive addresses, like blocks of scanners, in random order"""
+    rand = random.Random(seed)
+    ips = []
+    start = int(IPAddress('11.0.0.0'))
+    while len(ips) < ips_count:
+        run = min(rand.randint(1, 64), ips_count - len(ips))
+        ips.extend(IPAddress(start + i) for i in range(run))
+        start += run + rand.randint(1, 256)
+    rand.shuffle(ips)
+    return ips
+
+
+def main():
+    for ips_count in (10000, 100000, 1000000):
+        ips = build_ips(ips_count)
+        for collapse_ips in (COLLAPSE_TO_RANGES, COLLAPSE_TO_CIDR):
+            results = {}
+            modes = (('before', legacy_ips_to_ranges), ('sweep', ips_to_ranges))
+            for mode, collapse in modes:
+                if mode == 'before' and ips_count > LEGACY_MAX_IPS:
+                    continue
+
+                def run():
+                    results[mode] = collapse(ips, collapse_ips)
+
+                duration = measure(run)
+                report('{:,} IPs - {} - {} ({:,} entries)'.format(ips_count, collapse_ips, mode, len(results[mode])),
+                       duration, ips_count, 'IPs')
+            if collapse_ips == COLLAPSE_TO_RANGES and 'before' in results:
+                assert sorted(results['before']) == sorted(results['sweep'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Peak memory and indicators/sec of JSONFeedApiModule fetch-indicators on a large AWS-like feed.
+
+Each mode runs in its own process, so its peak RSS is not mixed with the feed server or the other mode:
+    whole   - the feed is parsed with r.json(), searched with jmespath.search and all the fields of every item
+              are flattened, collecting all the indicators before submitting them, as before
+    stream  - feed_main, which parses the items of the array while the feed is downloaded,
+              flattens only the mapped fields and submits batches
+"""
+import json
+import subprocess
+import sys
+import time
+
+from Utils.benchmarks.http_feed_streaming import peak_rss_mb
+from Utils.benchmarks.utils import StubHandler, StubServer, add_to_path, report
+
+JSON_FEED_DIRS = ('Packs/Base/Scripts/CommonServerUserPython', 'Packs/ApiModules/Scripts/JSONFeedApiModule')
+EXTRACTOR = "prefixes[?service=='AMAZON']"
+MAPPING = {'region': 'Region'}
+
+
+class FeedHandler(StubHandler):
+    body = b''
+
+    def respond(self):
+        return 200, {'Content-Type': 'application/json'}, self.body
+
+
+def run_fetch(mode, url):
+    add_to_path(*JSON_FEED_DIRS)
+    import demistomock as demisto
+    import jmespath
+    import requests
+    import JSONFeedApiModule
+
+    created = [0]
+
+    def create_indicators(indicators):
+        created[0] += len(indicators)
+
+    params = {'url': url, 'feed_name_to_config': {'AMAZON': {
+        'url': url, 'extractor': EXTRACTOR, 'indicator': 'ip_prefix', 'indicator_type': 'CIDR', 'mapping': MAPPING}}}
+    demisto.command = lambda: 'fetch-indicators'
+    demisto.createIndicators = create_indicators
+
+    start = time.time()
+    if mode == 'whole':
+        indicators = []
+        for item in jmespath.search(EXTRACTOR, requests.get(url).json()):
+            indicator = {'value': item['ip_prefix'], 'type': 'CIDR', 'fields': {'tags': []}, 'rawJSON': item}
+            attributes = {'source_name': 'AMAZON', 'value': item['ip_prefix'], 'type': 'CIDR'}
+            attributes.update(JSONFeedApiModule.extract_all_fields_from_indicator(item, 'ip_prefix'))
+            for key in MAPPING:
+                if key in attributes:
+                    indicator['fields'][MAPPING[key]] = attributes[key]
+            indicators.append(indicator)
+        for b in JSONFeedApiModule.iter_indicator_batches(indicators):
+            demisto.createIndicators(b)
+    else:
+        JSONFeedApiModule.feed_main(params, 'benchmark', '')
+    duration = time.time() - start
+    report('{} - peak RSS {:,.0f} MB'.format(mode, peak_rss_mb()), duration, created[0], 'indicators')
+
+
+def main(items_count=1000000):
+    services = ('AMAZON', 'EC2', 'S3', 'CLOUDFRONT')
+    prefixes = ({'ip_prefix': '{}.{}.{}.0/24'.format(i >> 16 & 255, i >> 8 & 255, i & 255),
+                 'region': 'us-east-{}'.format(i % 3), 'service': services[i % 4] if i % 2 else 'AMAZON',
+                 'network_border_group': 'us-east-{}'.format(i % 3)} for i in range(items_count))
+    FeedHandler.body = ('{"syncToken": "1", "createDate": "2020-09-01-10-00-00", "prefixes": ['
+                        + ', '.join(json.dumps(prefix) for prefix in prefixes) + ']}').encode('utf-8')
+    with StubServer(FeedHandler) as server:
+        for mode in ('whole', 'stream'):
+            subprocess.check_call([sys.executable, '-m', 'Utils.benchmarks.json_feed_streaming', mode, server.url])
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3:
+        run_fetch(*sys.argv[1:])
+    else:
+        main(*map(int, sys.argv[1:]))
@@ -0,0 +1,117 @@
+"""Rows/sec and peak memory of tableToMarkdown on search results of 50k rows, like the ones of the Splunk, QRadar and
+Elasticsearch search commands, with and without removeNull:
+    before      - tableToMarkdown as it was: the string is concatenated cell by cell, and removeNull scans all the
+                  rows once per header
+    after       - tableToMarkdown, which joins a list of the rows, detects the empty columns in a single pass and
+                  formats and escapes only the cells which need it
+    max rows    - tableToMarkdown with max_rows=1000 and max_cell_length=100
+The output of tableToMarkdown is compared to the output of the legacy function.
+"""
+import random
+import tracemalloc
+
+from Utils.benchmarks.utils import add_to_path, measure, report
+
+add_to_path()
+from CommonServerPython import STRING_TYPES, formatCell, stringEscapeMD, tableToMarkdown  # noqa: E402
+
+ROWS = 50000
+
+
+def legacy_table_to_markdown(name, t, headers=None, headerTransform=None, removeNull=False, metadata=None):
+    """tableToMarkdown as it was before"""
+    mdResult = ''
+    if name:
+        mdResult = '### ' + name + '\n'
+    if metadata:
+        mdResult += metadata + '\n'
+    if not t or len(t) == 0:
+        mdResult += '**No entries.**\n'
+        return mdResult
+    if not isinstance(t, list):
+        t = [t]
+    if headers and isinstance(headers, STRING_TYPES):
+        headers = [headers]
+    if not isinstance(t[0], dict):
+        header = headers[0]
+        t = map(lambda item: dict((h, item) for h in [header]), t)
+    if not headers:
+        headers = list(t[0].keys())
+        headers.sort()
+    if removeNull:
+        headers_aux = headers[:]
+        for header in headers_aux:
+            if all(obj.get(header) in ('', None, [], {}) for obj in t):
+                headers.remove(header)
+    if t and len(headers) > 0:
+        newHeaders = []
+        if headerTransform is None:  # noqa
+            def headerTransform(s): return stringEscapeMD(s, True, True)  # noqa
+        for header in headers:
+            newHeaders.append(headerTransform(header))
+        mdResult += '|'
+        if len(newHeaders) == 1:
+            mdResult += newHeaders[0]
+        else:
+            mdResult += '|'.join(newHeaders)
+        mdResult += '|\n'
+        sep = '---'
+        mdResult += '|' + '|'.join([sep] * len(headers)) + '|\n'
+        for entry in t:
+            vals = [stringEscapeMD((formatCell(entry.get(h, ''), False) if entry.get(h) is not None else ''),
+                                   True, True) for h in headers]
+            mdResult += '| '
+            mdResult += ' | '.join(vals)
+            mdResult += ' |\n'
+    else:
+        mdResult += '**No entries.**\n'
+    return mdResult
+
+
+def build_rows(count, seed=0):
+    rand = random.Random(seed)
+    rows = []
+    for i in range(count):
+        rows.append({
+            '_time': '2021-03-{:02d}T{:02d}:{:02d}:00.000+00:00'.format(
+                rand.randint(1, 28), rand.randint(0, 23), rand.randint(0, 59)),
+            'host': 'host-{}.example.com'.format(rand.randint(0, 500)),
+            'source': '/var/log/{}.log'.format(rand.choice(['auth', 'syslog', 'nginx/access'])),
+            'src_ip': '10.0.{}.{}'.format(rand.randint(0, 255), rand.randint(0, 255)),
+            'dest_port': rand.choice([22, 80, 443, 8080]),
+            'user': rand.choice(['root', 'admin', 'svc|backup', None]),
+            'tags': rand.sample(['auth', 'failed', 'vpn', 'internal'], 2),
+            'raw': 'Mar {} sshd[{}]: Failed password for root from 10.0.0.1\nport 22 ssh2'.format(
+                rand.randint(1, 28), rand.randint(1000, 9999)),
+            'comment': '',
+            'empty': None,
+        })
+    return rows
+
+
+def main(count=ROWS):
+    rows = build_rows(count)
+    for remove_null in (False, True):
+        expected = legacy_table_to_markdown('Search results', rows, removeNull=remove_null)
+        modes = (
+            ('before', lambda: legacy_table_to_markdown('Search results', rows, removeNull=remove_null)),
+            ('after', lambda: tableToMarkdown('Search results', rows, removeNull=remove_null)),
+            ('max rows', lambda: tableToMarkdown('Search results', rows, removeNull=remove_null, max_rows=1000,
+                                                 max_cell_length=100)),
+        )
+        for mode, run in modes:
+            results = []
+            duration = measure(lambda: results.append(run()))
+            if mode == 'after':
+                assert results[0] == expected
+            # the memory is traced apart, as tracing slows down the measured run
+            tracemalloc.start()
+            run()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            report('{:,} rows, removeNull={} - {}'.format(count, remove_null, mode), duration, count, 'rows')
+            print('    {:,.1f} MB peak memory, {:,} characters'.format(peak / 1024 / 1024, len(results[0])))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Objects/sec of TAXII2ApiModule parsing a 100k-object STIX bundle, with the parsing as it was before
+(a deep copy of the STIX object per indicator, four regex passes over each pattern and both modified times
+parsed for every object), and as it is now"""
+import copy
+import re
+
+from Utils.benchmarks.utils import add_to_path, measure, report
+
+add_to_path('Packs/Base/Scripts/CommonServerUserPython', 'Packs/ApiModules/Scripts/TAXII2ApiModule')
+from TAXII2ApiModule import (CIDR_ISSUBSET_VAL_PATTERN, CIDR_ISUPPERSET_VAL_PATTERN,  # noqa: E402
+                             HASHES_EQUALS_VAL_PATTERN, INDICATOR_EQUALS_VAL_PATTERN,
+                             STIX_2_TYPES_TO_CORTEX_CIDR_TYPES, STIX_2_TYPES_TO_CORTEX_TYPES, Taxii2FeedClient)
+
+PATTERNS = (
+    "[ipv4-addr:value = '10.{0}.{1}.{2}']",
+    "[domain-name:value = 'host{3}.example.com' OR url:value = 'https://host{3}.example.com/path']",
+    "[file:hashes.'SHA-256' = '{3:064x}']",
+    "[ipv4-addr:value ISSUBSET '10.{0}.{1}.0/24']",
+)
+
+
+class LegacyTaxii2FeedClient(Taxii2FeedClient):
+    """The parsing of Taxii2FeedClient as it was before"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.indicator_regexes = [re.compile(INDICATOR_EQUALS_VAL_PATTERN), re.compile(HASHES_EQUALS_VAL_PATTERN)]
+        self.cidr_regexes = [re.compile(CIDR_ISSUBSET_VAL_PATTERN), re.compile(CIDR_ISUPPERSET_VAL_PATTERN)]
+
+    def parse_indicators_list(self, indicators_objs):
+        indicators = []
+        for indicator_obj in indicators_objs:
+            indicators.extend(self.parse_single_indicator(indicator_obj))
+            indicator_modified_str = indicator_obj.get("modified")
+            if self.last_fetched_indicator__modified is None:
+                self.last_fetched_indicator__modified = indicator_modified_str
+            elif self.stix_time_to_datetime(indicator_modified_str) > self.stix_time_to_datetime(
+                    self.last_fetched_indicator__modified):
+                self.last_fetched_indicator__modified = indicator_modified_str
+        return indicators
+
+    def parse_single_indicator(self, indicator_obj):
+        indicators = []
+        trimmed_pattern = indicator_obj.get("pattern").replace(" ", "")
+        indicator_groups = self.extract_indicator_groups_from_pattern(trimmed_pattern, self.indicator_regexes)
+        indicators.extend(self.get_indicators_from_indicator_groups(
+            indicator_groups, indicator_obj, STIX_2_TYPES_TO_CORTEX_TYPES, self.field_map))
+        cidr_groups = self.extract_indicator_groups_from_pattern(trimmed_pattern, self.cidr_regexes)
+        indicators.extend(self.get_indicators_from_indicator_groups(
+            cidr_groups, indicator_obj, STIX_2_TYPES_TO_CORTEX_CIDR_TYPES, self.field_map))
+        return indicators
+
+    def create_indicator(self, indicator_obj, type_, value, field_map):
+        return super().create_indicator(copy.deepcopy(indicator_obj), type_, value, field_map)
+
+
+def build_bundle(objects_count):
+    objects = []
+    for i in range(objects_count):
+        objects.append({
+            'type': 'indicator',
+            'spec_version': '2.1',
+            'id': 'indicator--{:08x}-0000-4000-8000-000000000000'.format(i),
+            'created': '2020-06-10T01:14:33.126Z',
+            'modified': '2020-06-{:02d}T01:{:02d}:{:02d}.{:03d}Z'.format(i % 28 + 1, i % 60, i // 60 % 60, i % 1000),
+            'name': 'indicator {}'.format(i),
+            'description': 'A benchmark indicator',
+            'labels': ['malicious-activity', 'benchmark'],
+            'pattern': PATTERNS[i % len(PATTERNS)].format(i >> 16 & 255, i >> 8 & 255, i & 255, i),
+            'pattern_type': 'stix',
+            'valid_from': '2020-06-10T01:14:33.126Z',
+            'kill_chain_phases': [{'kill_chain_name': 'lockheed-martin-cyber-kill-chain', 'phase_name': 'delivery'}],
+            'external_references': [{'source_name': 'benchmark', 'url': 'https://example.com/{}'.format(i),
+                                     'external_id': 'BM-{}'.format(i)}],
+        })
+    return {'type': 'bundle', 'id': 'bundle--1', 'objects': objects}
+
+
+def main(objects_count=100000):
+    bundle = build_bundle(objects_count)
+    client_kwargs = dict(url='', collection_to_fetch='', proxies=[], verify=False, tlp_color='GREEN',
+                         field_map={'name': 'name'})
+    results = {}
+    for name, client_class in (('before', LegacyTaxii2FeedClient), ('now', Taxii2FeedClient)):
+        client = client_class(**client_kwargs)
+
+        def run():
+            results[name] = client.extract_indicators_from_envelope_and_parse(bundle)
+
+        report(name, measure(run), objects_count, 'objects')
+        results[name + ' modified'] = client.last_fetched_indicator__modified
+    assert results['before'] == results['now']
+    assert results['before modified'] == results['now modified']
+
+
+if __name__ == '__main__':
+    main()
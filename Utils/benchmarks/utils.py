@@ -0,0 +1,113 @@
+"""Shared helpers for the micro-benchmarks in this directory.
+
+The benchmarks are plain scripts, run them from the content root, e.g.:
+    python -m Utils.benchmarks.docker_python_loop_code_cache
+"""
+import io
+import os
+import socket
+import sys
+import threading
+import time
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+CONTENT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+COMMON_SERVER_PYTHON_DIR = os.path.join(CONTENT_ROOT, 'Packs', 'Base', 'Scripts', 'CommonServerPython')
+DEMISTOMOCK_DIR = os.path.join(CONTENT_ROOT, 'Tests', 'demistomock')
+
+
+def add_to_path(*relative_dirs):
+    """ Make demistomock, CommonServerPython and the given content dirs importable, like in the docker images """
+    for directory in (DEMISTOMOCK_DIR, COMMON_SERVER_PYTHON_DIR) + tuple(
+            os.path.join(CONTENT_ROOT, d) for d in relative_dirs):
+        if directory not in sys.path:
+            sys.path.insert(0, directory)
+
+
+def load_common_server_python():
+    """ Return CommonServerPython as the server sends it to the docker loop, without the imports it strips out """
+    with io.open(os.path.join(COMMON_SERVER_PYTHON_DIR, 'CommonServerPython.py'), encoding='utf-8') as f:
+        lines = f.read().splitlines(True)
+    return ''.join(line for line in lines
+                   if not line.startswith(('from __future__ import', 'import demistomock as demisto')))
+
+
+def measure(func, repeat=1):
+    """ Run func repeat times and return the average duration of a run in seconds """
+    start = time.time()
+    for _ in range(repeat):
+        func()
+    return (time.time() - start) / repeat
+
+
+def report(name, seconds, count=None, unit='items'):
+    line = '{:<50} {:>12.3f} ms'.format(name, seconds * 1000)
+    if count:
+        line += '  {:>14,.0f} {}/sec'.format(count / seconds if seconds else float('inf'), unit)
+    print(line)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers every request with a small json body over keep-alive connections. Override respond() to change it"""
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        BaseHTTPRequestHandler.setup(self)
+        # headers and body are written apart, without this every keep-alive response waits for a delayed ack
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def respond(self):
+        return 200, {}, b'{"ok": true}'
+
+    def _handle(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length:
+            self.rfile.read(length)
+        with self.server.lock:
+            self.server.requests += 1
+        status, headers, body = self.respond()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Type', headers.get('Content-Type', 'application/json'))
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = _handle
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    """Local HTTP server running in a background thread, counting the connections and requests it handled"""
+    daemon_threads = True
+
+    def __init__(self, handler_class=StubHandler):
+        HTTPServer.__init__(self, ('127.0.0.1', 0), handler_class)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = 0
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}/'.format(self.server_address[1])
+
+    def __enter__(self):
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,118 @@
+"""MB/sec and peak memory of converting PAN-OS API responses of several MB, a traffic log query result and a
+configuration, to a dictionary, as Panorama's http_request does:
+    before      - json.loads(xml2json(...)) as it was: the element tree is parsed, converted recursively to
+                  OrderedDicts, dumped to a JSON string and loaded back
+    xml2json    - json.loads(xml2json(...)), where xml2json builds the OrderedDicts from the parser events
+    xml2dict    - xml2dict, which builds the dictionaries from the parser events, without the tree and the JSON
+The dictionaries of all the modes are compared to the dictionary of before.
+"""
+import json
+import random
+import tracemalloc
+from collections import OrderedDict
+import xml.etree.ElementTree as ET
+
+from Utils.benchmarks.utils import add_to_path, measure, report
+
+add_to_path()
+from CommonServerPython import strip_tag, xml2dict, xml2json  # noqa: E402
+
+LOG_FIELDS = ['domain', 'receive_time', 'serial', 'seqno', 'actionflags', 'type', 'subtype', 'config_ver',
+              'time_generated', 'src', 'dst', 'natsrc', 'natdst', 'rule', 'srcuser', 'dstuser', 'app', 'vsys', 'from',
+              'to', 'inbound_if', 'outbound_if', 'logset', 'time_received', 'sessionid', 'repeatcnt', 'sport',
+              'dport', 'natsport', 'natdport', 'flags', 'proto', 'action', 'bytes', 'bytes_sent', 'bytes_received',
+              'packets', 'start', 'elapsed', 'category', 'device_name']
+
+
+def legacy_elem_to_internal(elem, strip_ns=1, strip=1):
+    """elem_to_internal as it was before"""
+    d = OrderedDict()  # type: dict
+    elem_tag = strip_tag(elem.tag) if strip_ns else elem.tag
+    for key, value in list(elem.attrib.items()):
+        d['@' + key] = value
+    for subelem in elem:
+        v = legacy_elem_to_internal(subelem, strip_ns=strip_ns, strip=strip)
+        tag = strip_tag(subelem.tag) if strip_ns else subelem.tag
+        value = v[tag]
+        try:
+            d[tag].append(value)
+        except AttributeError:
+            d[tag] = [d[tag], value]
+        except KeyError:
+            d[tag] = value
+    text = elem.text
+    tail = elem.tail
+    if strip:
+        if text:
+            text = text.strip()
+        if tail:
+            tail = tail.strip()
+    if tail:
+        d['#tail'] = tail
+    if d:
+        if text:
+            d["#text"] = text
+    else:
+        d = text or None  # type: ignore
+    return {elem_tag: d}
+
+
+def legacy_xml2json(xmlstring):
+    return json.dumps(legacy_elem_to_internal(ET.fromstring(xmlstring)))
+
+
+def traffic_logs(count, seed=0):
+    rand = random.Random(seed)
+    parts = ['<response status="success"><result><job><tenq>10:00:00</tenq><id>1</id><status>FIN</status></job>'
+             '<log><logs count="{}" progress="100">'.format(count)]
+    for i in range(count):
+        parts.append('<entry logid="{}">'.format(7000000 + i))
+        parts.extend('<{0}>{1}</{0}>'.format(field, rand.randint(0, 10 ** rand.randint(1, 9))) for field in LOG_FIELDS)
+        parts.append('<member>internal</member><member>vpn &amp; remote</member><padding/></entry>')
+    parts.append('</logs></log></result></response>')
+    return ''.join(parts)
+
+
+def configuration(count, seed=0):
+    rand = random.Random(seed)
+    parts = ['<response status="success" code="19"><result total-count="1" count="1">\n<rules admin="admin">\n']
+    for i in range(count):
+        parts.append('  <entry name="rule-{0}" uuid="{0:08x}-0000-4000-8000-000000000000">\n'.format(i))
+        for field in ('from', 'to', 'source', 'destination', 'application', 'service'):
+            members = ''.join('\n      <member>{}-{}</member>'.format(field, rand.randint(0, 999))
+                              for _ in range(rand.randint(1, 4)))
+            parts.append('    <{0}>{1}\n    </{0}>\n'.format(field, members))
+        parts.append('    <action>{}</action>\n    <description>rule {}</description>\n  </entry>\n'.format(
+            rand.choice(['allow', 'deny', 'drop']), i))
+    parts.append('</rules></result></response>')
+    return ''.join(parts)
+
+
+def main():
+    responses = (('traffic logs', traffic_logs, (2000, 10000, 20000)), ('configuration', configuration, (20000,)))
+    for name, build, counts in responses:
+        for count in counts:
+            response = build(count)
+            megabytes = len(response) / 1024.0 / 1024
+            expected = json.loads(legacy_xml2json(response))
+            modes = (
+                ('before', lambda: json.loads(legacy_xml2json(response))),
+                ('xml2json', lambda: json.loads(xml2json(response))),
+                ('xml2dict', lambda: xml2dict(response)),
+            )
+            for mode, run in modes:
+                results = []
+                duration = measure(lambda: results.append(run()))
+                assert results[0] == expected, mode
+                del results[:]
+                # the memory is traced apart, as tracing slows down the measured run
+                tracemalloc.start()
+                run()
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                report('{:.1f} MB {} - {}'.format(megabytes, name, mode), duration, megabytes, 'MB')
+                print('    {:,.1f} MB peak memory'.format(peak / 1024.0 / 1024))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,501 @@
+import codecs
+import json
+import os
+import subprocess
+import sys
+import time
+from decimal import Decimal
+
+import pytest
+
+from Utils._script_docker_python_loop import (CodeCache, JSONCodec, OrjsonCodec, Protocol, UjsonCodec,
+                                              get_json_codec)
+
+LOOP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '_script_docker_python_loop.py')
+
+
+class StandInServer(object):
+    """Runs the docker python loop in a sub process and plays the part of the Demisto server"""
+
+    def __init__(self, env=None):
+        full_env = dict(os.environ)
+        full_env.update(env or {})
+        self.process = subprocess.Popen([sys.executable, LOOP_PATH], stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        env=full_env)
+        self._buffer = ''
+        self._position = 0
+        self._decoder = json.JSONDecoder()
+        self._utf8_decoder = codecs.getincrementaldecoder('utf-8')()
+
+    def send(self, line):
+        self.process.stdin.write((line + '\n').encode('utf-8'))
+        self.process.stdin.flush()
+
+    def read_message(self):
+        while True:
+            # skip the separators, the loop terminates some of its messages with a literal '\\n'
+            while self._position < len(self._buffer):
+                if self._buffer[self._position].isspace():
+                    self._position += 1
+                elif self._buffer.startswith('\\n', self._position):
+                    self._position += 2
+                else:
+                    break
+            if self._position < len(self._buffer):
+                try:
+                    message, self._position = self._decoder.raw_decode(self._buffer, self._position)
+                    return message
+                except ValueError:
+                    pass
+            chunk = os.read(self.process.stdout.fileno(), 65536)
+            if not chunk:
+                raise EOFError('the loop has exited')
+            self._buffer = self._buffer[self._position:] + self._utf8_decoder.decode(chunk)
+            self._position = 0
+
+    def run_script(self, script, integration=False, args=None, replies=None):
+        """ Executes the script and returns all the messages sent by the loop until the script completed """
+        self.send('ping')
+        assert self.read_message() == {'type': 'pong'}
+        self.send(json.dumps({
+            'script': script,
+            'integration': integration,
+            'native': False,
+            'args': args or {},
+            'context': {},
+        }))
+        messages = []
+        while True:
+            message = self.read_message()
+            messages.append(message)
+            if message['type'] == 'completed':
+                return messages
+            if message['type'] in ('log', 'execute', 'executeCommand'):
+                self.send(json.dumps((replies or {}).get(message.get('command'), {})))
+
+    def close(self):
+        self.process.stdin.close()
+        self.process.wait()
+        self.process.stdout.close()
+
+
+@pytest.fixture
+def server():
+    stand_in = StandInServer()
+    yield stand_in
+    stand_in.close()
+
+
+class TestCodeCache:
+    def test_compile_hit(self):
+        cache = CodeCache()
+        first = cache.compile('x = 1')
+        second = cache.compile('x = 1')
+        assert first is second
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_evict_by_entries(self):
+        cache = CodeCache(max_entries=2)
+        first = cache.compile('x = 1')
+        cache.compile('x = 2')
+        cache.compile('x = 1')  # x = 1 is now the most recently used
+        cache.compile('x = 3')
+        assert len(cache) == 2
+        assert cache.compile('x = 1') is first
+        assert cache.misses == 3
+
+    def test_evict_by_size(self):
+        cache = CodeCache(max_bytes=8)
+        cache.compile('x = 1')
+        cache.compile('y = 2')
+        assert len(cache) == 1
+        assert cache.size == len('y = 2')
+        # an entry larger than the limit is still kept, as it is the most recent one
+        cache.compile('z = 3333333333')
+        assert len(cache) == 1
+
+    def test_disabled(self):
+        cache = CodeCache(max_entries=0)
+        assert cache.compile('x = 1') is not cache.compile('x = 1')
+        assert len(cache) == 0
+
+    def test_unicode_source(self):
+        cache = CodeCache()
+        namespace = {}
+        exec(cache.compile(u'x = u"שלום"'), namespace)
+        assert namespace['x'] == u'שלום'
+
+
+def test_loop_runs_scripts(server):
+    messages = server.run_script('demisto.results(demisto.args()["value"])', args={'value': 'first'})
+    assert messages[0] == {'type': 'result', 'results': [{'Type': 1, 'Contents': 'first', 'ContentsFormat': 'text'}]}
+    assert messages[-1] == {'type': 'completed'}
+
+    # the same script again, this time from the code cache
+    messages = server.run_script('demisto.results(demisto.args()["value"])', args={'value': 'second'})
+    assert messages[0]['results'][0]['Contents'] == 'second'
+
+
+def test_loop_reports_exceptions(server):
+    messages = server.run_script('raise ValueError("bad input")')
+    assert messages[0]['type'] == 'exception'
+    assert 'ValueError: bad input' in ''.join(messages[0]['args']['exception'])
+    assert messages[-1] == {'type': 'completed'}
+
+
+PRELUDE = '''
+def get_value():
+    return demisto.args()['value']
+
+
+def describe():
+    return 'value: ' + get_value()
+
+
+def reset_module_state():
+    global RUNS
+    RUNS = 0
+
+
+RUNS = 0
+
+# ###END_OF_COMMON_SERVER_PYTHON###
+'''
+
+
+def test_loop_module_snapshot(server):
+    messages = server.run_script(PRELUDE + 'RUNS += 1\ndemisto.results([describe(), str(RUNS)])', args={'value': 'a'})
+    assert [r['Contents'] for r in messages[0]['results']] == ['value: a', '1']
+
+    # the script overrides a function of the module, like CommonServerUserPython may do
+    overriding_script = 'def get_value():\n    return "overridden"\n\nRUNS += 1\ndemisto.results([describe(), str(RUNS)])'
+    messages = server.run_script(PRELUDE + overriding_script, args={'value': 'b'})
+    assert [r['Contents'] for r in messages[0]['results']] == ['value: overridden', '1']
+
+    # the override is rolled back after the run
+    messages = server.run_script(PRELUDE + 'demisto.results(describe())', args={'value': 'c'})
+    assert messages[0]['results'][0]['Contents'] == 'value: c'
+
+
+COMMON_SERVER_PYTHON_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+                                         'Packs', 'Base', 'Scripts', 'CommonServerPython', 'CommonServerPython.py')
+
+DEBUG_STATE_SCRIPT = '''
+import http.client
+import logging
+demisto.results(json.dumps([http.client.HTTPConnection.debuglevel, len(logging.getLogger().handlers),
+                            _requests_logger is None]))
+'''
+
+
+@pytest.mark.skipif(sys.version_info[0] < 3, reason='the debug-mode logger patches http.client in python 3 only')
+def test_loop_module_snapshot_debug_mode(server):
+    """
+    Given:
+        - CommonServerPython, executed for the first time in debug-mode
+    When:
+        - running scripts after it without debug-mode, and after a script which started debug-mode itself
+    Then:
+        - the debug-mode logging of a run does not leak into the next runs
+    """
+    with open(COMMON_SERVER_PYTHON_PATH) as f:
+        common_server_python = f.read()
+    # demisto is the one of the template, and is_debug is set on it by the server, which the loop runs without
+    future_import = 'from __future__ import print_function\n'
+    prelude = common_server_python.replace('import demistomock as demisto\n', '').replace(
+        future_import, future_import + "demisto.is_debug = demisto.args().get('debug-mode') == 'true'\n", 1)
+
+    def run(script, args=None):
+        messages = server.run_script(prelude + script, args=args)
+        return json.loads([m for m in messages if m['type'] == 'result'][0]['results'][0]['Contents'])
+
+    assert run(DEBUG_STATE_SCRIPT, {'debug-mode': 'true'}) == [1, 1, False]
+    normal_state = run(DEBUG_STATE_SCRIPT)
+    assert normal_state[0] == 0
+    assert normal_state[2] is True
+
+    assert run('demisto.is_debug = True\nreset_module_state()\n' + DEBUG_STATE_SCRIPT) == [1, 1, False]
+    assert run(DEBUG_STATE_SCRIPT) == normal_state
+
+
+def test_loop_module_snapshot_scripts_run_as_main(server):
+    script = PRELUDE + 'if __name__ in ("__main__", "__builtin__", "builtins"):\n    demisto.results("main")'
+    for _ in range(2):
+        assert server.run_script(script)[0]['results'][0]['Contents'] == 'main'
+
+
+MUTABLE_PRELUDE = '''
+MAPPING = {'key': ['value']}
+
+
+class Holder(object):
+    value = 'original'
+    values = []
+
+    class Nested(object):
+        value = 'original'
+
+# ###END_OF_COMMON_SERVER_PYTHON###
+'''
+
+MUTABLE_STATE_SCRIPT = '''
+demisto.results(json.dumps([MAPPING, Holder.value, Holder.values, Holder.Nested.value, hasattr(Holder, 'extra')]))
+MAPPING['key'].append('changed')
+MAPPING['other'] = 1
+Holder.value = 'changed'
+Holder.values.append('changed')
+Holder.Nested.value = 'changed'
+Holder.extra = 1
+'''
+
+
+def test_loop_module_snapshot_mutable_state(server):
+    """
+    Given:
+        - a module which defines a dict and a class with a nested class
+    When:
+        - running scripts which mutate them
+    Then:
+        - each run sees the module as it was defined
+    """
+    script = MUTABLE_PRELUDE + 'import json\n' + MUTABLE_STATE_SCRIPT
+    for _ in range(2):
+        state = json.loads(server.run_script(script)[0]['results'][0]['Contents'])
+        assert state == [{'key': ['value']}, 'original', [], 'original', False]
+
+
+def test_loop_module_snapshot_line_numbers():
+    script = PRELUDE + '\n\nraise ValueError("line numbers")'
+    tracebacks = []
+    for snapshot in ('true', 'false'):
+        stand_in = StandInServer(env={'DEMISTO_LOOP_MODULE_SNAPSHOT': snapshot})
+        try:
+            tracebacks.append(stand_in.run_script(script)[0]['args']['exception'][-2:])
+        finally:
+            stand_in.close()
+    assert tracebacks[0] == tracebacks[1]
+
+
+LOGGING_SCRIPT = '''
+for i in range(250):
+    demisto.info('info {}'.format(i))
+    print('print {}'.format(i))
+    demisto.results('result {}'.format(i))
+res = demisto.executeCommand('getList', {'listName': 'list'})
+demisto.debug('after request')
+demisto.results(res[0]['Contents'])
+'''
+
+
+@pytest.mark.parametrize('batch', ['true', 'false'])
+def test_loop_batched_messages(batch):
+    stand_in = StandInServer(env={'DEMISTO_LOOP_BATCH_MESSAGES': batch})
+    try:
+        messages = stand_in.run_script(LOGGING_SCRIPT, replies={'getList': [{'Contents': 'list content'}]})
+    finally:
+        stand_in.close()
+
+    assert len(messages) == 250 * 3 + 4
+    assert messages[0] == {'type': 'log', 'command': 'info', 'args': {'args': ['info 0']}}
+    assert messages[1] == {'type': 'entryLog', 'args': {'message': 'print 0'}}
+    assert messages[2]['results'][0]['Contents'] == 'result 0'
+    assert messages[-5]['results'][0]['Contents'] == 'result 249'
+    # the pending messages are written before the request
+    assert messages[-4] == {'type': 'executeCommand', 'command': 'getList', 'args': {'listName': 'list'}}
+    assert messages[-3]['args'] == {'args': ['after request']}
+    assert messages[-2]['results'][0]['Contents'] == 'list content'
+    assert messages[-1] == {'type': 'completed'}
+
+
+def test_loop_batched_messages_on_exception():
+    stand_in = StandInServer(env={'DEMISTO_LOOP_BATCH_MESSAGES': 'true'})
+    try:
+        messages = stand_in.run_script('demisto.debug("before")\nraise ValueError("failed")')
+    finally:
+        stand_in.close()
+    assert [m['type'] for m in messages] == ['log', 'exception', 'completed']
+
+
+def test_protocol_max_delay_timer():
+    """ The pending messages are written once max_delay passed, without another message of the script """
+    protocol = Protocol(batch=True, max_delay=0.05)
+    written = []
+    protocol._write = written.append
+    protocol.send({'type': 'entryLog', 'args': {'message': 'first'}})
+    protocol.send({'type': 'entryLog', 'args': {'message': 'second'}})
+    assert written == []
+
+    deadline = time.time() + 5
+    while not written and time.time() < deadline:
+        time.sleep(0.01)
+    assert [json.loads(line)['args']['message'] for line in written[0].splitlines()] == ['first', 'second']
+    assert protocol._timer is None
+
+
+def test_protocol_max_delay_timer_error():
+    """ An error reply read by the timer is raised by the next call of the script """
+    protocol = Protocol(batch=True, max_delay=0.05)
+    written = []
+    protocol._write = written.append
+
+    def read_reply():
+        raise ValueError('server failed')
+    protocol._read_reply = read_reply
+
+    protocol.send({'type': 'log', 'command': 'error', 'args': {'args': ['first']}}, expects_reply=True)
+    protocol._timer.join(5)
+    assert len(written) == 1
+    with pytest.raises(ValueError, match='server failed'):
+        protocol.send({'type': 'entryLog', 'args': {'message': 'second'}})
+    assert len(written) == 2
+    protocol.flush()
+
+
+def test_protocol_max_delay_timer_cancelled():
+    """ The timer of a batch which was already flushed does not write """
+    protocol = Protocol(batch=True, max_delay=0.05)
+    written = []
+    protocol._write = written.append
+    protocol.send({'type': 'entryLog', 'args': {'message': 'first'}})
+    timer = protocol._timer
+    protocol.flush()
+    timer.join(5)
+    assert len(written) == 1
+    assert protocol._timer is None
+
+
+def available_codecs():
+    codecs = [JSONCodec()]
+    for codec_class in (UjsonCodec, OrjsonCodec):
+        try:
+            codecs.append(codec_class())
+        except ImportError:
+            pass
+    return codecs
+
+
+CODEC_VALUES = [
+    {'type': 'result', 'results': [{'Type': 1, 'Contents': 'text', 'ContentsFormat': 'text'}]},
+    u'\u05e9\u05dc\u05d5\u05dd \u00e9 \U0001f600 \u2028',
+    'quotes " and \\ backslash / slash \n\t\x00 controls',
+    {1: 'int key', 2.5: 'float key', None: 'none key', False: 'bool key'},
+    [2 ** 63 - 1, -2 ** 63, 2 ** 70, 0.1, 0.1 + 0.2, 2.0 / 3, 1e-300, 1.7976931348623157e308, True, None],
+    {'nested': [{'a': [[], {}]}], 'empty': ''},
+]
+
+
+@pytest.mark.parametrize('codec', available_codecs(), ids=lambda c: c.name)
+class TestJSONCodecs:
+    @pytest.mark.parametrize('value', CODEC_VALUES)
+    def test_dumps_compatible(self, codec, value):
+        data = codec.dumps(value)
+        assert isinstance(data, str)
+        assert all(ord(c) < 128 for c in data)
+        assert json.loads(data) == json.loads(json.dumps(value))
+
+    @pytest.mark.parametrize('value', CODEC_VALUES)
+    def test_loads_compatible(self, codec, value):
+        data = json.dumps(value)
+        assert codec.loads(data) == json.loads(data)
+        assert codec.loads(data + '\n') == json.loads(data)
+
+    @pytest.mark.parametrize('data', ['NaN', '[Infinity]', '"\\ud800"', '123456789012345678901234567890',
+                                      '[-9223372036854775809]'])
+    def test_loads_fallback(self, codec, data):
+        loaded = codec.loads(data)
+        expected = json.loads(data)
+        assert repr(loaded) == repr(expected)
+
+    def test_loads_unicode_types(self, codec):
+        loaded = codec.loads('{"key": "\\u05e9", "ascii": "value"}')
+        expected = json.loads('{"key": "\\u05e9", "ascii": "value"}')
+        assert loaded == expected
+        assert [type(v) for v in loaded.values()] == [type(v) for v in expected.values()]
+
+    @pytest.mark.skipif(sys.version_info[0] < 3, reason='bytes are str in python 2')
+    def test_dumps_bytes(self, codec):
+        with pytest.raises(TypeError):
+            json.dumps(b'bytes')
+        with pytest.raises(TypeError):
+            codec.dumps({'Contents': b'bytes'})
+
+    def test_dumps_not_serializable(self, codec):
+        from datetime import datetime
+        with pytest.raises(TypeError):
+            codec.dumps({'time': datetime(2020, 1, 1)})
+
+    def test_dumps_subclass(self, codec):
+        from collections import OrderedDict
+        value = OrderedDict([('b', 1), ('a', 2)])
+        assert codec.dumps(value).replace(' ', '') == json.dumps(value).replace(' ', '')
+
+
+class JSONSerializable(object):
+    def __json__(self):
+        return '"json"'
+
+
+class DictSerializable(object):
+    def toDict(self):
+        return {'key': 'value'}
+
+
+@pytest.mark.parametrize('value, expected', [
+    ({'number': Decimal('1.5')}, {'number': 1.5}),
+    ({(1, 2): 'tuple key'}, {'(1, 2)': 'tuple key'}),
+    ([JSONSerializable()], ['json']),
+    ([DictSerializable()], [{'key': 'value'}]),
+])
+def test_ujson_codec_serializes_more(value, expected):
+    """ ujson serializes these values, where the standard library raises a TypeError """
+    pytest.importorskip('ujson')
+    with pytest.raises(TypeError):
+        json.dumps(value)
+    assert json.loads(UjsonCodec().dumps(value)) == expected
+
+
+@pytest.mark.parametrize('value', [float('nan'), float('inf'), float('-inf')])
+def test_orjson_codec_non_finite_floats(value):
+    """ orjson writes non finite floats as null, where the standard library writes a literal which is not JSON """
+    pytest.importorskip('orjson')
+    assert OrjsonCodec().dumps([value]) == '[null]'
+    assert json.dumps([value]) != '[null]'
+    with pytest.raises(TypeError):
+        OrjsonCodec().dumps({'number': Decimal('1.5')})
+
+
+def test_ujson_codec_truncated_floats(monkeypatch):
+    """ a ujson which truncates floats, as ujson 1.x does by default, is not used """
+    import types
+    ujson = types.ModuleType('ujson')
+    ujson.dumps = lambda obj, **kwargs: json.dumps(round(obj, 9))
+    ujson.loads = json.loads
+    monkeypatch.setitem(sys.modules, 'ujson', ujson)
+    with pytest.raises(ImportError):
+        UjsonCodec()
+    assert get_json_codec('ujson').name == 'json'
+
+
+@pytest.mark.skipif(sys.version_info[0] < 3, reason='orjson is python 3 only')
+def test_orjson_codec_serializes_more():
+    """ orjson serializes these values, where the standard library raises a TypeError """
+    import enum
+    import uuid
+    from datetime import date, datetime
+    pytest.importorskip('orjson')
+
+    class Color(enum.Enum):
+        RED = 'red'
+
+    value = {'uuid': uuid.UUID(int=1), 'enum': Color.RED, date(2020, 1, 2): 'date key'}
+    with pytest.raises(TypeError):
+        json.dumps(value)
+    expected = {'uuid': '00000000-0000-0000-0000-000000000001', 'enum': 'red', '2020-01-02': 'date key'}
+    assert json.loads(OrjsonCodec().dumps(value)) == expected
+    with pytest.raises(TypeError):
+        OrjsonCodec().dumps({'time': datetime(2020, 1, 2)})
+
+
+def test_get_json_codec():
+    assert get_json_codec('json').name == 'json'
+    assert get_json_codec('no_such_codec').name == 'json'